@@ -4,15 +4,25 @@ import threading
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 
 from a_core.a_fileflow.aa02_content_extractor import ContentExtractor
 from a_core.d_ai.ad01_analyzer import AIAnalyzer
 from a_core.a_fileflow.aa05_database import DatabaseManager
+from a_core.a_fileflow.aa016_async_db import AsyncDatabase
 from a_core.a_fileflow.aa014_vector_storage import VectorStorage
 from a_core.a_fileflow.aa03_context_memory import ContextMemory
+from a_core.e_utils.ae01_file_utils import FileUtils
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae08_metrics import get_registry
+from a_core.e_utils.ae09_tracing import get_tracer
+from a_core.f_data.af04_content_store import content_hash
+
+# Files slower than this end to end get a performance log entry with the
+# per-stage breakdown; every file is still recorded in the stage histograms
+SLOW_FILE_SECONDS = 5.0
 
 class FileEventHandler(FileSystemEventHandler):
     """Handle file system events for monitoring"""
@@ -36,15 +46,23 @@ class FileEventHandler(FileSystemEventHandler):
     def on_moved(self, event):
         """Handle file move/rename events"""
         if not event.is_directory:
+            self.file_monitor.remove_file(event.src_path)
             self.file_monitor.process_file(event.dest_path, "moved")
+    
+    def on_deleted(self, event):
+        """Handle file deletion events"""
+        if not event.is_directory:
+            self.file_monitor.remove_file(event.src_path)
 
 class FileMonitor:
     """Main file monitoring class"""
     
     def __init__(self, folder_path: str, db_manager: DatabaseManager, 
-                 vector_storage: VectorStorage, context_memory: ContextMemory):
+                 vector_storage: VectorStorage, context_memory: ContextMemory,
+                 async_db: Optional[AsyncDatabase] = None):
         self.folder_path = folder_path
         self.db_manager = db_manager
+        self.async_db = async_db
         self.vector_storage = vector_storage
         self.context_memory = context_memory
         self.observer = None
@@ -52,6 +70,11 @@ class FileMonitor:
         self.content_extractor = ContentExtractor()
         self.ai_analyzer = AIAnalyzer()
         self.logger = LoggingUtils()
+        self.metrics = get_registry()
+        self.tracer = get_tracer()
+        
+        # Fingerprints of files already processed, keyed by path
+        self._fingerprints: Dict[str, Dict[str, Any]] = {}
         
         # Supported file extensions
         self.supported_extensions = {
@@ -98,6 +121,12 @@ class FileMonitor:
             self.observer.stop()
             self.observer.join()
         
+        # Write out anything still waiting in the write-behind buffers
+        if self.async_db is not None:
+            self.async_db.submit_write(self.db_manager.flush).result()
+        else:
+            self.db_manager.flush()
+        
         self.logger.log_activity(
             "monitoring_stopped",
             f"Stopped monitoring folder: {self.folder_path}",
@@ -108,6 +137,16 @@ class FileMonitor:
         """Process all existing files in the folder"""
         try:
             folder_path = Path(self.folder_path)
+            
+            # Load all known fingerprints with one range scan so unchanged
+            # files are skipped after a stat() and nothing else
+            if self.async_db is not None:
+                self._fingerprints = self.async_db.submit_read(
+                    self.db_manager.get_file_fingerprints, self.folder_path
+                ).result()
+            else:
+                self._fingerprints = self.db_manager.get_file_fingerprints(self.folder_path)
+            
             for file_path in folder_path.rglob('*'):
                 if file_path.is_file() and file_path.suffix.lower() in self.supported_extensions:
                     self.process_file(str(file_path), "existing")
@@ -125,60 +164,99 @@ class FileMonitor:
             
             # Check if file extension is supported
             if file_path_obj.suffix.lower() not in self.supported_extensions:
+                self._count_file("unsupported")
                 return
             
-            # Check if file already processed recently
-            if self._is_recently_processed(file_path):
-                return
-            
-            # Extract content from file
-            content_data = self.content_extractor.extract_content(file_path)
-            if not content_data:
+            # Skip files that have not changed since they were last processed
+            with self.metrics.stage("detect_change"):
+                fingerprint = self._detect_change(file_path)
+            if fingerprint is None:
+                self._count_file("unchanged")
                 return
             
-            # Analyze content and generate naming suggestion
-            analysis_result = self.ai_analyzer.analyze_file_content(
-                content_data['content'],
-                content_data['metadata'],
-                self.context_memory
-            )
-            
-            # Generate vector embedding
-            embedding = self.ai_analyzer.generate_embedding(content_data['content'])
-            
-            # Store in vector database
-            vector_id = self.vector_storage.store_embedding(
-                embedding=embedding,
-                content=content_data['content'],
-                metadata={
-                    'file_path': file_path,
-                    'original_name': file_path_obj.name,
-                    'suggested_name': analysis_result['suggested_name'],
-                    'entities': analysis_result['entities'],
-                    'event_type': event_type
-                }
-            )
-            
-            # Store in main database
-            self.db_manager.store_file_analysis(
-                file_path=file_path,
-                original_name=file_path_obj.name,
-                suggested_name=analysis_result['suggested_name'],
-                content=content_data['content'],
-                metadata=content_data['metadata'],
-                entities=analysis_result['entities'],
-                confidence=analysis_result['confidence'],
-                reasoning=analysis_result['reasoning'],
-                vector_id=vector_id,
-                event_type=event_type
-            )
+            # One trace per processed file; each stage below is a child span
+            timings: Dict[str, float] = {}
+            with self._stage("process_file", timings, file_path=file_path,
+                             file_name=file_path_obj.name, event_type=event_type,
+                             bytes=fingerprint['size']):
+                # Extract content from file
+                with self._stage("extract", timings):
+                    content_data = self.content_extractor.extract_content(file_path)
+                if not content_data:
+                    # Same bytes would fail the same way, so don't retry until they change
+                    self._record_fingerprint(file_path, fingerprint)
+                    self._count_file("extraction_failed")
+                    return
+                
+                # Analyze content and generate naming suggestion
+                with self._stage("analyze", timings):
+                    analysis_result = self.ai_analyzer.analyze_file_content(
+                        content_data['content'],
+                        content_data['metadata'],
+                        self.context_memory
+                    )
+                
+                # Embed every chunk of the content in batched API calls
+                with self._stage("embed", timings):
+                    chunks, embeddings = self.ai_analyzer.embed_chunks(content_data['content'])
+                
+                # Store the chunks under one parent document in the vector database,
+                # replacing the vectors of the file's previous version
+                with self._stage("vector_store", timings, chunks=len(chunks)):
+                    document_metadata = {
+                        'original_name': file_path_obj.name,
+                        'suggested_name': analysis_result['suggested_name'],
+                        'entities': analysis_result['entities'],
+                        'event_type': event_type,
+                        'content_hash': content_hash(content_data['content'])
+                    }
+                    if chunks:
+                        texts = [chunk.text for chunk in chunks]
+                        chunk_metadatas = [{'char_start': chunk.char_start, 'char_end': chunk.char_end}
+                                           for chunk in chunks]
+                    else:
+                        embeddings = [self.ai_analyzer.generate_embedding(content_data['content'])]
+                        texts, chunk_metadatas = [content_data['content']], None
+                    vector_id = self.vector_storage.upsert_document(
+                        file_path=file_path,
+                        embeddings=embeddings,
+                        chunks=texts,
+                        metadata=document_metadata,
+                        chunk_metadatas=chunk_metadatas
+                    )
+                
+                # Queue for the main database (flushed in batches)
+                with self._stage("db_queue", timings):
+                    self.db_manager.queue_file_analysis(
+                        file_path=file_path,
+                        original_name=file_path_obj.name,
+                        suggested_name=analysis_result['suggested_name'],
+                        content=content_data['content'],
+                        metadata=content_data['metadata'],
+                        entities=analysis_result['entities'],
+                        confidence=analysis_result['confidence'],
+                        reasoning=analysis_result['reasoning'],
+                        vector_id=vector_id,
+                        event_type=event_type
+                    )
+                
+                # Update context memory
+                with self._stage("context_update", timings):
+                    self.context_memory.update_context(
+                        entities=analysis_result['entities'],
+                        content=content_data['content'],
+                        file_path=file_path
+                    )
+                
+                self._record_fingerprint(file_path, fingerprint)
             
-            # Update context memory
-            self.context_memory.update_context(
-                entities=analysis_result['entities'],
-                content=content_data['content'],
-                file_path=file_path
-            )
+            self._count_file("processed")
+            if timings['process_file'] >= SLOW_FILE_SECONDS:
+                self.logger.log_performance(
+                    "process_file",
+                    timings['process_file'],
+                    {"file_path": file_path, "stage_seconds": timings}
+                )
             
             # Log the activity
             self.logger.log_activity(
@@ -193,15 +271,88 @@ class FileMonitor:
             )
             
         except Exception as e:
+            self._count_file("error")
             self.logger.log_activity(
                 "file_processing_error",
                 f"Error processing file {file_path}: {str(e)}",
                 {"file_path": file_path, "error": str(e)}
             )
     
-    def _is_recently_processed(self, file_path: str) -> bool:
-        """Check if file was recently processed to avoid duplicates"""
+    def remove_file(self, file_path: str):
+        """Retire the vectors of a deleted or moved-away file and forget its fingerprint"""
+        if Path(file_path).suffix.lower() not in self.supported_extensions:
+            return
         try:
-            return self.db_manager.is_file_recently_processed(file_path)
-        except Exception:
-            return False
+            self._fingerprints.pop(file_path, None)
+            if self.async_db is not None:
+                self.async_db.submit_write(self.db_manager.delete_file_fingerprint, file_path).result()
+            else:
+                self.db_manager.delete_file_fingerprint(file_path)
+            removed = self.vector_storage.delete_document(file_path)
+            self._count_file("removed")
+            
+            self.logger.log_activity(
+                "file_removed",
+                f"Removed file: {Path(file_path).name}",
+                {"file_path": file_path, "vectors_removed": removed}
+            )
+            
+        except Exception as e:
+            self.logger.log_activity(
+                "file_processing_error",
+                f"Error removing file {file_path}: {str(e)}",
+                {"file_path": file_path, "error": str(e)}
+            )
+    
+    @contextmanager
+    def _stage(self, stage: str, timings: Dict[str, float], **attributes) -> Iterator[None]:
+        """Run a pipeline stage in a span, timed into its histogram and the file's timings"""
+        timer = self.metrics.stage(stage)
+        with self.tracer.span(stage, **attributes):
+            with timer:
+                yield
+        timings[stage] = round(timer.elapsed, 6)
+    
+    def _count_file(self, outcome: str):
+        """Count a file handled by process_file, by outcome"""
+        self.metrics.counter("fileflow_files_total", "Files seen by the monitor", outcome=outcome).inc()
+    
+    def _detect_change(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Return the file's new fingerprint if it changed, or None if unchanged"""
+        stat = os.stat(file_path)
+        known = self._fingerprints.get(file_path)
+        if known is None:
+            if self.async_db is not None:
+                known = self.async_db.submit_read(self.db_manager.get_file_fingerprint, file_path).result()
+            else:
+                known = self.db_manager.get_file_fingerprint(file_path)
+        
+        if known is not None and known['size'] == stat.st_size:
+            if known['mtime_ns'] == stat.st_mtime_ns and known['inode'] == stat.st_ino:
+                return None
+            
+            # Same size but touched, copied back or restored: compare content
+            file_hash = FileUtils.get_content_hash(file_path)
+            fingerprint = self._fingerprint_from_stat(stat, file_hash)
+            if file_hash is not None and file_hash == known['content_hash']:
+                # Remember the new stat so the next check is stat-only again
+                self._record_fingerprint(file_path, fingerprint)
+                return None
+            return fingerprint
+        
+        return self._fingerprint_from_stat(stat, FileUtils.get_content_hash(file_path))
+    
+    @staticmethod
+    def _fingerprint_from_stat(stat: os.stat_result, file_hash: Optional[str]) -> Dict[str, Any]:
+        """Build a fingerprint from stat() output and a content hash"""
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'inode': stat.st_ino,
+            'content_hash': file_hash
+        }
+    
+    def _record_fingerprint(self, file_path: str, fingerprint: Dict[str, Any]):
+        """Remember a processed file's fingerprint in memory and the database"""
+        self._fingerprints[file_path] = fingerprint
+        self.db_manager.queue_file_fingerprint(file_path=file_path, **fingerprint)
@@ -1,8 +1,11 @@
 import os
 import json
+import atexit
+import threading
+import time
+import weakref
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-import sqlite3
 from datetime import datetime
 
 # Try importing numpy with fallback
@@ -24,7 +27,100 @@ try:
 except ImportError:
     faiss = None
 
+try:
+    from a_core.a_fileflow.aa017_ann_index import (IVFIndex, DEFAULT_NPROBE, RETRAIN_GROWTH,
+                                                   default_nlist, member_mask, normalize_rows)
+except ImportError:
+    IVFIndex = None
+    DEFAULT_NPROBE = None
+    RETRAIN_GROWTH = None
+    default_nlist = None
+    member_mask = None
+    normalize_rows = None
+
+try:
+    from a_core.a_fileflow.aa018_mmap_vectors import MmapVectorMatrix
+except ImportError:
+    MmapVectorMatrix = None
+
+try:
+    from a_core.a_fileflow.aa019_quantization import PQ_TRAIN_SAMPLE, QUANTIZATION_MODES
+except ImportError:
+    PQ_TRAIN_SAMPLE = None
+    # Without NumPy only exact search runs
+    QUANTIZATION_MODES = ("none",)
+
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.e_utils.ae09_tracing import get_tracer
+from a_core.f_data.af02_migrations import MigrationRunner, VECTOR_DB_MIGRATIONS, FAISS_METADATA_MIGRATIONS
+from a_core.f_data.af05_vector_codec import encode_embedding, decode_embedding
+from a_core.f_data.af06_vector_attributes import index_attributes, metadata_attributes, normalize_extension
+from a_core.f_data.af07_sql_time import sql_timestamp
+
+# Only a preview of the text is kept next to each vector; the full text is
+# in second_brain.db's content store (DatabaseManager.get_file_content)
+SNIPPET_LENGTH = 1000
+
+# Dimensions of the FAISS index (OpenAI text-embedding models)
+FAISS_DIMENSIONS = 1536
+
+# Rows read per batch when replaying vectors.db into the ANN index or matrix
+ANN_SYNC_BATCH = 5000
+
+# FAISS adds are committed to metadata.db first and the index file is only
+# rewritten once this many adds (or this fraction of the index) have
+# accumulated, or after this many seconds; rows newer than the saved index
+# are replayed from the table on open
+FAISS_CHECKPOINT_MIN_ADDS = 1000
+FAISS_CHECKPOINT_FRACTION = 0.05
+FAISS_CHECKPOINT_SECONDS = 60
+
+# VECTOR_QUANTIZATION=int8 or pq on the FAISS backend stores codes instead of
+# float32 vectors: an IndexIVFScalarQuantizer (one byte per dimension) or an
+# IndexIVFPQ (one byte per FAISS_PQ_SUBVECTOR_DIMS dimensions) under
+# IndexIDMap2. The IVF lists and codebooks are trained on a sample of at most
+# PQ_TRAIN_SAMPLE stored embeddings, so the index stays flat and exact until
+# this many rows exist. maybe_retrain() trains it from the maintenance
+# scheduler, and retrains it once it has grown RETRAIN_GROWTH-fold
+FAISS_QUANTIZE_MIN_ROWS = 10000
+FAISS_PQ_SUBVECTOR_DIMS = 8
+FAISS_QUANTIZERS = {"IndexIVFScalarQuantizer": "int8", "IndexIVFPQ": "pq"}
+
+# Rows per collection.add call; ChromaDB rejects batches above ~5461
+CHROMA_ADD_BATCH = 5000
+
+# Ids per WHERE id IN (...) lookup, below SQLite's bound parameter limit
+ROW_LOOKUP_CHUNK = 500
+
+# A quantized ANN index returns this many times the requested results, which
+# are re-ranked exactly against the float32 embeddings in vectors.db
+DEFAULT_RERANK_FACTOR = 8
+
+# Chunks of one document share a parent_id in their metadata (the vector id
+# of chunk 0). search_documents fetches this many chunk hits per requested
+# document, doubling up to the cap while fewer distinct documents turn up
+CHUNK_SEARCH_FANOUT = 4
+MAX_CHUNK_CANDIDATES = 2000
+CHUNK_POOLING_MODES = ("max", "mean")
+
+# Filters accepted by search_similar and search_documents. Values within one
+# filter are alternatives, filters combine with AND; created_after /
+# created_before bound the row's created_at (inclusive / exclusive)
+VECTOR_FILTERS = ("entities", "extensions", "event_types", "file_paths", "created_after", "created_before")
+FILTER_ATTRIBUTES = {"entities": "entity", "extensions": "extension",
+                     "event_types": "event_type", "file_paths": "file_path"}
+# Filters matching at most this many rows are searched exactly over just
+# those rows; broader ones go through the FAISS or IVF index with the rows
+# as an id mask
+FILTER_FIRST_MAX_ROWS = 20000
+
+# Deleted and superseded rows are tombstoned: searches skip them at once,
+# and compact() later drops them from the table and rewrites the FAISS
+# index, IVF index or mmap matrix without them. maybe_compact() does so once
+# this many tombstones (or this fraction of the stored rows) accumulate
+COMPACT_MIN_TOMBSTONES = 1000
+COMPACT_FRACTION = 0.1
 
 class VectorStorage:
     """Vector database for semantic storage and search"""
@@ -33,26 +129,72 @@ class VectorStorage:
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True)
         self.logger = LoggingUtils()
+        self.tracer = get_tracer()
         
         # Initialize the vector database
         self.client = None
         self.collection = None
         self.faiss_index = None
-        self.metadata_db = None
+        self.metadata_pool = None
+        self.ann_index = None
+        self.ann_enabled = False
+        self.vector_matrix = None
+        self._faiss_unsaved = 0
+        self._faiss_saved_at = time.monotonic()
+        # Serializes index writers: the monitor's stores and the scheduler's compaction
+        self._write_lock = threading.RLock()
+        # Serializes the operations replacing the whole index: rebuilds, which
+        # only take the write lock to swap it in, compaction and clearing
+        self._index_lock = threading.RLock()
+        # Sorted row ids of tombstoned rows still held by the index
+        self._tombstones = self._empty_ids()
         
         self._initialize_storage()
+        if self.metadata_pool is not None and not self.collection:
+            self._load_tombstones()
+        _open_storages.add(self)
     
     def _initialize_storage(self):
-        """Initialize the vector storage system"""
+        """Initialize the vector storage system
+        
+        VECTOR_BACKEND=mmap selects the memory-mapped matrix; otherwise the
+        first available of ChromaDB, FAISS and the SQLite fallback is used.
+        VECTOR_QUANTIZATION=int8 or pq quantizes the FAISS index or the
+        SQLite fallback's IVF index. ChromaDB manages its own index and
+        can't be quantized: the setting is rejected with a logged error and
+        ChromaDB keeps storing float32 vectors, rather than switching to
+        another backend and leaving the collection behind. An unknown mode
+        is rejected the same way on every backend.
+        """
+        self.quantization = os.getenv("VECTOR_QUANTIZATION", "none").strip().lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            self.logger.log_activity(
+                "vector_storage_config_error",
+                f"Unknown VECTOR_QUANTIZATION={self.quantization}, expected one of "
+                f"{', '.join(QUANTIZATION_MODES)}; vectors are stored unquantized",
+                {"quantization": self.quantization}
+            )
+            self.quantization = "none"
+        
         try:
+            backend = os.getenv("VECTOR_BACKEND", "auto").strip().lower()
+            if backend == "mmap" and MmapVectorMatrix is not None:
+                self._initialize_mmap_matrix()
             # Try ChromaDB first
-            if chromadb:
+            elif chromadb:
+                if self.quantization != "none":
+                    self.logger.log_activity(
+                        "vector_storage_config_error",
+                        f"VECTOR_QUANTIZATION={self.quantization} is not supported by ChromaDB; "
+                        f"vectors are stored unquantized",
+                        {"quantization": self.quantization, "backend": "chromadb"}
+                    )
                 self._initialize_chromadb()
             elif faiss:
                 self._initialize_faiss()
             else:
                 self._initialize_sqlite_fallback()
-                
+        
         except Exception as e:
             self.logger.log_activity(
                 "vector_storage_init_error",
@@ -81,233 +223,1045 @@ class VectorStorage:
                 "ChromaDB initialized successfully",
                 {"storage_path": str(self.storage_path)}
             )
-            
+        
         except Exception as e:
             raise Exception(f"ChromaDB initialization failed: {str(e)}")
     
     def _initialize_faiss(self):
-        """Initialize FAISS for vector storage"""
+        """Initialize FAISS for vector storage
+        
+        Vectors are keyed by vector_metadata.id through IndexIDMap2, so hits
+        resolve with one primary-key lookup and stay correct after deletes.
+        With VECTOR_QUANTIZATION=int8 or pq the index holds codes once
+        maybe_retrain() finds FAISS_QUANTIZE_MIN_ROWS stored, searched with VECTOR_ANN_NPROBE
+        lists and re-ranked VECTOR_RERANK_FACTOR times the requested results
+        exactly against the embeddings in metadata.db.
+        """
         try:
-            # Create FAISS index (using 1536 dimensions for OpenAI embeddings)
-            self.faiss_index = faiss.IndexFlatL2(1536)
+            # Validated by _initialize_storage
+            self.faiss_quantization = self.quantization
+            self.faiss_nprobe = int(os.getenv("VECTOR_ANN_NPROBE", str(DEFAULT_NPROBE)))
+            self.faiss_rerank_factor = int(os.getenv("VECTOR_RERANK_FACTOR", str(DEFAULT_RERANK_FACTOR)))
             
             # Create metadata database
             metadata_db_path = self.storage_path / "metadata.db"
-            self.metadata_db = sqlite3.connect(str(metadata_db_path), check_same_thread=False)
-            
-            # Create metadata table
-            cursor = self.metadata_db.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS vector_metadata (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    vector_id TEXT UNIQUE,
-                    content TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            self.metadata_db.commit()
+            self.metadata_pool = get_pool(str(metadata_db_path))
+            MigrationRunner(self.metadata_pool, FAISS_METADATA_MIGRATIONS, logger=self.logger).run()
             
             # Load existing index if it exists
             index_path = self.storage_path / "faiss_index.bin"
             if index_path.exists():
                 self.faiss_index = faiss.read_index(str(index_path))
+                if not isinstance(self.faiss_index, faiss.IndexIDMap2):
+                    self._upgrade_positional_faiss_index()
+            else:
+                self.faiss_index = self._new_faiss_index()
+            
+            # Rows committed after the last checkpoint
+            replayed = self._replay_faiss_rows()
+            
+            with self.metadata_pool.read() as conn:
+                stored = conn.execute(
+                    "SELECT COUNT(*) FROM vector_metadata WHERE embedding IS NOT NULL"
+                ).fetchone()[0]
+            if stored != self.faiss_index.ntotal or self._faiss_needs_retraining(stored):
+                # The index file is missing or older than the table, or saved with
+                # another quantization
+                self.rebuild_index()
+            elif self.faiss_quantized:
+                faiss.extract_index_ivf(self.faiss_index).nprobe = self.faiss_nprobe
             
             self.logger.log_activity(
                 "vector_storage_init",
                 "FAISS initialized successfully",
-                {"storage_path": str(self.storage_path)}
+                {"storage_path": str(self.storage_path), "vectors": self.faiss_index.ntotal,
+                 "replayed": replayed, "quantization": self._faiss_index_quantization()}
             )
-            
+        
         except Exception as e:
             raise Exception(f"FAISS initialization failed: {str(e)}")
     
+    def _new_faiss_index(self, train_vectors=None, count: Optional[int] = None):
+        """Empty L2 index that stores explicit int64 ids
+        
+        The index is exact unless quantization is on and train_vectors holds
+        at least FAISS_QUANTIZE_MIN_ROWS vectors to train the codes on. The
+        IVF lists are sized for count rows, by default len(train_vectors).
+        """
+        if (self.faiss_quantization == "none" or train_vectors is None
+                or len(train_vectors) < FAISS_QUANTIZE_MIN_ROWS):
+            return faiss.IndexIDMap2(faiss.IndexFlatL2(FAISS_DIMENSIONS))
+        
+        nlist = default_nlist(count or len(train_vectors))
+        coarse = faiss.IndexFlatL2(FAISS_DIMENSIONS)
+        if self.faiss_quantization == "int8":
+            ivf = faiss.IndexIVFScalarQuantizer(coarse, FAISS_DIMENSIONS, nlist,
+                                                faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        else:
+            ivf = faiss.IndexIVFPQ(coarse, FAISS_DIMENSIONS, nlist,
+                                   FAISS_DIMENSIONS // FAISS_PQ_SUBVECTOR_DIMS, 8)
+        with self.tracer.span("faiss_train", vectors=len(train_vectors), nlist=nlist,
+                              quantization=self.faiss_quantization):
+            ivf.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+        ivf.nprobe = self.faiss_nprobe
+        return faiss.IndexIDMap2(ivf)
+    
+    def _faiss_index_quantization(self) -> str:
+        """Quantization of the loaded FAISS index: none, int8 or pq"""
+        inner = faiss.downcast_index(self.faiss_index.index)
+        return FAISS_QUANTIZERS.get(type(inner).__name__, "none")
+    
+    @property
+    def faiss_quantized(self) -> bool:
+        """Whether the FAISS index holds codes, whose hits need re-ranking"""
+        return self.faiss_index is not None and self._faiss_index_quantization() != "none"
+    
+    def _faiss_needs_retraining(self, stored: int) -> bool:
+        """Whether the index should be rebuilt for the configured quantization
+        
+        A quantized index stays as long as the mode matches, even after
+        compaction shrinks it below FAISS_QUANTIZE_MIN_ROWS.
+        """
+        current = self._faiss_index_quantization()
+        if current != "none":
+            return current != self.faiss_quantization
+        return self.faiss_quantization != "none" and stored >= FAISS_QUANTIZE_MIN_ROWS
+    
+    def _faiss_outgrown(self) -> bool:
+        """Whether a quantized FAISS index holds RETRAIN_GROWTH times the rows its lists were sized for
+        
+        nlist is default_nlist of the rows at training, about 2·sqrt(rows),
+        so that growth shows as sqrt(RETRAIN_GROWTH) times the lists.
+        """
+        if not self.faiss_quantized:
+            return False
+        nlist = faiss.extract_index_ivf(self.faiss_index).nlist
+        return default_nlist(self.faiss_index.ntotal) >= np.sqrt(RETRAIN_GROWTH) * nlist
+    
+    def maybe_retrain(self) -> bool:
+        """rebuild_index() if the FAISS index should be quantized or has outgrown its lists; whether it ran
+        
+        MaintenanceScheduler calls this, so training never runs on the
+        thread storing embeddings or while it waits for the write lock.
+        """
+        if self.faiss_index is None or self.metadata_pool is None:
+            return False
+        if not (self._faiss_needs_retraining(self.faiss_index.ntotal) or self._faiss_outgrown()):
+            return False
+        self.rebuild_index()
+        return True
+    
+    def _faiss_training_sample(self):
+        """Row count and embeddings of at most PQ_TRAIN_SAMPLE random rows of vector_metadata"""
+        with self.metadata_pool.read() as conn:
+            ids = np.array([row[0] for row in conn.execute(
+                "SELECT id FROM vector_metadata WHERE embedding IS NOT NULL ORDER BY id"
+            )], dtype=np.int64)
+        count = len(ids)
+        if count > PQ_TRAIN_SAMPLE:
+            ids = np.sort(np.random.default_rng(0).choice(ids, PQ_TRAIN_SAMPLE, replace=False))
+        
+        vectors = []
+        with self.metadata_pool.read() as conn:
+            for start in range(0, len(ids), ROW_LOOKUP_CHUNK):
+                chunk = ids[start:start + ROW_LOOKUP_CHUNK].tolist()
+                placeholders = ",".join("?" * len(chunk))
+                vectors.extend(decode_embedding(row[0]) for row in conn.execute(f"""
+                    SELECT embedding FROM vector_metadata WHERE id IN ({placeholders}) AND embedding IS NOT NULL
+                """, chunk))
+        return count, np.asarray(vectors, dtype=np.float32).reshape(len(vectors), FAISS_DIMENSIONS)
+    
+    def _save_faiss_index(self):
+        """Write the FAISS index to faiss_index.bin, replacing the old file atomically"""
+        index_path = self.storage_path / "faiss_index.bin"
+        tmp_path = self.storage_path / "faiss_index.bin.tmp"
+        with self.tracer.span("faiss_write_index", vectors=self.faiss_index.ntotal):
+            faiss.write_index(self.faiss_index, str(tmp_path))
+            os.replace(tmp_path, index_path)
+        self._faiss_unsaved = 0
+        self._faiss_saved_at = time.monotonic()
+    
+    def _maybe_checkpoint_faiss(self):
+        """Save the FAISS index once enough adds or time have accumulated"""
+        if not self._faiss_unsaved:
+            return
+        threshold = max(FAISS_CHECKPOINT_MIN_ADDS, FAISS_CHECKPOINT_FRACTION * self.faiss_index.ntotal)
+        if (self._faiss_unsaved >= threshold
+                or time.monotonic() - self._faiss_saved_at >= FAISS_CHECKPOINT_SECONDS):
+            self._save_faiss_index()
+    
+    def checkpoint(self):
+        """Persist index state that is only held in memory"""
+        if self.faiss_index is not None and self._faiss_unsaved:
+            self._save_faiss_index()
+        elif self.ann_index is not None:
+            self.ann_index.save()
+    
+    def _replay_faiss_rows(self) -> int:
+        """Add metadata rows newer than the loaded FAISS index and return how many"""
+        last_id = 0
+        if self.faiss_index.ntotal:
+            last_id = int(faiss.vector_to_array(self.faiss_index.id_map).max())
+        replayed = self._replay_stored_rows(last_id, self._add_to_faiss_index, table="vector_metadata")
+        if replayed:
+            self._save_faiss_index()
+        return replayed
+    
+    def _add_to_faiss_index(self, ids: List[int], embeddings):
+        """Add rows to the FAISS index under their metadata ids"""
+        self.faiss_index.add_with_ids(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1),
+                                      np.array(ids, dtype=np.int64))
+    
+    def _upgrade_positional_faiss_index(self):
+        """Re-key an index from before IndexIDMap2 by vector_metadata ids
+        
+        The old index held vectors by position, the nth matching the nth
+        vector_metadata row by id. Its vectors are copied into the table
+        so that later rebuilds don't depend on the index file.
+        """
+        legacy = self.faiss_index
+        vectors = np.empty((0, legacy.d), dtype=np.float32)
+        if legacy.ntotal:
+            vectors = legacy.reconstruct_n(0, legacy.ntotal)
+        with self.metadata_pool.transaction() as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM vector_metadata ORDER BY id LIMIT ?", (legacy.ntotal,)
+            )]
+            vectors = vectors[:len(ids)]
+            conn.executemany(
+                "UPDATE vector_metadata SET embedding = ? WHERE id = ?",
+                [(encode_embedding(vector), row_id) for vector, row_id in zip(vectors, ids)]
+            )
+        
+        self.faiss_index = self._new_faiss_index()
+        if ids:
+            self.faiss_index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32),
+                                          np.array(ids, dtype=np.int64))
+        self._save_faiss_index()
+        
+        self.logger.log_activity(
+            "faiss_index_upgraded",
+            f"Re-keyed {len(ids)} FAISS vectors by metadata id",
+            {"vector_count": len(ids), "legacy_vectors": legacy.ntotal}
+        )
+    
     def _initialize_sqlite_fallback(self):
         """Initialize SQLite fallback for vector storage"""
         try:
-            db_path = self.storage_path / "vectors.db"
-            self.metadata_db = sqlite3.connect(str(db_path), check_same_thread=False)
-            
-            cursor = self.metadata_db.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS vectors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    vector_id TEXT UNIQUE,
-                    embedding TEXT,
-                    content TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            self.metadata_db.commit()
+            self._initialize_vectors_db()
+            self._initialize_ann_index()
             
             self.logger.log_activity(
                 "vector_storage_init",
                 "SQLite fallback initialized successfully",
-                {"storage_path": str(self.storage_path)}
+                {"storage_path": str(self.storage_path),
+                 "ann_index": self.ann_index.ntotal if self.ann_index else None,
+                 "quantization": self.ann_quantization if self.ann_enabled else None,
+                 "index_bytes": self.ann_index.nbytes if self.ann_index else None}
             )
-            
+        
         except Exception as e:
             raise Exception(f"SQLite fallback initialization failed: {str(e)}")
     
+    def _initialize_mmap_matrix(self):
+        """Initialize the memory-mapped matrix backend, with content and metadata in vectors.db"""
+        try:
+            self._initialize_vectors_db()
+            self.vector_matrix = MmapVectorMatrix(str(self.storage_path / "matrix"))
+            self._sync_vector_matrix()
+            
+            self.logger.log_activity(
+                "vector_storage_init",
+                "Memory-mapped vector matrix initialized successfully",
+                {"storage_path": str(self.storage_path), "rows": self.vector_matrix.count}
+            )
+        
+        except Exception as e:
+            self.vector_matrix = None
+            raise Exception(f"Memory-mapped matrix initialization failed: {str(e)}")
+    
+    def _initialize_vectors_db(self):
+        """Open vectors.db and bring its schema up to date"""
+        db_path = self.storage_path / "vectors.db"
+        self.metadata_pool = get_pool(str(db_path))
+        
+        # Creates the table and re-encodes JSON embeddings as float32 blobs
+        runner = MigrationRunner(self.metadata_pool, VECTOR_DB_MIGRATIONS, logger=self.logger)
+        reencoded = runner.current_version() < 2
+        runner.run()
+        if reencoded:
+            self._reclaim_space()
+    
+    def _reclaim_space(self):
+        """VACUUM vectors.db so the pages freed by smaller embeddings go back to the OS"""
+        conn = self.metadata_pool.connection()
+        if conn.execute("SELECT EXISTS(SELECT 1 FROM vectors)").fetchone()[0]:
+            size_before = os.path.getsize(self.metadata_pool.db_path)
+            conn.execute("VACUUM")
+            # In WAL mode the rewritten pages sit in the WAL and the file
+            # keeps its old size until a checkpoint copies them back
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            self.logger.log_activity(
+                "vector_storage_compacted",
+                "Compacted vectors.db after converting embeddings to float32",
+                {"bytes_before": size_before,
+                 "bytes_after": os.path.getsize(self.metadata_pool.db_path)}
+            )
+    
+    def _initialize_ann_index(self):
+        """Open the IVF index next to vectors.db and catch it up with the table
+        
+        VECTOR_ANN=off disables the index; VECTOR_ANN_NPROBE and
+        VECTOR_ANN_NLIST tune recall against latency. VECTOR_QUANTIZATION
+        (none, int8 or pq) stores the index as codes, re-ranking
+        VECTOR_RERANK_FACTOR times the requested results exactly; it keeps
+        the index on even with VECTOR_ANN=off.
+        """
+        setting = os.getenv("VECTOR_ANN", "ivf").strip().lower()
+        self.ann_quantization = self.quantization
+        self.ann_enabled = IVFIndex is not None and (setting not in ("off", "0", "false", "no")
+                                                     or self.ann_quantization != "none")
+        if not self.ann_enabled:
+            return
+        
+        self.ann_path = self.storage_path / "vectors_ivf.npz"
+        self.ann_nprobe = int(os.getenv("VECTOR_ANN_NPROBE", str(DEFAULT_NPROBE)))
+        self.ann_nlist = int(os.getenv("VECTOR_ANN_NLIST", "0")) or None
+        self.ann_rerank_factor = int(os.getenv("VECTOR_RERANK_FACTOR", str(DEFAULT_RERANK_FACTOR)))
+        # An index saved with another quantization is not loaded and gets rebuilt from vectors.db
+        self.ann_index = IVFIndex.load(str(self.ann_path), nprobe=self.ann_nprobe, nlist=self.ann_nlist,
+                                       quantization=self.ann_quantization)
+        
+        try:
+            self._sync_ann_index()
+        except Exception as e:
+            self.logger.log_activity(
+                "ann_index_error",
+                f"ANN index unavailable, using exact search: {str(e)}",
+                {"error": str(e)}
+            )
+            self.ann_index = None
+            self.ann_enabled = False
+    
+    def _covers_stored_rows(self, max_id: int, count: int) -> bool:
+        """Whether an index holding count rows up to max_id still matches vectors.db"""
+        with self.metadata_pool.read() as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM vectors WHERE id <= ?", (max_id,)).fetchone()[0]
+        return stored == count
+    
+    def _replay_stored_rows(self, after_id: int, add, table: str = "vectors") -> int:
+        """Pass rows above after_id to add(ids, embeddings) in batches and return how many
+        
+        Each batch is its own keyset-paged read, so no snapshot is held
+        while add runs.
+        """
+        replayed = 0
+        while True:
+            with self.metadata_pool.read() as conn:
+                rows = conn.execute(f"""
+                    SELECT id, embedding FROM {table}
+                    WHERE id > ? AND embedding IS NOT NULL
+                    ORDER BY id
+                    LIMIT ?
+                """, (after_id, ANN_SYNC_BATCH)).fetchall()
+            if not rows:
+                break
+            add([row[0] for row in rows], [decode_embedding(row[1]) for row in rows])
+            replayed += len(rows)
+            after_id = rows[-1][0]
+        return replayed
+    
+    def _sync_vector_matrix(self):
+        """Append rows stored since the matrix was last written, rebuilding it if it no longer matches"""
+        if not self._covers_stored_rows(self.vector_matrix.max_id, self.vector_matrix.count):
+            # Rows were deleted or the table was replaced behind the matrix
+            self.vector_matrix.reset()
+        
+        replayed = self._replay_stored_rows(self.vector_matrix.max_id, self.vector_matrix.append)
+        if replayed:
+            self.logger.log_activity(
+                "vector_matrix_synced",
+                f"Appended {replayed} stored vectors to the memory-mapped matrix",
+                {"replayed": replayed, "total": self.vector_matrix.count}
+            )
+    
+    def _sync_ann_index(self):
+        """Add rows stored since the index was last saved, rebuilding it if it no longer matches"""
+        index = self.ann_index
+        if index is not None and not self._covers_stored_rows(index.max_id, index.ntotal):
+            # Rows were deleted or the table was replaced behind the index
+            self.ann_index.reset()
+            self.ann_index = None
+        
+        last_id = self.ann_index.max_id if self.ann_index is not None else 0
+        replayed = self._replay_stored_rows(last_id, self._add_to_ann_index)
+        if replayed and self.ann_index is not None:
+            self.ann_index.save()
+            self.logger.log_activity(
+                "ann_index_synced",
+                f"Added {replayed} stored vectors to the ANN index",
+                {"replayed": replayed, "total": self.ann_index.ntotal}
+            )
+    
+    def _add_to_ann_index(self, ids: List[int], embeddings: List[List[float]]):
+        """Add rows to the ANN index, creating it once the dimension is known"""
+        if not self.ann_enabled:
+            return
+        if self.ann_index is None:
+            self.ann_index = IVFIndex(len(embeddings[0]), nprobe=self.ann_nprobe, nlist=self.ann_nlist,
+                                      path=str(self.ann_path), quantization=self.ann_quantization)
+        self.ann_index.add(ids, embeddings)
+    
     def store_embedding(self, embedding: List[float], content: str, 
                        metadata: Dict[str, Any]) -> str:
         """Store an embedding with its content and metadata"""
+        return self.store_embeddings_batch([embedding], [content], [metadata])[0]
+    
+    def store_embeddings_batch(self, embeddings, contents: List[str], metadatas: List[Dict[str, Any]],
+                               vector_ids: Optional[List[str]] = None,
+                               replace_file_path: Optional[str] = None) -> List[str]:
+        """Store many embeddings (a list of lists or a 2-D array) in one transaction and index add
+        
+        replace_file_path tombstones the rows already stored for that file
+        in the same transaction, so searches see either the old or the new
+        version of it, never both.
+        """
         try:
-            vector_id = f"vec_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+            if not len(embeddings) == len(contents) == len(metadatas):
+                raise ValueError("embeddings, contents and metadatas must have the same length")
+            if not len(embeddings):
+                return []
+            
+            vector_ids = vector_ids or self._new_vector_ids(len(embeddings))
+            snippets = [content[:SNIPPET_LENGTH] for content in contents]
+            self.tracer.annotate(backend=self._backend_name(), dimensions=len(embeddings[0]),
+                                 snippet_chars=sum(len(snippet) for snippet in snippets),
+                                 batch_size=len(embeddings))
+            replaced = 0
             
             if self.collection:  # ChromaDB
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[content[:1000]],  # ChromaDB has document length limits
-                    metadatas=[metadata],
-                    ids=[vector_id]
-                )
-                
+                if replace_file_path:
+                    # ChromaDB deletes immediately, so it needs no tombstones
+                    replaced = len(self.collection.get(where={"file_path": replace_file_path})['ids'])
+                    self.collection.delete(where={"file_path": replace_file_path})
+                embeddings = [list(map(float, embedding)) for embedding in embeddings]
+                for start in range(0, len(vector_ids), CHROMA_ADD_BATCH):
+                    end = start + CHROMA_ADD_BATCH
+                    self.collection.add(
+                        embeddings=embeddings[start:end],
+                        documents=snippets[start:end],
+                        metadatas=metadatas[start:end],
+                        ids=vector_ids[start:end]
+                    )
+            
             elif self.faiss_index is not None:  # FAISS
-                # Add to FAISS index
-                if NUMPY_AVAILABLE and np is not None:
-                    embedding_array = np.array([embedding], dtype=np.float32)
-                    self.faiss_index.add(embedding_array)
-                else:
-                    # If numpy not available, fall back to SQLite storage
-                    cursor = self.metadata_db.cursor()
-                    cursor.execute("""
-                        INSERT INTO vectors (vector_id, embedding, content, metadata)
-                        VALUES (?, ?, ?, ?)
-                    """, (vector_id, json.dumps(embedding), content, json.dumps(metadata)))
-                    self.metadata_db.commit()
-                    return vector_id
-                
-                # Store metadata
-                cursor = self.metadata_db.cursor()
-                cursor.execute("""
-                    INSERT INTO vector_metadata (vector_id, content, metadata)
-                    VALUES (?, ?, ?)
-                """, (vector_id, content, json.dumps(metadata)))
-                self.metadata_db.commit()
-                
-                # Save FAISS index
-                index_path = self.storage_path / "faiss_index.bin"
-                faiss.write_index(self.faiss_index, str(index_path))
-                
+                with self._write_lock:
+                    # Row ids are the FAISS ids; a failed add rolls the rows back
+                    with self.metadata_pool.transaction() as conn:
+                        retired = self._tombstone_file(conn, replace_file_path) if replace_file_path else []
+                        row_ids = self._insert_rows(conn, vector_ids, embeddings, snippets, metadatas)
+                        self._add_to_faiss_index(row_ids, embeddings)
+                    self._add_tombstones(retired)
+                    
+                    # The rows are durable; the index file is rewritten at checkpoints
+                    self._faiss_unsaved += len(row_ids)
+                    self._maybe_checkpoint_faiss()
+                replaced = len(retired)
+            
             else:  # SQLite fallback
-                cursor = self.metadata_db.cursor()
-                cursor.execute("""
-                    INSERT INTO vectors (vector_id, embedding, content, metadata)
-                    VALUES (?, ?, ?, ?)
-                """, (vector_id, json.dumps(embedding), content, json.dumps(metadata)))
-                self.metadata_db.commit()
+                with self._write_lock:
+                    with self.metadata_pool.transaction() as conn:
+                        retired = self._tombstone_file(conn, replace_file_path) if replace_file_path else []
+                        row_ids = self._insert_rows(conn, vector_ids, embeddings, snippets, metadatas)
+                    self._add_tombstones(retired)
+                    
+                    try:
+                        if self.vector_matrix is not None:
+                            self.vector_matrix.append(row_ids, embeddings)
+                        elif self.ann_enabled:
+                            self._add_to_ann_index(row_ids, embeddings)
+                            self.ann_index.maybe_save()
+                    except Exception as e:
+                        # The rows are stored; the index catches up from vectors.db on next start
+                        self.logger.log_activity(
+                            "ann_index_error",
+                            f"Error adding {len(row_ids)} vectors to the vector index: {str(e)}",
+                            {"vector_id": vector_ids[0], "count": len(row_ids), "error": str(e)}
+                        )
+                replaced = len(retired)
             
             self.logger.log_activity(
                 "embedding_stored",
-                f"Embedding stored with ID: {vector_id}",
-                {"vector_id": vector_id, "content_length": len(content)}
+                f"Embedding stored with ID: {vector_ids[0]}" if len(vector_ids) == 1
+                else f"{len(vector_ids)} embeddings stored",
+                {"vector_id": vector_ids[0], "count": len(vector_ids),
+                 "content_length": sum(len(content) for content in contents),
+                 "replaced": replaced}
             )
             
-            return vector_id
-            
+            return vector_ids
+        
         except Exception as e:
             self.logger.log_activity(
                 "embedding_storage_error",
                 f"Error storing embedding: {str(e)}",
-                {"error": str(e)}
+                {"error": str(e), "count": len(embeddings)}
             )
             raise
     
-    def search_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar embeddings"""
+    def store_document_chunks(self, embeddings, chunks: List[str], metadata: Dict[str, Any],
+                              chunk_metadatas: Optional[List[Dict[str, Any]]] = None,
+                              replace: bool = False) -> str:
+        """Store one embedding per chunk of a document and return the document's vector id
+        
+        Every chunk carries the document metadata plus parent_id,
+        chunk_index and chunk_count; chunk_metadatas adds per-chunk fields
+        such as character offsets. The returned id is chunk 0's, which
+        doubles as the parent_id. replace retires the vectors stored
+        earlier for metadata['file_path'].
+        """
+        if not len(chunks):
+            raise ValueError("a document needs at least one chunk")
+        if replace and not metadata.get('file_path'):
+            raise ValueError("replacing a document needs metadata['file_path']")
+        chunk_metadatas = chunk_metadatas or [{} for _ in chunks]
+        metadatas = [dict(metadata, chunk_index=index, chunk_count=len(chunks), **extra)
+                     for index, extra in enumerate(chunk_metadatas)]
+        
+        # Ids are assigned before storing, so chunk 0's id is known for every parent_id
+        vector_ids = self._new_vector_ids(len(chunks))
+        for chunk_metadata in metadatas:
+            chunk_metadata['parent_id'] = vector_ids[0]
+        return self.store_embeddings_batch(embeddings, chunks, metadatas, vector_ids=vector_ids,
+                                           replace_file_path=metadata['file_path'] if replace else None)[0]
+    
+    def upsert_document(self, file_path: str, embeddings, chunks: List[str], metadata: Dict[str, Any],
+                        chunk_metadatas: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Store a file's chunks as its only live document and return the document's vector id"""
+        return self.store_document_chunks(embeddings, chunks, dict(metadata, file_path=file_path),
+                                          chunk_metadatas, replace=True)
+    
+    def delete_document(self, file_path: str) -> int:
+        """Retire every vector stored for file_path and return how many there were"""
         try:
-            results = []
+            if self.collection:
+                deleted = len(self.collection.get(where={"file_path": file_path})['ids'])
+                if deleted:
+                    self.collection.delete(where={"file_path": file_path})
+            else:
+                with self._write_lock:
+                    with self.metadata_pool.transaction() as conn:
+                        retired = self._tombstone_file(conn, file_path)
+                    self._add_tombstones(retired)
+                deleted = len(retired)
+            
+            if deleted:
+                self.logger.log_activity(
+                    "document_deleted",
+                    f"Deleted {deleted} vectors of {file_path}",
+                    {"file_path": file_path, "count": deleted, "tombstones": len(self._tombstones)}
+                )
+            return deleted
+        
+        except Exception as e:
+            self.logger.log_activity(
+                "embedding_delete_error",
+                f"Error deleting vectors of {file_path}: {str(e)}",
+                {"file_path": file_path, "error": str(e)}
+            )
+            raise
+    
+    def _new_vector_ids(self, count: int) -> List[str]:
+        """Time-based vector ids, suffixed when several share a timestamp"""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        if count == 1:
+            return [f"vec_{stamp}"]
+        return [f"vec_{stamp}_{i:06d}" for i in range(count)]
+    
+    def _insert_rows(self, conn, vector_ids: List[str], embeddings, snippets: List[str],
+                     metadatas: List[Dict[str, Any]]) -> List[int]:
+        """Insert content rows for the FAISS or SQLite backend and return their row ids"""
+        cursor = conn.cursor()
+        row_ids = []
+        for vector_id, embedding, snippet, metadata in zip(vector_ids, embeddings, snippets, metadatas):
+            cursor.execute(f"""
+                INSERT INTO {self._rows_table()} (vector_id, embedding, content, metadata)
+                VALUES (?, ?, ?, ?)
+            """, (vector_id, encode_embedding(embedding), snippet, json.dumps(metadata)))
+            row_ids.append(cursor.lastrowid)
+        index_attributes(cursor, zip(row_ids, metadatas))
+        return row_ids
+    
+    @staticmethod
+    def _empty_ids():
+        """Empty sorted id array (a list without NumPy, which only exact search runs without)"""
+        return np.empty(0, dtype=np.int64) if np is not None else []
+    
+    def _load_tombstones(self):
+        """Read the tombstoned row ids left by earlier sessions"""
+        with self.metadata_pool.read() as conn:
+            ids = [row[0] for row in conn.execute("SELECT row_id FROM vector_tombstones ORDER BY row_id")]
+        self._tombstones = np.array(ids, dtype=np.int64) if np is not None else ids
+    
+    def _tombstone_rows(self, conn, row_ids: List[int]):
+        """Mark rows dead and drop their attributes, so filters stop matching them"""
+        conn.executemany("INSERT OR IGNORE INTO vector_tombstones (row_id) VALUES (?)",
+                         [(row_id,) for row_id in row_ids])
+        conn.executemany("DELETE FROM vector_attributes WHERE row_id = ?", [(row_id,) for row_id in row_ids])
+    
+    def _tombstone_file(self, conn, file_path: str) -> List[int]:
+        """Tombstone the live rows stored for file_path and return their ids"""
+        # Tombstoned rows have no attributes left, so only live rows match
+        row_ids = [row[0] for row in conn.execute("""
+            SELECT row_id FROM vector_attributes WHERE attribute = 'file_path' AND value = ?
+        """, (file_path,))]
+        self._tombstone_rows(conn, row_ids)
+        return row_ids
+    
+    def _add_tombstones(self, row_ids: List[int]):
+        """Add committed tombstones to the in-memory set searches skip (write lock held)"""
+        if not row_ids:
+            return
+        if np is not None:
+            self._tombstones = np.union1d(self._tombstones, np.array(row_ids, dtype=np.int64))
+        else:
+            self._tombstones = sorted(set(self._tombstones) | set(row_ids))
+    
+    def _drop_tombstoned(self, hits, limit: int):
+        """(ids, distances) pairs without tombstoned rows, cut to limit per query"""
+        tombstones = self._tombstones
+        if not len(tombstones):
+            return hits
+        live_hits = []
+        for ids, distances in hits:
+            live = ~member_mask(np.asarray(ids, dtype=np.int64), tombstones)
+            live_hits.append((np.asarray(ids)[live][:limit], np.asarray(distances)[live][:limit]))
+        return live_hits
+    
+    def _backend_name(self) -> str:
+        """Name of the active vector backend"""
+        if self.collection:
+            return "chromadb"
+        if self.faiss_index is not None:
+            return "faiss"
+        if self.vector_matrix is not None:
+            return "mmap"
+        return "sqlite"
+    
+    def search_similar(self, query_embedding: List[float], limit: int = 5, **filters) -> List[Dict[str, Any]]:
+        """Search for similar embeddings, restricted by VECTOR_FILTERS"""
+        return self.search_similar_batch([query_embedding], limit, **filters)[0]
+    
+    def search_similar_batch(self, query_embeddings, limit: int = 5, **filters) -> List[List[Dict[str, Any]]]:
+        """Search for each query embedding with one index call and one row lookup for the batch"""
+        unknown = set(filters) - set(VECTOR_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        filters = {name: value for name, value in filters.items() if value}
+        try:
+            if not len(query_embeddings):
+                return []
+            
+            if filters:
+                return self._search_filtered(query_embeddings, limit, filters)
             
             if self.collection:  # ChromaDB
                 query_results = self.collection.query(
-                    query_embeddings=[query_embedding],
+                    query_embeddings=[list(map(float, query)) for query in query_embeddings],
                     n_results=limit
                 )
                 
-                for i in range(len(query_results['ids'][0])):
-                    results.append({
-                        'id': query_results['ids'][0][i],
-                        'content': query_results['documents'][0][i],
-                        'metadata': query_results['metadatas'][0][i],
-                        'distance': query_results['distances'][0][i] if 'distances' in query_results else 0
-                    })
-                    
-            elif self.faiss_index is not None:  # FAISS
-                if NUMPY_AVAILABLE and np is not None:
-                    query_array = np.array([query_embedding], dtype=np.float32)
-                    distances, indices = self.faiss_index.search(query_array, limit)
-                else:
-                    # Fall back to SQLite similarity search
-                    cursor = self.metadata_db.cursor()
-                    cursor.execute("SELECT vector_id, embedding, content, metadata FROM vectors")
-                    
-                    all_vectors = cursor.fetchall()
-                    similarities = []
-                    
-                    for row in all_vectors:
-                        stored_embedding = json.loads(row[1])
-                        similarity = self._cosine_similarity(query_embedding, stored_embedding)
-                        similarities.append({
-                            'id': row[0],
-                            'content': row[2],
-                            'metadata': json.loads(row[3]),
-                            'distance': 1 - similarity
+                batch_results = []
+                for q in range(len(query_embeddings)):
+                    results = []
+                    for i in range(len(query_results['ids'][q])):
+                        results.append({
+                            'id': query_results['ids'][q][i],
+                            'content': query_results['documents'][q][i],
+                            'metadata': query_results['metadatas'][q][i],
+                            'distance': query_results['distances'][q][i] if 'distances' in query_results else 0
                         })
-                    
-                    similarities.sort(key=lambda x: x['distance'])
-                    return similarities[:limit]
-                
-                cursor = self.metadata_db.cursor()
-                for i, idx in enumerate(indices[0]):
-                    if idx != -1:  # Valid result
-                        cursor.execute("""
-                            SELECT vector_id, content, metadata
-                            FROM vector_metadata
-                            ORDER BY id
-                            LIMIT 1 OFFSET ?
-                        """, (int(idx),))
-                        
-                        row = cursor.fetchone()
-                        if row:
-                            results.append({
-                                'id': row[0],
-                                'content': row[1],
-                                'metadata': json.loads(row[2]),
-                                'distance': float(distances[0][i])
-                            })
-                            
-            else:  # SQLite fallback (cosine similarity calculation)
-                cursor = self.metadata_db.cursor()
-                cursor.execute("SELECT vector_id, embedding, content, metadata FROM vectors")
-                
-                all_vectors = cursor.fetchall()
-                similarities = []
-                
-                for row in all_vectors:
-                    stored_embedding = json.loads(row[1])
-                    similarity = self._cosine_similarity(query_embedding, stored_embedding)
-                    similarities.append({
-                        'id': row[0],
-                        'content': row[2],
-                        'metadata': json.loads(row[3]),
-                        'distance': 1 - similarity  # Convert similarity to distance
-                    })
-                
-                # Sort by distance (ascending) and take top results
-                similarities.sort(key=lambda x: x['distance'])
-                results = similarities[:limit]
+                    batch_results.append(results)
+                return batch_results
             
-            return results
+            elif self.faiss_index is not None:  # FAISS
+                quantized = self.faiss_quantized
+                candidates = limit * self.faiss_rerank_factor if quantized else limit
+                hits = self._search_faiss_live(query_embeddings, candidates)
+                if quantized:
+                    with self.tracer.span("faiss_rerank", candidates=candidates, queries=len(query_embeddings)):
+                        hits = self._rerank(query_embeddings, hits, limit, table="vector_metadata")
+                return self._fetch_rows_batch(hits, table="vector_metadata")
+            
+            elif self.vector_matrix is not None:  # Memory-mapped matrix
+                with self.tracer.span("matrix_search", k=limit, rows=self.vector_matrix.count,
+                                      queries=len(query_embeddings)):
+                    hits = self.vector_matrix.search_batch(query_embeddings, limit, excluded=self._tombstones)
+                return self._fetch_rows_batch(hits)
             
+            elif self.ann_index is not None and self.ann_index.ntotal:  # SQLite fallback with IVF index
+                return self._search_ann_index(query_embeddings, limit)
+            
+            else:  # SQLite fallback (cosine similarity calculation)
+                return self._exact_search(query_embeddings, limit)
+        
         except Exception as e:
             self.logger.log_activity(
                 "vector_search_error",
                 f"Error searching vectors: {str(e)}",
-                {"error": str(e)}
+                {"error": str(e), "queries": len(query_embeddings)}
             )
-            return []
+            return [[] for _ in query_embeddings]
+    
+    def search_documents(self, query_embedding: List[float], limit: int = 5, pooling: str = "max",
+                         **filters) -> List[Dict[str, Any]]:
+        """Search chunks, then return the limit best documents with their chunk hits pooled
+        
+        pooling "max" scores a document by its closest chunk, "mean" by the
+        average distance of its chunks among the hits. Vectors stored
+        without chunking count as single-chunk documents. Each result is
+        the best chunk's dict, keyed by the document's id, with
+        matched_chunks and best_chunk_index added. filters are
+        VECTOR_FILTERS, applied to the chunks before they are scored.
+        """
+        if pooling not in CHUNK_POOLING_MODES:
+            raise ValueError(f"Unknown pooling {pooling!r}; expected one of {', '.join(CHUNK_POOLING_MODES)}")
+        
+        candidates = limit * CHUNK_SEARCH_FANOUT
+        total = self.get_total_embeddings()
+        with self.tracer.span("chunk_search", k=limit, pooling=pooling,
+                              filters=",".join(sorted(name for name, value in filters.items() if value))) as span:
+            while True:
+                hits = self.search_similar(query_embedding, min(candidates, MAX_CHUNK_CANDIDATES), **filters)
+                documents = self._pool_chunk_hits(hits, pooling)
+                # Stop once enough documents turned up, or every matching chunk was searched
+                if (len(documents) >= limit or len(hits) < candidates
+                        or candidates >= min(total, MAX_CHUNK_CANDIDATES)):
+                    break
+                candidates *= 2
+            span.set_attributes(chunk_hits=len(hits), documents=len(documents))
+        return documents[:limit]
+    
+    def _pool_chunk_hits(self, hits: List[Dict[str, Any]], pooling: str) -> List[Dict[str, Any]]:
+        """Group chunk hits by parent document, nearest documents first"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for hit in hits:
+            parent_id = (hit.get('metadata') or {}).get('parent_id') or hit['id']
+            groups.setdefault(parent_id, []).append(hit)
+        
+        documents = []
+        for parent_id, chunk_hits in groups.items():
+            # search_similar returns hits nearest first
+            best = chunk_hits[0]
+            if pooling == "max":
+                distance = best['distance']
+            else:
+                distance = sum(hit['distance'] for hit in chunk_hits) / len(chunk_hits)
+            documents.append(dict(
+                best, id=parent_id, distance=distance, matched_chunks=len(chunk_hits),
+                best_chunk_index=(best.get('metadata') or {}).get('chunk_index', 0)
+            ))
+        documents.sort(key=lambda document: document['distance'])
+        return documents
+    
+    def _search_filtered(self, query_embeddings, limit: int,
+                         filters: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Search only the rows matching filters, masking the rest out before distances are computed"""
+        if self.collection:
+            return self._search_chroma_filtered(query_embeddings, limit, filters)
+        
+        with self.tracer.span("vector_filter", filters=",".join(sorted(filters))) as span:
+            allowed = self._filtered_row_ids(filters)
+            span.set_attribute("allowed", len(allowed))
+        if not len(allowed):
+            return [[] for _ in query_embeddings]
+        
+        if self.vector_matrix is not None:
+            with self.tracer.span("matrix_search", k=limit, rows=self.vector_matrix.count,
+                                  queries=len(query_embeddings), allowed=len(allowed)):
+                hits = self.vector_matrix.search_batch(query_embeddings, limit, allowed)
+            return self._fetch_rows_batch(hits)
+        
+        # Few matching rows: score them exactly instead of masking the whole index
+        if len(allowed) > FILTER_FIRST_MAX_ROWS:
+            if self.faiss_index is not None:
+                hits = self._search_faiss_masked(query_embeddings, limit, allowed)
+                if hits is not None:
+                    return self._fetch_rows_batch(hits, table="vector_metadata")
+            elif self.ann_index is not None and self.ann_index.ntotal:
+                self.tracer.annotate(filter_strategy="search_first")
+                return self._search_ann_index(query_embeddings, limit, allowed)
+        
+        self.tracer.annotate(filter_strategy="filter_first")
+        return self._exact_search(query_embeddings, limit, row_ids=allowed)
+    
+    def _search_faiss_live(self, query_embeddings, k: int):
+        """FAISS (ids, distances) of the k nearest live rows per query
+        
+        Tombstoned ids are excluded inside the search with an ID selector.
+        FAISS builds without selectors over-fetch instead, doubling k only
+        while some query comes back with fewer than k live hits.
+        """
+        query_array = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        tombstones = self._tombstones
+        if len(tombstones):
+            try:
+                # Keep the inner selector referenced while FAISS holds a pointer to it
+                dead = faiss.IDSelectorBatch(tombstones)
+                live = faiss.IDSelectorNot(dead)
+                if self.faiss_quantized:
+                    params = faiss.SearchParametersIVF(sel=live, nprobe=self.faiss_nprobe)
+                else:
+                    params = faiss.SearchParameters(sel=live)
+                distances, ids = self.faiss_index.search(query_array, k, params=params)
+                return self._faiss_hits(ids, distances)
+            except (AttributeError, TypeError):
+                # FAISS before 1.7.3
+                pass
+        
+        fetch = k
+        while True:
+            distances, ids = self.faiss_index.search(query_array, fetch)
+            hits = self._drop_tombstoned(self._faiss_hits(ids, distances), k)
+            if fetch >= self.faiss_index.ntotal or all(len(row_ids) >= k for row_ids, _ in hits):
+                return hits
+            fetch = min(fetch * 2, self.faiss_index.ntotal)
+    
+    @staticmethod
+    def _faiss_hits(ids, distances):
+        """(ids, distances) pairs per query without the -1 padding FAISS adds when short of k vectors"""
+        return [(row_ids[row_ids != -1], row_distances[row_ids != -1])
+                for row_ids, row_distances in zip(ids, distances)]
+    
+    def _search_faiss_masked(self, query_embeddings, limit: int, allowed):
+        """FAISS search restricted to allowed ids, or None if this FAISS build has no ID selectors"""
+        quantized = self.faiss_quantized
+        candidates = limit * self.faiss_rerank_factor if quantized else limit
+        try:
+            if quantized:
+                params = faiss.SearchParametersIVF(sel=faiss.IDSelectorBatch(allowed), nprobe=self.faiss_nprobe)
+            else:
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed))
+            query_array = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+            distances, ids = self.faiss_index.search(query_array, candidates, params=params)
+        except (AttributeError, TypeError):
+            # FAISS before 1.7.3
+            return None
+        self.tracer.annotate(filter_strategy="search_first")
+        hits = self._faiss_hits(ids, distances)
+        if quantized:
+            hits = self._rerank(query_embeddings, hits, limit, table="vector_metadata")
+        return hits
+    
+    def _filtered_row_ids(self, filters: Dict[str, Any]):
+        """Sorted int64 ids of the rows matching every filter"""
+        table = self._rows_table()
+        parts = []
+        with self.metadata_pool.read() as conn:
+            for name, attribute in FILTER_ATTRIBUTES.items():
+                values = filters.get(name)
+                if not values:
+                    continue
+                if isinstance(values, str):
+                    values = [values]
+                if attribute == "extension":
+                    values = [normalize_extension(value) for value in values]
+                values = sorted({str(value) for value in values})
+                ids = []
+                for start in range(0, len(values), ROW_LOOKUP_CHUNK):
+                    chunk = values[start:start + ROW_LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    ids.extend(row[0] for row in conn.execute(f"""
+                        SELECT row_id FROM vector_attributes WHERE attribute = ? AND value IN ({placeholders})
+                    """, (attribute, *chunk)))
+                parts.append(np.unique(np.array(ids, dtype=np.int64)))
+            
+            if filters.get("created_after") or filters.get("created_before"):
+                clauses, params = [], []
+                if filters.get("created_after"):
+                    clauses.append("created_at >= ?")
+                    params.append(sql_timestamp(filters["created_after"]))
+                if filters.get("created_before"):
+                    clauses.append("created_at < ?")
+                    params.append(sql_timestamp(filters["created_before"]))
+                # Tombstoned rows lose their attributes, but keep their created_at
+                clauses.append("id NOT IN (SELECT row_id FROM vector_tombstones)")
+                parts.append(np.array([row[0] for row in conn.execute(f"""
+                    SELECT id FROM {table} WHERE {" AND ".join(clauses)} ORDER BY id
+                """, params)], dtype=np.int64))
+        
+        allowed = parts[0]
+        for part in parts[1:]:
+            allowed = np.intersect1d(allowed, part, assume_unique=True)
+        return allowed
+    
+    def _search_chroma_filtered(self, query_embeddings, limit: int,
+                                filters: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Over-fetch from ChromaDB and keep the hits whose metadata matches, widening until limit are found"""
+        if filters.get("created_after") or filters.get("created_before"):
+            raise ValueError("ChromaDB rows carry no creation date; date filters need the FAISS or SQLite backends")
+        
+        total = self.collection.count()
+        batch_results = []
+        for query in query_embeddings:
+            candidates = limit * CHUNK_SEARCH_FANOUT
+            while True:
+                hits = self.search_similar(query, min(candidates, total))
+                matching = [hit for hit in hits if self._metadata_matches(hit.get('metadata') or {}, filters)]
+                if len(matching) >= limit or candidates >= total:
+                    break
+                candidates *= 2
+            batch_results.append(matching[:limit])
+        return batch_results
+    
+    @staticmethod
+    def _metadata_matches(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        """Whether metadata satisfies every attribute filter"""
+        pairs = set(metadata_attributes(metadata))
+        for name, attribute in FILTER_ATTRIBUTES.items():
+            values = filters.get(name)
+            if not values:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            if attribute == "extension":
+                values = [normalize_extension(value) for value in values]
+            if not any((attribute, str(value)) in pairs for value in values):
+                return False
+        return True
+    
+    def _search_ann_index(self, query_embeddings, limit: int,
+                          allowed=None) -> List[List[Dict[str, Any]]]:
+        """Approximate search through the IVF index, optionally masked to allowed ids, then fetch the rows"""
+        quantized = self.ann_index.is_quantized
+        candidates = limit * self.ann_rerank_factor if quantized else limit
+        # allowed never holds tombstoned rows; otherwise mask them inside the search
+        excluded = self._tombstones if allowed is None else None
+        with self.tracer.span("ann_search", k=limit, vectors=self.ann_index.ntotal, nprobe=self.ann_index.nprobe,
+                              queries=len(query_embeddings), quantization=self.ann_index.quantization,
+                              allowed=len(allowed) if allowed is not None else None):
+            hits = [self.ann_index.search(query, candidates, allowed=allowed, excluded=excluded)
+                    for query in query_embeddings]
+        if quantized:
+            with self.tracer.span("ann_rerank", candidates=candidates, queries=len(query_embeddings)):
+                hits = self._rerank(query_embeddings, hits, limit)
+        return self._fetch_rows_batch(hits)
+    
+    def _rerank(self, query_embeddings, hits, limit: int, table: str = "vectors"):
+        """Exact distances for approximate hits, keeping the nearest limit per query
+        
+        Distances are cosine distances, or squared L2 for the FAISS
+        backend's vector_metadata, as in _exact_search.
+        """
+        wanted = sorted({int(row_id) for ids, _ in hits for row_id in ids})
+        stored = {}
+        with self.metadata_pool.read() as conn:
+            for start in range(0, len(wanted), ROW_LOOKUP_CHUNK):
+                chunk = wanted[start:start + ROW_LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for row_id, embedding in conn.execute(f"""
+                    SELECT id, embedding FROM {table} WHERE id IN ({placeholders}) AND embedding IS NOT NULL
+                """, chunk):
+                    stored[row_id] = embedding
+        
+        reranked = []
+        for query, (ids, _) in zip(query_embeddings, hits):
+            ids = np.array([row_id for row_id in ids if int(row_id) in stored], dtype=np.int64)
+            if not len(ids):
+                reranked.append((ids, np.empty(0, dtype=np.float32)))
+                continue
+            vectors = np.vstack([decode_embedding(stored[int(row_id)]) for row_id in ids])
+            query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+            if table == "vector_metadata":
+                distances = ((vectors - query) ** 2).sum(axis=1)
+            else:
+                distances = 1 - normalize_rows(vectors) @ normalize_rows(query)[0]
+            top = np.argsort(distances, kind="stable")[:limit]
+            reranked.append((ids[top], distances[top]))
+        return reranked
+    
+    def _exact_search(self, query_embeddings, limit: int, row_ids=None) -> List[List[Dict[str, Any]]]:
+        """Score every stored embedding, or only those of row_ids, then fetch only the top rows
+        
+        Distances are cosine distances, except on the FAISS backend, where
+        they are squared L2 like those of its IndexFlatL2, so a filtered
+        search reports the same metric whichever path serves it.
+        """
+        table = self._rows_table()
+        with self.metadata_pool.read() as conn:
+            if row_ids is None:
+                rows = conn.execute(f"""
+                    SELECT id, embedding FROM {table}
+                    WHERE embedding IS NOT NULL AND id NOT IN (SELECT row_id FROM vector_tombstones)
+                """).fetchall()
+            else:
+                rows = []
+                wanted = [int(row_id) for row_id in row_ids]
+                for start in range(0, len(wanted), ROW_LOOKUP_CHUNK):
+                    chunk = wanted[start:start + ROW_LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(conn.execute(f"""
+                        SELECT id, embedding FROM {table}
+                        WHERE id IN ({placeholders}) AND embedding IS NOT NULL
+                    """, chunk))
+        if not rows:
+            return [[] for _ in query_embeddings]
+        
+        if NUMPY_AVAILABLE and np is not None:
+            # One matmul over the stacked float32 views for the whole batch
+            matrix = np.vstack([decode_embedding(row[1]) for row in rows])
+            matrix_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+            if table == "vector_metadata":
+                distances = _squared_l2(queries, matrix)
+            else:
+                norms = np.outer(np.linalg.norm(queries, axis=1), np.linalg.norm(matrix, axis=1))
+                norms[norms == 0] = np.inf
+                distances = 1 - (queries @ matrix.T) / norms
+            k = min(limit, len(rows))
+            hits = []
+            for row_distances in distances:
+                top = np.argpartition(row_distances, k - 1)[:k]
+                top = top[np.argsort(row_distances[top])]
+                hits.append((matrix_ids[top], row_distances[top]))
+            return self._fetch_rows_batch(hits, table=table)
+        
+        hits = []
+        for query in query_embeddings:
+            scored = sorted(
+                (1 - self._cosine_similarity(query, decode_embedding(row[1])), row[0])
+                for row in rows
+            )[:limit]
+            hits.append(([row_id for _, row_id in scored], [distance for distance, _ in scored]))
+        return self._fetch_rows_batch(hits, table=table)
+    
+    def _fetch_rows_batch(self, hits, table: str = "vectors") -> List[List[Dict[str, Any]]]:
+        """Result dicts per (ids, distances) pair, reading each distinct row of table once"""
+        wanted = sorted({int(row_id) for ids, _ in hits for row_id in ids})
+        by_id = {}
+        with self.metadata_pool.read() as conn:
+            for start in range(0, len(wanted), ROW_LOOKUP_CHUNK):
+                chunk = wanted[start:start + ROW_LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(f"""
+                    SELECT id, vector_id, content, metadata FROM {table} WHERE id IN ({placeholders})
+                """, chunk):
+                    by_id[row[0]] = row
+        
+        batch_results = []
+        for ids, distances in hits:
+            results = []
+            for row_id, distance in zip(ids, distances):
+                row = by_id.get(int(row_id))
+                if row:
+                    results.append({
+                        'id': row[1],
+                        'content': row[2],
+                        'metadata': json.loads(row[3]),
+                        'distance': float(distance)
+                    })
+            batch_results.append(results)
+        return batch_results
     
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -322,7 +1276,7 @@ class VectorStorage:
                 
                 if norm1 == 0 or norm2 == 0:
                     return 0
-                    
+                
                 return dot_product / (norm1 * norm2)
             else:
                 # Fallback implementation without numpy
@@ -332,28 +1286,145 @@ class VectorStorage:
                 
                 if norm1 == 0 or norm2 == 0:
                     return 0
-                    
+                
                 return dot_product / (norm1 * norm2)
-            
+        
         except Exception:
             return 0
     
     def get_total_embeddings(self) -> int:
-        """Get total number of stored embeddings"""
+        """Get total number of live stored embeddings, excluding tombstoned rows"""
         try:
             if self.collection:
                 return self.collection.count()
-            elif self.metadata_db:
-                cursor = self.metadata_db.cursor()
-                if self.faiss_index is not None:
-                    cursor.execute("SELECT COUNT(*) FROM vector_metadata")
-                else:
-                    cursor.execute("SELECT COUNT(*) FROM vectors")
+            elif self.metadata_pool:
+                cursor = self.metadata_pool.connection().cursor()
+                cursor.execute(f"""
+                    SELECT (SELECT COUNT(*) FROM {self._rows_table()}) - (SELECT COUNT(*) FROM vector_tombstones)
+                """)
                 return cursor.fetchone()[0]
             return 0
         except Exception:
             return 0
     
+    def update_embedding(self, vector_id: str, embedding: List[float], content: Optional[str] = None,
+                         metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Replace a stored embedding, and optionally its content and metadata; False if not found
+        
+        Outside ChromaDB the old row is tombstoned and the new version
+        appended under the same vector id, like an upsert, so no index is
+        rewritten and compact() reclaims the old row later.
+        """
+        try:
+            snippet = content[:SNIPPET_LENGTH] if content is not None else None
+            if self.collection:
+                if not self.collection.get(ids=[vector_id])['ids']:
+                    return False
+                self.collection.update(
+                    ids=[vector_id],
+                    embeddings=[embedding],
+                    documents=[snippet] if snippet is not None else None,
+                    metadatas=[metadata] if metadata is not None else None
+                )
+            else:
+                with self._write_lock:
+                    with self.metadata_pool.transaction() as conn:
+                        old_row_id = self._live_row_id(conn, vector_id)
+                        if old_row_id is None:
+                            return False
+                        old_content, old_metadata = conn.execute(
+                            f"SELECT content, metadata FROM {self._rows_table()} WHERE id = ?", (old_row_id,)
+                        ).fetchone()
+                        # vector_id is unique; the dead row keeps none until compact() drops it
+                        self._tombstone_rows(conn, [old_row_id])
+                        conn.execute(f"UPDATE {self._rows_table()} SET vector_id = NULL WHERE id = ?",
+                                     (old_row_id,))
+                        row_id = self._insert_rows(
+                            conn, [vector_id], [embedding],
+                            [snippet if snippet is not None else old_content],
+                            [metadata if metadata is not None else json.loads(old_metadata or "{}")]
+                        )[0]
+                        # Inside the transaction, so a failing index add rolls both rows back
+                        self._add_to_index(row_id, embedding)
+                    self._add_tombstones([old_row_id])
+                    
+                    if self.faiss_index is not None:
+                        self._faiss_unsaved += 1
+                        self._maybe_checkpoint_faiss()
+                    elif self.ann_index is not None:
+                        self.ann_index.maybe_save()
+            
+            self.logger.log_activity(
+                "embedding_updated",
+                f"Embedding updated: {vector_id}",
+                {"vector_id": vector_id}
+            )
+            return True
+        
+        except Exception as e:
+            self.logger.log_activity(
+                "embedding_update_error",
+                f"Error updating embedding {vector_id}: {str(e)}",
+                {"vector_id": vector_id, "error": str(e)}
+            )
+            raise
+    
+    def delete_embedding(self, vector_id: str) -> bool:
+        """Delete a stored embedding; False if not found
+        
+        The row is tombstoned rather than removed from the index, which
+        compact() rewrites later for all tombstones at once.
+        """
+        try:
+            if self.collection:
+                if not self.collection.get(ids=[vector_id])['ids']:
+                    return False
+                self.collection.delete(ids=[vector_id])
+            else:
+                with self._write_lock:
+                    with self.metadata_pool.transaction() as conn:
+                        row_id = self._live_row_id(conn, vector_id)
+                        if row_id is None:
+                            return False
+                        self._tombstone_rows(conn, [row_id])
+                    self._add_tombstones([row_id])
+            
+            self.logger.log_activity(
+                "embedding_deleted",
+                f"Embedding deleted: {vector_id}",
+                {"vector_id": vector_id}
+            )
+            return True
+        
+        except Exception as e:
+            self.logger.log_activity(
+                "embedding_delete_error",
+                f"Error deleting embedding {vector_id}: {str(e)}",
+                {"vector_id": vector_id, "error": str(e)}
+            )
+            raise
+    
+    def _rows_table(self) -> str:
+        """Table holding content and metadata for the FAISS and SQLite-based backends"""
+        return "vector_metadata" if self.faiss_index is not None else "vectors"
+    
+    def _live_row_id(self, conn, vector_id: str) -> Optional[int]:
+        """Row id of vector_id, or None if it isn't stored or is tombstoned"""
+        row = conn.execute(f"""
+            SELECT id FROM {self._rows_table()}
+            WHERE vector_id = ? AND id NOT IN (SELECT row_id FROM vector_tombstones)
+        """, (vector_id,)).fetchone()
+        return row[0] if row else None
+    
+    def _add_to_index(self, row_id: int, embedding: List[float]):
+        """Add one row to the FAISS index, the mmap matrix or the ANN index"""
+        if self.faiss_index is not None:
+            self._add_to_faiss_index([row_id], [embedding])
+        elif self.vector_matrix is not None:
+            self.vector_matrix.append([row_id], [embedding])
+        else:
+            self._add_to_ann_index([row_id], [embedding])
+    
     def clear_all_vectors(self):
         """Clear all stored vectors"""
         try:
@@ -365,22 +1436,35 @@ class VectorStorage:
                     metadata={"description": "Document content embeddings for semantic search"}
                 )
             elif self.faiss_index is not None:
-                # Reset FAISS index
-                self.faiss_index = faiss.IndexFlatL2(1536)
-                cursor = self.metadata_db.cursor()
-                cursor.execute("DELETE FROM vector_metadata")
-                self.metadata_db.commit()
+                with self._index_lock, self._write_lock:
+                    # Reset FAISS index
+                    self.faiss_index = self._new_faiss_index()
+                    with self.metadata_pool.transaction() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("DELETE FROM vector_metadata")
+                        cursor.execute("DELETE FROM vector_attributes")
+                        cursor.execute("DELETE FROM vector_tombstones")
+                    self._tombstones = self._empty_ids()
+                    self._save_faiss_index()
             else:
-                cursor = self.metadata_db.cursor()
-                cursor.execute("DELETE FROM vectors")
-                self.metadata_db.commit()
-                
+                with self._write_lock:
+                    with self.metadata_pool.transaction() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("DELETE FROM vectors")
+                        cursor.execute("DELETE FROM vector_attributes")
+                        cursor.execute("DELETE FROM vector_tombstones")
+                    self._tombstones = self._empty_ids()
+                    if self.ann_index is not None:
+                        self.ann_index.reset()
+                    if self.vector_matrix is not None:
+                        self.vector_matrix.reset()
+            
             self.logger.log_activity(
                 "vectors_cleared",
                 "All vectors cleared successfully",
                 {}
             )
-            
+        
         except Exception as e:
             self.logger.log_activity(
                 "vector_clear_error",
@@ -392,42 +1476,60 @@ class VectorStorage:
     def rebuild_index(self):
         """Rebuild the vector index (useful for FAISS)"""
         try:
-            if self.faiss_index is not None and self.metadata_db:
-                # Create new index
-                self.faiss_index = faiss.IndexFlatL2(1536)
-                
-                # Reload all vectors
-                if NUMPY_AVAILABLE and np is not None:
-                    cursor = self.metadata_db.cursor()
-                    cursor.execute("SELECT embedding FROM vector_metadata ORDER BY id")
+            if self.faiss_index is not None and self.metadata_pool:
+                with self._index_lock:
+                    # A new index, trained on a sample of the stored vectors when
+                    # quantized, is filled in keyset-paged batches while stores
+                    # keep going to the old one
+                    count, sample = self._faiss_training_sample()
+                    index = self._new_faiss_index(sample, count=count)
+                    def add(ids, embeddings):
+                        index.add_with_ids(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1),
+                                           np.array(ids, dtype=np.int64))
                     
-                    embeddings = []
-                    for row in cursor.fetchall():
-                        embedding = json.loads(row[0])
-                        embeddings.append(embedding)
-                    
-                    if embeddings:
-                        embeddings_array = np.array(embeddings, dtype=np.float32)
-                        self.faiss_index.add(embeddings_array)
-                else:
-                    # Cannot rebuild FAISS index without numpy
-                    self.logger.log_activity(
-                        "index_rebuild_skipped",
-                        "FAISS index rebuild skipped - numpy not available",
-                        {"numpy_available": False}
-                    )
-                    return
+                    self._replay_stored_rows(0, add, table="vector_metadata")
                     
-                    # Save rebuilt index
-                    index_path = self.storage_path / "faiss_index.bin"
-                    faiss.write_index(self.faiss_index, str(index_path))
+                    with self._write_lock:
+                        # Rows stored meanwhile, then swap the complete index in
+                        last_id = int(faiss.vector_to_array(index.id_map).max()) if index.ntotal else 0
+                        self._replay_stored_rows(last_id, add, table="vector_metadata")
+                        self.faiss_index = index
+                        self._save_faiss_index()
+                
+                self.logger.log_activity(
+                    "index_rebuilt",
+                    f"Vector index rebuilt with {index.ntotal} vectors",
+                    {"vector_count": index.ntotal, "quantization": self._faiss_index_quantization()}
+                )
+            
+            elif self.vector_matrix is not None:
+                # Rewrite the matrix from the embeddings in vectors.db
+                self.vector_matrix.reset()
+                self._sync_vector_matrix()
                 
                 self.logger.log_activity(
                     "index_rebuilt",
-                    f"Vector index rebuilt with {len(embeddings)} vectors",
-                    {"vector_count": len(embeddings)}
+                    f"Vector matrix rebuilt with {self.vector_matrix.count} vectors",
+                    {"vector_count": self.vector_matrix.count}
                 )
             
+            elif self.ann_index is not None:
+                if self.ann_index.is_quantized:
+                    # Re-encode from vectors.db so the codebook is trained on full-precision vectors
+                    self.ann_index.reset()
+                    self._sync_ann_index()
+                else:
+                    # Recluster the IVF index for its current size
+                    self.ann_index.train()
+                    self.ann_index.save()
+                
+                self.logger.log_activity(
+                    "index_rebuilt",
+                    f"ANN index reclustered with {self.ann_index.ntotal} vectors",
+                    {"vector_count": self.ann_index.ntotal,
+                     "nlist": len(self.ann_index.lists)}
+                )
+        
         except Exception as e:
             self.logger.log_activity(
                 "index_rebuild_error",
@@ -435,3 +1537,102 @@ class VectorStorage:
                 {"error": str(e)}
             )
             raise
+    
+    def maybe_compact(self, min_tombstones: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """compact() once enough tombstones accumulated; None if it didn't run
+        
+        The default threshold is COMPACT_MIN_TOMBSTONES or COMPACT_FRACTION
+        of the stored rows, whichever is larger; min_tombstones overrides
+        it, e.g. 1 to compact whatever is dead while the app is idle.
+        """
+        if self.collection or self.metadata_pool is None:
+            return None
+        tombstones = len(self._tombstones)
+        if min_tombstones is None:
+            stored = self.get_total_embeddings() + tombstones
+            min_tombstones = max(COMPACT_MIN_TOMBSTONES, COMPACT_FRACTION * stored)
+        if not tombstones or tombstones < min_tombstones:
+            return None
+        return self.compact()
+    
+    def compact(self) -> Dict[str, Any]:
+        """Delete tombstoned rows and rewrite the index without them
+        
+        The rows go in one transaction, after which the FAISS index is
+        copied without them and swapped in, the IVF index drops them (and
+        reclusters if it shrank past RETRAIN_GROWTH), or the mmap matrix is
+        rewritten. Until then searches keep skipping them, and an index
+        still holding them after a crash is rebuilt on the next open. Pages
+        freed in the database are reused by later inserts.
+        """
+        result = {"removed": 0, "vectors": self.get_total_embeddings()}
+        if self.collection or self.metadata_pool is None:
+            return result
+        
+        try:
+            with self._index_lock, self._write_lock, \
+                    self.tracer.span("vector_compact", backend=self._backend_name()) as span:
+                with self.metadata_pool.transaction() as conn:
+                    dead = [row[0] for row in conn.execute("SELECT row_id FROM vector_tombstones ORDER BY row_id")]
+                    conn.execute(f"""
+                        DELETE FROM {self._rows_table()} WHERE id IN (SELECT row_id FROM vector_tombstones)
+                    """)
+                    conn.execute("DELETE FROM vector_tombstones")
+                if not dead:
+                    return result
+                dead_ids = np.array(dead, dtype=np.int64) if np is not None else dead
+                
+                if self.faiss_index is not None:
+                    # Searches use the old index until the copy is swapped in
+                    index = faiss.clone_index(self.faiss_index)
+                    index.remove_ids(dead_ids)
+                    self.faiss_index = index
+                    self._save_faiss_index()
+                elif self.vector_matrix is not None:
+                    self.vector_matrix.remove(dead_ids)
+                elif self.ann_index is not None:
+                    self.ann_index.remove(dead_ids)
+                    if self.ann_index.ntotal and self.ann_index.ntotal * RETRAIN_GROWTH < self.ann_index.trained_size:
+                        self.ann_index.train()
+                    self.ann_index.save()
+                
+                # Nothing was tombstoned meanwhile, the write lock is held
+                self._tombstones = self._empty_ids()
+                result = {"removed": len(dead), "vectors": self.get_total_embeddings()}
+                span.set_attributes(**result)
+            
+            self.logger.log_activity(
+                "vector_storage_compacted",
+                f"Compacted vector index: removed {len(dead)} dead vectors",
+                result
+            )
+            return result
+        
+        except Exception as e:
+            self.logger.log_activity(
+                "vector_compact_error",
+                f"Error compacting vector index: {str(e)}",
+                {"error": str(e)}
+            )
+            raise
+
+
+def _squared_l2(queries, matrix):
+    """Squared L2 distance of every query row to every matrix row, as IndexFlatL2 reports it"""
+    distances = ((queries * queries).sum(axis=1)[:, None] - 2 * (queries @ matrix.T)
+                 + (matrix * matrix).sum(axis=1)[None, :])
+    return np.maximum(distances, 0)
+
+
+_open_storages = weakref.WeakSet()
+
+
+@atexit.register
+def checkpoint_open_storages():
+    """Save FAISS indexes with adds past their last checkpoint before the interpreter exits"""
+    for storage in list(_open_storages):
+        if storage.faiss_index is not None and storage._faiss_unsaved:
+            try:
+                storage._save_faiss_index()
+            except Exception as e:
+                print(f"VECTOR_STORAGE_ERROR: Failed to checkpoint {storage.storage_path}: {str(e)}")
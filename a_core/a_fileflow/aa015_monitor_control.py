@@ -7,7 +7,8 @@ def start_monitoring(folder_path, session_state):
         folder_path=folder_path,
         db_manager=session_state.db_manager,
         vector_storage=session_state.vector_storage,
-        context_memory=session_state.context_memory
+        context_memory=session_state.context_memory,
+        async_db=session_state.async_db
     )
     
     monitor_thread = threading.Thread(
@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from a_core.a_fileflow.aa05_database import DatabaseManager
+
+
+class AsyncDatabase:
+    """Asyncio facade over DatabaseManager with one writer thread and a pool of readers
+    
+    Every write, including the write-behind flushes of the monitor pipeline,
+    runs on a single writer thread, so writers queue in order instead of
+    contending for the database lock. Reads run on separate reader threads,
+    each with its own pooled WAL connection, and see the last committed
+    snapshot without waiting for a write in progress.
+    
+    Each operation is available as a coroutine for asyncio callers and via
+    submit_read/submit_write, which return futures for plain threads such as
+    the monitor or Streamlit script runner.
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, reader_count: int = 4):
+        self.db_manager = db_manager
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=reader_count, thread_name_prefix="db-reader")
+        
+        # Route the write-behind flusher through the same writer thread
+        self.db_manager.write_executor = self._writer
+    
+    def submit_read(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run a read-only callable on a reader thread"""
+        return self._readers.submit(fn, *args, **kwargs)
+    
+    def submit_write(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run a writing callable on the writer thread, after earlier writes"""
+        return self._writer.submit(fn, *args, **kwargs)
+    
+    async def read(self, fn: Callable, *args, **kwargs) -> Any:
+        """Await a read-only callable run on a reader thread"""
+        return await asyncio.wrap_future(self.submit_read(fn, *args, **kwargs))
+    
+    async def write(self, fn: Callable, *args, **kwargs) -> Any:
+        """Await a writing callable run on the writer thread"""
+        return await asyncio.wrap_future(self.submit_write(fn, *args, **kwargs))
+    
+    # Reads
+    
+    async def get_pending_reviews_page(self, limit: int = 50,
+                                       before: Optional[Tuple[str, int]] = None
+                                       ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Get one page of pending files and the cursor of the next page"""
+        return await self.read(self.db_manager.get_pending_reviews_page, limit=limit, before=before)
+    
+    async def get_activity_timeline_page(self, days: Optional[float] = 7, limit: int = 100,
+                                         before: Optional[Tuple[str, int]] = None,
+                                         activity_types: Optional[List[str]] = None
+                                         ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Get one page of activities and the cursor of the next page"""
+        return await self.read(
+            self.db_manager.get_activity_timeline_page,
+            days=days, limit=limit, before=before, activity_types=activity_types
+        )
+    
+    async def get_entities_page(self, limit: int = 100, before: Optional[Tuple[int, int]] = None
+                                ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Get one page of entities and the cursor of the next page"""
+        return await self.read(self.db_manager.get_entities_page, limit=limit, before=before)
+    
+    async def get_database_stats(self) -> Dict[str, Any]:
+        """Get database statistics"""
+        return await self.read(self.db_manager.get_database_stats)
+    
+    async def get_activity_breakdown(self, days: Optional[float] = 1) -> Dict[str, int]:
+        """Get activity counts per type over the last days"""
+        return await self.read(self.db_manager.get_activity_breakdown, days)
+    
+    async def get_activity_counts(self, days: Optional[float] = 1,
+                                  bucket: str = "hour") -> List[Dict[str, Any]]:
+        """Get activity counts per hour or day and type over the last days"""
+        return await self.read(self.db_manager.get_activity_counts, days, bucket)
+    
+    async def search_documents(self, query: str, limit: int = 10, match_any: bool = False,
+                               **filters) -> List[Dict[str, Any]]:
+        """Full-text search over analysed documents, restricted by DOCUMENT_FILTERS"""
+        return await self.read(self.db_manager.search_documents, query, limit, match_any, **filters)
+    
+    async def search_related_documents(self, keywords: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+        """Find documents related to any of the keywords"""
+        return await self.read(self.db_manager.search_related_documents, keywords, limit)
+    
+    async def search_documents_by_entity(self, entity_name: str) -> List[Dict[str, Any]]:
+        """Find documents linked to an entity"""
+        return await self.read(self.db_manager.search_documents_by_entity, entity_name)
+    
+    async def get_file_fingerprint(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Get the stored fingerprint of a file"""
+        return await self.read(self.db_manager.get_file_fingerprint, file_path)
+    
+    # Writes
+    
+    async def approve_file_rename(self, file_id: int, approved_name: str = None):
+        """Approve a file rename suggestion"""
+        return await self.write(self.db_manager.approve_file_rename, file_id, approved_name)
+    
+    async def reject_file_rename(self, file_id: int):
+        """Reject a file rename suggestion"""
+        return await self.write(self.db_manager.reject_file_rename, file_id)
+    
+    async def store_entity(self, entity_name: str, variations: List[str]):
+        """Store or update an entity and its variations"""
+        return await self.write(self.db_manager.store_entity, entity_name, variations)
+    
+    async def add_entity_variation(self, canonical_name: str, variation: str):
+        """Add a variation to an existing entity"""
+        return await self.write(self.db_manager.add_entity_variation, canonical_name, variation)
+    
+    async def flush(self) -> int:
+        """Write everything buffered by the pipeline and return the row count"""
+        return await self.write(self.db_manager.flush)
+    
+    async def clear_all_data(self):
+        """Clear all data from the database"""
+        return await self.write(self.db_manager.clear_all_data)
+    
+    def close(self):
+        """Flush pending writes and stop the writer and reader threads"""
+        try:
+            self.submit_write(self.db_manager.flush).result()
+        finally:
+            self.db_manager.write_executor = None
+            self._writer.shutdown(wait=True)
+            self._readers.shutdown(wait=True)
@@ -0,0 +1,402 @@
+import atexit
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from a_core.a_fileflow.aa019_quantization import make_quantizer
+
+# Inverted-file (IVF-flat) approximate nearest neighbour index in pure NumPy,
+# used by VectorStorage's SQLite fallback when neither ChromaDB nor FAISS is
+# installed. Vectors are unit-normalized and grouped into nlist clusters by
+# spherical k-means; a query scores the centroids, then only the vectors in
+# the nprobe closest clusters. Raising nprobe trades latency for recall.
+# Below MIN_TRAIN_VECTORS the index is a single flat list (exact search).
+# With a quantizer (IVF-SQ8 / IVF-PQ) the lists hold codes instead of float
+# vectors once the index is trained; see aa019_quantization.
+
+MIN_TRAIN_VECTORS = 4096
+# Retrain once the index has grown this many times its size at the last training
+RETRAIN_GROWTH = 4
+DEFAULT_NPROBE = 16
+KMEANS_ITERATIONS = 10
+# k-means runs on a sample of at most this many points per cluster
+TRAIN_POINTS_PER_LIST = 64
+# Rows per matmul when assigning vectors to clusters
+ASSIGN_CHUNK = 16384
+# Checkpoint after this many adds, or this fraction of the index, whichever is larger.
+# Adds since the last checkpoint are replayed from vectors.db on open
+SAVE_MIN_ADDS = 256
+SAVE_FRACTION = 0.05
+INDEX_FORMAT_VERSION = 1
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length, leaving zero rows as they are"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def member_mask(ids: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Boolean mask of ids found in the sorted int64 array allowed"""
+    if not len(allowed):
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(allowed, ids), len(allowed) - 1)
+    return allowed[positions] == ids
+
+
+def default_nlist(count: int) -> int:
+    """Number of clusters for count vectors, about 2·sqrt(count)"""
+    return max(16, int(2 * np.sqrt(count)))
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """Spherical k-means over a sample of unit vectors"""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    sample_size = min(len(vectors), nlist * TRAIN_POINTS_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        # Re-seed empty clusters from random sample points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        centroids = normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class _InvertedList:
+    """Growable id and row arrays for one cluster; rows are float vectors or quantized codes"""
+    
+    __slots__ = ("ids", "vectors", "size")
+    
+    def __init__(self, width: int, capacity: int = 16, dtype=np.float32):
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, width), dtype=dtype)
+        self.size = 0
+    
+    def append(self, ids: np.ndarray, vectors: np.ndarray):
+        """Append rows, doubling capacity as needed"""
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_ids[:self.size] = self.ids[:self.size]
+            grown_vectors = np.empty((capacity, self.vectors.shape[1]), dtype=self.vectors.dtype)
+            grown_vectors[:self.size] = self.vectors[:self.size]
+            self.ids, self.vectors = grown_ids, grown_vectors
+        self.ids[self.size:needed] = ids
+        self.vectors[self.size:needed] = vectors
+        self.size = needed
+
+
+class IVFIndex:
+    """IVF-flat index over cosine similarity, keyed by integer ids
+    
+    Ids are the rowids of the vectors table, so the index can be caught up
+    from vectors.db after a crash: everything above max_id is replayed.
+    quantization is one of QUANTIZATION_MODES; quantized distances are
+    approximate and meant to be re-ranked against the stored embeddings.
+    """
+    
+    def __init__(self, dim: int, nprobe: int = DEFAULT_NPROBE, nlist: Optional[int] = None,
+                 path: Optional[str] = None, quantization: str = "none"):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.path = Path(path) if path else None
+        self.quantizer = make_quantizer(quantization, dim)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists = [_InvertedList(dim)]
+        self.ntotal = 0
+        self.max_id = 0
+        self.trained_size = 0
+        self._unsaved = 0
+        self._lock = threading.RLock()
+        _open_indexes.add(self)
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+    
+    @property
+    def quantization(self) -> str:
+        return self.quantizer.kind if self.quantizer is not None else "none"
+    
+    @property
+    def is_quantized(self) -> bool:
+        """Whether the lists hold codes rather than float vectors"""
+        return self.quantizer is not None and self.quantizer.is_trained
+    
+    @property
+    def nbytes(self) -> int:
+        """Memory held by ids and rows, excluding spare capacity"""
+        return sum(lst.size * (lst.ids.itemsize + lst.vectors.itemsize * lst.vectors.shape[1])
+                   for lst in self.lists)
+    
+    def add(self, ids: Sequence[int], vectors) -> None:
+        """Add vectors under the given ids, retraining when the index has outgrown its clusters"""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if not len(ids):
+            return
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim))
+        with self._lock:
+            self._append(ids, vectors)
+            self.ntotal += len(ids)
+            self.max_id = max(self.max_id, int(ids.max()))
+            self._unsaved += len(ids)
+            if self._needs_training():
+                self.train()
+    
+    def _needs_training(self) -> bool:
+        """Whether enough vectors were added since the last training"""
+        if self.centroids is None:
+            return self.ntotal >= MIN_TRAIN_VECTORS
+        if self.quantizer is not None and not self.quantizer.is_trained:
+            return self.ntotal >= self.quantizer.min_train_vectors
+        return self.ntotal >= RETRAIN_GROWTH * self.trained_size
+    
+    def _append(self, ids: np.ndarray, vectors: np.ndarray):
+        """Route normalized vectors to their clusters, encoding them when quantized"""
+        if self.centroids is None:
+            self.lists[0].append(ids, vectors)
+            return
+        assignments = _nearest_centroids(vectors, self.centroids)
+        if self.is_quantized:
+            vectors = self.quantizer.encode(vectors)
+        order = np.argsort(assignments, kind="stable")
+        sorted_assignments = assignments[order]
+        clusters, starts = np.unique(sorted_assignments, return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for cluster, start, end in zip(clusters, starts, ends):
+            rows = order[start:end]
+            self.lists[cluster].append(ids[rows], vectors[rows])
+    
+    def _all(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Every id and stored row (vector or code), in list order"""
+        ids = np.concatenate([lst.ids[:lst.size] for lst in self.lists])
+        vectors = np.concatenate([lst.vectors[:lst.size] for lst in self.lists])
+        return ids, vectors
+    
+    def _new_lists(self, capacities: Sequence[int]) -> list:
+        """Empty lists for float vectors, or for codes once the quantizer is trained"""
+        if self.is_quantized:
+            width, dtype = self.quantizer.code_size, np.uint8
+        else:
+            width, dtype = self.dim, np.float32
+        return [_InvertedList(width, max(16, capacity), dtype) for capacity in capacities]
+    
+    def train(self, nlist: Optional[int] = None):
+        """Cluster the current vectors and redistribute them over the new lists"""
+        with self._lock:
+            ids, vectors = self._all()
+            if not len(ids):
+                return
+            if self.is_quantized:
+                # Retraining clusters the reconstructions; the codebook stays fixed
+                vectors = normalize_rows(self.quantizer.decode(vectors))
+            elif self.quantizer is not None and len(vectors) >= self.quantizer.min_train_vectors:
+                self.quantizer.train(vectors)
+            nlist = nlist or self.nlist or default_nlist(len(ids))
+            self.centroids = train_centroids(vectors, nlist)
+            self.lists = self._new_lists([16] * len(self.centroids))
+            self._append(ids, vectors)
+            self.trained_size = len(ids)
+            # Everything moved, so the next checkpoint rewrites the file anyway
+            self._unsaved = max(self._unsaved, SAVE_MIN_ADDS)
+    
+    def search(self, query, k: int = 10, nprobe: Optional[int] = None,
+               allowed: Optional[np.ndarray] = None,
+               excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine distances (1 - similarity) of the k nearest vectors, nearest first
+        
+        allowed, a sorted int64 id array, masks every other vector out
+        before scoring; lists are then probed until they hold k allowed
+        vectors, so a selective filter probes more of them. excluded,
+        also sorted int64 ids, masks those vectors out the same way.
+        """
+        if excluded is not None and not len(excluded):
+            excluded = None
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, self.dim))[0]
+        nprobe = nprobe or self.nprobe
+        with self._lock:
+            score = self.quantizer.scorer(query) if self.is_quantized else (lambda rows: rows @ query)
+            if self.centroids is None:
+                order = [0]
+            else:
+                order = np.argsort(-(self.centroids @ query))
+            
+            # Probe at least nprobe lists, and more if they hold fewer than k candidates
+            id_parts, score_parts = [], []
+            probed, candidates = 0, 0
+            for cluster in order:
+                if probed >= nprobe and candidates >= k:
+                    break
+                probed += 1
+                lst = self.lists[cluster]
+                if not lst.size:
+                    continue
+                ids, rows = lst.ids[:lst.size], lst.vectors[:lst.size]
+                if allowed is not None or excluded is not None:
+                    mask = np.ones(len(ids), dtype=bool)
+                    if allowed is not None:
+                        mask &= member_mask(ids, allowed)
+                    if excluded is not None:
+                        mask &= ~member_mask(ids, excluded)
+                    if not mask.any():
+                        continue
+                    ids, rows = ids[mask], rows[mask]
+                id_parts.append(ids)
+                score_parts.append(score(rows))
+                candidates += len(ids)
+        
+        if not id_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate(id_parts)
+        scores = np.concatenate(score_parts)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return ids[top], 1 - scores[top]
+    
+    def remove(self, ids: Sequence[int]) -> int:
+        """Remove vectors by id and return how many were found"""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        removed = 0
+        with self._lock:
+            for lst in self.lists:
+                if not lst.size:
+                    continue
+                keep = ~np.isin(lst.ids[:lst.size], ids)
+                kept = int(keep.sum())
+                if kept == lst.size:
+                    continue
+                removed += lst.size - kept
+                lst.ids[:kept] = lst.ids[:lst.size][keep]
+                lst.vectors[:kept] = lst.vectors[:lst.size][keep]
+                lst.size = kept
+            self.ntotal -= removed
+            self._unsaved += removed
+        return removed
+    
+    def reset(self):
+        """Drop every vector and the clustering"""
+        with self._lock:
+            self.centroids = None
+            if self.quantizer is not None:
+                self.quantizer = make_quantizer(self.quantizer.kind, self.dim)
+            self.lists = [_InvertedList(self.dim)]
+            self.ntotal = 0
+            self.max_id = 0
+            self.trained_size = 0
+            self._unsaved = 0
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+    
+    def maybe_save(self) -> bool:
+        """Checkpoint to disk once enough adds have accumulated"""
+        if self.path is None or self._unsaved < max(SAVE_MIN_ADDS, SAVE_FRACTION * self.ntotal):
+            return False
+        self.save()
+        return True
+    
+    def save(self):
+        """Write the index atomically to its .npz file"""
+        if self.path is None:
+            return
+        with self._lock:
+            ids, vectors = self._all()
+            centroids = self.centroids if self.centroids is not None else np.empty((0, self.dim), np.float32)
+            payload = {
+                'version': np.array(INDEX_FORMAT_VERSION),
+                'dim': np.array(self.dim),
+                'max_id': np.array(self.max_id),
+                'trained_size': np.array(self.trained_size),
+                'centroids': centroids,
+                'list_sizes': np.array([lst.size for lst in self.lists], dtype=np.int64),
+                'ids': ids,
+                'vectors': vectors,
+                'quantization': np.array(self.quantization)
+            }
+            if self.is_quantized:
+                payload.update({'quantizer_' + key: value for key, value in self.quantizer.state().items()})
+            self._unsaved = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **payload)
+        os.replace(tmp_path, self.path)
+    
+    @classmethod
+    def load(cls, path: str, nprobe: int = DEFAULT_NPROBE, nlist: Optional[int] = None,
+             quantization: str = "none") -> Optional["IVFIndex"]:
+        """Open a saved index, or None if it is missing, unreadable or uses another quantization"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != INDEX_FORMAT_VERSION:
+                    return None
+                # Files written before quantization existed hold float vectors
+                saved = str(data['quantization']) if 'quantization' in data.files else "none"
+                if saved != quantization:
+                    return None
+                index = cls(int(data['dim']), nprobe=nprobe, nlist=nlist, path=str(path),
+                            quantization=quantization)
+                ids, vectors = data['ids'], data['vectors']
+                if any(key.startswith('quantizer_') for key in data.files):
+                    index.quantizer.load_state({key[len('quantizer_'):]: data[key]
+                                                for key in data.files if key.startswith('quantizer_')})
+                if len(data['centroids']):
+                    index.centroids = data['centroids']
+                    index.lists = index._new_lists(data['list_sizes'])
+                offset = 0
+                for lst, size in zip(index.lists, data['list_sizes']):
+                    lst.append(ids[offset:offset + size], vectors[offset:offset + size])
+                    offset += size
+                index.ntotal = len(ids)
+                index.max_id = int(data['max_id'])
+                index.trained_size = int(data['trained_size'])
+            return index
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+_open_indexes = weakref.WeakSet()
+
+
+@atexit.register
+def save_open_indexes():
+    """Checkpoint indexes with unsaved adds before the interpreter exits"""
+    for index in list(_open_indexes):
+        if index._unsaved:
+            try:
+                index.save()
+            except Exception as e:
+                print(f"ANN_INDEX_ERROR: Failed to save {index.path}: {str(e)}")
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from a_core.a_fileflow.aa017_ann_index import member_mask, normalize_rows
+
+# Exact vector search over one contiguous, memory-mapped float32 matrix. Rows
+# are unit-normalized when appended, so cosine similarity for a query is a
+# single matrix-vector product followed by argpartition. The files are only
+# ever appended to and are read through np.memmap, so the rows live in the OS
+# page cache and are shared by every process that maps them, instead of
+# being decoded into Python objects.
+#
+# Layout inside the directory:
+#   vectors.f32  - row-major little-endian float32, dim values per row
+#   ids.i64      - little-endian int64 vectors.id of each row, same order
+#   matrix.json  - {"dim": ...}
+# Rows are written before ids, so after a crash the shorter file decides the
+# row count and the torn tail is truncated on the next open. remove() is the
+# one rewrite: both files are replaced by copies without the removed rows,
+# with rewrite.pending present between the two renames so that a crash in
+# between empties the matrix (the caller rebuilds it) on the next open.
+
+MATRIX_FILE = "vectors.f32"
+IDS_FILE = "ids.i64"
+META_FILE = "matrix.json"
+REWRITE_MARKER = "rewrite.pending"
+# Queries scored per pass over the matrix in search_batch
+QUERY_BLOCK = 64
+# A filtered search copies out the allowed rows when they are at most this
+# fraction of the matrix, and otherwise scores every row and masks the rest
+GATHER_FRACTION = 0.25
+# Rows copied per block when remove() rewrites the matrix
+REWRITE_BLOCK = 65536
+
+
+class MmapVectorMatrix:
+    """Append-only on-disk matrix of unit vectors with a parallel id array
+    
+    Searching from several processes is safe; appends should come from one
+    process (the monitor), which also serializes its own threads.
+    """
+    
+    def __init__(self, directory: str, dim: Optional[int] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.directory / MATRIX_FILE
+        self.ids_path = self.directory / IDS_FILE
+        self.meta_path = self.directory / META_FILE
+        self.marker_path = self.directory / REWRITE_MARKER
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._mapped_count = 0
+        
+        if self.marker_path.exists():
+            # A rewrite stopped between its renames; rows and ids may not pair up
+            self.reset()
+        
+        self.dim = dim or self._read_dim()
+        if self.dim:
+            self._truncate_torn_tail()
+    
+    def _read_dim(self) -> Optional[int]:
+        """Dimension recorded by the first append, if any"""
+        if not self.meta_path.exists():
+            return None
+        with open(self.meta_path, encoding="utf-8") as f:
+            return int(json.load(f)["dim"])
+    
+    def _file_count(self) -> int:
+        """Complete rows present in both files"""
+        if not self.dim or not self.matrix_path.exists() or not self.ids_path.exists():
+            return 0
+        return min(os.path.getsize(self.ids_path) // 8,
+                   os.path.getsize(self.matrix_path) // (4 * self.dim))
+    
+    def _truncate_torn_tail(self):
+        """Cut both files back to the rows they have in common"""
+        count = self._file_count()
+        for path, row_bytes in ((self.matrix_path, 4 * self.dim), (self.ids_path, 8)):
+            if path.exists() and os.path.getsize(path) != count * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(count * row_bytes)
+    
+    @property
+    def count(self) -> int:
+        return self._file_count()
+    
+    @property
+    def max_id(self) -> int:
+        """Id of the last appended row, 0 when empty"""
+        count = self._file_count()
+        if not count:
+            return 0
+        return int(np.fromfile(self.ids_path, dtype="<i8", count=1, offset=(count - 1) * 8)[0])
+    
+    def append(self, ids: Sequence[int], vectors) -> None:
+        """Normalize and append rows; ids must be increasing"""
+        ids = np.asarray(ids, dtype="<i8").reshape(-1)
+        if not len(ids):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+            
+            with open(self.matrix_path, "ab") as f:
+                f.write(normalize_rows(vectors).astype("<f4").tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.write(ids.tobytes())
+    
+    def _mapped(self) -> Tuple[Optional[np.memmap], Optional[np.memmap]]:
+        """Current maps of both files, remapped when rows were appended by anyone"""
+        count = self._file_count()
+        if count != self._mapped_count or self._matrix is None:
+            if count:
+                self._matrix = np.memmap(self.matrix_path, dtype="<f4", mode="r", shape=(count, self.dim))
+                self._ids = np.memmap(self.ids_path, dtype="<i8", mode="r", shape=(count,))
+            else:
+                self._matrix = self._ids = None
+            self._mapped_count = count
+        return self._matrix, self._ids
+    
+    def search(self, query, k: int = 10, allowed: Optional[np.ndarray] = None,
+               excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine distances (1 - similarity) of the k nearest rows, nearest first"""
+        return self.search_batch([query], k, allowed, excluded)[0]
+    
+    def search_batch(self, queries, k: int = 10, allowed: Optional[np.ndarray] = None,
+                     excluded: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search() for many queries with one matrix-matrix product per block of queries
+        
+        allowed, a sorted int64 id array, restricts the rows scored. Below
+        GATHER_FRACTION of the matrix the allowed rows are gathered and only
+        they are scored; above it every row is scored and the rest masked.
+        excluded, also sorted int64 ids, masks those rows out of every result.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        with self._lock:
+            matrix, ids = self._mapped()
+        if matrix is None:
+            return [empty] * len(queries)
+        
+        if excluded is not None and not len(excluded):
+            excluded = None
+        masked = None
+        if allowed is not None:
+            allowed = np.asarray(allowed, dtype=np.int64)
+            if excluded is not None:
+                allowed = allowed[~member_mask(allowed, np.asarray(excluded, dtype=np.int64))]
+            # ids are appended in increasing order, so the map is sorted
+            mask = member_mask(allowed, np.asarray(ids))
+            positions = np.searchsorted(ids, allowed[mask])
+            if not len(positions):
+                return [empty] * len(queries)
+            if len(positions) <= GATHER_FRACTION * len(matrix):
+                matrix, ids = matrix[positions], np.asarray(ids)[positions]
+            else:
+                masked = np.ones(len(matrix), dtype=bool)
+                masked[positions] = False
+        elif excluded is not None:
+            masked = member_mask(np.asarray(ids), np.asarray(excluded, dtype=np.int64))
+            if masked.all():
+                return [empty] * len(queries)
+        
+        queries = normalize_rows(queries.reshape(-1, self.dim))
+        k = min(k, len(matrix) if masked is None else int((~masked).sum()))
+        results = []
+        # One pass over the matrix serves QUERY_BLOCK queries; the score block
+        # stays at QUERY_BLOCK x rows floats
+        for start in range(0, len(queries), QUERY_BLOCK):
+            scores = queries[start:start + QUERY_BLOCK] @ matrix.T
+            if masked is not None:
+                scores[:, masked] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, candidates in zip(scores, top):
+                candidates = candidates[np.argsort(-row[candidates])]
+                results.append((np.asarray(ids[candidates], dtype=np.int64), 1 - row[candidates]))
+        return results
+    
+    def remove(self, ids: Sequence[int]) -> int:
+        """Rewrite both files without the rows of ids and return how many were dropped
+        
+        Searches that mapped the old files keep reading them; later ones
+        map the rewritten files.
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        with self._lock:
+            matrix, row_ids = self._mapped()
+            if matrix is None or not len(ids):
+                return 0
+            keep = ~member_mask(np.asarray(row_ids), ids)
+            removed = len(keep) - int(keep.sum())
+            if not removed:
+                return 0
+            
+            matrix_tmp = self.matrix_path.with_name(MATRIX_FILE + ".tmp")
+            ids_tmp = self.ids_path.with_name(IDS_FILE + ".tmp")
+            with open(matrix_tmp, "wb") as f:
+                for start in range(0, len(matrix), REWRITE_BLOCK):
+                    block = keep[start:start + REWRITE_BLOCK]
+                    f.write(np.asarray(matrix[start:start + REWRITE_BLOCK][block]).tobytes())
+            with open(ids_tmp, "wb") as f:
+                f.write(np.asarray(row_ids)[keep].astype("<i8").tobytes())
+            
+            # Release our maps so the files can be replaced on every platform
+            del matrix, row_ids
+            self._matrix = self._ids = None
+            self._mapped_count = 0
+            self.marker_path.touch()
+            os.replace(matrix_tmp, self.matrix_path)
+            os.replace(ids_tmp, self.ids_path)
+            self.marker_path.unlink()
+        return removed
+    
+    def reset(self):
+        """Delete every row"""
+        with self._lock:
+            self._matrix = self._ids = None
+            self._mapped_count = 0
+            for path in (self.matrix_path, self.ids_path, self.meta_path, self.marker_path):
+                if path.exists():
+                    path.unlink()
+            self.dim = None
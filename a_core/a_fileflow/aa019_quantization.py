@@ -0,0 +1,168 @@
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# Lossy codes for the vectors held in RAM by the IVF index. The full-precision
+# float32 embeddings stay in vectors.db on disk, and VectorStorage re-ranks the
+# top candidates found through the codes against them, so only the order
+# among near ties is lost. With 1536-d float32 vectors (6 KB each):
+#   int8 - one byte per dimension, per-dimension min/max scaling: 1.5 KB (4x)
+#   pq   - product quantization, one byte per PQ_SUBVECTOR_DIMS dimensions
+#          chosen from 256 k-means centroids per subspace: 192 B (32x)
+# Both score a query against codes directly (asymmetric distance), without
+# decoding the stored vectors.
+
+QUANTIZATION_MODES = ("none", "int8", "pq")
+PQ_SUBVECTOR_DIMS = 8
+PQ_CENTROIDS = 256
+PQ_KMEANS_ITERATIONS = 15
+# About 40 points per centroid; smaller indexes keep float vectors until then
+PQ_MIN_TRAIN_VECTORS = 10000
+# k-means for each subspace runs on a sample of at most this many vectors
+PQ_TRAIN_SAMPLE = 65536
+# Rows per chunk when encoding, to bound temporary arrays
+ENCODE_CHUNK = 16384
+
+
+class ScalarQuantizer:
+    """8-bit scalar quantization with a per-dimension range"""
+    
+    kind = "int8"
+    min_train_vectors = 1
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_size = dim
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.scale is not None
+    
+    def train(self, vectors: np.ndarray):
+        """Fit each dimension's range to the training vectors"""
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = (high - low) / 255
+        scale[scale == 0] = 1
+        self.offset, self.scale = low.astype(np.float32), scale.astype(np.float32)
+    
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """uint8 codes, clipped to the trained range"""
+        return np.clip(np.rint((vectors - self.offset) / self.scale), 0, 255).astype(np.uint8)
+    
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors for codes"""
+        return codes * self.scale + self.offset
+    
+    def scorer(self, query: np.ndarray) -> Callable[[np.ndarray], np.ndarray]:
+        """Function giving the inner product of query with each decoded row of a code array"""
+        scaled = (query * self.scale).astype(np.float32)
+        bias = float(self.offset @ query)
+        return lambda codes: codes @ scaled + bias
+    
+    def state(self) -> Dict[str, np.ndarray]:
+        """Trained parameters, for saving alongside the index"""
+        return {'offset': self.offset, 'scale': self.scale}
+    
+    def load_state(self, state: Dict[str, np.ndarray]):
+        """Restore parameters returned by state()"""
+        self.offset, self.scale = state['offset'], state['scale']
+
+
+class ProductQuantizer:
+    """Product quantization: one byte per subspace of about PQ_SUBVECTOR_DIMS dimensions"""
+    
+    kind = "pq"
+    min_train_vectors = PQ_MIN_TRAIN_VECTORS
+    
+    def __init__(self, dim: int, subvector_dims: int = PQ_SUBVECTOR_DIMS):
+        self.dim = dim
+        self.code_size = max(1, dim // subvector_dims)
+        # Column where each subspace starts; uneven splits differ by one dimension
+        self.bounds = np.linspace(0, dim, self.code_size + 1).astype(np.int64)
+        # Row c holds centroid c of every subspace side by side
+        self.codebook: Optional[np.ndarray] = None
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.codebook is not None
+    
+    def train(self, vectors: np.ndarray, seed: int = 0):
+        """k-means per subspace over a sample of the training vectors"""
+        rng = np.random.default_rng(seed)
+        if len(vectors) > PQ_TRAIN_SAMPLE:
+            vectors = vectors[np.sort(rng.choice(len(vectors), PQ_TRAIN_SAMPLE, replace=False))]
+        centroids = min(PQ_CENTROIDS, len(vectors))
+        codebook = np.zeros((PQ_CENTROIDS, self.dim), dtype=np.float32)
+        for start, end in zip(self.bounds[:-1], self.bounds[1:]):
+            codebook[:centroids, start:end] = _kmeans(vectors[:, start:end], centroids, rng)
+        # Unused slots repeat the first centroid so no code decodes to garbage
+        codebook[centroids:] = codebook[0]
+        self.codebook = codebook
+    
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """uint8 code of the nearest centroid in each subspace"""
+        codes = np.empty((len(vectors), self.code_size), dtype=np.uint8)
+        for start in range(0, len(vectors), ENCODE_CHUNK):
+            chunk = vectors[start:start + ENCODE_CHUNK]
+            for sub, (low, high) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+                codes[start:start + len(chunk), sub] = _nearest(chunk[:, low:high], self.codebook[:, low:high])
+        return codes
+    
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors for codes"""
+        vectors = np.empty((len(codes), self.dim), dtype=np.float32)
+        for sub, (low, high) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            vectors[:, low:high] = self.codebook[codes[:, sub], low:high]
+        return vectors
+    
+    def scorer(self, query: np.ndarray) -> Callable[[np.ndarray], np.ndarray]:
+        """Function giving the inner product of query with each decoded row of a code array"""
+        # table[sub, c] is the query's inner product with centroid c of subspace sub
+        table = np.add.reduceat(self.codebook * query, self.bounds[:-1], axis=1).T.astype(np.float32)
+        subspaces = np.arange(self.code_size)
+        return lambda codes: table[subspaces, codes].sum(axis=1)
+    
+    def state(self) -> Dict[str, np.ndarray]:
+        """Trained parameters, for saving alongside the index"""
+        return {'codebook': self.codebook}
+    
+    def load_state(self, state: Dict[str, np.ndarray]):
+        """Restore parameters returned by state()"""
+        self.codebook = state['codebook']
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (L2) for each point"""
+    # argmin |p - c|^2 == argmax p·c - |c|^2 / 2
+    return np.argmax(points @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+
+
+def _kmeans(points: np.ndarray, k: int, rng: np.random.Generator,
+            iterations: int = PQ_KMEANS_ITERATIONS) -> np.ndarray:
+    """Euclidean k-means, re-seeding empty clusters from random points"""
+    centroids = points[rng.choice(len(points), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = _nearest(points, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.stack([np.bincount(assignments, weights=points[:, d], minlength=k)
+                         for d in range(points.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+    return centroids
+
+
+QUANTIZERS = {quantizer.kind: quantizer for quantizer in (ScalarQuantizer, ProductQuantizer)}
+
+
+def make_quantizer(kind: str, dim: int):
+    """Quantizer for one of QUANTIZATION_MODES; None means full-precision vectors"""
+    if kind not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {kind!r}; expected one of {', '.join(QUANTIZATION_MODES)}")
+    if kind == "none":
+        return None
+    return QUANTIZERS[kind](dim)
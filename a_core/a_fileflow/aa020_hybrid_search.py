@@ -0,0 +1,179 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from a_core.a_fileflow.aa014_vector_storage import VectorStorage
+from a_core.a_fileflow.aa05_database import DatabaseManager, DOCUMENT_FILTERS
+from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae08_metrics import get_registry
+from a_core.e_utils.ae09_tracing import get_tracer
+
+# One query over both indexes: BM25 over the FTS5 document_search table finds
+# exact tokens (invoice numbers, names) and the vector store finds
+# paraphrases. Both legs run concurrently, each returning its own candidate
+# list, and the lists are fused per file_path:
+#   rrf      - sum of weight / (RRF_K + rank) over the lists a file appears in
+#   weighted - weighted sum of each list's min-max normalized scores
+# Document filters are resolved in SQL before either leg scores anything: the
+# lexical leg adds them to its MATCH query, the vector leg passes the matching
+# files as a file_paths pre-filter of the vector store.
+
+FUSION_MODES = ("rrf", "weighted")
+RRF_K = 60
+# Candidates fetched from each leg per requested result
+CANDIDATE_FACTOR = 4
+MIN_CANDIDATES = 20
+
+
+class HybridSearch:
+    """Lexical and semantic document search fused into one ranked list"""
+    
+    def __init__(self, db_manager: DatabaseManager, vector_storage: VectorStorage, ai_analyzer=None):
+        self.db_manager = db_manager
+        self.vector_storage = vector_storage
+        # Embeds text queries; callers passing query_embedding can leave it out
+        self.ai_analyzer = ai_analyzer
+        self.logger = LoggingUtils()
+        self.metrics = get_registry()
+        self.tracer = get_tracer()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-search")
+    
+    def search(self, query: str, limit: int = 10, query_embedding: Optional[List[float]] = None,
+               fusion: str = "rrf", lexical_weight: float = 1.0, vector_weight: float = 1.0,
+               **filters) -> List[Dict[str, Any]]:
+        """Top documents for query from both indexes, restricted by DOCUMENT_FILTERS
+        
+        Each result has file_path, score, lexical_rank and vector_rank
+        (1-based, None when absent from that list), plus the fields of the
+        lexical hit (id, suggested_name, entities, snippet, bm25) and/or
+        the vector hit (vector_id, distance, matched_chunks).
+        """
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion {fusion!r}; expected one of {', '.join(FUSION_MODES)}")
+        unknown = set(filters) - set(DOCUMENT_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        if not query.strip() and query_embedding is None:
+            return []
+        
+        candidates = max(MIN_CANDIDATES, limit * CANDIDATE_FACTOR)
+        with self.tracer.span("hybrid_search", k=limit, fusion=fusion,
+                              filters=",".join(sorted(name for name, value in filters.items() if value))) as span, \
+                self.metrics.stage("hybrid_search"):
+            file_paths = self.db_manager.get_filtered_file_paths(**filters)
+            if file_paths is not None and not file_paths:
+                span.set_attribute("filtered_files", 0)
+                return []
+            
+            lexical = self._submit(self._lexical_leg, query, candidates, filters)
+            semantic = self._submit(self._vector_leg, query, query_embedding, candidates, file_paths)
+            lexical_hits, vector_hits = lexical.result(), semantic.result()
+            
+            if fusion == "rrf":
+                results = self._fuse_rrf(lexical_hits, vector_hits, lexical_weight, vector_weight)
+            else:
+                results = self._fuse_weighted(lexical_hits, vector_hits, lexical_weight, vector_weight)
+            span.set_attributes(lexical_hits=len(lexical_hits), vector_hits=len(vector_hits),
+                                filtered_files=len(file_paths) if file_paths is not None else None,
+                                results=min(limit, len(results)))
+        return results[:limit]
+    
+    def _submit(self, fn, *args):
+        """Run fn on the search pool inside the current trace context"""
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+    
+    def _lexical_leg(self, query: str, candidates: int, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """BM25 hits matching any query term, best first"""
+        if not query.strip():
+            return []
+        with self.tracer.span("lexical_leg", k=candidates):
+            return self.db_manager.search_documents(query, candidates, match_any=True, **filters)
+    
+    def _vector_leg(self, query: str, query_embedding: Optional[List[float]], candidates: int,
+                    file_paths: Optional[set]) -> List[Dict[str, Any]]:
+        """Nearest documents to the query embedding, one per file_path, best first"""
+        try:
+            with self.tracer.span("vector_leg", k=candidates):
+                if query_embedding is None:
+                    if self.ai_analyzer is None:
+                        return []
+                    query_embedding = self.ai_analyzer.generate_embedding(query)
+                if not any(query_embedding):
+                    # generate_embedding returns a zero vector when the API call failed
+                    return []
+                documents = self.vector_storage.search_documents(query_embedding, candidates,
+                                                                 file_paths=file_paths)
+        except Exception as e:
+            self.logger.log_activity(
+                "hybrid_search_error",
+                f"Vector leg failed, using lexical results only: {str(e)}",
+                {"error": str(e)}
+            )
+            return []
+        
+        # A file analysed more than once can have several vector documents
+        seen, hits = set(), []
+        for document in documents:
+            file_path = (document.get('metadata') or {}).get('file_path')
+            if file_path and file_path not in seen:
+                seen.add(file_path)
+                hits.append(document)
+        return hits
+    
+    @staticmethod
+    def _merge(lexical_hits: List[Dict[str, Any]], vector_hits: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Result dicts keyed by file_path, with each list's rank and fields"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for rank, hit in enumerate(lexical_hits, 1):
+            merged[hit['file_path']] = dict(hit, lexical_rank=rank, vector_rank=None, score=0.0)
+        for rank, hit in enumerate(vector_hits, 1):
+            metadata = hit.get('metadata') or {}
+            result = merged.setdefault(metadata['file_path'], {
+                'file_path': metadata['file_path'],
+                'suggested_name': metadata.get('suggested_name'),
+                'entities': metadata.get('entities', []),
+                'snippet': hit.get('content'),
+                'lexical_rank': None,
+                'score': 0.0
+            })
+            result.update(vector_rank=rank, vector_id=hit['id'], distance=hit['distance'],
+                          matched_chunks=hit.get('matched_chunks', 1))
+        return merged
+    
+    def _fuse_rrf(self, lexical_hits, vector_hits, lexical_weight: float,
+                  vector_weight: float) -> List[Dict[str, Any]]:
+        """Reciprocal-rank fusion; robust to the lists' incomparable score scales"""
+        merged = self._merge(lexical_hits, vector_hits)
+        for result in merged.values():
+            if result['lexical_rank'] is not None:
+                result['score'] += lexical_weight / (RRF_K + result['lexical_rank'])
+            if result['vector_rank'] is not None:
+                result['score'] += vector_weight / (RRF_K + result['vector_rank'])
+        return sorted(merged.values(), key=lambda result: result['score'], reverse=True)
+    
+    def _fuse_weighted(self, lexical_hits, vector_hits, lexical_weight: float,
+                       vector_weight: float) -> List[Dict[str, Any]]:
+        """Weighted sum of min-max normalized BM25 and vector scores"""
+        merged = self._merge(lexical_hits, vector_hits)
+        # bm25() and distances are lower-is-better
+        lexical_scores = _min_max({hit['file_path']: -hit.get('bm25', -hit.get('similarity_score', 0.0))
+                                   for hit in lexical_hits})
+        vector_scores = _min_max({hit['metadata']['file_path']: -hit['distance'] for hit in vector_hits})
+        for file_path, result in merged.items():
+            result['score'] = (lexical_weight * lexical_scores.get(file_path, 0.0)
+                               + vector_weight * vector_scores.get(file_path, 0.0))
+        return sorted(merged.values(), key=lambda result: result['score'], reverse=True)
+    
+    def close(self):
+        """Stop the search threads"""
+        self._executor.shutdown(wait=False)
+
+
+def _min_max(scores: Dict[str, float]) -> Dict[str, float]:
+    """Scores rescaled onto [0, 1]; a single or constant list maps to 1"""
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (value - low) / (high - low) for key, value in scores.items()}
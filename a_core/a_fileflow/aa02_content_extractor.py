@@ -27,12 +27,16 @@ except ImportError:
     pytesseract = None
 
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae08_metrics import get_registry
+from a_core.e_utils.ae09_tracing import get_tracer
 
 class ContentExtractor:
     """Extract content from various file formats"""
     
     def __init__(self):
         self.logger = LoggingUtils()
+        self.metrics = get_registry()
+        self.tracer = get_tracer()
         self.supported_formats = {
             'pdf': self._extract_pdf,
             'docx': self._extract_docx,
@@ -69,11 +73,13 @@ class ContentExtractor:
                 'extension': extension,
                 'mime_type': mimetypes.guess_type(str(file_path_obj))[0] or 'unknown'
             }
+            self.tracer.annotate(extension=extension, bytes=stat.st_size)
             
             # Extract content based on file type
             if extension in self.supported_formats:
                 content = self.supported_formats[extension](file_path_obj)
                 if content:
+                    self.tracer.annotate(chars=len(content))
                     return {
                         'content': content,
                         'metadata': metadata
@@ -99,20 +105,24 @@ class ContentExtractor:
         try:
             # Try with pdfplumber first (better for complex layouts)
             if pdfplumber:
-                with pdfplumber.open(file_path) as pdf:
-                    text_content = []
-                    for page in pdf.pages:
-                        text = page.extract_text()
-                        if text:
-                            text_content.append(text)
-                    
-                    if text_content:
-                        return '\n\n'.join(text_content)
+                with self.tracer.span("pdfplumber") as span:
+                    with pdfplumber.open(file_path) as pdf:
+                        span.set_attribute("page_count", len(pdf.pages))
+                        text_content = []
+                        for page in pdf.pages:
+                            text = page.extract_text()
+                            if text:
+                                text_content.append(text)
+                        
+                        span.set_attribute("pages_with_text", len(text_content))
+                        if text_content:
+                            return '\n\n'.join(text_content)
             
             # Fallback to PyPDF2
             if PyPDF2:
-                with open(file_path, 'rb') as file:
+                with self.tracer.span("pypdf2") as span, open(file_path, 'rb') as file:
                     pdf_reader = PyPDF2.PdfReader(file)
+                    span.set_attribute("page_count", len(pdf_reader.pages))
                     text_content = []
                     
                     for page in pdf_reader.pages:
@@ -204,7 +214,8 @@ class ContentExtractor:
                     img = img.convert('RGB')
                 
                 # Perform OCR
-                text = pytesseract.image_to_string(img, lang='eng')
+                with self.tracer.span("ocr", width=img.width, height=img.height), self.metrics.stage("ocr"):
+                    text = pytesseract.image_to_string(img, lang='eng')
                 
                 return text.strip() if text.strip() else None
                 
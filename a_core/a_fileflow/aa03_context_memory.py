@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from a_core.a_fileflow.aa05_database import DatabaseManager
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.f_data.af04_content_store import content_hash
 
 class ContextMemory:
     """Maintain context and consistency across document processing"""
@@ -18,7 +19,7 @@ class ContextMemory:
     def load_entity_cache(self):
         """Load entity mappings from database"""
         try:
-            entities = self.db_manager.get_all_entities()
+            entities = self.db_manager.iter_entities()
             self.entity_cache = {}
             
             for entity_data in entities:
@@ -66,6 +67,18 @@ class ContextMemory:
             )
             return []
     
+    def search_by_text(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Full-text search across previously processed documents"""
+        try:
+            return self.db_manager.search_documents(query, limit)
+        except Exception as e:
+            self.logger.log_activity(
+                "text_search_error",
+                f"Error searching documents by text: {str(e)}",
+                {"query": query, "error": str(e)}
+            )
+            return []
+    
     def _extract_keywords(self, content: str) -> List[str]:
         """Extract potential keywords from content"""
         # Simple keyword extraction (can be enhanced with NLP libraries)
@@ -170,12 +183,13 @@ class ContextMemory:
                 normalized = self.normalize_entity_name(entity)
                 normalized_entities.append(normalized)
             
-            # Store document context
-            self.db_manager.store_document_context(
+            # Queue document context (flushed in batches)
+            self.db_manager.queue_document_context(
                 file_path=file_path,
                 entities=normalized_entities,
-                content_summary=content[:500],  # Store first 500 chars as summary
-                keywords=self._extract_keywords(content)[:10]  # Top 10 keywords
+                content_summary=None,  # Text is in the content store, referenced by hash
+                keywords=self._extract_keywords(content)[:10],  # Top 10 keywords
+                content_hash=content_hash(content) if content else None
             )
             
             self.logger.log_activity(
@@ -1,107 +1,160 @@
-import sqlite3
+import atexit
 import json
-from typing import List, Dict, Any, Optional
+import os
+from collections import Counter
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 import threading
+import time
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae08_metrics import get_registry
+from a_core.e_utils.ae09_tracing import get_tracer
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af02_migrations import MigrationRunner
+from a_core.f_data import af03_rollups as rollups
+from a_core.f_data import af04_content_store as content_store
+from a_core.f_data.af07_sql_time import sql_timestamp
+
+# Upserts shared by the immediate store_* methods and the write-behind flush.
+# Re-analysing a file keeps its row id and first-seen timestamp but puts it
+# back into the review queue, matching the old INSERT OR REPLACE behaviour.
+# The text itself lives in content_blobs; the row only holds its hash.
+UPSERT_FILE_ANALYSIS_SQL = """
+    INSERT INTO file_analysis
+    (file_path, original_name, suggested_name, content_hash, metadata, entities,
+     confidence, reasoning, vector_id, event_type, status, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+    ON CONFLICT(file_path) DO UPDATE SET
+        original_name = excluded.original_name,
+        suggested_name = excluded.suggested_name,
+        content = NULL,
+        content_hash = excluded.content_hash,
+        metadata = excluded.metadata,
+        entities = excluded.entities,
+        confidence = excluded.confidence,
+        reasoning = excluded.reasoning,
+        vector_id = excluded.vector_id,
+        event_type = excluded.event_type,
+        status = 'pending',
+        updated_at = excluded.updated_at
+"""
+
+UPSERT_ENTITY_USAGE_SQL = """
+    INSERT INTO entities (entity_name, variations, usage_count, last_seen)
+    VALUES (?, '[]', ?, ?)
+    ON CONFLICT(entity_name) DO UPDATE SET
+        usage_count = usage_count + excluded.usage_count,
+        last_seen = excluded.last_seen
+"""
+
+# Replaces a file's entity links; entity rows are created by the usage upsert
+DELETE_FILE_ENTITIES_SQL = """
+    DELETE FROM file_entities
+    WHERE file_id = (SELECT id FROM file_analysis WHERE file_path = ?)
+"""
+
+INSERT_FILE_ENTITY_SQL = """
+    INSERT OR IGNORE INTO file_entities (file_id, entity_id)
+    SELECT fa.id, e.id
+    FROM file_analysis fa, entities e
+    WHERE fa.file_path = ? AND e.entity_name = ?
+"""
+
+INSERT_DOCUMENT_CONTEXT_SQL = """
+    INSERT INTO document_context
+    (file_path, entities, content_summary, keywords, content_hash)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Triggers can't decompress blobs, so search rows get their text from here
+UPSERT_DOCUMENT_SEARCH_SQL = """
+    INSERT OR REPLACE INTO document_search (rowid, file_path, suggested_name, content, keywords)
+    SELECT fa.id, fa.file_path, fa.suggested_name, ?,
+           COALESCE((SELECT keywords FROM document_context dc
+                     WHERE dc.file_path = fa.file_path
+                     ORDER BY dc.id DESC LIMIT 1), '')
+    FROM file_analysis fa
+    WHERE fa.file_path = ?
+"""
+
+FINGERPRINT_COLUMNS = ("file_path", "size", "mtime_ns", "inode", "content_hash", "last_processed")
+
+UPSERT_FILE_FINGERPRINT_SQL = """
+    INSERT INTO file_fingerprints
+    (file_path, size, mtime_ns, inode, content_hash, last_processed)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(file_path) DO UPDATE SET
+        size = excluded.size,
+        mtime_ns = excluded.mtime_ns,
+        inode = excluded.inode,
+        content_hash = excluded.content_hash,
+        last_processed = excluded.last_processed
+"""
+
+# Column weights for bm25(): file_path (unindexed), suggested_name, content, keywords
+FTS_BM25_WEIGHTS = "0.0, 2.0, 1.0, 1.5"
+
+# Document filters accepted by search_documents and get_filtered_file_paths:
+# created_after / created_before (inclusive / exclusive bounds on the UTC
+# file_analysis.created_at, as local or aware datetimes, dates or ISO
+# strings; see af07_sql_time), entity (a canonical
+# entity name) and extensions (e.g. [".pdf", "docx"])
+DOCUMENT_FILTERS = ("created_after", "created_before", "entity", "extensions")
 
 class DatabaseManager:
     """Manage SQLite database for file analysis and metadata"""
     
-    def __init__(self, db_path: str = "./data/second_brain.db"):
+    def __init__(self, db_path: str = "./data/second_brain.db",
+                 batch_size: int = 500, flush_interval_ms: int = 500):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
-        self.logger = LoggingUtils()
+        self.pool = get_pool(str(self.db_path))
+        self.logger = LoggingUtils(str(self.db_path))
+        self.metrics = get_registry()
+        self.tracer = get_tracer()
         self._lock = threading.Lock()
         
+        # Write-behind buffers, drained by a background flusher thread
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._buffer_cond = threading.Condition()
+        # file_path -> (UPSERT_FILE_ANALYSIS_SQL row, extracted text)
+        self._pending_analysis: Dict[str, Tuple[Tuple, Optional[str]]] = {}
+        self._pending_entity_usage: Counter = Counter()
+        self._pending_context: List[Tuple] = []
+        self._pending_fingerprints: Dict[str, Tuple] = {}
+        self._flusher: Optional[threading.Thread] = None
+        # When set (e.g. by AsyncDatabase), flushes run on this executor's
+        # thread instead of the flusher thread
+        self.write_executor: Optional[Executor] = None
+        self._closing = False
+        atexit.register(self.close)
+        self.metrics.gauge(
+            "db_write_buffer_rows", "Rows waiting in the write-behind buffers"
+        ).set_function(self._pending_count)
+        
+        self.fts_enabled = False
         self._initialize_database()
     
     def _initialize_database(self):
-        """Initialize the database with required tables"""
+        """Initialize the database by applying any pending schema migrations"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            runner = MigrationRunner(self.pool, logger=self.logger)
+            schema_version = runner.run()
+            
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
-                
-                # Files analysis table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS file_analysis (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        file_path TEXT UNIQUE NOT NULL,
-                        original_name TEXT NOT NULL,
-                        suggested_name TEXT NOT NULL,
-                        content TEXT,
-                        metadata TEXT,
-                        entities TEXT,
-                        confidence REAL,
-                        reasoning TEXT,
-                        vector_id TEXT,
-                        event_type TEXT,
-                        status TEXT DEFAULT 'pending',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Entities table for consistency tracking
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS entities (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        entity_name TEXT UNIQUE NOT NULL,
-                        variations TEXT,
-                        usage_count INTEGER DEFAULT 1,
-                        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Document context for memory
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS document_context (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        file_path TEXT NOT NULL,
-                        entities TEXT,
-                        content_summary TEXT,
-                        keywords TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Activity log
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS activity_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        activity_type TEXT NOT NULL,
-                        description TEXT NOT NULL,
-                        metadata TEXT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # File processing history
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS processing_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        file_path TEXT NOT NULL,
-                        file_hash TEXT,
-                        last_processed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Create indexes for better performance
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_path ON file_analysis(file_path)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_entities ON file_analysis(entities)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON file_analysis(status)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON file_analysis(created_at)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_type ON activity_log(activity_type)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON activity_log(timestamp)")
-                
-                conn.commit()
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_search'"
+                )
+                self.fts_enabled = cursor.fetchone() is not None
                 
             self.logger.log_activity(
                 "database_initialized",
                 "Database initialized successfully",
-                {"db_path": str(self.db_path)}
+                {"db_path": str(self.db_path), "schema_version": schema_version}
             )
             
         except Exception as e:
@@ -117,27 +170,16 @@ class DatabaseManager:
                           confidence: float, reasoning: str, vector_id: str, event_type: str):
         """Store file analysis results"""
         try:
+            row = self._file_analysis_row(
+                file_path, original_name, suggested_name, content, metadata,
+                entities, confidence, reasoning, vector_id, event_type
+            )
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO file_analysis
-                        (file_path, original_name, suggested_name, content, metadata, entities,
-                         confidence, reasoning, vector_id, event_type, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        file_path, original_name, suggested_name, content,
-                        json.dumps(metadata), json.dumps(entities),
-                        confidence, reasoning, vector_id, event_type,
-                        datetime.now().isoformat()
-                    ))
-                    
-                    conn.commit()
-                    
-            # Update entity usage
-            for entity in entities:
-                self._update_entity_usage(entity)
+                with self.pool.transaction() as conn:
+                    # Blob, row, entity usage, links and search row together
+                    self._write_file_analyses(
+                        conn.cursor(), {file_path: (row, content)}, Counter(entities)
+                    )
                 
         except Exception as e:
             self.logger.log_activity(
@@ -147,23 +189,219 @@ class DatabaseManager:
             )
             raise
     
+    def _file_analysis_row(self, file_path: str, original_name: str, suggested_name: str,
+                           content: str, metadata: Dict[str, Any], entities: List[str],
+                           confidence: float, reasoning: str, vector_id: str,
+                           event_type: str) -> Tuple:
+        """Build the parameter tuple for UPSERT_FILE_ANALYSIS_SQL"""
+        return (
+            file_path, original_name, suggested_name,
+            content_store.content_hash(content) if content else None,
+            json.dumps(metadata), json.dumps(entities),
+            confidence, reasoning, vector_id, event_type,
+            datetime.now().isoformat()
+        )
+    
+    def _write_file_analyses(self, cursor, analyses: Dict[str, Tuple[Tuple, Optional[str]]],
+                             usage: Counter):
+        """Write analysis rows with their content blobs, entity usage, links and search rows"""
+        if analyses:
+            content_store.put_contents(cursor, {
+                row[3]: content for row, content in analyses.values() if content
+            })
+            cursor.executemany(UPSERT_FILE_ANALYSIS_SQL, [row for row, _ in analyses.values()])
+        self._upsert_entity_usage(cursor, usage)
+        if not analyses:
+            return
+        self._link_file_entities(cursor, [
+            (file_path, json.loads(row[5])) for file_path, (row, _) in analyses.items()
+        ])
+        if self.fts_enabled:
+            cursor.executemany(UPSERT_DOCUMENT_SEARCH_SQL, [
+                (content or '', file_path) for file_path, (_, content) in analyses.items()
+            ])
+    
+    def _upsert_entity_usage(self, cursor, usage: Counter):
+        """Add usage increments for several entities with one executemany"""
+        if not usage:
+            return
+        now = datetime.now().isoformat()
+        cursor.executemany(
+            UPSERT_ENTITY_USAGE_SQL,
+            [(entity_name, count, now) for entity_name, count in usage.items()]
+        )
+    
+    def _link_file_entities(self, cursor, items: List[Tuple[str, List[str]]]):
+        """Replace the file_entities rows for each (file_path, entities) pair"""
+        if not items:
+            return
+        cursor.executemany(DELETE_FILE_ENTITIES_SQL, [(file_path,) for file_path, _ in items])
+        cursor.executemany(INSERT_FILE_ENTITY_SQL, [
+            (file_path, entity_name)
+            for file_path, entities in items
+            for entity_name in set(entities)
+        ])
+    
+    def queue_file_analysis(self, file_path: str, original_name: str, suggested_name: str,
+                            content: str, metadata: Dict[str, Any], entities: List[str],
+                            confidence: float, reasoning: str, vector_id: str, event_type: str):
+        """Buffer file analysis results for the next batched flush"""
+        row = self._file_analysis_row(
+            file_path, original_name, suggested_name, content, metadata,
+            entities, confidence, reasoning, vector_id, event_type
+        )
+        with self._buffer_cond:
+            # Later analyses of the same path supersede earlier buffered ones
+            self._pending_analysis[file_path] = (row, content)
+            self._pending_entity_usage.update(entities)
+            self._notify_flusher()
+    
+    def queue_document_context(self, file_path: str, entities: List[str],
+                               content_summary: Optional[str], keywords: List[str],
+                               content_hash: Optional[str] = None):
+        """Buffer document context for the next batched flush"""
+        with self._buffer_cond:
+            self._pending_context.append((
+                file_path, json.dumps(entities),
+                content_summary, json.dumps(keywords), content_hash
+            ))
+            self._notify_flusher()
+    
+    def queue_file_fingerprint(self, file_path: str, size: int, mtime_ns: int,
+                               inode: Optional[int], content_hash: Optional[str]):
+        """Buffer a file's fingerprint for the next batched flush"""
+        with self._buffer_cond:
+            self._pending_fingerprints[file_path] = (
+                file_path, size, mtime_ns, inode, content_hash,
+                datetime.now().isoformat()
+            )
+            self._notify_flusher()
+    
+    def _pending_count(self) -> int:
+        """Number of buffered rows waiting to be flushed"""
+        return (len(self._pending_analysis) + len(self._pending_entity_usage) +
+                len(self._pending_context) + len(self._pending_fingerprints))
+    
+    def _notify_flusher(self):
+        """Wake the flusher thread, starting it on first use (buffer lock held)"""
+        if self._flusher is None or not self._flusher.is_alive():
+            self._closing = False
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="db-write-behind", daemon=True
+            )
+            self._flusher.start()
+        self._buffer_cond.notify()
+    
+    def _flush_loop(self):
+        """Flush buffered rows every batch_size rows or flush_interval seconds"""
+        while True:
+            with self._buffer_cond:
+                while not self._pending_count() and not self._closing:
+                    self._buffer_cond.wait()
+                if self._closing:
+                    return
+                self._buffer_cond.wait_for(
+                    lambda: self._pending_count() >= self.batch_size or self._closing,
+                    timeout=self.flush_interval
+                )
+            executor = self.write_executor
+            if executor is not None:
+                try:
+                    executor.submit(self.flush).result()
+                    continue
+                except RuntimeError:
+                    # Executor shut down between the check and the submit
+                    pass
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write all buffered rows in a single transaction and return the row count"""
+        with self._buffer_cond:
+            analysis = self._pending_analysis
+            usage = self._pending_entity_usage
+            contexts = self._pending_context
+            fingerprints = self._pending_fingerprints
+            self._pending_analysis = {}
+            self._pending_entity_usage = Counter()
+            self._pending_context = []
+            self._pending_fingerprints = {}
+        
+        row_count = len(analysis) + len(usage) + len(contexts) + len(fingerprints)
+        if not row_count:
+            return 0
+        
+        try:
+            with self.tracer.span("db_flush", rows=row_count, files=len(analysis)) as span:
+                wait_started = time.perf_counter()
+                with self._lock:
+                    with self.metrics.stage("db_flush"):
+                        with self.pool.transaction() as conn:
+                            # Waiting on our own lock plus SQLite's write lock (BEGIN IMMEDIATE)
+                            lock_wait = time.perf_counter() - wait_started
+                            span.set_attribute("lock_wait_ms", round(lock_wait * 1000, 3))
+                            self.metrics.histogram("db_lock_wait_seconds").observe(lock_wait)
+                            
+                            cursor = conn.cursor()
+                            self._write_file_analyses(cursor, analysis, usage)
+                            if contexts:
+                                cursor.executemany(INSERT_DOCUMENT_CONTEXT_SQL, contexts)
+                            if fingerprints:
+                                cursor.executemany(UPSERT_FILE_FINGERPRINT_SQL, list(fingerprints.values()))
+            self.metrics.counter("db_rows_flushed_total", "Rows written by write-behind flushes").inc(row_count)
+            return row_count
+            
+        except Exception as e:
+            # Put the rows back so a later flush can retry them
+            with self._buffer_cond:
+                for file_path, item in analysis.items():
+                    self._pending_analysis.setdefault(file_path, item)
+                self._pending_entity_usage.update(usage)
+                self._pending_context[:0] = contexts
+                for file_path, row in fingerprints.items():
+                    self._pending_fingerprints.setdefault(file_path, row)
+            self.logger.log_activity(
+                "write_behind_flush_error",
+                f"Error flushing buffered writes: {str(e)}",
+                {"row_count": row_count, "error": str(e)}
+            )
+            return 0
+    
+    def close(self):
+        """Stop the flusher thread and durably write anything still buffered"""
+        with self._buffer_cond:
+            self._closing = True
+            self._buffer_cond.notify_all()
+            flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
+    
     def get_pending_reviews(self) -> List[Dict[str, Any]]:
         """Get all files pending review"""
+        return list(self.iter_pending_reviews())
+    
+    def get_pending_reviews_page(self, limit: int = 50,
+                                 before: Optional[Tuple[str, int]] = None
+                                 ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Get one page of pending files, newest first, plus the cursor of the next page"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
+                
+                # Keyset pagination: seek past the last (created_at, id) seen
+                # on idx_file_analysis_status_created instead of using OFFSET
+                keyset = "AND (created_at, id) < (?, ?)" if before else ""
+                cursor.execute(f"""
                     SELECT id, file_path, original_name, suggested_name, entities,
                            confidence, reasoning, created_at
                     FROM file_analysis
-                    WHERE status = 'pending'
-                    ORDER BY created_at DESC
-                """)
+                    WHERE status = 'pending' {keyset}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                """, (*(before or ()), limit))
                 
-                rows = cursor.fetchall()
                 results = []
-                
-                for row in rows:
+                for row in cursor.fetchall():
                     results.append({
                         'id': row[0],
                         'file_path': row[1],
@@ -175,7 +413,10 @@ class DatabaseManager:
                         'created_at': row[7]
                     })
                 
-                return results
+                next_cursor = None
+                if len(results) == limit:
+                    next_cursor = (results[-1]['created_at'], results[-1]['id'])
+                return results, next_cursor
                 
         except Exception as e:
             self.logger.log_activity(
@@ -183,13 +424,27 @@ class DatabaseManager:
                 f"Error getting pending reviews: {str(e)}",
                 {"error": str(e)}
             )
-            return []
+            return [], None
+    
+    def iter_pending_reviews(self, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream all files pending review, newest first, one page at a time"""
+        return self._iter_pages(self.get_pending_reviews_page, page_size)
+    
+    @staticmethod
+    def _iter_pages(fetch_page: Callable, page_size: int, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Yield rows from a keyset-paginated page method until it runs out"""
+        before = None
+        while True:
+            rows, before = fetch_page(limit=page_size, before=before, **kwargs)
+            yield from rows
+            if before is None:
+                return
     
     def approve_file_rename(self, file_id: int, approved_name: str = None):
         """Approve a file rename suggestion"""
         try:
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
                     
                     if approved_name:
@@ -205,8 +460,6 @@ class DatabaseManager:
                             WHERE id = ?
                         """, (datetime.now().isoformat(), file_id))
                     
-                    conn.commit()
-                    
         except Exception as e:
             self.logger.log_activity(
                 "approve_rename_error",
@@ -219,7 +472,7 @@ class DatabaseManager:
         """Reject a file rename suggestion"""
         try:
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
                     cursor.execute("""
                         UPDATE file_analysis
@@ -227,8 +480,6 @@ class DatabaseManager:
                         WHERE id = ?
                     """, (datetime.now().isoformat(), file_id))
                     
-                    conn.commit()
-                    
         except Exception as e:
             self.logger.log_activity(
                 "reject_rename_error",
@@ -241,15 +492,17 @@ class DatabaseManager:
         """Store a new entity"""
         try:
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
+                    # Upsert rather than REPLACE so the entity keeps its id
+                    # and its file_entities links
                     cursor.execute("""
-                        INSERT OR REPLACE INTO entities
-                        (entity_name, variations, usage_count, last_seen)
-                        VALUES (?, ?, ?, ?)
-                    """, (entity_name, json.dumps(variations), 1, datetime.now().isoformat()))
-                    
-                    conn.commit()
+                        INSERT INTO entities (entity_name, variations, usage_count, last_seen)
+                        VALUES (?, ?, 1, ?)
+                        ON CONFLICT(entity_name) DO UPDATE SET
+                            variations = excluded.variations,
+                            last_seen = excluded.last_seen
+                    """, (entity_name, json.dumps(variations), datetime.now().isoformat()))
                     
         except Exception as e:
             self.logger.log_activity(
@@ -259,57 +512,40 @@ class DatabaseManager:
             )
             raise
     
-    def _update_entity_usage(self, entity_name: str):
-        """Update entity usage count"""
-        try:
-            with sqlite3.connect(str(self.db_path)) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE entities
-                    SET usage_count = usage_count + 1, last_seen = ?
-                    WHERE entity_name = ?
-                """, (datetime.now().isoformat(), entity_name))
-                
-                if cursor.rowcount == 0:
-                    # Entity doesn't exist, create it
-                    cursor.execute("""
-                        INSERT INTO entities (entity_name, variations, usage_count, last_seen)
-                        VALUES (?, ?, 1, ?)
-                    """, (entity_name, json.dumps([]), datetime.now().isoformat()))
-                
-                conn.commit()
-                
-        except Exception as e:
-            self.logger.log_activity(
-                "entity_usage_update_error",
-                f"Error updating entity usage: {str(e)}",
-                {"entity_name": entity_name, "error": str(e)}
-            )
-    
     def get_all_entities(self) -> List[Dict[str, Any]]:
         """Get all entities with their variations"""
+        return list(self.iter_entities())
+    
+    def get_entities_page(self, limit: int = 100, before: Optional[Tuple[int, int]] = None
+                          ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Get one page of entities, most used first, plus the cursor of the next page"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT entity_name, variations, usage_count, first_seen, last_seen
+                keyset = "WHERE (usage_count, id) < (?, ?)" if before else ""
+                cursor.execute(f"""
+                    SELECT id, entity_name, variations, usage_count, first_seen, last_seen
                     FROM entities
-                    ORDER BY usage_count DESC
-                """)
+                    {keyset}
+                    ORDER BY usage_count DESC, id DESC
+                    LIMIT ?
+                """, (*(before or ()), limit))
                 
-                rows = cursor.fetchall()
                 results = []
-                
-                for row in rows:
+                for row in cursor.fetchall():
                     results.append({
-                        'entity_name': row[0],
-                        'variations': json.loads(row[1]) if row[1] else [],
-                        'usage_count': row[2],
-                        'first_seen': row[3],
-                        'last_seen': row[4]
+                        'id': row[0],
+                        'entity_name': row[1],
+                        'variations': json.loads(row[2]) if row[2] else [],
+                        'usage_count': row[3],
+                        'first_seen': row[4],
+                        'last_seen': row[5]
                     })
                 
-                return results
+                next_cursor = None
+                if len(results) == limit:
+                    next_cursor = (results[-1]['usage_count'], results[-1]['id'])
+                return results, next_cursor
                 
         except Exception as e:
             self.logger.log_activity(
@@ -317,26 +553,25 @@ class DatabaseManager:
                 f"Error getting entities: {str(e)}",
                 {"error": str(e)}
             )
-            return []
+            return [], None
+    
+    def iter_entities(self, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Stream all entities, most used first, one page at a time"""
+        return self._iter_pages(self.get_entities_page, page_size)
     
     def store_document_context(self, file_path: str, entities: List[str], 
-                             content_summary: str, keywords: List[str]):
+                             content_summary: Optional[str], keywords: List[str],
+                             content_hash: Optional[str] = None):
         """Store document context for memory"""
         try:
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO document_context
-                        (file_path, entities, content_summary, keywords)
-                        VALUES (?, ?, ?, ?)
-                    """, (
+                    cursor.execute(INSERT_DOCUMENT_CONTEXT_SQL, (
                         file_path, json.dumps(entities),
-                        content_summary, json.dumps(keywords)
+                        content_summary, json.dumps(keywords), content_hash
                     ))
                     
-                    conn.commit()
-                    
         except Exception as e:
             self.logger.log_activity(
                 "document_context_error",
@@ -344,51 +579,157 @@ class DatabaseManager:
                 {"file_path": file_path, "error": str(e)}
             )
     
-    def search_related_documents(self, keywords: List[str], limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for related documents based on keywords"""
+    def get_file_content(self, file_path: str) -> Optional[str]:
+        """Get the extracted text of an analysed file from the content store"""
+        with self._buffer_cond:
+            pending = self._pending_analysis.get(file_path)
+        if pending is not None:
+            return pending[1]
+        
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
-                cursor = conn.cursor()
-                
-                # Create a query to search for documents with matching keywords
-                keyword_placeholders = ','.join(['?' for _ in keywords])
-                query = f"""
-                    SELECT DISTINCT fa.file_path, fa.entities, fa.suggested_name,
-                           COUNT(*) as match_count
-                    FROM file_analysis fa
-                    JOIN document_context dc ON fa.file_path = dc.file_path
-                    WHERE dc.keywords LIKE '%' || ? || '%'
-                    GROUP BY fa.file_path
-                    ORDER BY match_count DESC
-                    LIMIT ?
-                """
+            with self.pool.read() as conn:
+                row = conn.execute(
+                    "SELECT content_hash, content FROM file_analysis WHERE file_path = ?",
+                    (file_path,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[0]:
+                    return content_store.get_content(conn, row[0])
+                # Inline text of a row the content_blobs backfill hasn't reached
+                return row[1]
                 
-                # For simplicity, we'll search for any keyword match
-                results = []
-                for keyword in keywords[:3]:  # Limit to top 3 keywords
-                    cursor.execute(query, (keyword, limit))
-                    rows = cursor.fetchall()
+        except Exception as e:
+            self.logger.log_activity(
+                "content_lookup_error",
+                f"Error loading file content: {str(e)}",
+                {"file_path": file_path, "error": str(e)}
+            )
+            return None
+    
+    def delete_orphan_content(self) -> int:
+        """Delete content blobs no longer referenced by any analysed file"""
+        try:
+            with self._lock:
+                with self.pool.transaction() as conn:
+                    return content_store.delete_orphan_blobs(conn.cursor())
                     
-                    for row in rows:
-                        results.append({
-                            'file_path': row[0],
-                            'entities': json.loads(row[1]) if row[1] else [],
-                            'suggested_name': row[2],
-                            'similarity_score': row[3] / len(keywords)
-                        })
-                
-                # Remove duplicates and sort by similarity
-                unique_results = {}
-                for result in results:
-                    path = result['file_path']
-                    if path not in unique_results or result['similarity_score'] > unique_results[path]['similarity_score']:
-                        unique_results[path] = result
-                
-                final_results = sorted(unique_results.values(), 
-                                     key=lambda x: x['similarity_score'], reverse=True)
-                
-                return final_results[:limit]
-                
+        except Exception as e:
+            self.logger.log_activity(
+                "content_cleanup_error",
+                f"Error deleting orphaned content: {str(e)}",
+                {"error": str(e)}
+            )
+            return 0
+    
+    @staticmethod
+    def _fts_match_expression(terms: List[str], operator: str) -> str:
+        """Quote terms as FTS5 strings and join them with AND/OR"""
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms if term.strip()]
+        return f" {operator} ".join(quoted)
+    
+    @staticmethod
+    def _document_filter_sql(created_after=None, created_before=None, entity: Optional[str] = None,
+                             extensions: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        """AND-ed conditions on file_analysis fa for the given DOCUMENT_FILTERS, with their parameters"""
+        clauses, params = [], []
+        if created_after:
+            clauses.append("fa.created_at >= ?")
+            params.append(sql_timestamp(created_after))
+        if created_before:
+            clauses.append("fa.created_at < ?")
+            params.append(sql_timestamp(created_before))
+        if entity:
+            # Served by idx_file_entities_entity
+            clauses.append("""fa.id IN (SELECT fe.file_id FROM file_entities fe
+                                        JOIN entities e ON e.id = fe.entity_id
+                                        WHERE e.entity_name = ?)""")
+            params.append(entity)
+        if extensions:
+            suffixes = ["." + extension.lower().lstrip(".") for extension in extensions]
+            clauses.append("(" + " OR ".join("lower(fa.file_path) LIKE '%' || ?" for _ in suffixes) + ")")
+            params.extend(suffixes)
+        return "".join(f" AND {clause}" for clause in clauses), params
+    
+    def get_filtered_file_paths(self, **filters) -> Optional[set]:
+        """Paths of analysed files matching DOCUMENT_FILTERS; None when no filter is set"""
+        if not any(filters.get(name) for name in DOCUMENT_FILTERS):
+            return None
+        filter_sql, params = self._document_filter_sql(**filters)
+        with self.pool.read() as conn:
+            return {row[0] for row in conn.execute(
+                f"SELECT fa.file_path FROM file_analysis fa WHERE 1 = 1{filter_sql}", params
+            )}
+    
+    def _search_full_text(self, match_expression: str, limit: int,
+                          filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run one BM25-ranked query against the FTS5 index, restricted by DOCUMENT_FILTERS"""
+        filter_sql, filter_params = self._document_filter_sql(**(filters or {}))
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT fa.id, fa.file_path, fa.entities, fa.suggested_name,
+                       snippet(document_search, 2, '[', ']', '...', 12),
+                       bm25(document_search, {FTS_BM25_WEIGHTS}) AS rank
+                FROM document_search
+                JOIN file_analysis fa ON fa.id = document_search.rowid
+                WHERE document_search MATCH ?{filter_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, (match_expression, *filter_params, limit))
+            
+            results = []
+            for row in cursor.fetchall():
+                # bm25() is lower-is-better and unbounded; map it onto (0, 1)
+                score = -row[5]
+                results.append({
+                    'id': row[0],
+                    'file_path': row[1],
+                    'entities': json.loads(row[2]) if row[2] else [],
+                    'suggested_name': row[3],
+                    'snippet': row[4],
+                    'bm25': row[5],
+                    'similarity_score': score / (1.0 + score) if score > 0 else 0.0
+                })
+            
+            return results
+    
+    def search_documents(self, query: str, limit: int = 10, match_any: bool = False,
+                         **filters) -> List[Dict[str, Any]]:
+        """Full-text search over names, content and keywords, ranked by BM25
+        
+        All terms must match unless match_any is set. filters are
+        DOCUMENT_FILTERS, applied in the same query before ranking.
+        """
+        try:
+            terms = query.split()
+            if not terms:
+                return []
+            if not self.fts_enabled:
+                return self._search_related_documents_like(terms, limit, filters)
+            
+            operator = "OR" if match_any else "AND"
+            return self._search_full_text(self._fts_match_expression(terms, operator), limit, filters)
+            
+        except Exception as e:
+            self.logger.log_activity(
+                "document_search_error",
+                f"Error searching documents: {str(e)}",
+                {"query": query, "error": str(e)}
+            )
+            return []
+    
+    def search_related_documents(self, keywords: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+        """Search for related documents based on keywords"""
+        try:
+            if not keywords:
+                return []
+            if not self.fts_enabled:
+                return self._search_related_documents_like(keywords, limit)
+            
+            # One ranked query matching any keyword replaces a query per keyword
+            return self._search_full_text(self._fts_match_expression(keywords, "OR"), limit)
+            
         except Exception as e:
             self.logger.log_activity(
                 "related_documents_search_error",
@@ -397,32 +738,103 @@ class DatabaseManager:
             )
             return []
     
-    def get_activity_timeline(self, days: int = 7) -> List[Dict[str, Any]]:
+    def _search_related_documents_like(self, keywords: List[str], limit: int,
+                                       filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Keyword search for SQLite builds without FTS5"""
+        filter_sql, filter_params = self._document_filter_sql(**(filters or {}))
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            
+            # Create a query to search for documents with matching keywords
+            query = f"""
+                SELECT DISTINCT fa.file_path, fa.entities, fa.suggested_name,
+                       COUNT(*) as match_count
+                FROM file_analysis fa
+                JOIN document_context dc ON fa.file_path = dc.file_path
+                WHERE dc.keywords LIKE '%' || ? || '%'{filter_sql}
+                GROUP BY fa.file_path
+                ORDER BY match_count DESC
+                LIMIT ?
+            """
+            
+            # For simplicity, we'll search for any keyword match
+            results = []
+            for keyword in keywords[:3]:  # Limit to top 3 keywords
+                cursor.execute(query, (keyword, *filter_params, limit))
+                rows = cursor.fetchall()
+                
+                for row in rows:
+                    results.append({
+                        'file_path': row[0],
+                        'entities': json.loads(row[1]) if row[1] else [],
+                        'suggested_name': row[2],
+                        'similarity_score': row[3] / len(keywords)
+                    })
+            
+            # Remove duplicates and sort by similarity
+            unique_results = {}
+            for result in results:
+                path = result['file_path']
+                if path not in unique_results or result['similarity_score'] > unique_results[path]['similarity_score']:
+                    unique_results[path] = result
+            
+            final_results = sorted(unique_results.values(), 
+                                 key=lambda x: x['similarity_score'], reverse=True)
+            
+            return final_results[:limit]
+    
+    def get_activity_timeline(self, days: Optional[float] = 7) -> List[Dict[str, Any]]:
         """Get activity timeline for the specified number of days"""
+        return list(self.iter_activity_timeline(days))
+    
+    def get_activity_timeline_page(self, days: Optional[float] = 7, limit: int = 100,
+                                   before: Optional[Tuple[str, int]] = None,
+                                   activity_types: Optional[List[str]] = None
+                                   ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Get one page of activities, newest first, plus the cursor of the next page
+        
+        days=None means no lower time bound.
+        """
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 
-                cutoff_date = datetime.now() - timedelta(days=days)
-                cursor.execute("""
-                    SELECT activity_type, description, metadata, timestamp
+                conditions = []
+                params: List[Any] = []
+                if days is not None:
+                    conditions.append("timestamp >= ?")
+                    params.append((datetime.now() - timedelta(days=days)).isoformat())
+                if activity_types:
+                    placeholders = ','.join('?' * len(activity_types))
+                    conditions.append(f"activity_type IN ({placeholders})")
+                    params.extend(activity_types)
+                if before:
+                    conditions.append("(timestamp, id) < (?, ?)")
+                    params.extend(before)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                
+                cursor.execute(f"""
+                    SELECT id, activity_type, description, metadata, timestamp
                     FROM activity_log
-                    WHERE timestamp >= ?
-                    ORDER BY timestamp DESC
-                """, (cutoff_date.isoformat(),))
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (*params, limit))
                 
-                rows = cursor.fetchall()
                 results = []
-                
-                for row in rows:
+                for row in cursor.fetchall():
                     results.append({
-                        'activity_type': row[0],
-                        'description': row[1],
-                        'metadata': json.loads(row[2]) if row[2] else {},
-                        'timestamp': row[3]
+                        'id': row[0],
+                        'activity_type': row[1],
+                        'description': row[2],
+                        'metadata': json.loads(row[3]) if row[3] else {},
+                        'timestamp': row[4]
                     })
                 
-                return results
+                next_cursor = None
+                if len(results) == limit:
+                    next_cursor = (results[-1]['timestamp'], results[-1]['id'])
+                return results, next_cursor
                 
         except Exception as e:
             self.logger.log_activity(
@@ -430,33 +842,35 @@ class DatabaseManager:
                 f"Error getting activity timeline: {str(e)}",
                 {"error": str(e)}
             )
-            return []
+            return [], None
+    
+    def iter_activity_timeline(self, days: Optional[float] = 7, page_size: int = 1000,
+                               activity_types: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream activities, newest first, one page at a time"""
+        return self._iter_pages(
+            self.get_activity_timeline_page, page_size,
+            days=days, activity_types=activity_types
+        )
+    
+    def get_activity_types(self, days: Optional[float] = 30) -> List[str]:
+        """Get the distinct activity types logged in the last days"""
+        return sorted(self.get_activity_breakdown(days))
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Get database statistics"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
-                cursor = conn.cursor()
-                
-                stats = {}
+            with self.pool.read() as conn:
+                # Read from the trigger-maintained rollup tables
+                row_counts = rollups.read_row_counts(conn)
+                status_counts = rollups.read_status_counts(conn)
                 
-                # Total files processed
-                cursor.execute("SELECT COUNT(*) FROM file_analysis")
-                stats['total_files'] = cursor.fetchone()[0]
-                
-                # Pending reviews
-                cursor.execute("SELECT COUNT(*) FROM file_analysis WHERE status = 'pending'")
-                stats['pending_reviews'] = cursor.fetchone()[0]
-                
-                # Total entities
-                cursor.execute("SELECT COUNT(*) FROM entities")
-                stats['total_entities'] = cursor.fetchone()[0]
-                
-                # Total activities
-                cursor.execute("SELECT COUNT(*) FROM activity_log")
-                stats['total_activities'] = cursor.fetchone()[0]
-                
-                return stats
+                return {
+                    'total_files': row_counts['file_analysis'],
+                    'pending_reviews': status_counts.get('pending', 0),
+                    'total_entities': row_counts['entities'],
+                    'total_activities': row_counts['activity_log'],
+                    'status_counts': status_counts
+                }
                 
         except Exception as e:
             self.logger.log_activity(
@@ -466,15 +880,47 @@ class DatabaseManager:
             )
             return {}
     
+    def get_activity_breakdown(self, days: Optional[float] = 1) -> Dict[str, int]:
+        """Get activity counts per type over the last days, from hourly rollups"""
+        try:
+            with self.pool.read() as conn:
+                return rollups.read_activity_breakdown(conn, days)
+                
+        except Exception as e:
+            self.logger.log_activity(
+                "database_stats_error",
+                f"Error getting activity breakdown: {str(e)}",
+                {"error": str(e)}
+            )
+            return {}
+    
+    def get_activity_counts(self, days: Optional[float] = 1,
+                            bucket: str = "hour") -> List[Dict[str, Any]]:
+        """Get activity counts per hour or day and type over the last days"""
+        try:
+            with self.pool.read() as conn:
+                return [
+                    {'bucket': key, 'activity_type': activity_type, 'count': count}
+                    for key, activity_type, count in rollups.read_activity_buckets(conn, days, bucket)
+                ]
+                
+        except Exception as e:
+            self.logger.log_activity(
+                "database_stats_error",
+                f"Error getting activity counts: {str(e)}",
+                {"error": str(e)}
+            )
+            return []
+    
     def is_file_recently_processed(self, file_path: str, hours: int = 1) -> bool:
         """Check if file was processed recently"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 
                 cutoff_time = datetime.now() - timedelta(hours=hours)
                 cursor.execute("""
-                    SELECT COUNT(*) FROM processing_history
+                    SELECT COUNT(*) FROM file_fingerprints
                     WHERE file_path = ? AND last_processed >= ?
                 """, (file_path, cutoff_time.isoformat()))
                 
@@ -484,22 +930,102 @@ class DatabaseManager:
         except Exception as e:
             return False
     
+    def get_file_fingerprint(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Get the stored fingerprint of a file, including still-buffered ones"""
+        with self._buffer_cond:
+            row = self._pending_fingerprints.get(file_path)
+        if row is not None:
+            return dict(zip(FINGERPRINT_COLUMNS, row))
+        
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT file_path, size, mtime_ns, inode, content_hash, last_processed
+                    FROM file_fingerprints WHERE file_path = ?
+                """, (file_path,))
+                
+                row = cursor.fetchone()
+                return dict(zip(FINGERPRINT_COLUMNS, row)) if row else None
+                
+        except Exception as e:
+            self.logger.log_activity(
+                "fingerprint_lookup_error",
+                f"Error loading file fingerprint: {str(e)}",
+                {"file_path": file_path, "error": str(e)}
+            )
+            return None
+    
+    def delete_file_fingerprint(self, file_path: str):
+        """Forget a file's fingerprint, buffered or stored, so it is processed again if it reappears"""
+        with self._buffer_cond:
+            self._pending_fingerprints.pop(file_path, None)
+        
+        try:
+            with self._lock:
+                with self.pool.transaction() as conn:
+                    conn.execute("DELETE FROM file_fingerprints WHERE file_path = ?", (file_path,))
+                
+        except Exception as e:
+            self.logger.log_activity(
+                "fingerprint_delete_error",
+                f"Error deleting file fingerprint: {str(e)}",
+                {"file_path": file_path, "error": str(e)}
+            )
+    
+    def get_file_fingerprints(self, folder_path: str) -> Dict[str, Dict[str, Any]]:
+        """Get the stored fingerprints of every file under a folder, keyed by path"""
+        prefix = str(Path(folder_path)).rstrip(os.sep) + os.sep
+        # Half-open range on the primary key: every path starting with prefix
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        fingerprints = {}
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT file_path, size, mtime_ns, inode, content_hash, last_processed
+                    FROM file_fingerprints WHERE file_path >= ? AND file_path < ?
+                """, (prefix, upper))
+                
+                for row in cursor.fetchall():
+                    fingerprints[row[0]] = dict(zip(FINGERPRINT_COLUMNS, row))
+                
+        except Exception as e:
+            self.logger.log_activity(
+                "fingerprint_lookup_error",
+                f"Error loading file fingerprints: {str(e)}",
+                {"folder_path": folder_path, "error": str(e)}
+            )
+        
+        with self._buffer_cond:
+            for file_path, row in self._pending_fingerprints.items():
+                if file_path.startswith(prefix):
+                    fingerprints[file_path] = dict(zip(FINGERPRINT_COLUMNS, row))
+        return fingerprints
+    
     def clear_all_data(self):
         """Clear all data from the database"""
         try:
+            with self._buffer_cond:
+                self._pending_analysis = {}
+                self._pending_entity_usage = Counter()
+                self._pending_context = []
+                self._pending_fingerprints = {}
+            # Write out queued log records now so they don't land after the wipe
+            self.logger.flush(timeout=5)
+            
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
                     
                     # Clear all tables
-                    tables = ['file_analysis', 'entities', 'document_context', 
-                             'activity_log', 'processing_history']
+                    tables = ['file_fingerprints', 'file_entities', 'file_analysis', 'entities', 'document_context',
+                             'activity_log', 'processing_history', 'content_blobs', 'table_row_counts',
+                             'file_status_counts', 'activity_hourly_counts']
                     
                     for table in tables:
                         cursor.execute(f"DELETE FROM {table}")
                     
-                    conn.commit()
-                    
             self.logger.log_activity(
                 "database_cleared",
                 "All database data cleared",
@@ -518,7 +1044,7 @@ class DatabaseManager:
         """Add a variation to an existing entity"""
         try:
             with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
+                with self.pool.transaction() as conn:
                     cursor = conn.cursor()
                     
                     # Get current variations
@@ -538,8 +1064,6 @@ class DatabaseManager:
                             """, (json.dumps(current_variations), 
                                  datetime.now().isoformat(), canonical_name))
                             
-                            conn.commit()
-                    
         except Exception as e:
             self.logger.log_activity(
                 "entity_variation_add_error",
@@ -550,13 +1074,16 @@ class DatabaseManager:
     def search_documents_by_entity(self, entity_name: str) -> List[Dict[str, Any]]:
         """Search documents by entity name"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    SELECT file_path, original_name, suggested_name, entities, created_at
-                    FROM file_analysis
-                    WHERE entities LIKE '%' || ? || '%'
-                    ORDER BY created_at DESC
+                    SELECT fa.file_path, fa.original_name, fa.suggested_name,
+                           fa.entities, fa.created_at
+                    FROM entities e
+                    JOIN file_entities fe ON fe.entity_id = e.id
+                    JOIN file_analysis fa ON fa.id = fe.file_id
+                    WHERE e.entity_name = ?
+                    ORDER BY fa.created_at DESC
                 """, (entity_name,))
                 
                 rows = cursor.fetchall()
@@ -584,7 +1111,7 @@ class DatabaseManager:
     def get_top_entities(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top entities by usage count"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT entity_name, usage_count
@@ -599,10 +1126,34 @@ class DatabaseManager:
         except Exception as e:
             return []
     
+    def get_cooccurring_entities(self, entity_name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get entities that appear in the same files as the given entity"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT e2.entity_name, COUNT(*) AS shared_files
+                    FROM entities e
+                    JOIN file_entities fe1 ON fe1.entity_id = e.id
+                    JOIN file_entities fe2 ON fe2.file_id = fe1.file_id
+                                          AND fe2.entity_id != fe1.entity_id
+                    JOIN entities e2 ON e2.id = fe2.entity_id
+                    WHERE e.entity_name = ?
+                    GROUP BY fe2.entity_id
+                    ORDER BY shared_files DESC
+                    LIMIT ?
+                """, (entity_name, limit))
+                
+                rows = cursor.fetchall()
+                return [{'entity_name': row[0], 'shared_files': row[1]} for row in rows]
+                
+        except Exception as e:
+            return []
+    
     def get_recent_entities(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get recently used entities"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT entity_name, last_seen
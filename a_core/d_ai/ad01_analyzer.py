@@ -1,19 +1,38 @@
 import os
 import json
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, RateLimitError, InternalServerError
 from a_core.a_fileflow.aa03_context_memory import ContextMemory
+from a_core.d_ai.ad02_chunking import TextChunk, chunk_text
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae08_metrics import get_registry
+from a_core.e_utils.ae09_tracing import get_tracer
+
+# Transient OpenAI failures worth retrying (timeouts are connection errors)
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+# Inputs and tokens per embeddings request, below the API's limits of 2048
+# inputs and 300k tokens
+EMBEDDING_BATCH_INPUTS = 256
+EMBEDDING_BATCH_TOKENS = 250000
 
 class AIAnalyzer:
     """AI-powered content analysis and file naming"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
+        # Retries are done here rather than inside the client so each
+        # attempt is visible on the call's span
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""), max_retries=0)
+        self.max_retries = 2
         self.logger = LoggingUtils()
+        self.metrics = get_registry()
+        self.tracer = get_tracer()
         
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
@@ -24,7 +43,8 @@ class AIAnalyzer:
         """Analyze file content and generate naming suggestions"""
         try:
             # Get relevant context from memory
-            context_info = context_memory.get_relevant_context(content, limit=5)
+            with self.tracer.span("context_lookup"):
+                context_info = context_memory.get_relevant_context(content, limit=5)
             
             # Prepare context information for the prompt
             context_text = ""
@@ -36,21 +56,24 @@ class AIAnalyzer:
             # Create analysis prompt
             prompt = self._create_analysis_prompt(content, metadata, context_text)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert document analyzer specializing in intelligent file naming and entity extraction. Your task is to analyze document content and suggest descriptive, consistent file names following the format: YYYY-MM-DD_EntityName_DescriptiveWords. Always maintain consistency with previously identified entities."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
+            with self.tracer.span("gpt_call", model=self.model, prompt_chars=len(prompt)) as span, \
+                    self.metrics.stage("gpt_call"):
+                response = self._create_with_retries(
+                    span, self.client.chat.completions.create,
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are an expert document analyzer specializing in intelligent file naming and entity extraction. Your task is to analyze document content and suggest descriptive, consistent file names following the format: YYYY-MM-DD_EntityName_DescriptiveWords. Always maintain consistency with previously identified entities."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.3
+                )
             
             result = json.loads(response.choices[0].message.content)
             
@@ -93,6 +116,29 @@ class AIAnalyzer:
                 "keywords": []
             }
     
+    def _create_with_retries(self, span, create, **kwargs):
+        """Call an OpenAI create method, retrying transient failures with backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                span.set_attribute("retries", attempt)
+                if attempt == self.max_retries:
+                    raise
+                span.set_attribute("last_retry_error", type(e).__name__)
+                time.sleep(min(0.5 * 2 ** attempt, 8.0))
+                continue
+            
+            span.set_attribute("retries", attempt)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                span.set_attributes(
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None),
+                    total_tokens=getattr(usage, "total_tokens", None)
+                )
+            return response
+    
     def _create_analysis_prompt(self, content: str, metadata: Dict[str, Any], 
                               context_text: str) -> str:
         """Create a detailed prompt for content analysis"""
@@ -140,10 +186,14 @@ Respond with JSON in this exact format:
             # Truncate content if too long for embedding
             truncated_content = content[:8000] if len(content) > 8000 else content
             
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=truncated_content
-            )
+            with self.tracer.span("embedding_api", model=EMBEDDING_MODEL,
+                                  input_chars=len(truncated_content)) as span, \
+                    self.metrics.stage("embedding_api"):
+                response = self._create_with_retries(
+                    span, self.client.embeddings.create,
+                    model=EMBEDDING_MODEL,
+                    input=truncated_content
+                )
             
             return response.data[0].embedding
             
@@ -154,20 +204,83 @@ Respond with JSON in this exact format:
                 {"error": str(e)}
             )
             # Return zero vector as fallback
-            return [0.0] * 1536
+            return [0.0] * EMBEDDING_DIMENSIONS
+    
+    def generate_embeddings(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[List[float]]:
+        """Embed many texts, packing them into as few API requests as the batch limits allow
+        
+        token_counts, when known, keeps each request under
+        EMBEDDING_BATCH_TOKENS. A request that fails yields zero vectors for
+        its texts, like generate_embedding.
+        """
+        embeddings = []
+        batch_start = 0
+        while batch_start < len(texts):
+            batch_end, batch_tokens = batch_start, 0
+            while batch_end < len(texts) and batch_end - batch_start < EMBEDDING_BATCH_INPUTS:
+                tokens = token_counts[batch_end] if token_counts else 0
+                if batch_end > batch_start and batch_tokens + tokens > EMBEDDING_BATCH_TOKENS:
+                    break
+                batch_tokens += tokens
+                batch_end += 1
+            embeddings.extend(self._embed_batch(texts[batch_start:batch_end], batch_tokens))
+            batch_start = batch_end
+        return embeddings
+    
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        """One embeddings request for a list of texts, in input order"""
+        try:
+            with self.tracer.span("embedding_api", model=EMBEDDING_MODEL, inputs=len(texts),
+                                  input_chars=sum(len(text) for text in texts),
+                                  input_tokens=tokens or None) as span, \
+                    self.metrics.stage("embedding_api"):
+                response = self._create_with_retries(
+                    span, self.client.embeddings.create,
+                    model=EMBEDDING_MODEL,
+                    input=texts
+                )
+            
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        
+        except Exception as e:
+            self.logger.log_activity(
+                "embedding_error",
+                f"Error generating {len(texts)} embeddings: {str(e)}",
+                {"error": str(e), "inputs": len(texts)}
+            )
+            return [[0.0] * EMBEDDING_DIMENSIONS for _ in texts]
+    
+    def embed_chunks(self, content: str) -> Tuple[List[TextChunk], List[List[float]]]:
+        """Split content into token windows and embed every window
+        
+        Unlike generate_embedding, nothing past the first 8000 characters
+        is dropped; see ad02_chunking for the window sizes.
+        """
+        with self.tracer.span("chunk_text", input_chars=len(content)) as span:
+            chunks = chunk_text(content)
+            span.set_attribute("chunks", len(chunks))
+        if not chunks:
+            return [], []
+        embeddings = self.generate_embeddings([chunk.text for chunk in chunks],
+                                              [chunk.tokens for chunk in chunks])
+        return chunks, embeddings
     
     def analyze_image_content(self, image_base64: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze image content using GPT-4 Vision"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"""Analyze this image and extract any visible text, identify key elements, and suggest a descriptive filename.
+            with self.tracer.span("gpt_vision_call", model=self.model,
+                                  image_bytes=len(image_base64) * 3 // 4) as span, \
+                    self.metrics.stage("gpt_vision_call"):
+                response = self._create_with_retries(
+                    span, self.client.chat.completions.create,
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": f"""Analyze this image and extract any visible text, identify key elements, and suggest a descriptive filename.
                                 
 Respond with JSON in this format:
 {{
@@ -182,17 +295,17 @@ Respond with JSON in this format:
 
 Original filename: {metadata.get('file_name', 'unknown')}
 Use today's date {datetime.now().strftime('%Y-%m-%d')} if no date is visible in the image."""
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
-                            }
-                        ]
-                    }
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=1000
-            )
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
+                                }
+                            ]
+                        }
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=1000
+                )
             
             result = json.loads(response.choices[0].message.content)
             
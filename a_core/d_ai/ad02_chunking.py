@@ -0,0 +1,111 @@
+import re
+from typing import List, NamedTuple, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Token-aware sliding windows over extracted text, so every part of a long
+# document gets its own embedding instead of only the first 8000 characters.
+# Windows are CHUNK_TOKENS long and overlap by CHUNK_OVERLAP_TOKENS, so a
+# sentence cut at one boundary is whole in the neighbouring chunk. Tokens are
+# counted with tiktoken's encoding for the embedding model when it is
+# installed; otherwise words are windowed at WORDS_PER_TOKEN words per token.
+
+EMBEDDING_ENCODING = "cl100k_base"
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+# Bounds the embedding calls for one file (about 115k tokens with the defaults)
+MAX_CHUNKS_PER_DOCUMENT = 256
+# English text averages about 0.75 words per cl100k token
+WORDS_PER_TOKEN = 0.75
+
+_WORD = re.compile(r"\S+\s*")
+_encoding = None
+
+
+class TextChunk(NamedTuple):
+    """One window of a document's text"""
+    index: int
+    text: str
+    tokens: int
+    char_start: int
+    char_end: int
+
+
+def _get_encoding():
+    """The tiktoken encoding, loaded on first use; None without tiktoken"""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(EMBEDDING_ENCODING)
+        except Exception:
+            # The encoding file could not be downloaded; count words instead
+            return None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text under the embedding model's encoding, or an estimate from words"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(_WORD.findall(text)) / WORDS_PER_TOKEN + 0.5)
+
+
+def chunk_text(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+               max_chunks: Optional[int] = MAX_CHUNKS_PER_DOCUMENT) -> List[TextChunk]:
+    """Split text into overlapping windows of at most chunk_tokens tokens
+
+    Text that fits in one window comes back as a single chunk; empty or
+    whitespace-only text gives no chunks.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    if not text or not text.strip():
+        return []
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        return _chunk_tokens(text, encoding, chunk_tokens, overlap_tokens, max_chunks)
+    return _chunk_words(text, chunk_tokens, overlap_tokens, max_chunks)
+
+
+def _chunk_tokens(text: str, encoding, chunk_tokens: int, overlap_tokens: int,
+                  max_chunks: Optional[int]) -> List[TextChunk]:
+    """Windows over tiktoken tokens, with character offsets from the decoded stride lengths
+
+    Offsets can be off by a character where a boundary splits a multi-byte
+    character across two tokens.
+    """
+    tokens = encoding.encode(text, disallowed_special=())
+    stride = chunk_tokens - overlap_tokens
+    chunks = []
+    char_start = 0
+    for start in range(0, max(1, len(tokens) - overlap_tokens), stride):
+        if max_chunks is not None and len(chunks) >= max_chunks:
+            break
+        if start:
+            char_start += len(encoding.decode(tokens[start - stride:start]))
+        window = tokens[start:start + chunk_tokens]
+        chunk = encoding.decode(window)
+        chunks.append(TextChunk(len(chunks), chunk, len(window), char_start, char_start + len(chunk)))
+    return chunks
+
+
+def _chunk_words(text: str, chunk_tokens: int, overlap_tokens: int,
+                 max_chunks: Optional[int]) -> List[TextChunk]:
+    """Windows over whitespace-delimited words sized by the words-per-token estimate"""
+    words = [match.span() for match in _WORD.finditer(text)]
+    window_words = max(1, int(chunk_tokens * WORDS_PER_TOKEN))
+    stride = max(1, window_words - int(overlap_tokens * WORDS_PER_TOKEN))
+    chunks = []
+    for start in range(0, max(1, len(words) - (window_words - stride)), stride):
+        if max_chunks is not None and len(chunks) >= max_chunks:
+            break
+        window = words[start:start + window_words]
+        char_start, char_end = window[0][0], window[-1][1]
+        chunks.append(TextChunk(len(chunks), text[char_start:char_end].strip(),
+                                int(len(window) / WORDS_PER_TOKEN + 0.5), char_start, char_end))
+    return chunks
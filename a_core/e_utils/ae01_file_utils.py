@@ -21,6 +21,18 @@ class FileUtils:
         except Exception:
             return None
     
+    @staticmethod
+    def get_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> Optional[str]:
+        """Generate a BLAKE2b content hash of a file, read in large chunks"""
+        try:
+            digest = hashlib.blake2b(digest_size=20)
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except Exception:
+            return None
+    
     @staticmethod
     def is_file_accessible(file_path: str) -> bool:
         """Check if file exists and is accessible"""
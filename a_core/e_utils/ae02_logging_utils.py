@@ -6,65 +6,60 @@ from typing import Dict, Any, Optional
 import threading
 import logging
 
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af02_migrations import run_migrations
+from a_core.f_data import af03_rollups as rollups
+from a_core.e_utils.ae06_log_pipeline import get_log_pipeline, level_for
+
 class LoggingUtils:
     """Centralized logging utility for the Second Brain system"""
     
     def __init__(self, db_path: str = "./data/second_brain.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        self.pool = get_pool(str(self.db_path))
         self._lock = threading.Lock()
         self._ensure_log_table()
+        # Shared per database file, so every LoggingUtils feeds one writer
+        self.pipeline = get_log_pipeline(str(self.db_path))
     
     def _ensure_log_table(self):
         """Ensure the activity_log table exists"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS activity_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        activity_type TEXT NOT NULL,
-                        description TEXT NOT NULL,
-                        metadata TEXT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                conn.commit()
+            # activity_log is part of the baseline schema migration
+            run_migrations(str(self.db_path), target_version=1)
         except Exception:
             # If database operations fail, we'll continue without logging
             pass
     
     def log_activity(self, activity_type: str, description: str, 
-                    metadata: Optional[Dict[str, Any]] = None):
-        """Log an activity to the database and console"""
+                    metadata: Optional[Dict[str, Any]] = None,
+                    level: Optional[int] = None):
+        """Queue an activity for the database and console sinks"""
         try:
-            timestamp = datetime.now().isoformat()
-            
-            # Console logging for immediate visibility
-            print(f"[{timestamp}] {activity_type.upper()}: {description}")
-            if metadata:
-                print(f"  Metadata: {json.dumps(metadata, indent=2)}")
-            
-            # Database logging
-            with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO activity_log (activity_type, description, metadata, timestamp)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        activity_type,
-                        description,
-                        json.dumps(metadata) if metadata else None,
-                        timestamp
-                    ))
-                    conn.commit()
-                    
+            # Only the enqueue happens on the caller's thread; the pipeline's
+            # writer batches records into the sinks in the background
+            self.pipeline.enqueue((
+                level_for(activity_type) if level is None else level,
+                activity_type,
+                description,
+                metadata,
+                datetime.now().isoformat()
+            ))
         except Exception as e:
-            # Fallback to console only if database logging fails
             print(f"[{datetime.now().isoformat()}] LOGGING_ERROR: Failed to log activity: {str(e)}")
             print(f"  Original activity: {activity_type} - {description}")
     
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every activity queued so far has reached the sinks"""
+        return self.pipeline.flush(timeout)
+    
+    def get_sampling_stats(self) -> Dict[str, Dict[str, int]]:
+        """Events seen and suppressed per sampled activity type in this process"""
+        if self.pipeline.sampler is None:
+            return {}
+        return self.pipeline.sampler.stats()
+    
     def log_error(self, error_type: str, error_message: str, 
                   context: Optional[Dict[str, Any]] = None):
         """Log an error with additional context"""
@@ -160,7 +155,7 @@ class LoggingUtils:
             cutoff_time = datetime.now().timestamp() - (hours * 3600)
             cutoff_iso = datetime.fromtimestamp(cutoff_time).isoformat()
             
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 
                 if activity_types:
@@ -200,6 +195,13 @@ class LoggingUtils:
     def get_log_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get a summary of log activities"""
         try:
+            try:
+                return self._get_log_summary_from_rollups(hours)
+            except sqlite3.OperationalError:
+                # Rollup tables are created by DatabaseManager's migrations;
+                # count raw rows if this database hasn't been upgraded yet
+                pass
+            
             logs = self.get_recent_logs(hours)
             
             summary = {
@@ -207,6 +209,7 @@ class LoggingUtils:
                 'activity_breakdown': {},
                 'error_count': 0,
                 'performance_issues': 0,
+                'suppressed_events': 0,
                 'time_range_hours': hours
             }
             
@@ -217,6 +220,8 @@ class LoggingUtils:
                 
                 if activity_type == 'error':
                     summary['error_count'] += 1
+                elif activity_type == 'log_suppressed':
+                    summary['suppressed_events'] += log.get('metadata', {}).get('suppressed_count', 0)
                 elif activity_type == 'performance':
                     metadata = log.get('metadata', {})
                     if metadata.get('performance_level') in ['slow', 'very_slow']:
@@ -230,10 +235,41 @@ class LoggingUtils:
                 'activity_breakdown': {},
                 'error_count': 1,
                 'performance_issues': 0,
+                'suppressed_events': 0,
                 'time_range_hours': hours,
                 'summary_error': str(e)
             }
     
+    def _get_log_summary_from_rollups(self, hours: int) -> Dict[str, Any]:
+        """Build the log summary from hourly rollups plus two narrow indexed queries"""
+        with self.pool.read() as conn:
+            breakdown = rollups.read_activity_breakdown(conn, hours / 24)
+            
+            cutoff_iso = datetime.fromtimestamp(datetime.now().timestamp() - hours * 3600).isoformat()
+            performance_issues = conn.execute("""
+                SELECT COUNT(*) FROM activity_log
+                WHERE activity_type = 'performance' AND timestamp >= ?
+                  AND CASE WHEN json_valid(metadata)
+                           THEN json_extract(metadata, '$.performance_level') END
+                      IN ('slow', 'very_slow')
+            """, (cutoff_iso,)).fetchone()[0]
+            # Sampled-out events only exist as counts in log_suppressed summaries
+            suppressed_events = conn.execute("""
+                SELECT COALESCE(SUM(CASE WHEN json_valid(metadata)
+                                         THEN json_extract(metadata, '$.suppressed_count') END), 0)
+                FROM activity_log
+                WHERE activity_type = 'log_suppressed' AND timestamp >= ?
+            """, (cutoff_iso,)).fetchone()[0]
+        
+        return {
+            'total_activities': sum(breakdown.values()),
+            'activity_breakdown': breakdown,
+            'error_count': breakdown.get('error', 0),
+            'performance_issues': performance_issues,
+            'suppressed_events': suppressed_events,
+            'time_range_hours': hours
+        }
+    
     def export_logs(self, format_type: str = 'json', 
                    hours: int = 24) -> Optional[str]:
         """Export logs in specified format"""
@@ -268,28 +304,40 @@ class LoggingUtils:
             self.log_error("log_export_error", f"Failed to export logs: {str(e)}")
             return None
     
-    def clear_old_logs(self, days_to_keep: int = 30):
-        """Clear old log entries to manage database size"""
+    def clear_old_logs(self, days_to_keep: int = 30, chunk_size: int = 5000):
+        """Clear old log entries to manage database size
+        
+        Rows are deleted in chunks, each in its own short transaction, so the
+        pipeline's writes are never held up behind one huge DELETE. Use
+        MaintenanceScheduler to archive rows instead of dropping them.
+        """
         try:
             cutoff_time = datetime.now().timestamp() - (days_to_keep * 24 * 3600)
             cutoff_iso = datetime.fromtimestamp(cutoff_time).isoformat()
             
-            with self._lock:
-                with sqlite3.connect(str(self.db_path)) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        DELETE FROM activity_log
-                        WHERE timestamp < ?
-                    """, (cutoff_iso,))
-                    
-                    deleted_count = cursor.rowcount
-                    conn.commit()
-                    
-                    self.log_activity(
-                        "maintenance",
-                        f"Cleared {deleted_count} old log entries",
-                        {"days_to_keep": days_to_keep, "deleted_count": deleted_count}
-                    )
+            deleted_count = 0
+            while True:
+                with self._lock:
+                    with self.pool.transaction() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("""
+                            DELETE FROM activity_log
+                            WHERE id IN (SELECT id FROM activity_log
+                                         WHERE timestamp < ?
+                                         ORDER BY timestamp LIMIT ?)
+                        """, (cutoff_iso, chunk_size))
+                        chunk_count = cursor.rowcount
+                deleted_count += chunk_count
+                if chunk_count < chunk_size:
+                    break
+            
+            self.log_activity(
+                "maintenance",
+                f"Cleared {deleted_count} old log entries",
+                {"days_to_keep": days_to_keep, "deleted_count": deleted_count}
+            )
+            return deleted_count
                     
         except Exception as e:
             self.log_error("log_cleanup_error", f"Failed to clear old logs: {str(e)}")
+            return 0
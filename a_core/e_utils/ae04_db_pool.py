@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# Pragmas applied to every connection handed out by a pool. WAL lets readers
+# keep working while the monitor thread writes, and synchronous=NORMAL is
+# durable across application crashes in WAL mode while only fsyncing at
+# checkpoints instead of on every commit.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,  # negative value is KiB, i.e. ~20 MB page cache
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+}
+
+# Pragmas applied before DEFAULT_PRAGMAS when the file is still empty.
+# auto_vacuum=INCREMENTAL lets MaintenanceScheduler return freed pages with
+# incremental_vacuum, but only takes effect before journal_mode=WAL and the
+# first table initialize the file; on an existing database it would wait
+# for the write lock and change nothing without a VACUUM.
+NEW_DATABASE_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+}
+
+# Size of sqlite3's per-connection prepared statement cache. Because the pool
+# keeps connections alive per thread, repeated queries with identical SQL text
+# are compiled once and reused.
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """Per-thread cached SQLite connections for a single database file"""
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, object]] = None,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        # Connections open lazily on each thread, so a relative path is
+        # pinned now rather than resolved against a later working directory
+        self.db_path = Path(db_path).resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._registry_lock = threading.Lock()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open and configure a new connection"""
+        # isolation_level=None puts the driver in autocommit mode so that
+        # transaction boundaries are controlled explicitly by transaction()
+        conn = sqlite3.connect(
+            str(self.db_path),
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if not conn.execute("PRAGMA page_count").fetchone()[0]:
+            for name, value in NEW_DATABASE_PRAGMAS.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _prune_dead_threads(self):
+        """Close connections owned by threads that have exited"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+            except Exception:
+                pass
+
+    def connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._registry_lock:
+                self._prune_dead_threads()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's connection for read-only statements"""
+        yield self.connection()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a single write transaction on this thread's connection
+
+        Nested calls on the same thread join the outermost transaction, so a
+        helper that opens its own transaction (for example activity logging)
+        never commits half of its caller's work.
+        """
+        conn = self.connection()
+        if self._local.depth > 0:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            try:
+                conn.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT (e.g. SQLITE_BUSY or a deferred constraint)
+                # can leave the transaction open on this thread's connection
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            self._local.depth = 0
+
+    def close_all(self):
+        """Close every connection owned by this pool"""
+        with self._registry_lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Get the shared pool for a database file, creating it if needed"""
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[key] = pool
+        return pool
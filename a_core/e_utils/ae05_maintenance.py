@@ -0,0 +1,252 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af04_content_store import delete_orphan_blobs
+
+
+class MaintenanceScheduler:
+    """Background retention, archiving and compaction for second_brain.db
+    
+    Every pass moves activity_log rows older than days_to_keep into gzip
+    JSONL files, one per month, in bounded chunks. Each chunk is written and
+    fsynced before its rows are deleted in their own short transaction, so
+    the writer lock is never held for long and a crash can at worst leave
+    a chunk in the archive twice. Once the application's tables have been
+    left alone for idle_seconds, orphaned content blobs are dropped, freed
+    pages are returned with incremental_vacuum and the planner statistics
+    refreshed. Freed pages are only returned on a database with
+    auto_vacuum=INCREMENTAL: new databases get it from the connection pool,
+    older ones take an explicit, offline enable_incremental_vacuum run.
+    Given a vector_storage, its tombstoned vectors are compacted away once
+    past its threshold, or whatever there are of them while idle, and its
+    index is retrained once it should be quantized or has outgrown its lists.
+    """
+    
+    def __init__(self, db_path: str = "./data/second_brain.db",
+                 archive_dir: str = "./data/archive", days_to_keep: int = 30,
+                 chunk_size: int = 2000, check_interval: float = 600,
+                 idle_seconds: float = 300, vacuum_pages: int = 2000,
+                 chunk_pause: float = 0.05, vector_storage=None):
+        self.db_path = Path(db_path)
+        self.archive_dir = Path(archive_dir)
+        self.days_to_keep = days_to_keep
+        self.chunk_size = chunk_size
+        self.check_interval = check_interval
+        self.idle_seconds = idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.chunk_pause = chunk_pause
+        self.vector_storage = vector_storage
+        self.pool = get_pool(str(self.db_path))
+        self.logger = LoggingUtils(str(self.db_path))
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._activity: Optional[Tuple[Any, ...]] = None
+        self._activity_since = time.monotonic()
+    
+    def start(self):
+        """Start the scheduler thread if it isn't running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the scheduler thread, letting a chunk in progress finish"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        """Run a maintenance pass every check_interval seconds"""
+        while not self._stop.wait(self.check_interval):
+            self.run_once()
+    
+    def run_once(self) -> Dict[str, Any]:
+        """Archive aged logs, then compact if the database is idle"""
+        result = {"archived": 0, "compacted": False, "vectors_removed": 0, "index_retrained": False}
+        try:
+            result["archived"] = self.archive_old_logs()
+            idle = self.is_idle()
+            if idle:
+                result.update(self.compact())
+                result["compacted"] = True
+            if self.vector_storage is not None:
+                compacted = self.vector_storage.maybe_compact(min_tombstones=1 if idle else None)
+                if compacted:
+                    result["vectors_removed"] = compacted["removed"]
+                result["index_retrained"] = self.vector_storage.maybe_retrain()
+        except Exception as e:
+            self.logger.log_activity(
+                "maintenance_error",
+                f"Database maintenance failed: {str(e)}",
+                {"error": str(e)}
+            )
+        return result
+    
+    def is_idle(self) -> bool:
+        """True when the application's tables haven't changed for idle_seconds"""
+        activity = self._activity_signature()
+        now = time.monotonic()
+        if activity != self._activity:
+            self._activity = activity
+            self._activity_since = now
+            return False
+        return now - self._activity_since >= self.idle_seconds
+    
+    def _activity_signature(self) -> Tuple[Any, ...]:
+        """Cheap fingerprint of application writes, leaving activity_log out
+        
+        The log pipeline commits the scheduler's own records too, so
+        PRAGMA data_version would count every maintenance pass as activity.
+        Row counts and status counts come from the rollup tables; the
+        indexed MAX lookups catch inserts and entity updates that leave the
+        counts alone.
+        """
+        conn = self.pool.connection()
+        try:
+            return (
+                tuple(conn.execute(
+                    "SELECT table_name, row_count FROM table_row_counts "
+                    "WHERE table_name != 'activity_log' ORDER BY table_name").fetchall()),
+                tuple(conn.execute(
+                    "SELECT status, file_count FROM file_status_counts ORDER BY status").fetchall()),
+                conn.execute("SELECT MAX(created_at) FROM file_analysis").fetchone()[0],
+                conn.execute("SELECT MAX(last_seen) FROM entities").fetchone()[0],
+            )
+        except sqlite3.OperationalError:
+            # Rollups only exist once DatabaseManager has migrated; until
+            # then fall back to any commit from another connection
+            return ("data_version", conn.execute("PRAGMA data_version").fetchone()[0])
+    
+    def archive_old_logs(self) -> int:
+        """Move activity_log rows past retention into monthly archives, chunk by chunk"""
+        cutoff_iso = (datetime.now() - timedelta(days=self.days_to_keep)).isoformat()
+        archived = 0
+        
+        while not self._stop.is_set():
+            with self.pool.read() as conn:
+                rows = conn.execute("""
+                    SELECT id, activity_type, description, metadata, timestamp
+                    FROM activity_log
+                    WHERE timestamp < ?
+                    ORDER BY timestamp, id
+                    LIMIT ?
+                """, (cutoff_iso, self.chunk_size)).fetchall()
+            if not rows:
+                break
+            
+            by_month: Dict[str, List[Dict[str, Any]]] = {}
+            for row in rows:
+                by_month.setdefault(str(row[4])[:7], []).append({
+                    'id': row[0],
+                    'activity_type': row[1],
+                    'description': row[2],
+                    'metadata': json.loads(row[3]) if row[3] else {},
+                    'timestamp': row[4]
+                })
+            for month, records in by_month.items():
+                self._append_archive(month, records)
+            
+            with self.pool.transaction() as conn:
+                conn.executemany("DELETE FROM activity_log WHERE id = ?", [(row[0],) for row in rows])
+            archived += len(rows)
+            
+            # Give the pipeline's writer a chance between chunks
+            time.sleep(self.chunk_pause)
+        
+        if archived:
+            self.logger.log_activity(
+                "maintenance",
+                f"Archived {archived} log entries older than {self.days_to_keep} days",
+                {"archived_count": archived, "days_to_keep": self.days_to_keep,
+                 "archive_dir": str(self.archive_dir)}
+            )
+        return archived
+    
+    def _append_archive(self, month: str, records: List[Dict[str, Any]]):
+        """Append records to the month's gzip JSONL archive and fsync it"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_dir / f"activity_log_{month}.jsonl.gz"
+        # Each append adds a gzip member; gzip.open reads them back as one stream
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                for record in records:
+                    archive.write((json.dumps(record, default=str) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+    
+    def compact(self) -> Dict[str, Any]:
+        """Drop orphaned blobs, release free pages and refresh planner statistics"""
+        conn = self.pool.connection()
+        
+        try:
+            with self.pool.transaction() as tx:
+                orphan_blobs = delete_orphan_blobs(tx.cursor())
+        except sqlite3.OperationalError:
+            # content_blobs only exists once DatabaseManager has migrated
+            orphan_blobs = 0
+        
+        # A no-op until enable_incremental_vacuum has converted an older file.
+        # Each step of the pragma frees one page and execute() only takes
+        # the first; executescript() runs it to completion
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum != 2:
+            self.logger.log_activity(
+                "maintenance",
+                f"{self.db_path} has auto_vacuum={auto_vacuum}, so incremental_vacuum releases no pages; "
+                f"run enable_incremental_vacuum while the app is stopped",
+                {"auto_vacuum": auto_vacuum},
+                level=logging.WARNING
+            )
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+        free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        
+        result = {"orphan_blobs": orphan_blobs, "pages_released": free_before - free_after}
+        self.logger.log_activity(
+            "maintenance",
+            f"Compacted database: released {result['pages_released']} pages",
+            result
+        )
+        return result
+
+
+def enable_incremental_vacuum(db_path: str = "./data/second_brain.db") -> bool:
+    """Switch db_path to auto_vacuum=INCREMENTAL; False if it already was
+    
+    The setting only takes effect on an existing database through a full
+    VACUUM, which rewrites the file and holds the writer lock throughout,
+    so run it while nothing else has the database open.
+    """
+    conn = get_pool(db_path).connection()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+if __name__ == "__main__":
+    # One-off conversion so idle passes can return freed pages:
+    #   python -m a_core.e_utils.ae05_maintenance ./data/second_brain.db
+    path = sys.argv[1] if len(sys.argv) > 1 else "./data/second_brain.db"
+    if enable_incremental_vacuum(path):
+        print(f"✅ {path} now uses auto_vacuum=INCREMENTAL")
+    else:
+        print(f"✅ {path} already uses auto_vacuum=INCREMENTAL")
@@ -0,0 +1,384 @@
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.e_utils.ae07_log_sampling import LogSampler, build_sampler_from_env
+from a_core.e_utils.ae08_metrics import get_registry
+
+# Queue-based backend for LoggingUtils. Callers only build a record and put
+# it on a bounded queue; a background thread drains the queue and hands
+# whole batches to the sinks, so the SQLite sink commits one transaction per
+# batch instead of one per event.
+
+# Records are plain tuples to keep the enqueue path cheap:
+# (level, activity_type, description, metadata, timestamp)
+LogRecord = Tuple[int, str, str, Optional[Dict[str, Any]], str]
+
+# What to do with a record when the queue is full
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.5
+# Upper bound on how long the "block" policy may stall a caller
+DEFAULT_BLOCK_TIMEOUT = 0.05
+
+INSERT_ACTIVITY_SQL = """
+    INSERT INTO activity_log (activity_type, description, metadata, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def level_for(activity_type: str) -> int:
+    """Default level of an activity type: ERROR for error types, INFO otherwise"""
+    return logging.ERROR if "error" in activity_type else logging.INFO
+
+
+def parse_level(value: Any) -> int:
+    """Accept a logging level as a number or a name such as 'WARNING'"""
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {value}")
+    return level
+
+
+class LogSink:
+    """Destination for batches of log records"""
+    
+    def __init__(self, level: int = logging.NOTSET):
+        self.level = level
+    
+    def accepts(self, record: LogRecord) -> bool:
+        """True if the record is at or above this sink's level"""
+        return record[0] >= self.level
+    
+    def write_batch(self, records: List[LogRecord]):
+        """Write a batch of records"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any resources held by the sink"""
+        pass
+
+
+class SQLiteSink(LogSink):
+    """Insert records into activity_log, one transaction per batch"""
+    
+    def __init__(self, db_path: str, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.pool = get_pool(db_path)
+    
+    def write_batch(self, records: List[LogRecord]):
+        """Insert a batch of records in a single transaction"""
+        rows = [
+            (activity_type, description, json.dumps(metadata, default=str) if metadata else None, timestamp)
+            for _, activity_type, description, metadata, timestamp in records
+        ]
+        with self.pool.transaction() as conn:
+            conn.executemany(INSERT_ACTIVITY_SQL, rows)
+
+
+class JSONLSink(LogSink):
+    """Append records as one JSON object per line"""
+    
+    def __init__(self, path: str, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+    
+    def write_batch(self, records: List[LogRecord]):
+        """Append a batch of records and flush the file once"""
+        self._file.write("".join(
+            json.dumps({
+                'timestamp': timestamp,
+                'level': logging.getLevelName(level),
+                'activity_type': activity_type,
+                'description': description,
+                'metadata': metadata or {}
+            }, default=str) + "\n"
+            for level, activity_type, description, metadata, timestamp in records
+        ))
+        self._file.flush()
+    
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class StdoutSink(LogSink):
+    """Print one compact line per record"""
+    
+    def __init__(self, level: int = logging.NOTSET, stream=None):
+        super().__init__(level)
+        self.stream = stream or sys.stdout
+    
+    def write_batch(self, records: List[LogRecord]):
+        """Print a batch of records with a single write"""
+        lines = []
+        for _, activity_type, description, metadata, timestamp in records:
+            line = f"[{timestamp}] {activity_type.upper()}: {description}"
+            if metadata:
+                line += f" {json.dumps(metadata, default=str)}"
+            lines.append(line + "\n")
+        self.stream.write("".join(lines))
+        self.stream.flush()
+
+
+class LogPipeline:
+    """Bounded queue of log records drained in batches by a background writer
+    
+    enqueue() never touches a sink. When the queue is full the overflow
+    policy decides what gives: "drop_newest" discards the incoming record,
+    "drop_oldest" discards the oldest queued one, and "block" waits up to
+    block_timeout for space before dropping. Drops are counted and reported
+    as a single log_dropped record with the next batch. flush() queues a
+    marker behind the current records and waits for the writer to reach it.
+    
+    With a sampler, records of sampled types are thinned out before they
+    are queued and the writer adds the sampler's log_suppressed summaries.
+    """
+    
+    def __init__(self, sinks: List[LogSink], level: int = logging.INFO,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, overflow: str = "drop_newest",
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 block_timeout: float = DEFAULT_BLOCK_TIMEOUT,
+                 sampler: Optional[LogSampler] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.sinks = sinks
+        self.level = level
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.sampler = sampler
+        
+        # deque appends and pops are atomic, so the enqueue path only takes
+        # the condition's lock when a full batch is ready for the writer
+        self._records: deque = deque()
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        metrics = get_registry()
+        metrics.gauge("log_queue_records", "Log records waiting for the writer").set_function(lambda: self.pending)
+        self._dropped_counter = metrics.counter("log_records_dropped_total", "Log records dropped on overflow")
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+    
+    @property
+    def pending(self) -> int:
+        """Records waiting in the queue"""
+        return len(self._records)
+    
+    @property
+    def dropped(self) -> int:
+        """Records dropped and not yet reported"""
+        return self._dropped
+    
+    def enqueue(self, record: LogRecord) -> bool:
+        """Queue a record for the sinks; False if it was filtered or dropped"""
+        if record[0] < self.level or self._closed:
+            return False
+        if self.sampler is not None and not self.sampler.sample(record[1]):
+            return False
+        
+        if len(self._records) >= self.queue_size:
+            if self.overflow == "drop_oldest":
+                try:
+                    oldest = self._records.popleft()
+                except IndexError:
+                    oldest = None
+                if isinstance(oldest, threading.Event):
+                    # A flush marker; everything queued before it is gone already
+                    oldest.set()
+                else:
+                    self._count_drop()
+            elif self.overflow != "block" or not self._wait_for_space():
+                self._count_drop()
+                return False
+        
+        self._records.append(record)
+        # The writer drains everything once awake, so one nudge per batch is enough
+        if len(self._records) == self.batch_size:
+            with self._wakeup:
+                self._wakeup.notify()
+        return True
+    
+    def _wait_for_space(self) -> bool:
+        """Wait up to block_timeout for the queue to drop below its limit"""
+        deadline = time.monotonic() + self.block_timeout
+        with self._wakeup:
+            self._wakeup.notify()
+        while len(self._records) >= self.queue_size:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+    
+    def _count_drop(self):
+        """Count one dropped record"""
+        with self._dropped_lock:
+            self._dropped += 1
+        self._dropped_counter.inc()
+    
+    def _run(self):
+        """Drain the queue in batches until closed and empty"""
+        while True:
+            with self._wakeup:
+                if len(self._records) < self.batch_size and not self._closed:
+                    # Let a partial batch fill up a little before writing it
+                    self._wakeup.wait(self.flush_interval)
+            
+            while True:
+                batch, marker = self._take_batch()
+                if batch:
+                    self._write(batch)
+                if marker is not None:
+                    marker.set()
+                elif not batch:
+                    break
+            
+            if self._closed and not self._records:
+                return
+    
+    def _take_batch(self) -> Tuple[List[LogRecord], Optional[threading.Event]]:
+        """Pop up to batch_size records, stopping early at a flush marker"""
+        batch = []
+        marker = None
+        while len(batch) < self.batch_size:
+            try:
+                record = self._records.popleft()
+            except IndexError:
+                break
+            if isinstance(record, threading.Event):
+                marker = record
+                break
+            batch.append(record)
+        
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            batch.append((
+                logging.WARNING, "log_dropped",
+                f"Dropped {dropped} log records, queue full",
+                {"dropped_count": dropped, "queue_size": self.queue_size, "overflow": self.overflow},
+                datetime.now().isoformat()
+            ))
+        if self.sampler is not None:
+            batch.extend(self.sampler.collect_summaries(force=self._closed))
+        return batch, marker
+    
+    def _write(self, batch: List[LogRecord]):
+        """Hand a batch to every sink; one failing sink doesn't stop the others"""
+        for sink in self.sinks:
+            records = [record for record in batch if sink.accepts(record)]
+            if not records:
+                continue
+            try:
+                sink.write_batch(records)
+            except Exception as e:
+                print(f"[{datetime.now().isoformat()}] LOGGING_ERROR: {type(sink).__name__} "
+                      f"failed to write {len(records)} records: {str(e)}", file=sys.stderr)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every record queued so far has been written"""
+        if not self._thread.is_alive():
+            return not self._records
+        marker = threading.Event()
+        self._records.append(marker)
+        with self._wakeup:
+            self._wakeup.notify()
+        return marker.wait(timeout)
+    
+    def close(self, timeout: Optional[float] = 5.0):
+        """Write what is queued, stop the writer and close the sinks"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._wakeup:
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
+
+
+def build_pipeline_from_env(db_path: str) -> LogPipeline:
+    """Build a pipeline configured from LOG_* environment variables
+    
+    LOG_SINKS is a comma-separated subset of sqlite, jsonl and stdout
+    (default "sqlite,stdout"). LOG_LEVEL sets the pipeline's minimum level
+    and LOG_STDOUT_LEVEL the console's. LOG_JSONL_PATH, LOG_QUEUE_SIZE,
+    LOG_OVERFLOW and LOG_BATCH_SIZE tune the rest. Sampling is set up by
+    build_sampler_from_env.
+    """
+    sinks: List[LogSink] = []
+    for name in os.getenv("LOG_SINKS", "sqlite,stdout").split(","):
+        name = name.strip().lower()
+        if name == "sqlite":
+            sinks.append(SQLiteSink(db_path))
+        elif name == "jsonl":
+            sinks.append(JSONLSink(os.getenv("LOG_JSONL_PATH", "./data/logs/activity.jsonl")))
+        elif name == "stdout":
+            sinks.append(StdoutSink(parse_level(os.getenv("LOG_STDOUT_LEVEL", "INFO"))))
+        elif name:
+            raise ValueError(f"Unknown log sink: {name}")
+    
+    return LogPipeline(
+        sinks,
+        level=parse_level(os.getenv("LOG_LEVEL", "INFO")),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))),
+        overflow=os.getenv("LOG_OVERFLOW", "drop_newest"),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))),
+        sampler=build_sampler_from_env()
+    )
+
+
+_pipelines: Dict[str, LogPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_log_pipeline(db_path: str) -> LogPipeline:
+    """Get the shared pipeline for a database file, creating it if needed"""
+    key = str(Path(db_path).resolve())
+    with _pipelines_lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            pipeline = build_pipeline_from_env(db_path)
+            _pipelines[key] = pipeline
+        return pipeline
+
+
+def set_log_pipeline(db_path: str, pipeline: LogPipeline) -> Optional[LogPipeline]:
+    """Replace the shared pipeline for a database file, returning the old one"""
+    key = str(Path(db_path).resolve())
+    with _pipelines_lock:
+        previous = _pipelines.get(key)
+        _pipelines[key] = pipeline
+        return previous
+
+
+@atexit.register
+def close_log_pipelines():
+    """Write out every queued record before the interpreter exits"""
+    with _pipelines_lock:
+        pipelines = list(_pipelines.values())
+    for pipeline in pipelines:
+        pipeline.close()
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Per-activity-type sampling for the logging pipeline. High-frequency types
+# such as file_processed are logged in full for the first few events of each
+# window, then 1-in-K, and never more than max_per_window times per window.
+# Whatever was held back is reported as one log_suppressed record per type
+# and window, so the log grows with elapsed time rather than file count.
+
+# Types emitted once per file by the monitor pipeline
+HIGH_FREQUENCY_TYPES = (
+    "file_processed",
+    "embedding_stored",
+    "ai_analysis_complete",
+    "context_updated",
+    "unsupported_format",
+)
+
+
+class SamplingRule:
+    """How many events of one activity type to keep per window"""
+    
+    def __init__(self, first_n: int = 20, every_k: int = 100,
+                 max_per_window: int = 50, window_seconds: float = 60.0):
+        self.first_n = first_n
+        self.every_k = max(1, every_k)
+        self.max_per_window = max(first_n, max_per_window)
+        self.window_seconds = window_seconds
+
+
+class LogSampler:
+    """Decide per event whether it is logged and summarize the rest"""
+    
+    def __init__(self, rules: Dict[str, SamplingRule]):
+        self.rules = rules
+        self._lock = threading.Lock()
+        # activity_type -> [window_start, seen, logged, suppressed]
+        self._windows: Dict[str, list] = {}
+        # activity_type -> [seen, suppressed] since the sampler started
+        self._totals: Dict[str, list] = {}
+    
+    def sample(self, activity_type: str) -> bool:
+        """Count an event and return True if it should be logged"""
+        rule = self.rules.get(activity_type)
+        if rule is None:
+            return True
+        
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(activity_type)
+            if window is None:
+                window = self._windows[activity_type] = [now, 0, 0, 0]
+                self._totals[activity_type] = [0, 0]
+            elif now - window[0] >= rule.window_seconds and not window[3]:
+                # Nothing to report for the old window; just start a new one.
+                # Windows with suppressed events are rolled by collect_summaries
+                window[:] = [now, 0, 0, 0]
+            
+            window[1] += 1
+            self._totals[activity_type][0] += 1
+            seen = window[1]
+            keep = window[2] < rule.max_per_window and (
+                seen <= rule.first_n or (seen - rule.first_n) % rule.every_k == 0
+            )
+            if keep:
+                window[2] += 1
+            else:
+                window[3] += 1
+                self._totals[activity_type][1] += 1
+            return keep
+    
+    def collect_summaries(self, force: bool = False) -> List[tuple]:
+        """log_suppressed records for every finished window that held events back"""
+        now = time.monotonic()
+        wall_now = datetime.now()
+        summaries = []
+        with self._lock:
+            for activity_type, window in self._windows.items():
+                window_start, seen, _, suppressed = window
+                elapsed = now - window_start
+                if not suppressed or (elapsed < self.rules[activity_type].window_seconds and not force):
+                    continue
+                summaries.append((
+                    logging.INFO,
+                    "log_suppressed",
+                    f"Suppressed {suppressed} of {seen} {activity_type} events in the last {elapsed:.0f}s",
+                    {
+                        "activity_type": activity_type,
+                        "suppressed_count": suppressed,
+                        "seen_count": seen,
+                        "window_start": (wall_now - timedelta(seconds=elapsed)).isoformat(),
+                        "window_seconds": round(elapsed, 1)
+                    },
+                    wall_now.isoformat()
+                ))
+                window[:] = [now, 0, 0, 0]
+        return summaries
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Events seen and suppressed per sampled type since start"""
+        with self._lock:
+            return {
+                activity_type: {"seen": seen, "suppressed": suppressed}
+                for activity_type, (seen, suppressed) in self._totals.items()
+            }
+
+
+def build_sampler_from_env() -> Optional[LogSampler]:
+    """Build the sampler configured by LOG_SAMPLING* environment variables
+    
+    LOG_SAMPLING=off disables sampling. LOG_SAMPLED_TYPES overrides the
+    comma-separated list of sampled types, and LOG_SAMPLE_FIRST_N,
+    LOG_SAMPLE_EVERY_K, LOG_SAMPLE_MAX_PER_WINDOW and LOG_SAMPLE_WINDOW
+    tune the rule they share.
+    """
+    if os.getenv("LOG_SAMPLING", "on").strip().lower() in ("off", "0", "false", "no"):
+        return None
+    
+    types = os.getenv("LOG_SAMPLED_TYPES")
+    types = [t.strip() for t in types.split(",") if t.strip()] if types else HIGH_FREQUENCY_TYPES
+    rule = SamplingRule(
+        first_n=int(os.getenv("LOG_SAMPLE_FIRST_N", "20")),
+        every_k=int(os.getenv("LOG_SAMPLE_EVERY_K", "100")),
+        max_per_window=int(os.getenv("LOG_SAMPLE_MAX_PER_WINDOW", "50")),
+        window_seconds=float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+    )
+    return LogSampler({activity_type: rule for activity_type in types})
@@ -0,0 +1,367 @@
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# In-process metrics for the FileFlow pipeline: counters, gauges and
+# HDR-style latency histograms, exported in the Prometheus text format.
+# Every stage of FileMonitor.process_file records into
+# fileflow_stage_seconds{stage=...}.
+
+STAGE_SECONDS = "fileflow_stage_seconds"
+STAGE_ERRORS = "fileflow_stage_errors_total"
+
+# Quantiles exported for every histogram
+EXPORT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Histogram resolution: values are recorded in whole microseconds into
+# log-linear buckets with 2**(SUB_BUCKET_BITS - 1) sub-buckets per power of
+# two, which bounds the relative error of any quantile to about 6%
+SUB_BUCKET_BITS = 5
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_SUB_BUCKET_HALF = _SUB_BUCKET_COUNT >> 1
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> Labels:
+    """Hashable, ordered form of a label set"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value for the text format"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render labels as {name="value",...} for the text format"""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonically increasing count"""
+    
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        """Add amount to the counter"""
+        with self._lock:
+            self._value += amount
+    
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down, or be read from a callback"""
+    
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+    
+    def set(self, value: float):
+        """Set the gauge to value"""
+        self._value = float(value)
+    
+    def inc(self, amount: float = 1.0):
+        """Add amount to the gauge"""
+        with self._lock:
+            self._value += amount
+    
+    def dec(self, amount: float = 1.0):
+        """Subtract amount from the gauge"""
+        self.inc(-amount)
+    
+    def set_function(self, function: Callable[[], float]):
+        """Read the gauge from function at export time"""
+        self._function = function
+    
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return float("nan")
+        return self._value
+
+
+class Histogram:
+    """Latency histogram with log-linear buckets, recorded in seconds"""
+    
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self._count = 0
+        self._sum = 0.0
+        self._min = float("inf")
+        self._max = 0.0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _bucket_index(micros: int) -> int:
+        """Bucket of a value in microseconds"""
+        if micros < _SUB_BUCKET_COUNT:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS
+        return shift * _SUB_BUCKET_HALF + (micros >> shift)
+    
+    @staticmethod
+    def _bucket_bounds(index: int) -> Tuple[int, int]:
+        """[low, high) range of a bucket in microseconds"""
+        if index < _SUB_BUCKET_COUNT:
+            return index, index + 1
+        shift = index // _SUB_BUCKET_HALF - 1
+        mantissa = index - shift * _SUB_BUCKET_HALF
+        return mantissa << shift, (mantissa + 1) << shift
+    
+    def observe(self, seconds: float):
+        """Record one duration"""
+        index = self._bucket_index(max(0, int(seconds * 1_000_000)))
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self._count += 1
+            self._sum += seconds
+            if seconds < self._min:
+                self._min = seconds
+            if seconds > self._max:
+                self._max = seconds
+    
+    @property
+    def count(self) -> int:
+        return self._count
+    
+    @property
+    def sum(self) -> float:
+        return self._sum
+    
+    def quantiles(self, qs: Tuple[float, ...] = EXPORT_QUANTILES) -> Dict[float, float]:
+        """Estimate several quantiles in one pass over the buckets"""
+        with self._lock:
+            buckets = sorted(self._counts.items())
+            count, low, high = self._count, self._min, self._max
+        if not count:
+            return {q: float("nan") for q in qs}
+        
+        result = {}
+        targets = sorted((max(1, int(q * count + 0.5)), q) for q in qs)
+        seen = 0
+        position = 0
+        for index, bucket_count in buckets:
+            seen += bucket_count
+            while position < len(targets) and seen >= targets[position][0]:
+                bucket_low, bucket_high = self._bucket_bounds(index)
+                # Midpoint of the bucket, clamped to what was actually seen
+                estimate = (bucket_low + bucket_high) / 2 / 1_000_000
+                result[targets[position][1]] = min(max(estimate, low), high)
+                position += 1
+        return result
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Count, sum, mean, min, max and the exported quantiles"""
+        quantiles = self.quantiles()
+        count = self._count
+        return {
+            'count': count,
+            'sum': self._sum,
+            'mean': self._sum / count if count else float("nan"),
+            'min': self._min if count else float("nan"),
+            'max': self._max if count else float("nan"),
+            **{f"p{int(q * 100)}": value for q, value in quantiles.items()}
+        }
+
+
+class Timer:
+    """Time a block or a function into a histogram
+    
+    Usable as a context manager or a decorator. Exceptions are timed too,
+    and also counted in the matching *_errors_total counter with the same
+    labels. elapsed holds the calling thread's last measured duration.
+    """
+    
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, object]):
+        self.registry = registry
+        self.histogram = registry.histogram(name, **labels)
+        self.labels = labels
+        base = name[:-len("_seconds")] if name.endswith("_seconds") else name
+        self.error_counter_name = f"{base}_errors_total"
+        self._local = threading.local()
+    
+    def __enter__(self):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._local.starts.pop()
+        self._local.elapsed = elapsed
+        self.histogram.observe(elapsed)
+        if exc_type is not None:
+            self.registry.counter(self.error_counter_name, **self.labels).inc()
+        return False
+    
+    @property
+    def elapsed(self) -> Optional[float]:
+        """Duration of the calling thread's last completed timing, in seconds"""
+        return getattr(self._local, "elapsed", None)
+    
+    def __call__(self, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self:
+                return function(*args, **kwargs)
+        return wrapper
+
+
+class MetricsRegistry:
+    """Named, labelled counters, gauges and histograms"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[Tuple[str, int], ThreadingHTTPServer] = {}
+        # name -> (kind, help, {labels: metric})
+        self._families: Dict[str, Tuple[str, str, Dict[Labels, object]]] = {}
+    
+    def _get(self, kind: str, factory: Callable, name: str, description: str,
+             labels: Dict[str, object]):
+        """Get or create the metric for name and labels"""
+        key = _label_key(labels)
+        family = self._families.get(name)
+        if family is not None:
+            metric = family[2].get(key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, description, {})
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} is a {family[0]}, not a {kind}")
+            return family[2].setdefault(key, factory())
+    
+    def counter(self, name: str, description: str = "", **labels) -> Counter:
+        """Get or create a counter"""
+        return self._get("counter", Counter, name, description, labels)
+    
+    def gauge(self, name: str, description: str = "", **labels) -> Gauge:
+        """Get or create a gauge"""
+        return self._get("gauge", Gauge, name, description, labels)
+    
+    def histogram(self, name: str, description: str = "", **labels) -> Histogram:
+        """Get or create a latency histogram"""
+        return self._get("histogram", Histogram, name, description, labels)
+    
+    def time(self, name: str, **labels) -> Timer:
+        """Timer for a block or function, recorded into histogram name"""
+        return Timer(self, name, labels)
+    
+    def stage(self, stage: str) -> Timer:
+        """Timer for one FileFlow pipeline stage"""
+        return self.time(STAGE_SECONDS, stage=stage)
+    
+    def families(self) -> Iterator[Tuple[str, str, str, List[Tuple[Labels, object]]]]:
+        """(name, kind, help, [(labels, metric)]) for every metric family"""
+        with self._lock:
+            families = [(name, kind, description, list(metrics.items()))
+                        for name, (kind, description, metrics) in sorted(self._families.items())]
+        return iter(families)
+    
+    def histogram_snapshots(self, name: str = STAGE_SECONDS,
+                            label: str = "stage") -> Dict[str, Dict[str, float]]:
+        """Snapshots of one histogram family keyed by the value of label"""
+        family = self._families.get(name)
+        if family is None:
+            return {}
+        return {
+            dict(labels).get(label, ""): metric.snapshot()
+            for labels, metric in list(family[2].items())
+        }
+    
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format
+        
+        Histograms are exported as summaries: quantiles plus _sum and _count.
+        """
+        lines = []
+        for name, kind, description, metrics in self.families():
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {'summary' if kind == 'histogram' else kind}")
+            for labels, metric in metrics:
+                if kind == "histogram":
+                    for q, value in metric.quantiles().items():
+                        lines.append(f"{name}{_format_labels(labels, ('quantile', str(q)))} {value:.6g}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum:.6g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value:.6g}")
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str):
+        """Write the text format to path atomically, e.g. for node_exporter's textfile collector"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_text(self.render_prometheus(), encoding="utf-8")
+        os.replace(tmp, target)
+    
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the text format at http://host:port/metrics on a daemon thread
+        
+        Calling it again for the same address returns the running server.
+        """
+        with self._lock:
+            server = self._servers.get((host, port))
+        if server is not None:
+            return server
+        registry = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        with self._lock:
+            server = self._servers.get((host, port))
+            if server is None:
+                server = ThreadingHTTPServer((host, port), MetricsHandler)
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                self._servers[(host, port)] = server
+                # Port 0 binds a free port; remember the one actually bound
+                self._servers[(host, server.server_address[1])] = server
+        return server
+    
+    def reset(self):
+        """Drop every metric"""
+        with self._lock:
+            self._families.clear()
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return _registry
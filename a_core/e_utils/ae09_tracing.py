@@ -0,0 +1,377 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Any, Dict, Iterator, List, Optional
+
+from a_core.e_utils.ae04_db_pool import get_pool
+
+# Lightweight span tracing for the FileFlow pipeline. Each processed file is
+# one trace: a root process_file span with child spans for extraction, OCR,
+# OpenAI calls, vector storage and so on, each carrying attributes such as
+# bytes, pages, tokens and retries. Finished traces are written by a
+# background thread to a local store (SQLite by default, or JSONL), so no
+# collector is needed and the pipeline never waits on trace I/O.
+
+DEFAULT_SQLITE_PATH = "./data/traces.db"
+DEFAULT_JSONL_PATH = "./data/logs/traces.jsonl"
+DEFAULT_RETENTION_DAYS = 7
+
+# Prune expired traces after this many writes
+PRUNE_EVERY_WRITES = 500
+
+
+class Span:
+    """One timed operation within a trace"""
+    
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_time",
+                 "duration_ms", "status", "error", "attributes", "_trace_spans", "_start")
+    
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        if parent is None:
+            self.trace_id = os.urandom(8).hex()
+            self.parent_id = None
+            self._trace_spans: List["Span"] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self._trace_spans = parent._trace_spans
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.attributes = attributes
+    
+    def set_attribute(self, key: str, value: Any):
+        """Attach an attribute to the span"""
+        self.attributes[key] = value
+    
+    def set_attributes(self, **attributes):
+        """Attach several attributes to the span"""
+        self.attributes.update(attributes)
+    
+    def record_error(self, error: BaseException):
+        """Mark the span as failed, e.g. when the error is handled inside it"""
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form of the span"""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_time,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is off"""
+    
+    trace_id = None
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def set_attributes(self, **attributes):
+        pass
+    
+    def record_error(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanStore:
+    """Destination for finished traces"""
+    
+    def write_spans(self, spans: List[Dict[str, Any]]):
+        """Persist a batch of span dicts"""
+        raise NotImplementedError
+    
+    def recent_traces(self, limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Root spans of the most recent traces, newest first, optionally by root name"""
+        raise NotImplementedError
+    
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All spans of one trace, in start order"""
+        raise NotImplementedError
+    
+    def prune(self, days: float):
+        """Drop traces older than days"""
+        pass
+
+
+class SQLiteSpanStore(SpanStore):
+    """Spans in their own SQLite file, away from second_brain.db's writer lock"""
+    
+    def __init__(self, db_path: str = DEFAULT_SQLITE_PATH):
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trace_spans (
+                    span_id TEXT PRIMARY KEY,
+                    trace_id TEXT NOT NULL,
+                    parent_id TEXT,
+                    name TEXT NOT NULL,
+                    start_time REAL NOT NULL,
+                    duration_ms REAL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    attributes TEXT
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trace_spans_trace ON trace_spans(trace_id, start_time)")
+            # Only root spans are listed by recent_traces
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_trace_spans_roots
+                ON trace_spans(start_time) WHERE parent_id IS NULL
+            """)
+    
+    def write_spans(self, spans: List[Dict[str, Any]]):
+        """Insert a batch of spans in one transaction"""
+        with self.pool.transaction() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO trace_spans
+                    (span_id, trace_id, parent_id, name, start_time, duration_ms, status, error, attributes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                span['span_id'], span['trace_id'], span['parent_id'], span['name'],
+                span['start_time'], span['duration_ms'], span['status'], span['error'],
+                json.dumps(span['attributes'], default=str)
+            ) for span in spans])
+    
+    def _rows_to_dicts(self, rows) -> List[Dict[str, Any]]:
+        """Convert trace_spans rows to span dicts"""
+        return [{
+            'span_id': row[0],
+            'trace_id': row[1],
+            'parent_id': row[2],
+            'name': row[3],
+            'start_time': row[4],
+            'duration_ms': row[5],
+            'status': row[6],
+            'error': row[7],
+            'attributes': json.loads(row[8]) if row[8] else {}
+        } for row in rows]
+    
+    def recent_traces(self, limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Root spans of the most recent traces, newest first, optionally by root name"""
+        with self.pool.read() as conn:
+            rows = conn.execute("""
+                SELECT span_id, trace_id, parent_id, name, start_time, duration_ms, status, error, attributes
+                FROM trace_spans
+                WHERE parent_id IS NULL AND (? IS NULL OR name = ?)
+                ORDER BY start_time DESC
+                LIMIT ?
+            """, (name, name, limit)).fetchall()
+        return self._rows_to_dicts(rows)
+    
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All spans of one trace, in start order"""
+        with self.pool.read() as conn:
+            rows = conn.execute("""
+                SELECT span_id, trace_id, parent_id, name, start_time, duration_ms, status, error, attributes
+                FROM trace_spans
+                WHERE trace_id = ?
+                ORDER BY start_time
+            """, (trace_id,)).fetchall()
+        return self._rows_to_dicts(rows)
+    
+    def prune(self, days: float):
+        """Drop traces whose root started more than days ago"""
+        cutoff = time.time() - days * 86400
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                DELETE FROM trace_spans
+                WHERE trace_id IN (SELECT trace_id FROM trace_spans
+                                   WHERE parent_id IS NULL AND start_time < ?)
+            """, (cutoff,))
+
+
+class JSONLSpanStore(SpanStore):
+    """Spans appended to a JSONL file, one object per line
+    
+    Reads scan the whole file, so this suits short debugging sessions; use
+    the SQLite store for long-running monitoring.
+    """
+    
+    def __init__(self, path: str = DEFAULT_JSONL_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def write_spans(self, spans: List[Dict[str, Any]]):
+        """Append a batch of spans"""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(span, default=str) + "\n" for span in spans))
+    
+    def _iter_spans(self) -> Iterator[Dict[str, Any]]:
+        """Every span in the file"""
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def recent_traces(self, limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Root spans of the most recent traces, newest first, optionally by root name"""
+        roots = deque((
+            span for span in self._iter_spans()
+            if span['parent_id'] is None and (name is None or span['name'] == name)
+        ), maxlen=limit)
+        return sorted(roots, key=lambda span: span['start_time'], reverse=True)
+    
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All spans of one trace, in start order"""
+        spans = [span for span in self._iter_spans() if span['trace_id'] == trace_id]
+        return sorted(spans, key=lambda span: span['start_time'])
+
+
+class Tracer:
+    """Create spans and hand finished traces to a store in the background
+    
+    The current span is tracked in a context variable, so spans opened
+    anywhere below a root (in the same thread) become its children without
+    passing span objects around. A trace is queued for writing once its
+    root span ends.
+    """
+    
+    def __init__(self, store: Optional[SpanStore],
+                 retention_days: float = DEFAULT_RETENTION_DAYS):
+        self.store = store
+        self.retention_days = retention_days
+        self._current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+        self._queue: SimpleQueue = SimpleQueue()
+        self._writes = 0
+        self._thread: Optional[threading.Thread] = None
+        if store is not None:
+            self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+            self._thread.start()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+    
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Time a block as a span, a child of the current span if there is one"""
+        if self.store is None:
+            yield NOOP_SPAN
+            return
+        
+        parent = self._current.get()
+        span = Span(name, parent, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - span._start) * 1000, 3)
+            self._current.reset(token)
+            span._trace_spans.append(span)
+            if parent is None:
+                self._queue.put(span._trace_spans)
+    
+    def current_span(self):
+        """The innermost open span, or a no-op span outside any trace"""
+        return self._current.get() or NOOP_SPAN
+    
+    def annotate(self, **attributes):
+        """Attach attributes to the current span, if any"""
+        self.current_span().set_attributes(**attributes)
+    
+    def _run(self):
+        """Write finished traces, batching whatever has queued up"""
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get())
+            
+            markers = [item for item in batch if isinstance(item, threading.Event)]
+            spans = [span.to_dict() for item in batch if isinstance(item, list) for span in item]
+            try:
+                if spans:
+                    self.store.write_spans(spans)
+                    self._writes += 1
+                    if self._writes % PRUNE_EVERY_WRITES == 0:
+                        self.store.prune(self.retention_days)
+            except Exception as e:
+                print(f"TRACING_ERROR: Failed to write {len(spans)} spans: {str(e)}")
+            for marker in markers:
+                marker.set()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every finished trace so far has been written"""
+        if self._thread is None:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+
+def build_tracer_from_env() -> Tracer:
+    """Build a tracer configured by TRACE_* environment variables
+    
+    TRACE_STORE is sqlite (default), jsonl or off; TRACE_PATH overrides the
+    store's file and TRACE_RETENTION_DAYS how long SQLite keeps traces.
+    """
+    kind = os.getenv("TRACE_STORE", "sqlite").strip().lower()
+    path = os.getenv("TRACE_PATH")
+    if kind == "sqlite":
+        store = SQLiteSpanStore(path or DEFAULT_SQLITE_PATH)
+    elif kind == "jsonl":
+        store = JSONLSpanStore(path or DEFAULT_JSONL_PATH)
+    elif kind in ("off", "none", ""):
+        store = None
+    else:
+        raise ValueError(f"Unknown trace store: {kind}")
+    return Tracer(store, float(os.getenv("TRACE_RETENTION_DAYS", str(DEFAULT_RETENTION_DAYS))))
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer, creating it on first use"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = build_tracer_from_env()
+        return _tracer
+
+
+@atexit.register
+def flush_tracer():
+    """Write out finished traces before the interpreter exits"""
+    if _tracer is not None:
+        _tracer.flush(timeout=2.0)
+
+
+def set_tracer(tracer: Tracer) -> Optional[Tracer]:
+    """Replace the process-wide tracer, returning the old one"""
+    global _tracer
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+        return previous
@@ -0,0 +1,757 @@
+import sqlite3
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from a_core.e_utils.ae04_db_pool import ConnectionPool, get_pool
+from a_core.f_data.af04_content_store import backfill_content_blobs
+from a_core.f_data.af05_vector_codec import backfill_embedding_blobs
+from a_core.f_data.af06_vector_attributes import backfill_vector_attributes
+
+# Signature of a progress callback: (migration, last_id_done, max_id)
+ProgressCallback = Callable[["Migration", int, int], None]
+
+# Signature of a Python backfill step: (cursor, start_id, end_id)
+BackfillFunction = Callable[[sqlite3.Cursor, int, int], None]
+
+
+class Migration:
+    """One ordered, idempotent schema step for a database
+
+    statements run together in a single transaction. If backfill_table is
+    set, backfill_statements then run once per id range of that table, each
+    range in its own short transaction, with the range bounds bound to the
+    two parameters of every statement. backfill_function, if given, runs
+    after them in the same transaction for work SQL can't express (hashing,
+    compression). finalize_statements run once after the last chunk.
+    PRAGMA user_version is only bumped when all of it completed, so an
+    interrupted upgrade resumes from the last finished chunk without
+    re-running the schema statements.
+    """
+
+    def __init__(self, version: int, name: str, statements: List[str],
+                 backfill_table: Optional[str] = None,
+                 backfill_statements: Optional[List[str]] = None,
+                 finalize_statements: Optional[List[str]] = None,
+                 optional: bool = False,
+                 backfill_function: Optional[BackfillFunction] = None):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.backfill_table = backfill_table
+        self.backfill_statements = backfill_statements or []
+        self.finalize_statements = finalize_statements or []
+        self.backfill_function = backfill_function
+        # Optional steps (e.g. FTS5, which not every SQLite build ships) are
+        # skipped with a warning instead of blocking later migrations
+        self.optional = optional
+
+
+def activity_delete_rollup_trigger_sql(when: str = "") -> str:
+    """Trigger taking deleted activity_log rows out of the rollups, optionally guarded by a WHEN clause"""
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_activity_delete
+        AFTER DELETE ON activity_log {when} BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('activity_log', -1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count - 1;
+            INSERT INTO activity_hourly_counts (hour, activity_type, activity_count)
+            VALUES (COALESCE(strftime('%Y-%m-%dT%H:00:00', old.timestamp), substr(old.timestamp, 1, 13)),
+                    old.activity_type, -1)
+            ON CONFLICT(hour, activity_type) DO UPDATE SET activity_count = activity_count - 1;
+        END
+    """
+
+
+SECOND_BRAIN_MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline_schema", [
+        """
+        CREATE TABLE IF NOT EXISTS file_analysis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT UNIQUE NOT NULL,
+            original_name TEXT NOT NULL,
+            suggested_name TEXT NOT NULL,
+            content TEXT,
+            metadata TEXT,
+            entities TEXT,
+            confidence REAL,
+            reasoning TEXT,
+            vector_id TEXT,
+            event_type TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS entities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity_name TEXT UNIQUE NOT NULL,
+            variations TEXT,
+            usage_count INTEGER DEFAULT 1,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS document_context (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT NOT NULL,
+            entities TEXT,
+            content_summary TEXT,
+            keywords TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            metadata TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS processing_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT NOT NULL,
+            file_hash TEXT,
+            last_processed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_file_path ON file_analysis(file_path)",
+        "CREATE INDEX IF NOT EXISTS idx_status ON file_analysis(status)",
+        "CREATE INDEX IF NOT EXISTS idx_created_at ON file_analysis(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_type ON activity_log(activity_type)",
+        "CREATE INDEX IF NOT EXISTS idx_timestamp ON activity_log(timestamp)",
+    ]),
+
+    # Normalized file <-> entity links. The primary key serves file -> entities
+    # lookups, idx_file_entities_entity serves entity -> files; both covering.
+    Migration(2, "file_entities_join_table", [
+        """
+        CREATE TABLE IF NOT EXISTS file_entities (
+            file_id INTEGER NOT NULL REFERENCES file_analysis(id) ON DELETE CASCADE,
+            entity_id INTEGER NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+            PRIMARY KEY (file_id, entity_id)
+        ) WITHOUT ROWID
+        """,
+        # A b-tree over JSON text can't serve substring searches
+        "DROP INDEX IF EXISTS idx_entities",
+        "CREATE INDEX IF NOT EXISTS idx_file_entities_entity ON file_entities(entity_id, file_id)",
+        "CREATE INDEX IF NOT EXISTS idx_entities_usage ON entities(usage_count DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_entities_last_seen ON entities(last_seen)",
+    ],
+        backfill_table="file_analysis",
+        backfill_statements=[
+            # Entities missing from the entities table start at zero usage
+            # and are counted once all links exist
+            """
+            INSERT OR IGNORE INTO entities (entity_name, variations, usage_count)
+            SELECT DISTINCT je.value, '[]', 0
+            FROM file_analysis fa, json_each(fa.entities) je
+            WHERE fa.id > ? AND fa.id <= ? AND json_valid(fa.entities)
+            """,
+            """
+            INSERT OR IGNORE INTO file_entities (file_id, entity_id)
+            SELECT fa.id, e.id
+            FROM file_analysis fa, json_each(fa.entities) je
+            JOIN entities e ON e.entity_name = je.value
+            WHERE fa.id > ? AND fa.id <= ? AND json_valid(fa.entities)
+            """,
+        ],
+        finalize_statements=[
+            """
+            UPDATE entities
+            SET usage_count = (SELECT COUNT(*) FROM file_entities fe
+                               WHERE fe.entity_id = entities.id)
+            WHERE usage_count = 0
+            """,
+        ]
+    ),
+
+    # Full-text index over file_analysis plus the latest document_context
+    # keywords. rowid mirrors file_analysis.id and triggers keep it in sync.
+    Migration(3, "document_search_fts5", [
+        "CREATE INDEX IF NOT EXISTS idx_document_context_path ON document_context(file_path)",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS document_search USING fts5(
+            file_path UNINDEXED, suggested_name, content, keywords,
+            tokenize = 'porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_search_insert
+        AFTER INSERT ON file_analysis BEGIN
+            INSERT INTO document_search (rowid, file_path, suggested_name, content, keywords)
+            VALUES (new.id, new.file_path, new.suggested_name, COALESCE(new.content, ''),
+                    COALESCE((SELECT keywords FROM document_context
+                              WHERE file_path = new.file_path
+                              ORDER BY id DESC LIMIT 1), ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_search_update
+        AFTER UPDATE OF file_path, suggested_name, content ON file_analysis BEGIN
+            UPDATE document_search
+            SET file_path = new.file_path,
+                suggested_name = new.suggested_name,
+                content = COALESCE(new.content, '')
+            WHERE rowid = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_search_delete
+        AFTER DELETE ON file_analysis BEGIN
+            DELETE FROM document_search WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_search_keywords
+        AFTER INSERT ON document_context BEGIN
+            UPDATE document_search
+            SET keywords = COALESCE(new.keywords, '')
+            WHERE rowid = (SELECT id FROM file_analysis WHERE file_path = new.file_path);
+        END
+        """,
+    ],
+        backfill_table="file_analysis",
+        backfill_statements=[
+            # OR REPLACE: rows inserted by the trigger while the backfill runs
+            # are simply rewritten with identical content
+            """
+            INSERT OR REPLACE INTO document_search (rowid, file_path, suggested_name, content, keywords)
+            SELECT fa.id, fa.file_path, fa.suggested_name, COALESCE(fa.content, ''),
+                   COALESCE((SELECT keywords FROM document_context dc
+                             WHERE dc.file_path = fa.file_path
+                             ORDER BY dc.id DESC LIMIT 1), '')
+            FROM file_analysis fa
+            WHERE fa.id > ? AND fa.id <= ?
+            """,
+        ],
+        optional=True
+    ),
+
+    # Last-seen stat signature and content hash per file, so a rescan can
+    # skip unchanged files without reading them. WITHOUT ROWID keeps each
+    # lookup a single b-tree probe on the path.
+    Migration(4, "file_fingerprints", [
+        """
+        CREATE TABLE IF NOT EXISTS file_fingerprints (
+            file_path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER,
+            content_hash TEXT,
+            last_processed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+    ]),
+
+    # Indexes matching the keyset-paginated queries, so each page is a seek
+    # plus LIMIT rows in index order with no sort. The old single-column
+    # indexes are prefixes of the new ones and only cost write time.
+    Migration(5, "keyset_pagination_indexes", [
+        "DROP INDEX IF EXISTS idx_status",
+        "CREATE INDEX IF NOT EXISTS idx_file_analysis_status_created ON file_analysis(status, created_at, id)",
+        "DROP INDEX IF EXISTS idx_activity_type",
+        "CREATE INDEX IF NOT EXISTS idx_activity_type_timestamp ON activity_log(activity_type, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_entities_usage_id ON entities(usage_count, id)",
+        "DROP INDEX IF EXISTS idx_entities_usage",
+    ]),
+    # Trigger-maintained aggregates so dashboard counters are O(1) reads and
+    # activity charts read hourly buckets instead of raw log rows. Per-entity
+    # usage is already kept in entities.usage_count by the write-behind flush.
+    # activity_log can be large, so its rows are counted by a chunked
+    # backfill up to the last id that existed when the triggers were
+    # created; later rows are counted by the insert trigger. Until the
+    # backfill is done, deleting a row it hasn't reached yet leaves the
+    # rollups alone, since that row was never added to them.
+    Migration(6, "aggregate_rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS table_row_counts (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS file_status_counts (
+            status TEXT PRIMARY KEY,
+            file_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activity_hourly_counts (
+            hour TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            activity_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, activity_type)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_file_analysis_insert
+        AFTER INSERT ON file_analysis BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('file_analysis', 1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+            INSERT INTO file_status_counts (status, file_count) VALUES (COALESCE(new.status, 'pending'), 1)
+            ON CONFLICT(status) DO UPDATE SET file_count = file_count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_file_analysis_delete
+        AFTER DELETE ON file_analysis BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('file_analysis', -1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count - 1;
+            INSERT INTO file_status_counts (status, file_count) VALUES (COALESCE(old.status, 'pending'), -1)
+            ON CONFLICT(status) DO UPDATE SET file_count = file_count - 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_file_analysis_status
+        AFTER UPDATE OF status ON file_analysis
+        WHEN old.status IS NOT new.status BEGIN
+            INSERT INTO file_status_counts (status, file_count) VALUES (COALESCE(old.status, 'pending'), -1)
+            ON CONFLICT(status) DO UPDATE SET file_count = file_count - 1;
+            INSERT INTO file_status_counts (status, file_count) VALUES (COALESCE(new.status, 'pending'), 1)
+            ON CONFLICT(status) DO UPDATE SET file_count = file_count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_entities_insert
+        AFTER INSERT ON entities BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('entities', 1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_entities_delete
+        AFTER DELETE ON entities BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('entities', -1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count - 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_activity_insert
+        AFTER INSERT ON activity_log BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('activity_log', 1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+            INSERT INTO activity_hourly_counts (hour, activity_type, activity_count)
+            VALUES (COALESCE(strftime('%Y-%m-%dT%H:00:00', new.timestamp), substr(new.timestamp, 1, 13)),
+                    new.activity_type, 1)
+            ON CONFLICT(hour, activity_type) DO UPDATE SET activity_count = activity_count + 1;
+        END
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activity_rollup_seed (
+            max_id INTEGER NOT NULL,
+            done_id INTEGER NOT NULL
+        )
+        """,
+        "INSERT INTO activity_rollup_seed (max_id, done_id) SELECT COALESCE(MAX(id), 0), 0 FROM activity_log",
+        activity_delete_rollup_trigger_sql(
+            "WHEN NOT EXISTS (SELECT 1 FROM activity_rollup_seed WHERE old.id > done_id AND old.id <= max_id)"
+        ),
+        # Seed from existing rows; the triggers above are created in the same
+        # transaction, so no write can slip in between
+        """
+        INSERT OR REPLACE INTO table_row_counts (table_name, row_count)
+        SELECT 'file_analysis', COUNT(*) FROM file_analysis
+        UNION ALL SELECT 'entities', COUNT(*) FROM entities
+        """,
+        """
+        INSERT OR REPLACE INTO file_status_counts (status, file_count)
+        SELECT COALESCE(status, 'pending'), COUNT(*) FROM file_analysis
+        GROUP BY COALESCE(status, 'pending')
+        """,
+    ],
+        backfill_table="activity_log",
+        backfill_statements=[
+            """
+            INSERT INTO table_row_counts (table_name, row_count)
+            SELECT 'activity_log', COUNT(*) FROM activity_log
+            WHERE id > ? AND id <= ? AND id <= (SELECT max_id FROM activity_rollup_seed)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + excluded.row_count
+            """,
+            """
+            INSERT INTO activity_hourly_counts (hour, activity_type, activity_count)
+            SELECT COALESCE(strftime('%Y-%m-%dT%H:00:00', timestamp), substr(timestamp, 1, 13)) AS hour,
+                   activity_type, COUNT(*)
+            FROM activity_log
+            WHERE id > ? AND id <= ? AND id <= (SELECT max_id FROM activity_rollup_seed)
+            GROUP BY hour, activity_type
+            ON CONFLICT(hour, activity_type) DO UPDATE SET activity_count = activity_count + excluded.activity_count
+            """,
+            # Only the chunk's end is needed; ?2 still takes both range bounds
+            "UPDATE activity_rollup_seed SET done_id = ?2",
+        ],
+        finalize_statements=[
+            "DROP TRIGGER IF EXISTS trg_rollup_activity_delete",
+            activity_delete_rollup_trigger_sql(),
+            "DROP TABLE IF EXISTS activity_rollup_seed",
+        ]
+    ),
+
+    # Document text moves out of file_analysis in migration 8, and SQL
+    # triggers can't read the compressed blobs, so DatabaseManager writes
+    # document_search rows itself. Only renames are still mirrored by a
+    # trigger. Must run before migration 8 nulls file_analysis.content.
+    Migration(7, "document_search_explicit_content", [
+        # Fails, and skips this optional step, when FTS5 was never set up
+        "SELECT 1 FROM document_search LIMIT 0",
+        "DROP TRIGGER IF EXISTS trg_document_search_insert",
+        "DROP TRIGGER IF EXISTS trg_document_search_update",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_search_rename
+        AFTER UPDATE OF file_path, suggested_name ON file_analysis BEGIN
+            UPDATE document_search
+            SET file_path = new.file_path,
+                suggested_name = new.suggested_name
+            WHERE rowid = new.id;
+        END
+        """,
+    ],
+        optional=True
+    ),
+
+    # Extracted text is stored once per distinct SHA-256 in content_blobs,
+    # zlib-compressed when that helps; file_analysis and document_context
+    # keep only the hash
+    Migration(8, "content_blobs", [
+        """
+        CREATE TABLE IF NOT EXISTS content_blobs (
+            content_hash TEXT PRIMARY KEY,
+            encoding TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        """,
+        "ALTER TABLE file_analysis ADD COLUMN content_hash TEXT",
+        "ALTER TABLE document_context ADD COLUMN content_hash TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_file_analysis_content_hash ON file_analysis(content_hash)",
+    ],
+        backfill_table="file_analysis",
+        backfill_function=backfill_content_blobs
+    ),
+
+    # The hourly activity buckets are history: retention archives or clears
+    # old activity_log rows, and the charts should still show those hours.
+    # Deletes now only keep the live row count in step.
+    Migration(9, "keep_activity_history_on_delete", [
+        "DROP TRIGGER IF EXISTS trg_rollup_activity_delete",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_activity_delete
+        AFTER DELETE ON activity_log BEGIN
+            INSERT INTO table_row_counts (table_name, row_count) VALUES ('activity_log', -1)
+            ON CONFLICT(table_name) DO UPDATE SET row_count = row_count - 1;
+        END
+        """,
+    ]),
+
+    # document_context rows also hold blobs, so the orphan sweep probes
+    # this column once per blob
+    Migration(10, "document_context_content_hash_index", [
+        "CREATE INDEX IF NOT EXISTS idx_document_context_content_hash ON document_context(content_hash)",
+    ]),
+]
+
+
+# (attribute, value) -> row ids, for filtered vector search; the row index
+# serves deletes of one row's attributes
+VECTOR_ATTRIBUTES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS vector_attributes (
+        attribute TEXT NOT NULL,
+        value TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        PRIMARY KEY (attribute, value, row_id)
+    ) WITHOUT ROWID
+"""
+VECTOR_ATTRIBUTES_ROW_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_vector_attributes_row ON vector_attributes(row_id)"
+)
+
+# Rows deleted or superseded but still held by the FAISS/IVF index or the
+# mmap matrix; searches skip them until VectorStorage.compact drops them
+VECTOR_TOMBSTONES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS vector_tombstones (
+        row_id INTEGER PRIMARY KEY,
+        deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def retire_superseded_vectors_sql(table: str) -> List[str]:
+    """Tombstone every document but the newest per file_path
+
+    Before upserts each re-analysis of a file stored another document; the
+    one holding the file's highest row id is kept, with all of its chunks.
+    """
+    document = "COALESCE(json_extract({0}.metadata, '$.parent_id'), {0}.vector_id)"
+    return [
+        f"""
+        INSERT OR IGNORE INTO vector_tombstones (row_id)
+        SELECT r.id FROM {table} r
+        JOIN vector_attributes a ON a.attribute = 'file_path' AND a.row_id = r.id
+        JOIN (
+            SELECT value, MAX(row_id) AS newest FROM vector_attributes
+            WHERE attribute = 'file_path' GROUP BY value
+        ) latest ON latest.value = a.value
+        JOIN {table} n ON n.id = latest.newest
+        WHERE {document.format('r')} != {document.format('n')}
+        """,
+        "DELETE FROM vector_attributes WHERE row_id IN (SELECT row_id FROM vector_tombstones)",
+    ]
+
+
+# vectors.db of VectorStorage's SQLite fallback, versioned on its own
+VECTOR_DB_MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline_vectors", [
+        """
+        CREATE TABLE IF NOT EXISTS vectors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vector_id TEXT UNIQUE,
+            embedding BLOB,
+            content TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+
+    # JSON text embeddings become packed little-endian float32 blobs. Older
+    # tables declare the column TEXT, whose affinity stores blobs unchanged,
+    # so the rows are rewritten in place without rebuilding the table
+    Migration(2, "float32_embeddings", [],
+        backfill_table="vectors",
+        backfill_function=backfill_embedding_blobs
+    ),
+
+    # Filterable metadata for pre-filtered search (see af06_vector_attributes),
+    # indexed from the metadata JSON of existing rows
+    Migration(3, "vector_attributes", [
+        VECTOR_ATTRIBUTES_TABLE_SQL,
+        VECTOR_ATTRIBUTES_ROW_INDEX_SQL,
+        "CREATE INDEX IF NOT EXISTS idx_vectors_created ON vectors(created_at)",
+    ],
+        backfill_table="vectors",
+        backfill_function=backfill_vector_attributes("vectors")
+    ),
+
+    # Deletes and upserts tombstone rows instead of rewriting the index
+    # files; copies of a file from repeated analyses are retired right away
+    Migration(4, "vector_tombstones",
+        [VECTOR_TOMBSTONES_TABLE_SQL] + retire_superseded_vectors_sql("vectors")
+    ),
+]
+
+
+# metadata.db of VectorStorage's FAISS backend, versioned on its own
+FAISS_METADATA_MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline_vector_metadata", [
+        """
+        CREATE TABLE IF NOT EXISTS vector_metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vector_id TEXT UNIQUE,
+            content TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+
+    # vector_metadata.id becomes the FAISS id (IndexIDMap2), and each row
+    # keeps its float32 embedding so the index can be rebuilt from the table.
+    # Rows written before this are filled in from the old positional index
+    # by VectorStorage when it upgrades that index
+    Migration(2, "vector_metadata_embeddings", [
+        "ALTER TABLE vector_metadata ADD COLUMN embedding BLOB",
+    ]),
+
+    # Same side index as migration 3 of VECTOR_DB_MIGRATIONS
+    Migration(3, "vector_attributes", [
+        VECTOR_ATTRIBUTES_TABLE_SQL,
+        VECTOR_ATTRIBUTES_ROW_INDEX_SQL,
+        "CREATE INDEX IF NOT EXISTS idx_vector_metadata_created ON vector_metadata(created_at)",
+    ],
+        backfill_table="vector_metadata",
+        backfill_function=backfill_vector_attributes("vector_metadata")
+    ),
+
+    # Same as migration 4 of VECTOR_DB_MIGRATIONS
+    Migration(4, "vector_tombstones",
+        [VECTOR_TOMBSTONES_TABLE_SQL] + retire_superseded_vectors_sql("vector_metadata")
+    ),
+]
+
+
+class MigrationRunner:
+    """Apply pending migrations to a database, tracked with PRAGMA user_version"""
+
+    # Serializes runners within this process; other processes are held off by
+    # BEGIN IMMEDIATE and see the bumped user_version when they get the lock
+    _run_lock = threading.Lock()
+
+    def __init__(self, pool: ConnectionPool,
+                 migrations: Optional[List[Migration]] = None,
+                 batch_size: int = 1000, logger=None,
+                 progress_callback: Optional[ProgressCallback] = None):
+        self.pool = pool
+        self.migrations = sorted(migrations or SECOND_BRAIN_MIGRATIONS, key=lambda m: m.version)
+        self.batch_size = batch_size
+        self.logger = logger
+        self.progress_callback = progress_callback
+
+    @property
+    def latest_version(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    def current_version(self) -> int:
+        """Read the schema version stored in the database header"""
+        with self.pool.read() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def run(self, target_version: Optional[int] = None) -> int:
+        """Apply every migration up to target_version and return the new version"""
+        target = self.latest_version if target_version is None else target_version
+        version = self.current_version()
+        if version >= target:
+            return version
+
+        with self._run_lock:
+            self._ensure_progress_table()
+            for migration in self.migrations:
+                if migration.version > target:
+                    break
+                # Re-read each time: another process may have moved it on
+                if migration.version <= self.current_version():
+                    continue
+                self._apply(migration)
+
+        return self.current_version()
+
+    def _ensure_progress_table(self):
+        """Create the table that checkpoints chunked backfills"""
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_backfill_progress (
+                    version INTEGER PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            """)
+
+    def _apply(self, migration: Migration):
+        """Apply one migration's schema statements, backfill and version bump"""
+        self._log(
+            "schema_migration_started",
+            f"Applying schema migration {migration.version}: {migration.name}",
+            {"version": migration.version, "name": migration.name}
+        )
+
+        try:
+            with self.pool.transaction() as conn:
+                # A checkpoint row means the schema statements already
+                # committed and a backfill was interrupted part way
+                resumed = conn.execute(
+                    "SELECT 1 FROM schema_backfill_progress WHERE version = ?",
+                    (migration.version,)
+                ).fetchone() is not None
+                if not resumed:
+                    for statement in migration.statements:
+                        conn.execute(statement)
+                    if migration.backfill_table:
+                        conn.execute(
+                            "INSERT INTO schema_backfill_progress (version, last_id) VALUES (?, 0)",
+                            (migration.version,)
+                        )
+        except Exception as e:
+            if not migration.optional:
+                raise
+            self._log(
+                "schema_migration_skipped",
+                f"Skipped optional schema migration {migration.version}: {str(e)}",
+                {"version": migration.version, "name": migration.name, "error": str(e)}
+            )
+            self._set_version(migration.version)
+            return
+
+        if migration.backfill_table:
+            self._run_backfill(migration)
+
+        self._set_version(migration.version)
+        self._log(
+            "schema_migration_applied",
+            f"Applied schema migration {migration.version}: {migration.name}",
+            {"version": migration.version, "name": migration.name}
+        )
+
+    def _run_backfill(self, migration: Migration):
+        """Run a migration's backfill in id-range chunks, one transaction each"""
+        with self.pool.read() as conn:
+            row = conn.execute(
+                "SELECT last_id FROM schema_backfill_progress WHERE version = ?",
+                (migration.version,)
+            ).fetchone()
+            start_id = row[0] if row else 0
+            max_id = conn.execute(
+                f"SELECT COALESCE(MAX(id), 0) FROM {migration.backfill_table}"
+            ).fetchone()[0]
+
+        while start_id < max_id:
+            end_id = min(start_id + self.batch_size, max_id)
+            with self.pool.transaction() as conn:
+                for statement in migration.backfill_statements:
+                    conn.execute(statement, (start_id, end_id))
+                if migration.backfill_function:
+                    migration.backfill_function(conn.cursor(), start_id, end_id)
+                conn.execute("""
+                    INSERT INTO schema_backfill_progress (version, last_id) VALUES (?, ?)
+                    ON CONFLICT(version) DO UPDATE SET last_id = excluded.last_id
+                """, (migration.version, end_id))
+            start_id = end_id
+            if self.progress_callback:
+                self.progress_callback(migration, end_id, max_id)
+
+        with self.pool.transaction() as conn:
+            for statement in migration.finalize_statements:
+                conn.execute(statement)
+            conn.execute("DELETE FROM schema_backfill_progress WHERE version = ?",
+                         (migration.version,))
+
+        if max_id:
+            self._log(
+                "schema_backfill_complete",
+                f"Backfilled {migration.backfill_table} rows up to id {max_id} "
+                f"for migration {migration.version}",
+                {"version": migration.version, "max_id": max_id}
+            )
+
+    def _set_version(self, version: int):
+        """Record the schema version in the database header"""
+        with self.pool.transaction() as conn:
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def _log(self, activity_type: str, description: str, metadata: Dict[str, Any]):
+        if self.logger:
+            self.logger.log_activity(activity_type, description, metadata)
+
+
+def run_migrations(db_path: str, target_version: Optional[int] = None, logger=None,
+                   progress_callback: Optional[ProgressCallback] = None) -> int:
+    """Bring second_brain.db at db_path up to date and return its schema version"""
+    runner = MigrationRunner(
+        get_pool(db_path), logger=logger, progress_callback=progress_callback
+    )
+    return runner.run(target_version)
+
+
+def _print_progress(migration: Migration, last_id: int, max_id: int):
+    percent = 100.0 * last_id / max_id if max_id else 100.0
+    print(f"  migration {migration.version} ({migration.name}): "
+          f"{last_id}/{max_id} rows ({percent:.1f}%)")
+
+
+if __name__ == "__main__":
+    # Offline upgrade with progress output:
+    #   python -m a_core.f_data.af02_migrations ./data/second_brain.db
+    path = sys.argv[1] if len(sys.argv) > 1 else "./data/second_brain.db"
+    version = run_migrations(path, progress_callback=_print_progress)
+    print(f"✅ {path} is at schema version {version}")
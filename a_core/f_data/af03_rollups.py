@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# Readers for the rollup tables created by migration 6 (aggregate_rollups).
+# Triggers keep the tables in step with every insert, update and delete, so
+# dashboard numbers are a handful of primary-key lookups instead of scans.
+# The hourly activity buckets are the exception: since migration 9 they keep
+# counting activity_log rows that retention archived or cleared.
+
+# Bucket keys use the same ISO layout as activity_log.timestamp so they can
+# be compared against isoformat() cutoffs as plain strings
+HOUR_BUCKET_FORMAT = "%Y-%m-%dT%H:00:00"
+
+ROW_COUNT_TABLES = ("file_analysis", "entities", "activity_log")
+
+
+def hour_bucket(moment: datetime) -> str:
+    """Truncate a datetime to the key of its hourly bucket"""
+    return moment.strftime(HOUR_BUCKET_FORMAT)
+
+
+def cutoff_bucket(days: Optional[float]) -> Optional[str]:
+    """First hourly bucket inside a window of the last days (None = all time)
+
+    Buckets are whole hours, so the window is widened to the start of the
+    hour it begins in.
+    """
+    if days is None:
+        return None
+    return hour_bucket(datetime.now() - timedelta(days=days))
+
+
+def read_row_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Row counts of the tracked tables"""
+    counts = {table: 0 for table in ROW_COUNT_TABLES}
+    for table_name, row_count in conn.execute("SELECT table_name, row_count FROM table_row_counts"):
+        counts[table_name] = row_count
+    return counts
+
+
+def read_status_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Number of analysed files in each review status"""
+    return dict(conn.execute(
+        "SELECT status, file_count FROM file_status_counts WHERE file_count > 0"
+    ).fetchall())
+
+
+def read_activity_breakdown(conn: sqlite3.Connection, days: Optional[float]) -> Dict[str, int]:
+    """Activity counts per type over the last days, from the hourly buckets"""
+    since = cutoff_bucket(days)
+    rows = conn.execute("""
+        SELECT activity_type, SUM(activity_count)
+        FROM activity_hourly_counts
+        WHERE hour >= ?
+        GROUP BY activity_type
+        HAVING SUM(activity_count) > 0
+        ORDER BY SUM(activity_count) DESC
+    """, (since or "",)).fetchall()
+    return dict(rows)
+
+
+def read_activity_buckets(conn: sqlite3.Connection, days: Optional[float],
+                          bucket: str = "hour") -> List[Tuple[str, str, int]]:
+    """(bucket, activity_type, count) rows over the last days, by hour or day"""
+    if bucket not in ("hour", "day"):
+        raise ValueError(f"Unsupported bucket: {bucket}")
+    # Day keys are the date prefix of the hour keys
+    key = "hour" if bucket == "hour" else "substr(hour, 1, 10)"
+    since = cutoff_bucket(days)
+    return conn.execute(f"""
+        SELECT {key} AS bucket, activity_type, SUM(activity_count)
+        FROM activity_hourly_counts
+        WHERE hour >= ?
+        GROUP BY bucket, activity_type
+        HAVING SUM(activity_count) > 0
+        ORDER BY bucket
+    """, (since or "",)).fetchall()
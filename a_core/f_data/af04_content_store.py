@@ -0,0 +1,107 @@
+import hashlib
+import sqlite3
+import zlib
+from typing import Dict, Optional, Tuple
+
+# Content-addressed storage for extracted document text (migration 8,
+# content_blobs). Rows elsewhere hold only the SHA-256 of the text, so
+# identical documents share one blob and the wide tables stay narrow.
+
+# Texts shorter than this are stored as-is; zlib barely helps and costs a
+# decompress on every read
+COMPRESSION_THRESHOLD = 512
+ZLIB_LEVEL = 6
+
+INSERT_BLOB_SQL = """
+    INSERT OR IGNORE INTO content_blobs (content_hash, encoding, size, data)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a text's UTF-8 bytes"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_content(text: str) -> Tuple[str, bytes]:
+    """Encode a text for storage, returning (encoding, data)"""
+    raw = text.encode("utf-8")
+    if len(raw) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(raw, ZLIB_LEVEL)
+        if len(compressed) < len(raw):
+            return "zlib", compressed
+    return "raw", raw
+
+
+def decode_content(encoding: str, data: bytes) -> str:
+    """Decode a stored blob back to text"""
+    if encoding == "zlib":
+        data = zlib.decompress(data)
+    elif encoding != "raw":
+        raise ValueError(f"Unknown content encoding: {encoding}")
+    return bytes(data).decode("utf-8")
+
+
+def blob_row(text: str) -> Tuple[str, str, int, bytes]:
+    """Parameter tuple for INSERT_BLOB_SQL"""
+    encoding, data = encode_content(text)
+    return content_hash(text), encoding, len(text), data
+
+
+def put_contents(cursor: sqlite3.Cursor, texts: Dict[str, str]):
+    """Store texts keyed by their content hash; existing blobs are left alone"""
+    if not texts:
+        return
+    # Skip the compression work for blobs that are already stored
+    hashes = list(texts)
+    existing = set()
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        existing.update(row[0] for row in cursor.execute(
+            f"SELECT content_hash FROM content_blobs WHERE content_hash IN ({placeholders})", chunk
+        ))
+    cursor.executemany(INSERT_BLOB_SQL, [
+        blob_row(text) for digest, text in texts.items() if digest not in existing
+    ])
+
+
+def get_content(conn: sqlite3.Connection, digest: str) -> Optional[str]:
+    """Load and decode one blob, or None if it is not stored"""
+    row = conn.execute(
+        "SELECT encoding, data FROM content_blobs WHERE content_hash = ?", (digest,)
+    ).fetchone()
+    return decode_content(row[0], row[1]) if row else None
+
+
+def delete_orphan_blobs(cursor: sqlite3.Cursor) -> int:
+    """Delete blobs no file_analysis or document_context row references and return how many went"""
+    cursor.execute("""
+        DELETE FROM content_blobs
+        WHERE NOT EXISTS (SELECT 1 FROM file_analysis fa
+                          WHERE fa.content_hash = content_blobs.content_hash)
+          AND NOT EXISTS (SELECT 1 FROM document_context dc
+                          WHERE dc.content_hash = content_blobs.content_hash)
+    """)
+    return cursor.rowcount
+
+
+def backfill_content_blobs(cursor: sqlite3.Cursor, start_id: int, end_id: int):
+    """Move inline file_analysis.content for ids in (start_id, end_id] into blobs"""
+    rows = cursor.execute("""
+        SELECT id, content FROM file_analysis
+        WHERE id > ? AND id <= ? AND content IS NOT NULL
+    """, (start_id, end_id)).fetchall()
+
+    texts = {}
+    updates = []
+    for row_id, text in rows:
+        digest = content_hash(text)
+        texts[digest] = text
+        updates.append((digest, row_id))
+
+    put_contents(cursor, texts)
+    cursor.executemany(
+        "UPDATE file_analysis SET content_hash = ?, content = NULL WHERE id = ?", updates
+    )
+
@@ -0,0 +1,50 @@
+import json
+import sqlite3
+import struct
+from typing import List, Sequence, Union
+
+# Try importing numpy with fallback
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# Embeddings in vectors.db (migration 2 of VECTOR_DB_MIGRATIONS) are packed
+# little-endian float32: 6 KB for a 1536-d OpenAI vector instead of ~20 KB of
+# JSON, and decoding is a zero-copy numpy.frombuffer instead of json.loads.
+
+EMBEDDING_DTYPE = "<f4"
+
+
+def encode_embedding(embedding: Sequence[float]) -> bytes:
+    """Pack an embedding as little-endian float32 bytes"""
+    if NUMPY_AVAILABLE:
+        return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+    return struct.pack(f"<{len(embedding)}f", *embedding)
+
+
+def decode_embedding(data: Union[bytes, str]) -> Union["np.ndarray", List[float]]:
+    """Unpack a stored embedding: a read-only float32 array with NumPy, else a list
+
+    JSON text, as written before the float32 migration, is still accepted.
+    """
+    if isinstance(data, str):
+        values = json.loads(data)
+        return np.asarray(values, dtype=np.float32) if NUMPY_AVAILABLE else values
+    if NUMPY_AVAILABLE:
+        return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+    return list(struct.unpack(f"<{len(data) // 4}f", data))
+
+
+def backfill_embedding_blobs(cursor: sqlite3.Cursor, start_id: int, end_id: int):
+    """Re-encode JSON embeddings for vectors ids in (start_id, end_id] as float32 blobs"""
+    rows = cursor.execute("""
+        SELECT id, embedding FROM vectors
+        WHERE id > ? AND id <= ? AND typeof(embedding) = 'text'
+    """, (start_id, end_id)).fetchall()
+    cursor.executemany(
+        "UPDATE vectors SET embedding = ? WHERE id = ?",
+        [(encode_embedding(json.loads(text)), row_id) for row_id, text in rows]
+    )
@@ -0,0 +1,65 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Side index of filterable metadata for the rows of vectors.db and the FAISS
+# backend's metadata.db, one (attribute, value, row_id) row per value. A
+# filter resolves to a sorted array of row ids with one index range scan per
+# attribute, and VectorStorage applies that array as the candidate mask of a
+# search instead of filtering results afterwards. Creation dates are filtered
+# on the rows' own created_at column.
+#
+#   entity     - each of metadata['entities']
+#   extension  - lower-cased suffix of metadata['file_path'], e.g. ".pdf"
+#   event_type - metadata['event_type']
+#   file_path  - metadata['file_path']
+
+VECTOR_ATTRIBUTES = ("entity", "extension", "event_type", "file_path")
+
+INSERT_VECTOR_ATTRIBUTE_SQL = """
+    INSERT OR IGNORE INTO vector_attributes (attribute, value, row_id) VALUES (?, ?, ?)
+"""
+
+
+def normalize_extension(extension: str) -> str:
+    """".pdf" for "pdf", ".PDF" or ".pdf\""""
+    return "." + extension.lower().lstrip(".")
+
+
+def metadata_attributes(metadata: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(attribute, value) pairs to index for one row's metadata"""
+    pairs = []
+    entities = metadata.get('entities') or []
+    if isinstance(entities, str):
+        entities = [entities]
+    pairs.extend(('entity', str(entity)) for entity in entities if entity)
+    file_path = metadata.get('file_path')
+    if file_path:
+        pairs.append(('file_path', str(file_path)))
+        suffix = Path(str(file_path)).suffix
+        if suffix:
+            pairs.append(('extension', normalize_extension(suffix)))
+    if metadata.get('event_type'):
+        pairs.append(('event_type', str(metadata['event_type'])))
+    return pairs
+
+
+def index_attributes(cursor: sqlite3.Cursor, rows: Iterable[Tuple[int, Dict[str, Any]]]):
+    """Add the attribute rows for (row_id, metadata) pairs"""
+    cursor.executemany(
+        INSERT_VECTOR_ATTRIBUTE_SQL,
+        [(attribute, value, row_id) for row_id, metadata in rows
+         for attribute, value in metadata_attributes(metadata)]
+    )
+
+
+def backfill_vector_attributes(table: str):
+    """Backfill function indexing the metadata of table ids in (start_id, end_id]"""
+    def backfill(cursor: sqlite3.Cursor, start_id: int, end_id: int):
+        rows = cursor.execute(f"""
+            SELECT id, metadata FROM {table} WHERE id > ? AND id <= ?
+        """, (start_id, end_id)).fetchall()
+        index_attributes(cursor, [(row_id, json.loads(metadata) if metadata else {})
+                                  for row_id, metadata in rows])
+    return backfill
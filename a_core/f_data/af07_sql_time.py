@@ -0,0 +1,20 @@
+from datetime import date, datetime, timezone
+from typing import Union
+
+# created_at columns are filled by SQLite's CURRENT_TIMESTAMP, which writes
+# UTC as "YYYY-MM-DD HH:MM:SS". Bounds compared against them go through
+# sql_timestamp: naive datetimes and dates are local time (what a date
+# picker or datetime.now() gives), aware ones keep their offset, and both
+# are converted to UTC text in the same format.
+
+SQL_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def sql_timestamp(value: Union[datetime, date, str]) -> str:
+    """UTC created_at text for a datetime, date or ISO string bound"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    # astimezone() reads a naive datetime as local time
+    return value.astimezone(timezone.utc).strftime(SQL_TIMESTAMP_FORMAT)
@@ -20,20 +20,72 @@ from b_gui.a_components.ba03_folder_selector import FolderSelector
 from b_gui.a_components.ba02_file_review import FileReview
 from b_gui.a_components.ba01_activity_timeline import ActivityTimeline
 from b_gui.a_components.ba04_log_export import LogExport
+from b_gui.a_components.ba05_pipeline_metrics import PipelineMetrics
+from b_gui.a_components.ba06_document_search import DocumentSearch
 
 #import other modules
 from a_core.a_fileflow.aa03_context_memory import ContextMemory
 from a_core.a_fileflow.aa05_database import DatabaseManager
+from a_core.a_fileflow.aa016_async_db import AsyncDatabase
+from a_core.e_utils.ae05_maintenance import MaintenanceScheduler
+from a_core.e_utils.ae08_metrics import get_registry
 from a_core.a_fileflow.aa014_vector_storage import VectorStorage
 from a_core.a_fileflow.aa02_content_extractor import ContentExtractor
+from a_core.a_fileflow.aa020_hybrid_search import HybridSearch
+from a_core.d_ai.ad01_analyzer import AIAnalyzer
 
 
-# Initialize session state
-if 'db_manager' not in st.session_state:
-    st.session_state.db_manager = DatabaseManager()
+# Process-wide services: Streamlit reruns this script for every session and
+# interaction, so anything owning threads, connections or a port is created
+# once per process and shared by all sessions
+@st.cache_resource
+def get_db_manager() -> DatabaseManager:
+    return DatabaseManager()
+
+
+@st.cache_resource
+def get_async_db() -> AsyncDatabase:
+    # Single writer thread for pipeline flushes and UI writes
+    return AsyncDatabase(get_db_manager())
+
+
+@st.cache_resource
+def get_metrics_server():
+    # Optional Prometheus scrape endpoint at http://127.0.0.1:METRICS_PORT/metrics
+    metrics_port = os.getenv("METRICS_PORT")
+    return get_registry().serve_prometheus(int(metrics_port)) if metrics_port else None
+
+
+@st.cache_resource
+def get_vector_storage() -> VectorStorage:
+    return VectorStorage()
+
+
+@st.cache_resource
+def get_maintenance() -> MaintenanceScheduler:
+    # Archives aged activity_log rows, compacts the database while idle and
+    # drops deleted or superseded vectors from the vector index
+    maintenance = MaintenanceScheduler(
+        days_to_keep=int(os.getenv("LOG_RETENTION_DAYS", "30")),
+        vector_storage=get_vector_storage()
+    )
+    maintenance.start()
+    return maintenance
+
+
+@st.cache_resource
+def get_hybrid_search() -> HybridSearch:
+    # Keyword and semantic search over the same documents, fused into one ranking
+    return HybridSearch(get_db_manager(), get_vector_storage(), AIAnalyzer())
 
-if 'vector_storage' not in st.session_state:
-    st.session_state.vector_storage = VectorStorage()
+
+# Initialize session state
+st.session_state.db_manager = get_db_manager()
+st.session_state.async_db = get_async_db()
+st.session_state.metrics_server = get_metrics_server()
+st.session_state.vector_storage = get_vector_storage()
+st.session_state.maintenance = get_maintenance()
+st.session_state.hybrid_search = get_hybrid_search()
 
 if 'context_memory' not in st.session_state:
     st.session_state.context_memory = ContextMemory(st.session_state.db_manager)
@@ -63,7 +115,8 @@ def main():
         st.header("Navigation")
         page = st.selectbox(
             "Select Page",
-            ["Folder Monitor", "File Review", "Activity Timeline", "Export Logs", "Settings"]
+            ["Folder Monitor", "Search", "File Review", "Activity Timeline", "Pipeline Metrics", "Export Logs",
+             "Settings"]
         )
         
         # OpenAI API Key status
@@ -86,14 +139,22 @@ def main():
         folder_selector = FolderSelector()
         folder_selector.render()
         
+    elif page == "Search":
+        document_search = DocumentSearch(st.session_state.hybrid_search)
+        document_search.render()
+        
     elif page == "File Review":
-        file_review = FileReview(st.session_state.db_manager)
+        file_review = FileReview(st.session_state.db_manager, async_db=st.session_state.async_db)
         file_review.render()
         
     elif page == "Activity Timeline":
-        timeline = ActivityTimeline(st.session_state.db_manager)
+        timeline = ActivityTimeline(st.session_state.db_manager, async_db=st.session_state.async_db)
         timeline.render()
         
+    elif page == "Pipeline Metrics":
+        pipeline_metrics = PipelineMetrics()
+        pipeline_metrics.render()
+        
     elif page == "Export Logs":
         log_export = LogExport(st.session_state.db_manager)
         log_export.render()
@@ -110,7 +171,7 @@ def render_settings():
     with col1:
         st.subheader("Database Information")
         try:
-            stats = st.session_state.db_manager.get_database_stats()
+            stats = st.session_state.async_db.submit_read(st.session_state.db_manager.get_database_stats).result()
             st.metric("Total Files Processed", stats.get('total_files', 0))
             st.metric("Pending Reviews", stats.get('pending_reviews', 0))
             st.metric("Vector Embeddings", stats.get('total_embeddings', 0))
@@ -122,7 +183,7 @@ def render_settings():
         if st.button("Clear All Data", type="secondary"):
             if st.checkbox("I understand this will delete all data"):
                 try:
-                    st.session_state.db_manager.clear_all_data()
+                    st.session_state.async_db.submit_write(st.session_state.db_manager.clear_all_data).result()
                     st.session_state.vector_storage.clear_all_vectors()
                     st.success("All data cleared successfully")
                     st.rerun()
@@ -11,15 +11,29 @@ except ImportError:
     PANDAS_AVAILABLE = False
     pd = None
 
+# Altair ships with Streamlit; only the trace waterfall needs it
+try:
+    import altair as alt
+    ALTAIR_AVAILABLE = True
+except ImportError:
+    ALTAIR_AVAILABLE = False
+    alt = None
+
 from a_core.a_fileflow.aa05_database import DatabaseManager
+from a_core.a_fileflow.aa016_async_db import AsyncDatabase
 from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils.ae09_tracing import Tracer, get_tracer
 
 class ActivityTimeline:
     """Component for displaying activity timeline and system logs"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, page_size: int = 100,
+                 tracer: Optional[Tracer] = None, async_db: Optional[AsyncDatabase] = None):
         self.db_manager = db_manager
+        self.page_size = page_size
+        self.async_db = async_db
         self.logger = LoggingUtils()
+        self.tracer = tracer or get_tracer()
         
         # Activity type colors and icons for better visualization
         self.activity_styles = {
@@ -50,6 +64,9 @@ class ActivityTimeline:
         # Main timeline display
         self._render_timeline()
         
+        # Per-file trace waterfall
+        self._render_trace_waterfall()
+        
         # Activity search and filters
         self._render_activity_search()
     
@@ -102,14 +119,17 @@ class ActivityTimeline:
         """Render activity statistics overview"""
         try:
             days = st.session_state.get('timeline_days', 1)
-            activities = self.db_manager.get_activity_timeline(int(days))
+            if self.async_db is not None:
+                breakdown = self.async_db.submit_read(self.db_manager.get_activity_breakdown, days).result()
+            else:
+                breakdown = self.db_manager.get_activity_breakdown(days)
             
-            if not activities:
+            if not breakdown:
                 st.info("No activities found for the selected time range.")
                 return
             
-            # Calculate statistics
-            stats = self._calculate_activity_stats(activities)
+            # Calculate statistics from the pre-aggregated counts
+            stats = self._calculate_activity_stats(breakdown)
             
             # Display metrics
             col1, col2, col3, col4 = st.columns(4)
@@ -139,31 +159,74 @@ class ActivityTimeline:
                     # Fallback display without pandas
                     for activity_type, count in stats['activity_breakdown'].items():
                         st.write(f"• **{activity_type}**: {count}")
+            
+            self._render_activity_over_time(days)
                 
         except Exception as e:
             st.error(f"Error loading activity statistics: {str(e)}")
     
+    def _render_activity_over_time(self, days: float):
+        """Render hourly or daily activity counts from the rollup buckets"""
+        bucket = 'hour' if days <= 3 else 'day'
+        if self.async_db is not None:
+            counts = self.async_db.submit_read(self.db_manager.get_activity_counts, days, bucket).result()
+        else:
+            counts = self.db_manager.get_activity_counts(days, bucket=bucket)
+        if not counts:
+            return
+        
+        st.subheader(f"Activity per {bucket}")
+        if PANDAS_AVAILABLE and pd is not None:
+            counts_df = pd.DataFrame(counts).pivot_table(
+                index='bucket', columns='activity_type', values='count',
+                aggfunc='sum', fill_value=0
+            )
+            st.bar_chart(counts_df)
+        else:
+            # Fallback display without pandas
+            totals = {}
+            for row in counts:
+                totals[row['bucket']] = totals.get(row['bucket'], 0) + row['count']
+            for key, count in totals.items():
+                st.write(f"• **{key}**: {count}")
+    
     def _render_timeline(self):
         """Render the main activity timeline"""
         try:
             days = st.session_state.get('timeline_days', 1)
             filters = st.session_state.get('timeline_filters', [])
             
-            activities = self.db_manager.get_activity_timeline(int(days))
+            # Start from the newest page whenever the range or filters change
+            view = (days, tuple(filters))
+            if st.session_state.get('timeline_view') != view:
+                st.session_state.timeline_view = view
+                st.session_state.timeline_page_cursors = [None]
+            page_cursors = st.session_state.timeline_page_cursors
             
-            if not activities:
-                st.info("No activities found for the selected time range.")
-                return
-            
-            # Apply filters
-            if filters:
-                activities = [a for a in activities if a['activity_type'] in filters]
+            if self.async_db is not None:
+                activities, next_cursor = self.async_db.submit_read(
+                    self.db_manager.get_activity_timeline_page,
+                    days=days,
+                    limit=self.page_size,
+                    before=page_cursors[-1],
+                    activity_types=filters
+                ).result()
+            else:
+                activities, next_cursor = self.db_manager.get_activity_timeline_page(
+                    days=days,
+                    limit=self.page_size,
+                    before=page_cursors[-1],
+                    activity_types=filters
+                )
             
             if not activities:
-                st.info("No activities match the selected filters.")
+                if filters:
+                    st.info("No activities match the selected filters.")
+                else:
+                    st.info("No activities found for the selected time range.")
                 return
             
-            st.subheader(f"Timeline ({len(activities)} activities)")
+            st.subheader(f"Timeline (page {len(page_cursors)}, {len(activities)} activities)")
             
             # Group activities by date for better organization
             grouped_activities = self._group_activities_by_date(activities)
@@ -175,6 +238,16 @@ class ActivityTimeline:
                     self._render_activity_item(activity)
                 
                 st.divider()
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(page_cursors) > 1 and st.button("← Newer activities"):
+                    page_cursors.pop()
+                    st.rerun()
+            with col2:
+                if next_cursor is not None and st.button("Older activities →"):
+                    page_cursors.append(next_cursor)
+                    st.rerun()
                 
         except Exception as e:
             st.error(f"Error loading timeline: {str(e)}")
@@ -269,12 +342,13 @@ class ActivityTimeline:
         if search_term or entity_search:
             try:
                 days = st.session_state.get('timeline_days', 7)  # Broader search
-                activities = self.db_manager.get_activity_timeline(int(days))
+                max_results = 20
                 
-                # Filter activities based on search terms
+                # Filter activities based on search terms, streaming pages
+                # until enough matches are found
                 filtered_activities = []
                 
-                for activity in activities:
+                for activity in self.db_manager.iter_activity_timeline(days):
                     match = False
                     
                     # Search in description
@@ -295,12 +369,14 @@ class ActivityTimeline:
                     
                     if match:
                         filtered_activities.append(activity)
+                        if len(filtered_activities) >= max_results:
+                            break
                 
                 if filtered_activities:
-                    st.write(f"**Found {len(filtered_activities)} matching activities:**")
+                    st.write(f"**Showing {len(filtered_activities)} most recent matching activities:**")
                     
                     # Display results
-                    for activity in filtered_activities[:20]:  # Limit to 20 results
+                    for activity in filtered_activities:
                         self._render_activity_item(activity)
                 else:
                     st.info("No activities found matching your search criteria.")
@@ -308,41 +384,100 @@ class ActivityTimeline:
             except Exception as e:
                 st.error(f"Error searching activities: {str(e)}")
     
+    def _render_trace_waterfall(self):
+        """Render a waterfall of the spans recorded while processing one file"""
+        store = self.tracer.store
+        if store is None:
+            return
+        
+        st.subheader("🔍 File Processing Traces")
+        try:
+            traces = store.recent_traces(limit=50, name="process_file")
+            if not traces:
+                st.info("No traces recorded yet. Traces appear once files are processed.")
+                return
+            
+            trace = st.selectbox(
+                "Trace",
+                options=traces,
+                format_func=lambda t: (
+                    f"{t['attributes'].get('file_name', t['trace_id'])} · "
+                    f"{(t['duration_ms'] or 0) / 1000:.2f}s · "
+                    f"{datetime.fromtimestamp(t['start_time']).strftime('%Y-%m-%d %H:%M:%S')}"
+                    + (" · ❌" if t['status'] == 'error' else "")
+                ),
+                key="trace_select"
+            )
+            
+            rows = self._build_waterfall_rows(store.get_trace(trace['trace_id']))
+            if ALTAIR_AVAILABLE and PANDAS_AVAILABLE:
+                waterfall_df = pd.DataFrame(rows)
+                chart = alt.Chart(waterfall_df).mark_bar().encode(
+                    x=alt.X('start_ms:Q', title='ms since start'),
+                    x2='end_ms:Q',
+                    y=alt.Y('span:N', sort=None, title=None),
+                    color=alt.Color('status:N', scale=alt.Scale(domain=['ok', 'error'], range=['#17a2b8', '#dc3545'])),
+                    tooltip=['span', 'duration_ms', 'start_ms', 'attributes', 'error']
+                ).properties(height=max(120, 28 * len(rows)))
+                st.altair_chart(chart, use_container_width=True)
+            else:
+                # Fallback display without altair
+                for row in rows:
+                    st.write(f"`{row['span']}` +{row['start_ms']:.0f} ms · **{row['duration_ms']:.1f} ms**")
+            
+            with st.expander("Span attributes"):
+                for row in rows:
+                    st.write(f"**{row['span'].strip()}** ({row['duration_ms']:.1f} ms)")
+                    if row['error']:
+                        st.error(row['error'])
+                    st.json(json.loads(row['attributes']))
+                    
+        except Exception as e:
+            st.error(f"Error loading traces: {str(e)}")
+    
+    def _build_waterfall_rows(self, spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order spans depth-first and place them relative to the trace start"""
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for span in spans:
+            children.setdefault(span['parent_id'], []).append(span)
+        trace_start = min(span['start_time'] for span in spans)
+        
+        rows = []
+        stack = [(span, 0) for span in reversed(children.get(None, []))]
+        while stack:
+            span, depth = stack.pop()
+            start_ms = (span['start_time'] - trace_start) * 1000
+            duration_ms = span['duration_ms'] or 0
+            rows.append({
+                # Numbered so repeated span names get their own bar
+                'span': f"{len(rows) + 1}. {'  ' * depth}{span['name']}",
+                'start_ms': round(start_ms, 3),
+                'end_ms': round(start_ms + duration_ms, 3),
+                'duration_ms': duration_ms,
+                'status': span['status'],
+                'error': span['error'],
+                'attributes': json.dumps(span['attributes'], default=str)
+            })
+            for child in reversed(children.get(span['span_id'], [])):
+                stack.append((child, depth + 1))
+        return rows
+    
     def _get_available_activity_types(self) -> List[str]:
         """Get list of available activity types from database"""
         try:
-            activities = self.db_manager.get_activity_timeline(30)  # Last 30 days
-            activity_types = list(set(a['activity_type'] for a in activities))
-            return sorted(activity_types)
+            return self.db_manager.get_activity_types(30)  # Last 30 days
         except Exception:
             return list(self.activity_styles.keys())
     
-    def _calculate_activity_stats(self, activities: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Calculate statistics from activities list"""
-        stats = {
-            'total_activities': len(activities),
-            'files_processed': 0,
-            'error_count': 0,
-            'ai_operations': 0,
-            'activity_breakdown': {}
+    def _calculate_activity_stats(self, breakdown: Dict[str, int]) -> Dict[str, Any]:
+        """Calculate statistics from per-type activity counts"""
+        return {
+            'total_activities': sum(breakdown.values()),
+            'files_processed': breakdown.get('file_processed', 0),
+            'error_count': breakdown.get('error', 0),
+            'ai_operations': breakdown.get('ai_analysis_complete', 0) + breakdown.get('ai_operation', 0),
+            'activity_breakdown': dict(breakdown)
         }
-        
-        for activity in activities:
-            activity_type = activity['activity_type']
-            
-            # Count by type
-            stats['activity_breakdown'][activity_type] = \
-                stats['activity_breakdown'].get(activity_type, 0) + 1
-            
-            # Specific counters
-            if activity_type == 'file_processed':
-                stats['files_processed'] += 1
-            elif activity_type == 'error':
-                stats['error_count'] += 1
-            elif activity_type in ['ai_analysis_complete', 'ai_operation']:
-                stats['ai_operations'] += 1
-        
-        return stats
     
     def _group_activities_by_date(self, activities: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Group activities by date for better timeline organization"""
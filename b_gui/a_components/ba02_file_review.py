@@ -1,6 +1,6 @@
 import streamlit as st
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import os
 
 # Try importing pandas with fallback
@@ -12,30 +12,45 @@ except ImportError:
     pd = None
 
 from a_core.a_fileflow.aa05_database import DatabaseManager
+from a_core.a_fileflow.aa016_async_db import AsyncDatabase
 from a_core.e_utils.ae01_file_utils import FileUtils
 
 class FileReview:
     """Component for reviewing and approving file rename suggestions"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, page_size: int = 50,
+                 async_db: Optional[AsyncDatabase] = None):
         self.db_manager = db_manager
+        self.page_size = page_size
+        self.async_db = async_db
     
     def render(self):
         """Render the file review interface"""
         st.header("📋 File Review & Approval")
         
-        # Get pending reviews
-        pending_files = self.db_manager.get_pending_reviews()
+        # Only fetch the page being rendered; the cursors of earlier pages are
+        # kept in session state so the user can step back
+        if 'review_page_cursors' not in st.session_state:
+            st.session_state.review_page_cursors = [None]
+        page_cursors = st.session_state.review_page_cursors
+        pending_files, next_cursor = self._get_pending_page(page_cursors[-1])
+        
+        if not pending_files and len(page_cursors) > 1:
+            # Everything on this page was reviewed, start over from the top
+            st.session_state.review_page_cursors = [None]
+            st.rerun()
         
         if not pending_files:
             st.info("No files pending review! All processed files have been reviewed.")
             self._render_processed_files_summary()
             return
         
-        st.write(f"**{len(pending_files)} files** are waiting for your review:")
+        pending_count = self._get_stats().get('pending_reviews', len(pending_files))
+        st.write(f"**{pending_count} files** are waiting for your review:")
         
         # Bulk spreadsheet-style interface
         self._render_bulk_approval_table(pending_files)
+        self._render_page_controls(next_cursor)
         
         st.divider()
         
@@ -46,6 +61,53 @@ class FileReview:
         with st.expander("Individual File Review (Advanced)", expanded=False):
             self._render_individual_review(pending_files)
     
+    def _get_pending_page(self, before: Optional[Tuple[str, int]]
+                          ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Fetch one page of pending files, on a reader thread if available"""
+        if self.async_db is not None:
+            return self.async_db.submit_read(
+                self.db_manager.get_pending_reviews_page, limit=self.page_size, before=before
+            ).result()
+        return self.db_manager.get_pending_reviews_page(limit=self.page_size, before=before)
+    
+    def _get_stats(self) -> Dict[str, Any]:
+        """Fetch database statistics, on a reader thread if available"""
+        if self.async_db is not None:
+            return self.async_db.submit_read(self.db_manager.get_database_stats).result()
+        return self.db_manager.get_database_stats()
+    
+    def _approve_file(self, file_id: int, approved_name: str = None):
+        """Approve a rename, queued behind pipeline writes on the writer thread if available"""
+        if self.async_db is not None:
+            self.async_db.submit_write(self.db_manager.approve_file_rename, file_id, approved_name).result()
+        else:
+            self.db_manager.approve_file_rename(file_id, approved_name)
+    
+    def _reject_file(self, file_id: int):
+        """Reject a rename, queued behind pipeline writes on the writer thread if available"""
+        if self.async_db is not None:
+            self.async_db.submit_write(self.db_manager.reject_file_rename, file_id).result()
+        else:
+            self.db_manager.reject_file_rename(file_id)
+    
+    def _render_page_controls(self, next_cursor: Optional[Tuple[str, int]]):
+        """Render previous/next buttons for the pending review pages"""
+        page_cursors = st.session_state.review_page_cursors
+        col1, col2, col3 = st.columns([1, 2, 1])
+        
+        with col1:
+            if len(page_cursors) > 1 and st.button("← Previous page"):
+                page_cursors.pop()
+                st.rerun()
+        
+        with col2:
+            st.caption(f"Page {len(page_cursors)}")
+        
+        with col3:
+            if next_cursor is not None and st.button("Next page →"):
+                page_cursors.append(next_cursor)
+                st.rerun()
+    
     def _render_bulk_approval_table(self, pending_files: List[Dict[str, Any]]):
         """Render spreadsheet-like bulk approval interface"""
         st.subheader("Bulk File Review")
@@ -131,11 +193,11 @@ class FileReview:
                 col6a, col6b = st.columns(2)
                 with col6a:
                     if st.button("Approve", key=f"approve_{file_id}", help="Approve this file"):
-                        self.db_manager.approve_file_rename(file_id, suggested)
+                        self._approve_file(file_id, suggested)
                         st.rerun()
                 with col6b:
                     if st.button("Reject", key=f"reject_{file_id}", help="Reject this file"):
-                        self.db_manager.reject_file_rename(file_id)
+                        self._reject_file(file_id)
                         st.rerun()
             
             with col7:
@@ -195,7 +257,7 @@ class FileReview:
                 suggested_name = st.session_state.get(f"suggested_{file_id}", file_data['suggested_name'])
                 final_name = custom_name if custom_name else suggested_name
                 
-                self.db_manager.approve_file_rename(file_id, final_name)
+                self._approve_file(file_id, final_name)
                 approved_count += 1
         
         st.success(f"Approved {approved_count} files")
@@ -209,7 +271,7 @@ class FileReview:
         for file_data in pending_files:
             file_id = file_data['id']
             if st.session_state.selected_files.get(file_id, False):
-                self.db_manager.reject_file_rename(file_id)
+                self._reject_file(file_id)
                 rejected_count += 1
         
         st.success(f"Rejected {rejected_count} files")  
@@ -224,12 +286,12 @@ class FileReview:
         
         with col1:
             if st.button("Approve All", type="primary"):
-                self._approve_all_files(pending_files)
+                self._approve_all_files(self.db_manager.iter_pending_reviews())
                 st.rerun()
         
         with col2:
             if st.button("Reject All", type="secondary"):
-                self._reject_all_files(pending_files)
+                self._reject_all_files(self.db_manager.iter_pending_reviews())
                 st.rerun()
         
         with col3:
@@ -243,7 +305,9 @@ class FileReview:
             
         with col4:
             if st.button(f"Auto-approve ≥{confidence_threshold:.0%}"):
-                approved_count = self._auto_approve_by_confidence(pending_files, confidence_threshold)
+                approved_count = self._auto_approve_by_confidence(
+                    self.db_manager.iter_pending_reviews(), confidence_threshold
+                )
                 st.success(f"Auto-approved {approved_count} files")
                 st.rerun()
     
@@ -360,7 +424,7 @@ class FileReview:
         with col1:
             if st.button("✅ Approve", key=f"approve_{file_id}", type="primary"):
                 final_name = custom_name if custom_name != selected_file['suggested_name'] else None
-                self.db_manager.approve_file_rename(file_id, final_name)
+                self._approve_file(file_id, final_name)
                 
                 # Perform the actual file rename if file exists
                 if os.path.exists(selected_file['file_path']):
@@ -376,7 +440,7 @@ class FileReview:
         
         with col2:
             if st.button("❌ Reject", key=f"reject_{file_id}", type="secondary"):
-                self.db_manager.reject_file_rename(file_id)
+                self._reject_file(file_id)
                 st.success("❌ File rename rejected")
                 st.rerun()
         
@@ -389,7 +453,7 @@ class FileReview:
         st.subheader("📊 Processing Summary")
         
         try:
-            stats = self.db_manager.get_database_stats()
+            stats = self._get_stats()
             
             col1, col2, col3 = st.columns(3)
             
@@ -397,7 +461,7 @@ class FileReview:
                 st.metric("Total Files Processed", stats.get('total_files', 0))
             
             with col2:
-                approved_count = stats.get('total_files', 0) - stats.get('pending_reviews', 0)
+                approved_count = stats.get('status_counts', {}).get('approved', 0)
                 st.metric("Files Approved", approved_count)
             
             with col3:
@@ -406,11 +470,11 @@ class FileReview:
         except Exception as e:
             st.error(f"Error loading statistics: {str(e)}")
     
-    def _approve_all_files(self, pending_files: List[Dict[str, Any]]):
+    def _approve_all_files(self, pending_files: Iterable[Dict[str, Any]]):
         """Approve all pending files"""
         for file_data in pending_files:
             try:
-                self.db_manager.approve_file_rename(file_data['id'])
+                self._approve_file(file_data['id'])
                 
                 # Attempt to rename the actual file
                 if os.path.exists(file_data['file_path']):
@@ -421,15 +485,15 @@ class FileReview:
             except Exception as e:
                 st.error(f"Error approving file {file_data['original_name']}: {str(e)}")
     
-    def _reject_all_files(self, pending_files: List[Dict[str, Any]]):
+    def _reject_all_files(self, pending_files: Iterable[Dict[str, Any]]):
         """Reject all pending files"""
         for file_data in pending_files:
             try:
-                self.db_manager.reject_file_rename(file_data['id'])
+                self._reject_file(file_data['id'])
             except Exception as e:
                 st.error(f"Error rejecting file {file_data['original_name']}: {str(e)}")
     
-    def _auto_approve_by_confidence(self, pending_files: List[Dict[str, Any]], 
+    def _auto_approve_by_confidence(self, pending_files: Iterable[Dict[str, Any]], 
                                    threshold: float) -> int:
         """Auto-approve files with confidence above threshold"""
         approved_count = 0
@@ -437,7 +501,7 @@ class FileReview:
         for file_data in pending_files:
             if file_data['confidence'] >= threshold:
                 try:
-                    self.db_manager.approve_file_rename(file_data['id'])
+                    self._approve_file(file_data['id'])
                     
                     # Attempt to rename the actual file
                     if os.path.exists(file_data['file_path']):
@@ -316,15 +316,10 @@ class LogExport:
     def _get_activity_data(self, days: Optional[float], activity_filters: list) -> list:
         """Get activity log data for export"""
         try:
-            if days is None:
-                # Get all activities - we'll limit to reasonable amount
-                activities = self.db_manager.get_activity_timeline(365)  # Last year max
-            else:
-                activities = self.db_manager.get_activity_timeline(int(days))
-            
-            # Apply activity type filters
-            if activity_filters:
-                activities = [a for a in activities if a['activity_type'] in activity_filters]
+            # Stream pages straight from the database; days=None is all time
+            activities = self.db_manager.iter_activity_timeline(
+                days, activity_types=activity_filters
+            )
             
             # Flatten the data for export
             export_data = []
@@ -366,7 +361,7 @@ class LogExport:
     def _get_entity_data(self) -> list:
         """Get entity data for export"""
         try:
-            entities = self.db_manager.get_all_entities()
+            entities = self.db_manager.iter_entities()
             
             export_data = []
             for entity in entities:
@@ -389,13 +384,10 @@ class LogExport:
     def _get_performance_data(self, days: Optional[float]) -> list:
         """Get performance metrics for export"""
         try:
-            if days is None:
-                activities = self.db_manager.get_activity_timeline(365)
-            else:
-                activities = self.db_manager.get_activity_timeline(int(days))
-            
-            # Filter for performance activities
-            perf_activities = [a for a in activities if a['activity_type'] == 'performance']
+            # Only performance activities are read from the database
+            perf_activities = self.db_manager.iter_activity_timeline(
+                days, activity_types=['performance']
+            )
             
             export_data = []
             for activity in perf_activities:
@@ -419,13 +411,10 @@ class LogExport:
     def _get_error_data(self, days: Optional[float]) -> list:
         """Get error log data for export"""
         try:
-            if days is None:
-                activities = self.db_manager.get_activity_timeline(365)
-            else:
-                activities = self.db_manager.get_activity_timeline(int(days))
-            
-            # Filter for error activities
-            error_activities = [a for a in activities if a['activity_type'] == 'error']
+            # Only error activities are read from the database
+            error_activities = self.db_manager.iter_activity_timeline(
+                days, activity_types=['error']
+            )
             
             export_data = []
             for activity in error_activities:
@@ -448,9 +437,7 @@ class LogExport:
     def _get_available_activity_types(self) -> list:
         """Get available activity types from recent data"""
         try:
-            activities = self.db_manager.get_activity_timeline(30)  # Last 30 days
-            activity_types = list(set(a['activity_type'] for a in activities))
-            return sorted(activity_types)
+            return self.db_manager.get_activity_types(30)  # Last 30 days
         except Exception:
             return [
                 'file_processed', 'monitoring_started', 'monitoring_stopped',
@@ -461,8 +448,9 @@ class LogExport:
         """Show recent export activities"""
         try:
             # Get recent export activities
-            activities = self.db_manager.get_activity_timeline(7)  # Last week
-            export_activities = [a for a in activities if a['activity_type'] == 'data_export']
+            export_activities, _ = self.db_manager.get_activity_timeline_page(
+                days=7, limit=5, activity_types=['data_export']
+            )  # Last week
             
             if export_activities:
                 st.write("**Recent Exports:**")
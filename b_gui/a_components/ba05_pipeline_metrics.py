@@ -0,0 +1,128 @@
+import streamlit as st
+import math
+from typing import Dict, Any, Optional
+
+# Try importing pandas with fallback
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+    pd = None
+
+from a_core.e_utils.ae08_metrics import MetricsRegistry, get_registry, STAGE_SECONDS, STAGE_ERRORS
+
+class PipelineMetrics:
+    """Component for displaying per-stage latency and pipeline counters"""
+    
+    # Order stages appear in process_file; anything else is listed after them
+    STAGE_ORDER = [
+        'process_file', 'detect_change', 'extract', 'ocr', 'analyze', 'gpt_call',
+        'gpt_vision_call', 'embed', 'embedding_api', 'vector_store', 'db_queue',
+        'db_flush', 'context_update'
+    ]
+    
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or get_registry()
+    
+    def render(self):
+        """Render the pipeline metrics interface"""
+        st.header("⏱️ Pipeline Metrics")
+        st.caption("Latencies since the app started, from in-process histograms (±6%)")
+        
+        self._render_counters()
+        self._render_stage_latencies()
+        self._render_export()
+    
+    def _render_counters(self):
+        """Render file outcome counters and queue gauges"""
+        values = self._collect_values()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Files Processed", int(values.get(('fileflow_files_total', 'processed'), 0)))
+        with col2:
+            st.metric("Unchanged (skipped)", int(values.get(('fileflow_files_total', 'unchanged'), 0)))
+        with col3:
+            st.metric("Errors", int(values.get(('fileflow_files_total', 'error'), 0)))
+        with col4:
+            st.metric("Write Buffer Rows", self._format_number(values.get(('db_write_buffer_rows', ''), 0)))
+    
+    def _collect_values(self) -> Dict[tuple, float]:
+        """Counter and gauge values keyed by (name, first label value)"""
+        values = {}
+        for name, kind, _, metrics in self.registry.families():
+            if kind == "histogram":
+                continue
+            for labels, metric in metrics:
+                label_value = labels[0][1] if labels else ''
+                values[(name, label_value)] = metric.value
+        return values
+    
+    def _render_stage_latencies(self):
+        """Render p50/p95/p99 per stage"""
+        st.subheader("Stage Latency")
+        
+        snapshots = self.registry.histogram_snapshots(STAGE_SECONDS, "stage")
+        if not snapshots:
+            st.info("No files processed yet. Start monitoring a folder to collect timings.")
+            return
+        
+        errors = {}
+        for name, _, _, metrics in self.registry.families():
+            if name == STAGE_ERRORS:
+                errors = {dict(labels).get('stage'): metric.value for labels, metric in metrics}
+        
+        order = {stage: i for i, stage in enumerate(self.STAGE_ORDER)}
+        rows = []
+        for stage in sorted(snapshots, key=lambda s: (order.get(s, len(order)), s)):
+            snapshot = snapshots[stage]
+            rows.append({
+                'Stage': stage,
+                'Count': int(snapshot['count']),
+                'Errors': int(errors.get(stage, 0)),
+                'p50 (ms)': self._to_ms(snapshot['p50']),
+                'p95 (ms)': self._to_ms(snapshot['p95']),
+                'p99 (ms)': self._to_ms(snapshot['p99']),
+                'Max (ms)': self._to_ms(snapshot['max']),
+                'Total (s)': round(snapshot['sum'], 2)
+            })
+        
+        if PANDAS_AVAILABLE:
+            df = pd.DataFrame(rows)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+            
+            # Where the time goes, excluding the end-to-end stage
+            chart = df[df['Stage'] != 'process_file'].set_index('Stage')[['p50 (ms)', 'p95 (ms)', 'p99 (ms)']]
+            if not chart.empty:
+                st.bar_chart(chart)
+        else:
+            for row in rows:
+                st.write(f"**{row['Stage']}** ({row['Count']} calls): "
+                         f"p50 {row['p50 (ms)']} ms · p95 {row['p95 (ms)']} ms · p99 {row['p99 (ms)']} ms")
+    
+    def _render_export(self):
+        """Render the Prometheus text export"""
+        with st.expander("Prometheus export"):
+            text = self.registry.render_prometheus()
+            st.download_button(
+                label="📥 Download metrics.prom",
+                data=text,
+                file_name="metrics.prom",
+                mime="text/plain"
+            )
+            st.code(text, language="text")
+    
+    @staticmethod
+    def _to_ms(seconds: float) -> Optional[float]:
+        """Seconds to rounded milliseconds, None for empty histograms"""
+        if seconds is None or math.isnan(seconds):
+            return None
+        return round(seconds * 1000, 2)
+    
+    @staticmethod
+    def _format_number(value: Any) -> str:
+        """Format a gauge value for st.metric"""
+        if isinstance(value, float) and math.isnan(value):
+            return "n/a"
+        return f"{value:,.0f}"
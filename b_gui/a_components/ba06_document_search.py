@@ -0,0 +1,80 @@
+import streamlit as st
+from datetime import date, timedelta
+from typing import Dict, Any, List
+
+from a_core.a_fileflow.aa020_hybrid_search import HybridSearch, FUSION_MODES
+
+class DocumentSearch:
+    """Component for hybrid keyword and semantic search over analysed documents"""
+    
+    def __init__(self, hybrid_search: HybridSearch, limit: int = 20):
+        self.hybrid_search = hybrid_search
+        self.limit = limit
+    
+    def render(self):
+        """Render the document search interface"""
+        st.header("🔎 Document Search")
+        st.caption("Exact terms and paraphrases in one query: BM25 and vector results fused by rank")
+        
+        query = st.text_input("Search", placeholder="Invoice INV-2024-0042, or 'contract renewal with Acme'")
+        options = self._render_options()
+        
+        if not query.strip():
+            st.info("Enter a query to search your documents.")
+            return
+        
+        with st.spinner("Searching..."):
+            results = self.hybrid_search.search(query, limit=self.limit, **options)
+        
+        if not results:
+            st.warning("No matching documents found.")
+            return
+        
+        st.write(f"**{len(results)} documents** found:")
+        for result in results:
+            self._render_result(result)
+    
+    def _render_options(self) -> Dict[str, Any]:
+        """Render the filter and ranking controls and return them as search() keyword arguments"""
+        options: Dict[str, Any] = {}
+        with st.expander("Filters"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if st.checkbox("Limit by date"):
+                    start, end = st.date_input(
+                        "Processed between",
+                        value=(date.today() - timedelta(days=30), date.today())
+                    )
+                    options['created_after'] = start
+                    # created_before is exclusive, so include the whole end day
+                    options['created_before'] = end + timedelta(days=1)
+            with col2:
+                entity = st.text_input("Entity", placeholder="AcmeCorporation")
+                if entity.strip():
+                    options['entity'] = entity.strip()
+            with col3:
+                extensions = st.text_input("Extensions", placeholder="pdf, docx")
+                if extensions.strip():
+                    options['extensions'] = [ext.strip() for ext in extensions.split(",") if ext.strip()]
+            
+            options['fusion'] = st.radio("Ranking", FUSION_MODES, horizontal=True,
+                                         format_func=lambda mode: {"rrf": "Rank fusion",
+                                                                   "weighted": "Weighted scores"}[mode])
+        return options
+    
+    def _render_result(self, result: Dict[str, Any]):
+        """Render one search hit"""
+        sources: List[str] = []
+        if result.get('lexical_rank'):
+            sources.append(f"keyword #{result['lexical_rank']}")
+        if result.get('vector_rank'):
+            sources.append(f"semantic #{result['vector_rank']}")
+        
+        with st.container():
+            st.markdown(f"**{result.get('suggested_name') or result['file_path']}**")
+            st.caption(f"{result['file_path']} · {' · '.join(sources)} · score {result['score']:.4f}")
+            if result.get('snippet'):
+                st.text(result['snippet'][:500])
+            if result.get('entities'):
+                st.write("Entities: " + ", ".join(result['entities']))
+            st.divider()
@@ -0,0 +1,73 @@
+"""Compare insert throughput of per-call connections against the shared pool.
+
+Usage: python c_scripts/c03_benchmarks/bench_db_pool.py [row_count]
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from a_core.e_utils.ae04_db_pool import ConnectionPool
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS activity_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        activity_type TEXT NOT NULL,
+        description TEXT NOT NULL,
+        metadata TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+INSERT_SQL = """
+    INSERT INTO activity_log (activity_type, description, metadata)
+    VALUES (?, ?, ?)
+"""
+
+
+def bench_per_call_connections(db_path: Path, rows: int) -> float:
+    """Old pattern: open a connection and commit for every insert"""
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute(CREATE_SQL)
+
+    start = time.perf_counter()
+    for i in range(rows):
+        with sqlite3.connect(str(db_path)) as conn:
+            conn.execute(INSERT_SQL, ("bench", f"row {i}", None))
+            conn.commit()
+    return rows / (time.perf_counter() - start)
+
+
+def bench_pooled_connections(db_path: Path, rows: int) -> float:
+    """New pattern: cached WAL connection, still one transaction per insert"""
+    pool = ConnectionPool(str(db_path))
+    with pool.transaction() as conn:
+        conn.execute(CREATE_SQL)
+
+    start = time.perf_counter()
+    for i in range(rows):
+        with pool.transaction() as conn:
+            conn.execute(INSERT_SQL, ("bench", f"row {i}", None))
+    elapsed = time.perf_counter() - start
+    pool.close_all()
+    return rows / elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = bench_per_call_connections(Path(tmp) / "before.db", rows)
+        after = bench_pooled_connections(Path(tmp) / "after.db", rows)
+
+    print(f"📊 {rows} single-row inserts")
+    print(f"   per-call connect + commit : {before:10.0f} inserts/sec")
+    print(f"   pooled WAL connection     : {after:10.0f} inserts/sec")
+    print(f"   speedup                   : {after / before:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measure memory and recall@10 of the quantized IVF index modes.
+
+Usage: python c_scripts/c03_benchmarks/bench_quantization.py [count] [dim] [rerank_factor]
+
+Builds one index per mode in QUANTIZATION_MODES over the same Gaussian-mixture
+vectors as bench_ann_index and reports the bytes held in RAM, recall@10 of the
+raw quantized scores, and recall@10 after re-ranking rerank_factor × 10
+candidates exactly, as VectorStorage does against vectors.db.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from a_core.a_fileflow.aa017_ann_index import IVFIndex, normalize_rows
+from a_core.a_fileflow.aa019_quantization import QUANTIZATION_MODES
+from c_scripts.c03_benchmarks.bench_ann_index import make_vectors, exact_top_k
+
+QUERY_COUNT = 200
+K = 10
+NPROBE = 16
+
+
+def recall(found, truth) -> float:
+    return float(np.mean([len(set(ids[:K]) & set(row)) / K for ids, row in zip(found, truth)]))
+
+
+def bench_mode(mode: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, rerank_factor: int):
+    """Build an index in one mode and report its footprint and recall"""
+    index = IVFIndex(vectors.shape[1], nprobe=NPROBE, quantization=mode)
+    start = time.perf_counter()
+    index.add(np.arange(len(vectors)), vectors)
+    if not index.is_trained or (index.quantizer is not None and not index.is_quantized):
+        index.train()
+    build_seconds = time.perf_counter() - start
+
+    raw, reranked = [], []
+    start = time.perf_counter()
+    for query in queries:
+        ids, _ = index.search(query, K * rerank_factor)
+        raw.append(ids)
+        exact = vectors[ids] @ query
+        reranked.append(ids[np.argsort(-exact, kind="stable")[:K]])
+    qps = QUERY_COUNT / (time.perf_counter() - start)
+
+    print(f"   {mode:<5}: {index.nbytes / 2**20:8.1f} MB in RAM, built in {build_seconds:5.1f}s, "
+          f"{qps:7.0f} QPS, recall@{K} raw {recall(raw, truth):.3f}, reranked {recall(reranked, truth):.3f}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    rerank_factor = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    rng = np.random.default_rng(42)
+    vectors = make_vectors(count, dim, rng)
+    queries = normalize_rows(vectors[rng.choice(count, QUERY_COUNT, replace=False)]
+                             + 0.5 * rng.standard_normal((QUERY_COUNT, dim), dtype=np.float32) / np.sqrt(dim))
+    truth = exact_top_k(vectors, queries, K)
+
+    print(f"\n📊 {count:,} vectors × {dim}d, nprobe={NPROBE}, re-ranking {rerank_factor * K} candidates")
+    for mode in QUANTIZATION_MODES:
+        bench_mode(mode, vectors, queries, truth, rerank_factor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+
+# Keep test runs off the console and out of ./data: logs go to each test's
+# own database only, and no trace store is opened
+os.environ.setdefault("LOG_SINKS", "sqlite")
+os.environ.setdefault("TRACE_STORE", "off")
+
+# Fixtures shared by the test modules. Every test runs in its own temporary
+# working directory, so components that default to ./data or ./vector_db
+# never touch the real stores.
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Run each test inside its own temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh second_brain.db for one test"""
+    return str(tmp_path / "data" / "second_brain.db")
+
+
+@pytest.fixture
+def db_manager(db_path):
+    """Migrated DatabaseManager on a temporary database"""
+    from a_core.a_fileflow.aa05_database import DatabaseManager
+
+    manager = DatabaseManager(db_path)
+    yield manager
+    manager.close()
+    manager.logger.flush(timeout=5)
+
+
+@pytest.fixture
+def store_analysis(db_manager):
+    """Callable storing a file_analysis row with test defaults; queue=True buffers it instead"""
+    def store(file_path, content="", entities=(), queue=False):
+        write = db_manager.queue_file_analysis if queue else db_manager.store_file_analysis
+        write(
+            file_path=file_path,
+            original_name=os.path.basename(file_path),
+            suggested_name="renamed_" + os.path.basename(file_path),
+            content=content,
+            metadata={},
+            entities=list(entities),
+            confidence=0.9,
+            reasoning="test",
+            vector_id="",
+            event_type="created"
+        )
+    return store
+
+
+@pytest.fixture
+def make_vector_storage(monkeypatch, tmp_path):
+    """Callable opening a VectorStorage; keywords set VECTOR_* variables
+    
+    ChromaDB and FAISS are hidden even where installed, so every test
+    exercises the SQLite fallback unless it asks for another backend:
+    backend="faiss" opens the FAISS one, skipping the test without FAISS.
+    """
+    from a_core.a_fileflow import aa014_vector_storage
+    
+    installed_faiss = aa014_vector_storage.faiss
+    monkeypatch.setattr(aa014_vector_storage, "chromadb", None)
+    monkeypatch.setattr(aa014_vector_storage, "faiss", None)
+    for name in ("VECTOR_BACKEND", "VECTOR_QUANTIZATION", "VECTOR_ANN", "VECTOR_ANN_NPROBE",
+                 "VECTOR_ANN_NLIST", "VECTOR_RERANK_FACTOR"):
+        monkeypatch.delenv(name, raising=False)
+    
+    def make(path="vector_db", backend="sqlite", **env):
+        if backend == "faiss":
+            if installed_faiss is None:
+                pytest.skip("faiss is not installed")
+            monkeypatch.setattr(aa014_vector_storage, "faiss", installed_faiss)
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        return aa014_vector_storage.VectorStorage(str(tmp_path / path))
+    return make
+
+
+@pytest.fixture
+def random_vectors():
+    """Callable returning count standard normal float32 vectors of dim dimensions, fixed by seed"""
+    def make(count, seed=0, dim=16):
+        return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return make
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from a_core.a_fileflow.aa017_ann_index import MIN_TRAIN_VECTORS, IVFIndex, member_mask, normalize_rows
+
+DIM = 32
+
+
+def clustered(count, seed=0, clusters=64):
+    """Points around random centres, the structure IVF relies on"""
+    rng = np.random.default_rng(seed)
+    centres = np.random.default_rng(99).normal(size=(clusters, DIM))
+    return (centres[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, DIM))).astype(np.float32)
+
+
+def exact_top(vectors, ids, query, k):
+    """Ids of the k highest cosine similarities"""
+    scores = normalize_rows(vectors) @ normalize_rows(query.reshape(1, -1))[0]
+    return ids[np.argsort(-scores)[:k]]
+
+
+def recall_at(index, vectors, ids, queries, k=10, **search):
+    found = [len(set(index.search(query, k, **search)[0]) & set(exact_top(vectors, ids, query, k)))
+             for query in queries]
+    return sum(found) / (k * len(queries))
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = clustered(MIN_TRAIN_VECTORS + 1000)
+    return np.arange(1, len(vectors) + 1, dtype=np.int64), vectors
+
+
+def test_small_index_is_exact_and_untrained():
+    vectors = clustered(500)
+    ids = np.arange(10, 510, dtype=np.int64)
+    index = IVFIndex(DIM)
+    index.add(ids, vectors)
+    assert not index.is_trained
+    
+    query = clustered(1, seed=5)[0]
+    found, distances = index.search(query, 5)
+    assert list(found) == list(exact_top(vectors, ids, query, 5))
+    assert np.all(np.diff(distances) >= 0)
+    assert distances[0] == pytest.approx(1 - normalize_rows(vectors[found[:1] - 10])[0]
+                                         @ normalize_rows(query.reshape(1, -1))[0], abs=1e-5)
+
+
+def test_trains_once_large_enough_and_keeps_recall(data):
+    ids, vectors = data
+    index = IVFIndex(DIM, nprobe=8)
+    index.add(ids, vectors)
+    assert index.is_trained and len(index.lists) > 1
+    assert index.ntotal == len(ids) and index.max_id == ids[-1]
+    
+    queries = clustered(50, seed=1)
+    assert recall_at(index, vectors, ids, queries) >= 0.9
+    # Probing every list is exact
+    assert recall_at(index, vectors, ids, queries, nprobe=len(index.lists)) == 1.0
+
+
+def test_allowed_ids_mask_the_search(data):
+    ids, vectors = data
+    index = IVFIndex(DIM, nprobe=4)
+    index.add(ids, vectors)
+    allowed = np.sort(np.random.default_rng(3).choice(ids, 25, replace=False))
+    
+    query = clustered(1, seed=2)[0]
+    found, _ = index.search(query, 10, allowed=allowed)
+    assert set(found) <= set(allowed)
+    # A selective mask probes past nprobe until k allowed vectors are found
+    assert len(found) == 10
+    keep = member_mask(ids, allowed)
+    assert len(set(found) & set(exact_top(vectors[keep], ids[keep], query, 10))) >= 8
+
+
+def test_remove_drops_ids(data):
+    ids, vectors = data
+    index = IVFIndex(DIM)
+    index.add(ids, vectors)
+    query = vectors[0]
+    assert index.search(query, 1)[0][0] == ids[0]
+    
+    assert index.remove([ids[0], 10 ** 9]) == 1
+    assert index.ntotal == len(ids) - 1
+    assert ids[0] not in index.search(query, 10)[0]
+
+
+def test_save_and_load_round_trip(tmp_path, data):
+    ids, vectors = data
+    path = tmp_path / "vectors_ivf.npz"
+    index = IVFIndex(DIM, nprobe=8, path=str(path))
+    index.add(ids, vectors)
+    index.save()
+    
+    loaded = IVFIndex.load(str(path), nprobe=8)
+    assert (loaded.ntotal, loaded.max_id, loaded.trained_size) == (index.ntotal, index.max_id, index.trained_size)
+    np.testing.assert_array_equal(loaded.centroids, index.centroids)
+    for query in clustered(10, seed=4):
+        np.testing.assert_array_equal(loaded.search(query, 10)[0], index.search(query, 10)[0])
+    
+    # Another quantization, or a broken file, is not loaded
+    assert IVFIndex.load(str(path), quantization="int8") is None
+    path.write_bytes(b"not an index")
+    assert IVFIndex.load(str(path)) is None
+    assert IVFIndex.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_maybe_save_waits_for_enough_adds(tmp_path):
+    path = tmp_path / "vectors_ivf.npz"
+    index = IVFIndex(DIM, path=str(path))
+    index.add(np.arange(1, 11), clustered(10))
+    assert not index.maybe_save() and not path.exists()
+    index.add(np.arange(11, 1011), clustered(1000, seed=1))
+    assert index.maybe_save() and path.exists()
+
+
+def test_storage_search_uses_the_index_and_catches_up_on_open(make_vector_storage):
+    storage = make_vector_storage(VECTOR_ANN_NPROBE=8)
+    vectors = clustered(MIN_TRAIN_VECTORS + 200)
+    vector_ids = storage.store_embeddings_batch(vectors, [f"doc {i}" for i in range(len(vectors))],
+                                                [{"i": i} for i in range(len(vectors))])
+    assert storage.ann_index.is_trained
+    
+    hits = storage.search_similar(vectors[7], limit=3)
+    assert hits[0]['id'] == vector_ids[7]
+    assert hits[0]['distance'] == pytest.approx(0, abs=1e-5)
+    
+    # Rows committed after the last checkpoint are replayed into the saved index on open
+    storage.ann_index.save()
+    extra = clustered(5, seed=8)
+    extra_ids = storage.store_embeddings_batch(extra, ["late"] * 5, [{}] * 5)
+    reopened = make_vector_storage()
+    assert reopened.ann_index.ntotal == len(vectors) + 5
+    assert reopened.search_similar(extra[2], limit=1)[0]['id'] == extra_ids[2]
+
+
+def test_storage_without_index_searches_exactly(make_vector_storage):
+    storage = make_vector_storage(VECTOR_ANN="off")
+    assert storage.ann_index is None
+    vectors = clustered(50)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 50, [{}] * 50)
+    query = clustered(1, seed=6)[0]
+    expected = exact_top(vectors, np.arange(50), query, 5)
+    assert [hit['id'] for hit in storage.search_similar(query, limit=5)] == [vector_ids[i] for i in expected]
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+from a_core.a_fileflow.aa016_async_db import AsyncDatabase
+from a_core.a_fileflow.aa05_database import DatabaseManager
+
+
+def test_writes_run_in_order_on_one_thread(db_manager):
+    async_db = AsyncDatabase(db_manager)
+    try:
+        seen = []
+        futures = [async_db.submit_write(lambda i=i: seen.append((i, threading.current_thread().name)))
+                   for i in range(20)]
+        for future in futures:
+            future.result(timeout=5)
+        
+        assert [i for i, _ in seen] == list(range(20))
+        assert len({name for _, name in seen}) == 1
+        assert seen[0][1].startswith("db-writer")
+    finally:
+        async_db.close()
+
+
+def test_write_behind_flushes_go_through_the_writer(db_path):
+    db_manager = DatabaseManager(db_path, batch_size=1, flush_interval_ms=60000)
+    async_db = AsyncDatabase(db_manager)
+    flushed_on = []
+    original_flush = db_manager.flush
+    
+    def flush():
+        flushed_on.append(threading.current_thread().name)
+        return original_flush()
+    
+    db_manager.flush = flush
+    try:
+        db_manager.queue_file_fingerprint("/docs/a.txt", 1, 1, None, None)
+        deadline = time.monotonic() + 5
+        while not flushed_on and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert flushed_on
+        assert all(name.startswith("db-writer") for name in flushed_on)
+    finally:
+        async_db.close()
+        db_manager.close()
+
+
+def test_close_flushes_and_detaches_the_writer(db_path):
+    db_manager = DatabaseManager(db_path, batch_size=1000, flush_interval_ms=60000)
+    async_db = AsyncDatabase(db_manager)
+    db_manager.queue_file_fingerprint("/docs/a.txt", 1, 1, None, None)
+    async_db.close()
+    
+    assert db_manager.write_executor is None
+    with db_manager.pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM file_fingerprints").fetchone()[0] == 1
+    db_manager.close()
+
+
+def test_ui_writes_round_trip(db_manager, store_analysis):
+    async_db = AsyncDatabase(db_manager)
+    try:
+        store_analysis("/docs/a.txt")
+        file_id = db_manager.get_pending_reviews()[0]['id']
+        async_db.submit_write(db_manager.approve_file_rename, file_id, "final.txt").result(timeout=5)
+        assert db_manager.get_pending_reviews() == []
+    finally:
+        async_db.close()
+
+
+def test_coroutines_read_on_readers_and_write_on_the_writer(db_manager, store_analysis):
+    async_db = AsyncDatabase(db_manager)
+    threads = []
+    
+    def record(fn):
+        def wrapper(*args, **kwargs):
+            threads.append((fn.__name__, threading.current_thread().name))
+            return fn(*args, **kwargs)
+        return wrapper
+    
+    db_manager.get_pending_reviews_page = record(db_manager.get_pending_reviews_page)
+    db_manager.get_database_stats = record(db_manager.get_database_stats)
+    db_manager.reject_file_rename = record(db_manager.reject_file_rename)
+    
+    async def scenario():
+        page, cursor = await async_db.get_pending_reviews_page(limit=10)
+        stats = await async_db.get_database_stats()
+        await async_db.reject_file_rename(page[0]['id'])
+        return page, cursor, stats, await async_db.get_pending_reviews_page(limit=10)
+    
+    try:
+        store_analysis("/docs/a.txt")
+        page, cursor, stats, (after, _) = asyncio.run(scenario())
+        
+        assert len(page) == 1 and cursor is None
+        assert stats['pending_reviews'] == 1
+        assert after == []
+        assert all(name.startswith("db-reader") for fn, name in threads if fn != "reject_file_rename")
+        assert [name for fn, name in threads if fn == "reject_file_rename"][0].startswith("db-writer")
+    finally:
+        async_db.close()
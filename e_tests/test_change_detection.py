@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+pytest.importorskip("watchdog")
+pytest.importorskip("openai")
+
+from a_core.a_fileflow.aa011_monitor import FileMonitor
+from a_core.a_fileflow.aa014_vector_storage import VectorStorage
+from a_core.a_fileflow.aa03_context_memory import ContextMemory
+
+
+@pytest.fixture
+def monitor(db_manager, tmp_path, monkeypatch):
+    # The analyzer's client is built but never called by change detection
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    folder = tmp_path / "watched"
+    folder.mkdir()
+    return FileMonitor(str(folder), db_manager, VectorStorage(str(tmp_path / "vector_db")),
+                       ContextMemory(db_manager))
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_new_files_are_changed_and_recorded_ones_are_not(monitor, tmp_path):
+    path = write(tmp_path / "watched" / "a.txt", "hello")
+    fingerprint = monitor._detect_change(path)
+    assert fingerprint is not None
+    assert fingerprint['size'] == 5
+    
+    monitor._record_fingerprint(path, fingerprint)
+    assert monitor._detect_change(path) is None
+
+
+def test_touched_file_with_same_content_is_unchanged(monitor, tmp_path):
+    path = write(tmp_path / "watched" / "a.txt", "hello")
+    monitor._record_fingerprint(path, monitor._detect_change(path))
+    
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert monitor._detect_change(path) is None
+    # The new mtime is remembered, so the next check is stat-only again
+    assert monitor._fingerprints[path]['mtime_ns'] == stat.st_mtime_ns + 10**9
+
+
+def test_same_size_edit_is_detected_by_hash(monitor, tmp_path):
+    path = write(tmp_path / "watched" / "a.txt", "hello")
+    monitor._record_fingerprint(path, monitor._detect_change(path))
+    
+    stat = os.stat(path)
+    write(tmp_path / "watched" / "a.txt", "jello")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert monitor._detect_change(path) is not None
+
+
+def test_fingerprints_survive_a_restart(monitor, db_manager, tmp_path):
+    path = write(tmp_path / "watched" / "a.txt", "hello")
+    monitor._record_fingerprint(path, monitor._detect_change(path))
+    db_manager.flush()
+    
+    monitor._fingerprints = {}
+    assert monitor._detect_change(path) is None
+    assert set(db_manager.get_file_fingerprints(str(tmp_path / "watched"))) == {path}
+    assert db_manager.get_file_fingerprints(str(tmp_path / "watch")) == {}
+    assert db_manager.is_file_recently_processed(path)
+
+
+def test_removed_file_is_forgotten(monitor, db_manager, tmp_path):
+    path = write(tmp_path / "watched" / "a.txt", "hello")
+    monitor._record_fingerprint(path, monitor._detect_change(path))
+    db_manager.flush()
+    
+    monitor.remove_file(path)
+    assert db_manager.get_file_fingerprint(path) is None
+    assert path not in monitor._fingerprints
@@ -0,0 +1,149 @@
+import types
+
+import numpy as np
+import pytest
+
+from a_core.d_ai import ad02_chunking
+from a_core.d_ai.ad02_chunking import WORDS_PER_TOKEN, chunk_text
+
+
+@pytest.fixture
+def word_windows(monkeypatch):
+    """Count words instead of tokens, whether or not tiktoken is installed"""
+    monkeypatch.setattr(ad02_chunking, "tiktoken", None)
+    monkeypatch.setattr(ad02_chunking, "_encoding", None)
+
+
+def document(words):
+    return " ".join(f"w{i}" for i in range(words))
+
+
+def test_short_and_empty_text(word_windows):
+    assert chunk_text("") == [] and chunk_text(" \n\t") == []
+    chunk, = chunk_text("A short note.")
+    assert (chunk.index, chunk.text, chunk.char_start) == (0, "A short note.", 0)
+
+
+def test_windows_overlap_and_cover_the_whole_text(word_windows):
+    text = document(2000)
+    chunks = chunk_text(text, chunk_tokens=100, overlap_tokens=20)
+    window, overlap = int(100 * WORDS_PER_TOKEN), int(20 * WORDS_PER_TOKEN)
+    
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert len(chunk.text.split()) <= window
+        assert text[chunk.char_start:chunk.char_end].strip() == chunk.text
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.text.split()[-overlap:] == chunk.text.split()[:overlap]
+    # Nothing past the first 8000 characters is dropped
+    assert chunks[-1].text.split()[-1] == "w1999"
+    assert set(" ".join(chunk.text for chunk in chunks).split()) == set(text.split())
+
+
+def test_chunk_limits(word_windows):
+    assert len(chunk_text(document(5000), chunk_tokens=100, overlap_tokens=10, max_chunks=3)) == 3
+    with pytest.raises(ValueError):
+        chunk_text("text", chunk_tokens=50, overlap_tokens=50)
+
+
+def test_token_windows_with_tiktoken():
+    tiktoken = pytest.importorskip("tiktoken")
+    try:
+        tiktoken.get_encoding(ad02_chunking.EMBEDDING_ENCODING)
+    except Exception:
+        pytest.skip("tiktoken encoding not available offline")
+    text = document(3000)
+    chunks = chunk_text(text, chunk_tokens=200, overlap_tokens=20)
+    assert len(chunks) > 1 and all(chunk.tokens <= 200 for chunk in chunks)
+    assert chunks[-1].text.endswith("w2999")
+
+
+def fake_embeddings_client(calls):
+    """Stands in for the OpenAI client, returning each batch out of order"""
+    def create(model, input):
+        calls.append(list(input))
+        data = [types.SimpleNamespace(index=i, embedding=[float(len(text)), float(i)])
+                for i, text in enumerate(input)]
+        return types.SimpleNamespace(data=list(reversed(data)), usage=None)
+    return types.SimpleNamespace(embeddings=types.SimpleNamespace(create=create))
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    pytest.importorskip("openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from a_core.d_ai.ad01_analyzer import AIAnalyzer
+    return AIAnalyzer()
+
+
+def test_embeddings_are_packed_into_few_requests(analyzer, monkeypatch):
+    from a_core.d_ai import ad01_analyzer
+    
+    calls = []
+    analyzer.client = fake_embeddings_client(calls)
+    monkeypatch.setattr(ad01_analyzer, "EMBEDDING_BATCH_INPUTS", 4)
+    monkeypatch.setattr(ad01_analyzer, "EMBEDDING_BATCH_TOKENS", 100)
+    
+    texts = [f"text {i}" for i in range(10)]
+    embeddings = analyzer.generate_embeddings(texts, token_counts=[10] * 6 + [60] * 4)
+    # Four inputs per request, and never past 100 tokens
+    assert [len(call) for call in calls] == [4, 3, 1, 1, 1]
+    # Results come back in input order whatever order the API used
+    assert [call_text for call in calls for call_text in call] == texts
+    assert [embedding[0] for embedding in embeddings] == [float(len(text)) for text in texts]
+
+
+def test_embed_chunks_embeds_every_window(analyzer, word_windows):
+    calls = []
+    analyzer.client = fake_embeddings_client(calls)
+    chunks, embeddings = analyzer.embed_chunks(document(3000))
+    assert len(chunks) == len(embeddings) > 1
+    assert len(calls) == 1
+    assert analyzer.embed_chunks("   ") == ([], [])
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector
+
+
+def test_search_documents_pools_chunks_per_document(make_vector_storage):
+    storage = make_vector_storage(VECTOR_ANN="off")
+    near = storage.upsert_document("/docs/near.pdf", [unit(1, 0.1), unit(0, 1), unit(1, 0.2)],
+                                   ["c0", "c1", "c2"], {"event_type": "created"},
+                                   [{"char_start": i * 10, "char_end": i * 10 + 10} for i in range(3)])
+    one = storage.upsert_document("/docs/one.txt", [unit(1, 0.15)], ["only"], {})
+    single = storage.store_embedding(list(unit(0.2, 1)), "unchunked", {"file_path": "/docs/legacy.txt"})
+    query = unit(1, 0)
+    
+    documents = storage.search_documents(query, limit=5)
+    assert [document['id'] for document in documents] == [near, one, single]
+    best = documents[0]
+    assert (best['matched_chunks'], best['best_chunk_index'], best['content']) == (3, 0, "c0")
+    assert best['metadata']['parent_id'] == near and best['metadata']['chunk_count'] == 3
+    assert best['metadata']['char_start'] == 0 and best['metadata']['event_type'] == "created"
+    assert documents[2]['matched_chunks'] == 1 and documents[2]['best_chunk_index'] == 0
+    
+    # Mean pooling lets the off-topic chunk pull the long document down
+    mean = storage.search_documents(query, limit=5, pooling="mean")
+    assert [document['id'] for document in mean][:2] == [one, near]
+    chunk_distances = [hit['distance'] for hit in storage.search_similar(query, limit=10)
+                       if hit['metadata'].get('parent_id') == near]
+    assert mean[1]['distance'] == pytest.approx(sum(chunk_distances) / 3)
+    
+    # limit counts documents, not chunks
+    assert len(storage.search_documents(query, limit=1)) == 1
+    with pytest.raises(ValueError):
+        storage.search_documents(query, pooling="median")
+
+
+def test_upsert_replaces_a_documents_chunks(make_vector_storage):
+    storage = make_vector_storage(VECTOR_ANN="off")
+    old = storage.upsert_document("/docs/a.txt", [unit(1), unit(0, 1)], ["old 0", "old 1"], {})
+    new = storage.upsert_document("/docs/a.txt", [unit(1, 1)], ["new"], {})
+    assert new != old
+    assert storage.get_total_embeddings() == 1
+    assert [document['id'] for document in storage.search_documents(unit(1), limit=5)] == [new]
+    with pytest.raises(ValueError):
+        storage.store_document_chunks([], [], {"file_path": "/docs/empty.txt"})
@@ -0,0 +1,65 @@
+import pytest
+
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data import af04_content_store as content_store
+from a_core.f_data.af02_migrations import run_migrations
+
+
+@pytest.mark.parametrize("text", ["", "short text", "ünïcode " * 200, "x" * 10000])
+def test_encode_round_trip(text):
+    encoding, data = content_store.encode_content(text)
+    assert content_store.decode_content(encoding, data) == text
+    if len(text) >= content_store.COMPRESSION_THRESHOLD and len(set(text)) < 20:
+        assert encoding == "zlib" and len(data) < len(text.encode("utf-8"))
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        content_store.decode_content("lz4", b"")
+
+
+def blob_count(db_manager):
+    with db_manager.pool.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0]
+
+
+def test_identical_content_shares_one_blob(db_manager, store_analysis):
+    text = "The same extracted text. " * 100
+    store_analysis("/docs/a.txt", content=text)
+    store_analysis("/docs/copy-of-a.txt", content=text)
+    
+    assert blob_count(db_manager) == 1
+    assert db_manager.get_file_content("/docs/copy-of-a.txt") == text
+    with db_manager.pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM file_analysis WHERE content IS NOT NULL").fetchone()[0] == 0
+
+
+def test_orphan_sweep_keeps_blobs_still_referenced(db_manager, store_analysis):
+    store_analysis("/docs/a.txt", content="first version")
+    store_analysis("/docs/a.txt", content="second version")
+    context_text = "summary kept only by document_context"
+    with db_manager.pool.transaction() as conn:
+        content_store.put_contents(conn.cursor(), {content_store.content_hash(context_text): context_text})
+    db_manager.store_document_context("/docs/b.txt", [], "summary", [],
+                                      content_hash=content_store.content_hash(context_text))
+    
+    assert db_manager.delete_orphan_content() == 1
+    assert db_manager.get_file_content("/docs/a.txt") == "second version"
+    with db_manager.pool.read() as conn:
+        assert content_store.get_content(conn, content_store.content_hash(context_text)) == context_text
+
+
+def test_migration_moves_inline_content_into_blobs(db_path):
+    run_migrations(db_path, target_version=7)
+    with get_pool(db_path).transaction() as conn:
+        conn.executemany("""
+            INSERT INTO file_analysis (file_path, original_name, suggested_name, content) VALUES (?, ?, ?, ?)
+        """, [("/a", "a", "a", "shared text"), ("/b", "b", "b", "shared text"), ("/c", "c", "c", None)])
+    run_migrations(db_path)
+    
+    with get_pool(db_path).read() as conn:
+        rows = conn.execute("SELECT file_path, content, content_hash FROM file_analysis ORDER BY id").fetchall()
+        assert rows == [("/a", None, content_store.content_hash("shared text")),
+                        ("/b", None, content_store.content_hash("shared text")),
+                        ("/c", None, None)]
+        assert conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0] == 1
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+
+import pytest
+
+from a_core.e_utils.ae04_db_pool import ConnectionPool, get_pool
+
+
+def test_connections_are_wal_and_reused_per_thread(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    conn = pool.connection()
+    
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert pool.connection() is conn
+    
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_get_pool_is_shared_per_file(tmp_path):
+    path = tmp_path / "shared.db"
+    assert get_pool(str(path)) is get_pool(str(tmp_path / "." / "shared.db"))
+    assert get_pool(str(path)) is not get_pool(str(tmp_path / "other.db"))
+
+
+def test_relative_path_survives_a_change_of_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = ConnectionPool("data/relative.db")
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    
+    # A thread connecting after the working directory moved still opens the same file
+    monkeypatch.chdir(tmp_path.parent)
+    tables = []
+    thread = threading.Thread(target=lambda: tables.extend(pool.connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()))
+    thread.start()
+    thread.join()
+    assert tables == [("t",)]
+    assert not (tmp_path.parent / "data" / "relative.db").exists()
+
+
+def test_transaction_commits_and_rolls_back(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "tx.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.execute("INSERT INTO items VALUES ('kept')")
+    
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('dropped')")
+            raise RuntimeError("abort")
+    
+    with pool.read() as conn:
+        assert [row[0] for row in conn.execute("SELECT name FROM items")] == ["kept"]
+
+
+def test_nested_transactions_join_the_outer_one(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "nested.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('outer')")
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO items VALUES ('inner')")
+            raise RuntimeError("abort")
+    
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_failed_commit_rolls_back(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "commit.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE parents (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE children (parent_id INTEGER "
+                     "REFERENCES parents (id) DEFERRABLE INITIALLY DEFERRED)")
+    
+    # The deferred foreign key is only checked, and fails, at COMMIT
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO children VALUES (1)")
+    assert not conn.in_transaction
+    
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO parents VALUES (1)")
+        conn.execute("INSERT INTO children VALUES (1)")
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 1
+
+
+def test_readers_see_committed_data_during_a_write(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "wal.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.execute("INSERT INTO items VALUES ('committed')")
+    
+    seen = []
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('uncommitted')")
+        reader = threading.Thread(target=lambda: seen.append(
+            pool.connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        ))
+        reader.start()
+        reader.join(timeout=5)
+    
+    assert seen == [1]
+
+
+def test_close_all_closes_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "close.db"))
+    conn = pool.connection()
+    pool.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.connection() is not conn
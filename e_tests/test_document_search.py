@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture
+def documents(db_manager, store_analysis):
+    if not db_manager.fts_enabled:
+        pytest.skip("SQLite build without FTS5")
+    store_analysis("/docs/invoice.pdf", content="Invoice for consulting services rendered in March")
+    store_analysis("/docs/contract.docx", content="Consulting contract with payment terms")
+    store_analysis("/docs/notes.txt", content="Grocery list: apples, bread")
+    return db_manager
+
+
+def paths(results):
+    return [result['file_path'] for result in results]
+
+
+def test_all_terms_must_match_by_default(documents):
+    assert paths(documents.search_documents("consulting invoice")) == ["/docs/invoice.pdf"]
+    assert set(paths(documents.search_documents("consulting invoice", match_any=True))) == {
+        "/docs/invoice.pdf", "/docs/contract.docx"
+    }
+
+
+def test_results_are_ranked_and_scored(documents):
+    results = documents.search_documents("consulting")
+    assert set(paths(results)) == {"/docs/invoice.pdf", "/docs/contract.docx"}
+    assert [result['bm25'] for result in results] == sorted(result['bm25'] for result in results)
+    assert all(0 < result['similarity_score'] < 1 for result in results)
+
+
+def test_porter_stemming_and_quoting(documents):
+    assert paths(documents.search_documents("rendering")) == ["/docs/invoice.pdf"]
+    # FTS5 syntax in the query is matched as text, not parsed
+    assert paths(documents.search_documents('apples" bread*')) == ["/docs/notes.txt"]
+    assert paths(documents.search_documents("NEAR(apples")) == []
+
+
+def test_keywords_and_renames_stay_in_sync(documents):
+    documents.store_document_context("/docs/notes.txt", [], "summary", ["shopping"])
+    assert paths(documents.search_documents("shopping")) == ["/docs/notes.txt"]
+    
+    with documents.pool.transaction() as conn:
+        conn.execute("UPDATE file_analysis SET suggested_name = 'weekly groceries' WHERE file_path = '/docs/notes.txt'")
+    assert paths(documents.search_documents("weekly")) == ["/docs/notes.txt"]
+
+
+def test_restored_content_replaces_the_search_row(documents, store_analysis):
+    store_analysis("/docs/notes.txt", content="Meeting agenda")
+    assert documents.search_documents("grocery") == []
+    assert paths(documents.search_documents("agenda")) == ["/docs/notes.txt"]
+
+
+def test_related_documents_match_any_keyword(documents):
+    assert set(paths(documents.search_related_documents(["payment", "apples"]))) == {
+        "/docs/contract.docx", "/docs/notes.txt"
+    }
@@ -0,0 +1,207 @@
+import functools
+import json
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from a_core.a_fileflow import aa014_vector_storage
+from a_core.a_fileflow.aa014_vector_storage import FAISS_DIMENSIONS
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af02_migrations import FAISS_METADATA_MIGRATIONS, MigrationRunner
+
+
+@pytest.fixture
+def random_vectors(random_vectors):
+    """conftest's random_vectors at the FAISS index's dimensions"""
+    return functools.partial(random_vectors, dim=FAISS_DIMENSIONS)
+
+
+def row_ids(storage):
+    with storage.metadata_pool.read() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM vector_metadata ORDER BY id")]
+
+
+def test_index_ids_are_metadata_row_ids(make_vector_storage, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    assert storage._backend_name() == "faiss"
+    vectors = random_vectors(20)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 20, [{"i": i} for i in range(20)])
+    
+    assert sorted(faiss.vector_to_array(storage.faiss_index.id_map)) == row_ids(storage)
+    query = vectors[4] + 0.01
+    hit = storage.search_similar(query, limit=1)[0]
+    assert hit['id'] == vector_ids[4] and hit['metadata'] == {"i": 4}
+    # IndexFlatL2 reports squared L2 distances
+    assert hit['distance'] == pytest.approx(float(np.sum((query - vectors[4]) ** 2)), rel=1e-4)
+
+
+def test_hits_stay_correct_after_deletes_and_compaction(make_vector_storage, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    vectors = random_vectors(20, seed=1)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 20, [{}] * 20)
+    
+    assert storage.delete_embedding(vector_ids[3])
+    assert vector_ids[3] not in [hit['id'] for hit in storage.search_similar(vectors[3], limit=20)]
+    assert storage.search_similar(vectors[4], limit=1)[0]['id'] == vector_ids[4]
+    
+    storage.compact()
+    assert storage.faiss_index.ntotal == 19
+    # Positions shifted inside the index, the ids did not
+    for i in (0, 4, 19):
+        assert storage.search_similar(vectors[i], limit=1)[0]['id'] == vector_ids[i]
+
+
+def test_tombstones_are_excluded_inside_the_search(make_vector_storage, monkeypatch, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    vectors = random_vectors(20, seed=6)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 20, [{}] * 20)
+    for vector_id in vector_ids[:5]:
+        assert storage.delete_embedding(vector_id)
+    
+    calls = []
+    search = storage.faiss_index.search
+    monkeypatch.setattr(storage.faiss_index, "search",
+                        lambda x, k, **kwargs: calls.append((k, kwargs)) or search(x, k, **kwargs))
+    hits = [hit['id'] for hit in storage.search_similar(vectors[0], limit=10)]
+    assert len(hits) == 10 and not set(hits) & set(vector_ids[:5])
+    # k is not widened by the number of tombstones
+    assert [k for k, _ in calls] == [10] and calls[0][1]["params"].sel is not None
+
+
+def test_rows_past_the_last_checkpoint_are_replayed(make_vector_storage, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    vectors = random_vectors(10, seed=2)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 10, [{}] * 10)
+    # Below the checkpoint threshold the file still holds the empty index
+    assert storage._faiss_unsaved == 10
+    
+    reopened = make_vector_storage(backend="faiss")
+    assert reopened.faiss_index.ntotal == 10
+    assert reopened.search_similar(vectors[7], limit=1)[0]['id'] == vector_ids[7]
+
+
+def test_updates_count_toward_the_next_checkpoint(make_vector_storage, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    vectors = random_vectors(10, seed=3)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 10, [{}] * 10)
+    target = random_vectors(1, seed=4)[0]
+    
+    assert storage.update_embedding(vector_ids[2], list(target))
+    # The new version was appended, not written out with the whole index
+    assert storage._faiss_unsaved == 11
+    assert storage.faiss_index.ntotal == 11
+    
+    reopened = make_vector_storage(backend="faiss")
+    hit = reopened.search_similar(target, limit=1)[0]
+    assert hit['id'] == vector_ids[2] and hit['distance'] == pytest.approx(0, abs=1e-4)
+    assert reopened.get_total_embeddings() == 10
+    assert reopened.compact()["removed"] == 1
+
+
+def test_positional_index_is_rekeyed(make_vector_storage, tmp_path, random_vectors):
+    directory = tmp_path / "vector_db"
+    directory.mkdir()
+    vectors = random_vectors(8, seed=3)
+    
+    # metadata.db and faiss_index.bin as written before IndexIDMap2
+    pool = get_pool(str(directory / "metadata.db"))
+    MigrationRunner(pool, FAISS_METADATA_MIGRATIONS).run(target_version=1)
+    with pool.transaction() as conn:
+        conn.executemany("INSERT INTO vector_metadata (vector_id, content, metadata) VALUES (?, ?, ?)",
+                         [(f"vec_{i}", f"doc {i}", json.dumps({"i": i})) for i in range(8)])
+    legacy = faiss.IndexFlatL2(FAISS_DIMENSIONS)
+    legacy.add(vectors)
+    faiss.write_index(legacy, str(directory / "faiss_index.bin"))
+    
+    storage = make_vector_storage(backend="faiss")
+    assert isinstance(storage.faiss_index, faiss.IndexIDMap2)
+    assert sorted(faiss.vector_to_array(storage.faiss_index.id_map)) == row_ids(storage)
+    for i in range(8):
+        assert storage.search_similar(vectors[i], limit=1)[0]['id'] == f"vec_{i}"
+    with storage.metadata_pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vector_metadata WHERE embedding IS NULL").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("kind, code_size", [("int8", FAISS_DIMENSIONS), ("pq", FAISS_DIMENSIONS // 8)])
+def test_quantized_index_is_trained_once_enough_rows_exist(make_vector_storage, monkeypatch, kind, code_size, random_vectors):
+    monkeypatch.setattr(aa014_vector_storage, "FAISS_QUANTIZE_MIN_ROWS", 1000)
+    monkeypatch.setattr(aa014_vector_storage, "PQ_TRAIN_SAMPLE", 1100)
+    storage = make_vector_storage(backend="faiss", VECTOR_QUANTIZATION=kind, VECTOR_ANN_NPROBE=100000)
+    vectors = random_vectors(1200, seed=5)
+    vector_ids = storage.store_embeddings_batch(vectors[:999], ["doc"] * 999, [{}] * 999)
+    # Too few rows to train on: the index stays exact
+    assert not storage.maybe_retrain()
+    assert storage._faiss_index_quantization() == "none"
+    
+    vector_ids += storage.store_embeddings_batch(vectors[999:], ["doc"] * 201, [{}] * 201)
+    # Stores never train; the maintenance pass does, on a bounded sample
+    assert storage._faiss_index_quantization() == "none"
+    trained_on = []
+    new_index = storage._new_faiss_index
+    monkeypatch.setattr(storage, "_new_faiss_index",
+                        lambda sample, count: trained_on.append((len(sample), count)) or new_index(sample, count))
+    assert storage.maybe_retrain()
+    assert trained_on == [(1100, 1200)]
+    assert storage._faiss_index_quantization() == kind
+    assert faiss.extract_index_ivf(storage.faiss_index).code_size == code_size
+    assert storage.faiss_index.ntotal == 1200
+    
+    # Hits are re-ranked to the exact squared L2 distances
+    query = vectors[42] + 0.01
+    hit = storage.search_similar(query, limit=1)[0]
+    assert hit['id'] == vector_ids[42]
+    assert hit['distance'] == pytest.approx(float(np.sum((query - vectors[42]) ** 2)), rel=1e-4)
+    
+    # The masked search path re-ranks too
+    monkeypatch.setattr(aa014_vector_storage, "FILTER_FIRST_MAX_ROWS", 10)
+    storage.delete_embedding(vector_ids[0])
+    allowed = np.array(row_ids(storage)[1:100], dtype=np.int64)
+    hits = storage._search_faiss_masked([query], 1, allowed)
+    assert [int(row_id) for row_id in hits[0][0]] == [row_ids(storage)[42]]
+    
+    storage.checkpoint()
+    assert make_vector_storage(backend="faiss")._faiss_index_quantization() == kind
+
+
+def test_changing_the_quantization_rebuilds_the_index(make_vector_storage, monkeypatch, random_vectors):
+    monkeypatch.setattr(aa014_vector_storage, "FAISS_QUANTIZE_MIN_ROWS", 500)
+    storage = make_vector_storage(backend="faiss", VECTOR_QUANTIZATION="int8")
+    vectors = random_vectors(600, seed=6)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 600, [{}] * 600)
+    assert storage.maybe_retrain()
+    assert storage._faiss_index_quantization() == "int8"
+    
+    reopened = make_vector_storage(backend="faiss", VECTOR_QUANTIZATION="none")
+    assert reopened._backend_name() == "faiss"
+    assert reopened._faiss_index_quantization() == "none"
+    assert reopened.faiss_index.ntotal == 600
+    assert reopened.search_similar(vectors[7], limit=1)[0]['id'] == vector_ids[7]
+
+
+def test_quantized_index_is_retrained_once_it_outgrows_its_lists(make_vector_storage, monkeypatch, random_vectors):
+    monkeypatch.setattr(aa014_vector_storage, "FAISS_QUANTIZE_MIN_ROWS", 500)
+    monkeypatch.setattr(aa014_vector_storage, "RETRAIN_GROWTH", 2)
+    storage = make_vector_storage(backend="faiss", VECTOR_QUANTIZATION="int8")
+    vectors = random_vectors(1100, seed=7)
+    storage.store_embeddings_batch(vectors[:500], ["doc"] * 500, [{}] * 500)
+    assert storage.maybe_retrain()
+    nlist = faiss.extract_index_ivf(storage.faiss_index).nlist
+    
+    storage.store_embeddings_batch(vectors[500:900], ["doc"] * 400, [{}] * 400)
+    assert not storage.maybe_retrain()
+    storage.store_embeddings_batch(vectors[900:], ["doc"] * 200, [{}] * 200)
+    assert storage.maybe_retrain()
+    assert faiss.extract_index_ivf(storage.faiss_index).nlist > nlist
+    assert storage.faiss_index.ntotal == 1100
+
+
+def test_unknown_quantization_is_logged_without_leaving_faiss(make_vector_storage, monkeypatch):
+    logged = []
+    monkeypatch.setattr(aa014_vector_storage.LoggingUtils, "log_activity",
+                        lambda self, activity_type, *args, **kwargs: logged.append(activity_type))
+    storage = make_vector_storage(backend="faiss", VECTOR_QUANTIZATION="int4")
+    assert storage._backend_name() == "faiss"
+    assert storage.faiss_quantization == "none"
+    assert "vector_storage_config_error" in logged and "vector_storage_init_error" not in logged
@@ -0,0 +1,72 @@
+import json
+
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af02_migrations import run_migrations
+
+
+def linked_entities(db_manager, file_path):
+    with db_manager.pool.read() as conn:
+        return sorted(row[0] for row in conn.execute("""
+            SELECT e.entity_name FROM file_entities fe
+            JOIN entities e ON e.id = fe.entity_id
+            JOIN file_analysis fa ON fa.id = fe.file_id
+            WHERE fa.file_path = ?
+        """, (file_path,)))
+
+
+def test_entity_lookups_go_through_the_join_table(db_manager, store_analysis):
+    store_analysis("/docs/a.txt", entities=["Acme", "Bob"])
+    store_analysis("/docs/b.txt", entities=["Acme"])
+    store_analysis("/docs/c.txt", entities=["Carol"])
+    
+    assert {row['file_path'] for row in db_manager.search_documents_by_entity("Acme")} == {
+        "/docs/a.txt", "/docs/b.txt"
+    }
+    # Substrings of other names no longer match, as they did with LIKE over JSON
+    assert db_manager.search_documents_by_entity("Acm") == []
+    assert db_manager.get_cooccurring_entities("Acme") == [{'entity_name': "Bob", 'shared_files': 1}]
+
+
+def test_restoring_a_file_replaces_its_links(db_manager, store_analysis):
+    store_analysis("/docs/a.txt", entities=["Acme", "Bob"])
+    store_analysis("/docs/a.txt", entities=["Carol", "Carol"])
+    
+    assert linked_entities(db_manager, "/docs/a.txt") == ["Carol"]
+    assert db_manager.search_documents_by_entity("Acme") == []
+
+
+def test_entity_search_uses_the_entity_index(db_manager):
+    with db_manager.pool.read() as conn:
+        plan = " ".join(row[3] for row in conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT fa.file_path FROM entities e
+            JOIN file_entities fe ON fe.entity_id = e.id
+            JOIN file_analysis fa ON fa.id = fe.file_id
+            WHERE e.entity_name = 'Acme'
+        """))
+    assert "idx_file_entities_entity" in plan or "PRIMARY KEY" in plan
+    assert "SCAN fe" not in plan
+
+
+def test_migration_backfills_links_from_json_entities(db_path):
+    run_migrations(db_path, target_version=1)
+    with get_pool(db_path).transaction() as conn:
+        conn.executemany("""
+            INSERT INTO file_analysis (file_path, original_name, suggested_name, entities)
+            VALUES (?, ?, ?, ?)
+        """, [("/docs/a.txt", "a.txt", "a.txt", json.dumps(["Acme", "Bob"])),
+              ("/docs/b.txt", "b.txt", "b.txt", json.dumps(["Acme"])),
+              ("/docs/c.txt", "c.txt", "c.txt", "not json")])
+    
+    run_migrations(db_path, target_version=2)
+    
+    with get_pool(db_path).read() as conn:
+        links = conn.execute("""
+            SELECT fa.file_path, e.entity_name FROM file_entities fe
+            JOIN entities e ON e.id = fe.entity_id
+            JOIN file_analysis fa ON fa.id = fe.file_id
+            ORDER BY 1, 2
+        """).fetchall()
+        usage = dict(conn.execute("SELECT entity_name, usage_count FROM entities"))
+    assert links == [("/docs/a.txt", "Acme"), ("/docs/a.txt", "Bob"), ("/docs/b.txt", "Acme")]
+    assert usage == {"Acme": 2, "Bob": 1}
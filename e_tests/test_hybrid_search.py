@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from a_core.a_fileflow.aa020_hybrid_search import RRF_K, HybridSearch
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return list(vector)
+
+
+# Query embedding used throughout; distances grow down the list
+QUERY = unit(1, 0)
+
+
+@pytest.fixture
+def search(db_manager, store_analysis, make_vector_storage):
+    if not db_manager.fts_enabled:
+        pytest.skip("SQLite build without FTS5")
+    storage = make_vector_storage(VECTOR_ANN="off")
+    documents = [
+        # path, content, entities, embedding
+        ("/docs/invoice.pdf", "Invoice INV-20931 for consulting", ["Acme"], unit(1, 0.1)),
+        ("/docs/bill.pdf", "Amount owed for advisory work", ["Acme"], unit(1, 0.2)),
+        ("/docs/ledger.xlsx", "Ledger listing INV-20931 and others", ["Globex"], unit(0, 1)),
+        ("/docs/recipe.txt", "Bread recipe", [], unit(-1, 0)),
+    ]
+    for path, content, entities, embedding in documents:
+        store_analysis(path, content=content, entities=entities)
+        storage.upsert_document(path, [embedding], [content], {"entities": entities,
+                                                               "suggested_name": "renamed"})
+    hybrid = HybridSearch(db_manager, storage)
+    yield hybrid
+    hybrid.close()
+
+
+def paths(results):
+    return [result['file_path'] for result in results]
+
+
+def test_rrf_fuses_both_lists(search):
+    results = search.search("INV-20931", limit=10, query_embedding=QUERY)
+    by_path = {result['file_path']: result for result in results}
+    
+    # Found by both legs beats found by one
+    assert paths(results)[0] == "/docs/invoice.pdf"
+    invoice = by_path["/docs/invoice.pdf"]
+    assert invoice['lexical_rank'] is not None and invoice['vector_rank'] == 1
+    assert invoice['score'] == pytest.approx(1 / (RRF_K + invoice['lexical_rank']) + 1 / (RRF_K + 1))
+    # The paraphrase only the vector leg finds is still returned
+    bill = by_path["/docs/bill.pdf"]
+    assert bill['lexical_rank'] is None and bill['vector_rank'] == 2
+    assert bill['distance'] >= 0 and bill['vector_id']
+    assert [result['score'] for result in results] == sorted((result['score'] for result in results), reverse=True)
+
+
+def test_weights_shift_the_ranking(search):
+    lexical = search.search("INV-20931", limit=10, query_embedding=QUERY, vector_weight=0.0)
+    assert set(paths(lexical)[:2]) == {"/docs/invoice.pdf", "/docs/ledger.xlsx"}
+    semantic = search.search("INV-20931", limit=10, query_embedding=QUERY, lexical_weight=0.0)
+    assert paths(semantic)[:2] == ["/docs/invoice.pdf", "/docs/bill.pdf"]
+
+
+def test_weighted_fusion_normalizes_scores(search):
+    results = search.search("INV-20931", limit=10, query_embedding=QUERY, fusion="weighted")
+    assert paths(results)[0] == "/docs/invoice.pdf"
+    assert results[0]['score'] == pytest.approx(2.0)
+    assert all(0.0 <= result['score'] <= 2.0 for result in results)
+
+
+def test_filters_apply_to_both_legs(search):
+    results = search.search("INV-20931", limit=10, query_embedding=QUERY, entity="Acme")
+    assert set(paths(results)) == {"/docs/invoice.pdf", "/docs/bill.pdf"}
+    results = search.search("INV-20931", limit=10, query_embedding=QUERY, extensions=["xlsx"])
+    assert paths(results) == ["/docs/ledger.xlsx"]
+    assert search.search("INV-20931", query_embedding=QUERY, entity="Nobody") == []
+
+
+def test_limit_and_one_leg_queries(search):
+    assert len(search.search("INV-20931", limit=1, query_embedding=QUERY)) == 1
+    # Without an analyzer a text query only runs the lexical leg
+    assert all(result['vector_rank'] is None for result in search.search("INV-20931"))
+    # An embedding alone only runs the vector leg
+    assert all(result['lexical_rank'] is None for result in search.search("", query_embedding=QUERY))
+    # A zero vector is what a failed embedding call returns
+    assert all(result['vector_rank'] is None
+               for result in search.search("INV-20931", query_embedding=[0.0] * 8))
+    assert search.search("   ") == []
+
+
+def test_vector_failure_falls_back_to_lexical(search, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("index unavailable")
+    monkeypatch.setattr(search.vector_storage, "search_documents", broken)
+    results = search.search("INV-20931", limit=10, query_embedding=QUERY)
+    assert set(paths(results)) == {"/docs/invoice.pdf", "/docs/ledger.xlsx"}
+
+
+def test_each_file_appears_once(search):
+    # An older analysis of the same file left a second vector document behind
+    search.vector_storage.store_embedding(unit(1, 0.05), "older copy", {"file_path": "/docs/invoice.pdf"})
+    results = search.search("", limit=10, query_embedding=QUERY)
+    assert paths(results).count("/docs/invoice.pdf") == 1
+
+
+def test_bad_arguments(search):
+    with pytest.raises(ValueError):
+        search.search("x", fusion="borda")
+    with pytest.raises(ValueError):
+        search.search("x", file_paths=["/docs/invoice.pdf"])
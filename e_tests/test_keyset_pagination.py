@@ -0,0 +1,70 @@
+import json
+
+
+def insert_pending_files(db_manager, count):
+    # Groups of rows share a created_at, so the id tiebreaker matters
+    with db_manager.pool.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO file_analysis (file_path, original_name, suggested_name, status, created_at)
+            VALUES (?, ?, ?, 'pending', ?)
+        """, [(f"/docs/{i}.txt", f"{i}.txt", f"{i}.txt", f"2024-01-01 00:00:{i // 7:02d}")
+              for i in range(count)])
+
+
+def collect_pages(fetch_page, page_size, **kwargs):
+    pages, before = [], None
+    while True:
+        rows, before = fetch_page(limit=page_size, before=before, **kwargs)
+        pages.append(rows)
+        if before is None:
+            return pages
+
+
+def test_pending_review_pages_cover_every_row_once_in_order(db_manager):
+    insert_pending_files(db_manager, 53)
+    pages = collect_pages(db_manager.get_pending_reviews_page, 10)
+    
+    assert [len(page) for page in pages] == [10, 10, 10, 10, 10, 3]
+    rows = [row for page in pages for row in page]
+    with db_manager.pool.read() as conn:
+        expected = [row[0] for row in conn.execute(
+            "SELECT id FROM file_analysis ORDER BY created_at DESC, id DESC"
+        )]
+    assert [row['id'] for row in rows] == expected
+    assert [row['id'] for row in db_manager.iter_pending_reviews(page_size=7)] == expected
+
+
+def test_timeline_pages_filter_by_type(db_manager):
+    with db_manager.pool.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO activity_log (activity_type, description, metadata, timestamp)
+            VALUES (?, ?, ?, ?)
+        """, [("test_event" if i % 2 else "other_event", f"event {i}", json.dumps({"i": i}),
+               f"2024-01-01T00:00:{i // 3:02d}") for i in range(40)])
+    
+    rows = list(db_manager.iter_activity_timeline(days=None, page_size=6, activity_types=["test_event"]))
+    assert [row['metadata']['i'] for row in rows] == list(range(39, 0, -2))
+
+
+def test_entity_pages_follow_usage_order(db_manager):
+    with db_manager.pool.transaction() as conn:
+        conn.executemany("INSERT INTO entities (entity_name, variations, usage_count) VALUES (?, '[]', ?)",
+                         [(f"entity{i}", i % 4) for i in range(25)])
+    rows = list(db_manager.iter_entities(page_size=4))
+    assert len({row['id'] for row in rows}) == 25
+    assert [(row['usage_count'], row['id']) for row in rows] == sorted(
+        ((row['usage_count'], row['id']) for row in rows), reverse=True)
+
+
+def test_page_queries_seek_an_index_without_sorting(db_manager):
+    queries = [
+        "SELECT id FROM file_analysis WHERE status = 'pending' AND (created_at, id) < ('x', 1) "
+        "ORDER BY created_at DESC, id DESC LIMIT 10",
+        "SELECT id FROM activity_log WHERE activity_type IN ('a') AND (timestamp, id) < ('x', 1) "
+        "ORDER BY timestamp DESC, id DESC LIMIT 10",
+        "SELECT id FROM entities WHERE (usage_count, id) < (1, 1) ORDER BY usage_count DESC, id DESC LIMIT 10",
+    ]
+    with db_manager.pool.read() as conn:
+        for query in queries:
+            plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query))
+            assert "USING" in plan and "TEMP B-TREE" not in plan, plan
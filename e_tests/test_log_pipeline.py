@@ -0,0 +1,155 @@
+import io
+import json
+import logging
+import threading
+from pathlib import Path
+
+import pytest
+
+from a_core.e_utils.ae02_logging_utils import LoggingUtils
+from a_core.e_utils import ae06_log_pipeline
+from a_core.e_utils.ae06_log_pipeline import JSONLSink, LogPipeline, LogSink, StdoutSink, set_log_pipeline
+
+
+class ListSink(LogSink):
+    """Keeps every batch it is given; optionally holds the writer on the first one"""
+    
+    def __init__(self, level=logging.NOTSET, hold=False):
+        super().__init__(level)
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+    
+    def write_batch(self, records):
+        self.entered.set()
+        self.release.wait(5)
+        self.batches.append(list(records))
+    
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+
+def record(activity_type="event", description="", level=logging.INFO):
+    return (level, activity_type, description, None, "2024-01-01T00:00:00")
+
+
+def test_records_reach_the_sinks_in_batches():
+    sink = ListSink()
+    pipeline = LogPipeline([sink], batch_size=10, flush_interval=60)
+    try:
+        for i in range(25):
+            assert pipeline.enqueue(record(description=str(i)))
+        assert pipeline.flush(timeout=5)
+        assert [r[2] for r in sink.records] == [str(i) for i in range(25)]
+        assert max(len(batch) for batch in sink.batches) <= 10
+    finally:
+        pipeline.close()
+
+
+def test_levels_filter_per_pipeline_and_sink():
+    everything, errors = ListSink(), ListSink(level=logging.ERROR)
+    pipeline = LogPipeline([everything, errors], level=logging.INFO)
+    try:
+        assert not pipeline.enqueue(record(level=logging.DEBUG))
+        pipeline.enqueue(record("info"))
+        pipeline.enqueue(record("failure_error", level=logging.ERROR))
+        pipeline.flush(timeout=5)
+        assert [r[1] for r in everything.records] == ["info", "failure_error"]
+        assert [r[1] for r in errors.records] == ["failure_error"]
+    finally:
+        pipeline.close()
+
+
+@pytest.mark.parametrize("overflow, kept", [("drop_newest", ["held", "0", "1"]),
+                                            ("drop_oldest", ["held", "3", "4"])])
+def test_overflow_drops_are_counted_and_reported(overflow, kept):
+    sink = ListSink(hold=True)
+    pipeline = LogPipeline([sink], queue_size=2, overflow=overflow, batch_size=1, flush_interval=0.01)
+    try:
+        pipeline.enqueue(record(description="held"))
+        assert sink.entered.wait(5)
+        for i in range(5):
+            pipeline.enqueue(record(description=str(i)))
+        assert pipeline.dropped == 3
+        
+        sink.release.set()
+        pipeline.flush(timeout=5)
+        assert [r[2] for r in sink.records if r[1] == "event"] == kept
+        dropped = [r for r in sink.records if r[1] == "log_dropped"]
+        assert [r[3]["dropped_count"] for r in dropped] == [3]
+    finally:
+        sink.release.set()
+        pipeline.close()
+
+
+def test_a_failing_sink_does_not_stop_the_others(capsys):
+    class BrokenSink(LogSink):
+        def write_batch(self, records):
+            raise IOError("disk full")
+    
+    sink = ListSink()
+    pipeline = LogPipeline([BrokenSink(), sink])
+    try:
+        pipeline.enqueue(record())
+        pipeline.flush(timeout=5)
+        assert len(sink.records) == 1
+        assert "disk full" in capsys.readouterr().err
+    finally:
+        pipeline.close()
+
+
+def test_close_writes_what_is_queued_and_rejects_more():
+    sink = ListSink()
+    pipeline = LogPipeline([sink], batch_size=100, flush_interval=60)
+    for _ in range(5):
+        pipeline.enqueue(record())
+    pipeline.close()
+    assert len(sink.records) == 5
+    assert not pipeline.enqueue(record())
+
+
+def test_file_and_console_sinks(tmp_path):
+    stream = io.StringIO()
+    jsonl = JSONLSink(str(tmp_path / "logs" / "activity.jsonl"))
+    pipeline = LogPipeline([jsonl, StdoutSink(stream=stream)])
+    pipeline.enqueue((logging.WARNING, "disk_low", "Disk almost full", {"free": 1}, "2024-01-01T00:00:00"))
+    pipeline.close()
+    
+    line = json.loads((tmp_path / "logs" / "activity.jsonl").read_text())
+    assert line == {"timestamp": "2024-01-01T00:00:00", "level": "WARNING", "activity_type": "disk_low",
+                    "description": "Disk almost full", "metadata": {"free": 1}}
+    assert stream.getvalue() == '[2024-01-01T00:00:00] DISK_LOW: Disk almost full {"free": 1}\n'
+
+
+def test_logging_utils_writes_to_activity_log(db_path):
+    logger = LoggingUtils(db_path)
+    for i in range(3):
+        logger.log_activity("test_event", f"event {i}", {"i": i})
+    assert logger.flush(timeout=5)
+    
+    with logger.pool.read() as conn:
+        rows = conn.execute(
+            "SELECT description, metadata FROM activity_log WHERE activity_type = 'test_event' ORDER BY id"
+        ).fetchall()
+    assert [(description, json.loads(metadata)["i"]) for description, metadata in rows] == [
+        ("event 0", 0), ("event 1", 1), ("event 2", 2)
+    ]
+
+
+def test_logging_utils_uses_the_shared_pipeline(db_path):
+    sink = ListSink()
+    pipeline = LogPipeline([sink])
+    set_log_pipeline(db_path, pipeline)
+    try:
+        logger = LoggingUtils(db_path)
+        logger.log_error("parse_error", "Could not parse", {"file": "a.txt"})
+        logger.flush(timeout=5)
+        assert sink.records[0][:3] == (logging.ERROR, "error", "Could not parse")
+        assert sink.records[0][3] == {"error_type": "parse_error", "file": "a.txt"}
+    finally:
+        with ae06_log_pipeline._pipelines_lock:
+            ae06_log_pipeline._pipelines.pop(str(Path(db_path).resolve()))
+        pipeline.close()
@@ -0,0 +1,91 @@
+import logging
+import time
+
+from a_core.e_utils.ae06_log_pipeline import LogPipeline, LogSink
+from a_core.e_utils.ae07_log_sampling import HIGH_FREQUENCY_TYPES, LogSampler, SamplingRule, build_sampler_from_env
+
+
+class ListSink(LogSink):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def write_batch(self, records):
+        self.records.extend(records)
+
+
+def test_first_n_then_every_k_up_to_the_window_cap():
+    sampler = LogSampler({"file_processed": SamplingRule(first_n=3, every_k=5, max_per_window=5,
+                                                         window_seconds=60)})
+    kept = [i for i in range(1, 41) if sampler.sample("file_processed")]
+    # 1-3 in full, then every 5th past first_n until five have been logged
+    assert kept == [1, 2, 3, 8, 13]
+    assert sampler.stats() == {"file_processed": {"seen": 40, "suppressed": 35}}
+
+
+def test_unsampled_types_are_always_kept():
+    sampler = LogSampler({"file_processed": SamplingRule(first_n=0, every_k=1000)})
+    assert all(sampler.sample("error") for _ in range(100))
+    assert sampler.stats() == {}
+
+
+def test_summaries_wait_for_the_window_and_reset_it():
+    sampler = LogSampler({"embedding_stored": SamplingRule(first_n=1, every_k=100, window_seconds=3600)})
+    for _ in range(10):
+        sampler.sample("embedding_stored")
+    assert sampler.collect_summaries() == []
+    
+    (level, activity_type, _, metadata, _), = sampler.collect_summaries(force=True)
+    assert (level, activity_type) == (logging.INFO, "log_suppressed")
+    assert metadata["activity_type"] == "embedding_stored"
+    assert (metadata["suppressed_count"], metadata["seen_count"]) == (9, 10)
+    
+    # The new window logs its first event again and has nothing to report
+    assert sampler.sample("embedding_stored")
+    assert sampler.collect_summaries(force=True) == []
+
+
+def test_expired_window_is_summarized_without_forcing():
+    sampler = LogSampler({"context_updated": SamplingRule(first_n=1, every_k=100, window_seconds=0.05)})
+    sampler.sample("context_updated")
+    sampler.sample("context_updated")
+    assert sampler.collect_summaries() == []
+    time.sleep(0.1)
+    summaries = sampler.collect_summaries()
+    assert [s[3]["suppressed_count"] for s in summaries] == [1]
+
+
+def test_pipeline_writes_sampled_records_and_summary():
+    sink = ListSink()
+    sampler = LogSampler({"file_processed": SamplingRule(first_n=2, every_k=1000, window_seconds=3600)})
+    pipeline = LogPipeline([sink], sampler=sampler)
+    accepted = [pipeline.enqueue((logging.INFO, "file_processed", str(i), None, "t")) for i in range(50)]
+    pipeline.enqueue((logging.INFO, "error", "kept", None, "t"))
+    pipeline.close()
+    
+    assert accepted.count(True) == 2
+    assert [r[2] for r in sink.records if r[1] == "file_processed"] == ["0", "1"]
+    assert [r[2] for r in sink.records if r[1] == "error"] == ["kept"]
+    summary, = [r for r in sink.records if r[1] == "log_suppressed"]
+    assert summary[3]["suppressed_count"] == 48
+    # Suppressed records are not overflow drops
+    assert pipeline.dropped == 0
+
+
+def test_build_sampler_from_env(monkeypatch):
+    monkeypatch.setenv("LOG_SAMPLING", "off")
+    assert build_sampler_from_env() is None
+    
+    monkeypatch.delenv("LOG_SAMPLING")
+    assert set(build_sampler_from_env().rules) == set(HIGH_FREQUENCY_TYPES)
+    
+    monkeypatch.setenv("LOG_SAMPLED_TYPES", "a, b,")
+    monkeypatch.setenv("LOG_SAMPLE_FIRST_N", "7")
+    monkeypatch.setenv("LOG_SAMPLE_EVERY_K", "0")
+    monkeypatch.setenv("LOG_SAMPLE_MAX_PER_WINDOW", "3")
+    monkeypatch.setenv("LOG_SAMPLE_WINDOW", "5")
+    sampler = build_sampler_from_env()
+    assert set(sampler.rules) == {"a", "b"}
+    rule = sampler.rules["a"]
+    # every_k is at least 1 and the cap never undercuts first_n
+    assert (rule.first_n, rule.every_k, rule.max_per_window, rule.window_seconds) == (7, 1, 7, 5.0)
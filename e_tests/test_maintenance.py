@@ -0,0 +1,123 @@
+import gzip
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.e_utils.ae05_maintenance import MaintenanceScheduler, enable_incremental_vacuum
+from a_core.f_data import af03_rollups as rollups
+from a_core.f_data.af02_migrations import run_migrations
+
+
+@pytest.fixture
+def scheduler(db_path, tmp_path):
+    run_migrations(db_path)
+    return MaintenanceScheduler(db_path=db_path, archive_dir=str(tmp_path / "archive"),
+                                days_to_keep=30, chunk_size=3, idle_seconds=0, chunk_pause=0)
+
+
+def add_activity(db_path, timestamps, activity_type="test_event"):
+    with get_pool(db_path).transaction() as conn:
+        conn.executemany(
+            "INSERT INTO activity_log (activity_type, description, metadata, timestamp) VALUES (?, ?, ?, ?)",
+            [(activity_type, f"event {i}", json.dumps({"i": i}), stamp) for i, stamp in enumerate(timestamps)]
+        )
+
+
+def test_aged_rows_move_to_monthly_archives(scheduler, db_path, tmp_path):
+    old = datetime.now() - timedelta(days=60)
+    add_activity(db_path, [old.isoformat()] * 7 + [datetime.now().isoformat()])
+    
+    assert scheduler.archive_old_logs() == 7
+    with get_pool(db_path).read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM activity_log WHERE activity_type = 'test_event'").fetchone()[0] == 1
+    
+    with gzip.open(tmp_path / "archive" / f"activity_log_{old:%Y-%m}.jsonl.gz", "rt") as archive:
+        records = [json.loads(line) for line in archive]
+    assert sorted(record['metadata']['i'] for record in records) == list(range(7))
+
+
+def test_archiving_keeps_the_hourly_rollups(scheduler, db_path):
+    stamp = "2020-01-01T10:00:00"
+    add_activity(db_path, [stamp] * 4)
+    scheduler.archive_old_logs()
+    
+    with get_pool(db_path).read() as conn:
+        assert rollups.read_activity_buckets(conn, None) == [("2020-01-01T10:00:00", "test_event", 4)]
+        assert conn.execute("SELECT COUNT(*) FROM activity_log WHERE timestamp = ?", (stamp,)).fetchone()[0] == 0
+
+
+def test_own_log_records_do_not_reset_the_idle_timer(scheduler, db_path):
+    assert not scheduler.is_idle()
+    scheduler.logger.log_activity("maintenance", "a maintenance pass", {})
+    scheduler.logger.flush(timeout=5)
+    assert scheduler.is_idle()
+
+
+def test_application_writes_reset_the_idle_timer(scheduler, db_path):
+    scheduler.is_idle()
+    with get_pool(db_path).transaction() as conn:
+        conn.execute("INSERT INTO file_analysis (file_path, original_name, suggested_name) VALUES ('/a', 'a', 'a')")
+    assert not scheduler.is_idle()
+    assert scheduler.is_idle()
+
+
+@pytest.fixture
+def legacy_db_path(tmp_path):
+    """Database created before the pool set auto_vacuum"""
+    path = tmp_path / "legacy" / "second_brain.db"
+    path.parent.mkdir()
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    conn.close()
+    run_migrations(str(path))
+    return str(path)
+
+
+def test_new_databases_use_incremental_auto_vacuum(db_path, legacy_db_path):
+    assert get_pool(db_path).connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert get_pool(legacy_db_path).connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+
+def test_compact_never_rewrites_the_whole_file(legacy_db_path, tmp_path):
+    scheduler = MaintenanceScheduler(db_path=legacy_db_path, archive_dir=str(tmp_path / "archive"), idle_seconds=0)
+    result = scheduler.compact()
+    assert result["pages_released"] == 0
+    # auto_vacuum stays as it was; converting it is enable_incremental_vacuum's job
+    pool = get_pool(legacy_db_path)
+    assert pool.connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    
+    scheduler.logger.flush()
+    with pool.read() as conn:
+        warnings = conn.execute(
+            "SELECT metadata FROM activity_log WHERE activity_type = 'maintenance' AND metadata LIKE '%auto_vacuum%'"
+        ).fetchall()
+    assert [json.loads(row[0]) for row in warnings] == [{"auto_vacuum": 0}]
+
+
+def test_enable_incremental_vacuum_converts_older_databases(legacy_db_path):
+    assert enable_incremental_vacuum(legacy_db_path)
+    assert not enable_incremental_vacuum(legacy_db_path)
+    assert get_pool(legacy_db_path).connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_incremental_vacuum_releases_pages_on_new_databases(scheduler, db_path):
+    assert not enable_incremental_vacuum(db_path)
+    
+    add_activity(db_path, ["2020-01-01T10:00:00"] * 20)
+    with get_pool(db_path).transaction() as conn:
+        conn.execute("UPDATE activity_log SET description = ?", ("x" * 4000,))
+    scheduler.archive_old_logs()
+    
+    assert scheduler.compact()["pages_released"] > 0
+    assert get_pool(db_path).connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+
+def test_run_once_reports_the_pass(scheduler, db_path):
+    add_activity(db_path, ["2020-01-01T10:00:00"] * 2)
+    scheduler.is_idle()
+    result = scheduler.run_once()
+    assert result["archived"] == 2
+    assert result["compacted"]
@@ -0,0 +1,125 @@
+import math
+import random
+import urllib.request
+
+import pytest
+
+from a_core.e_utils.ae08_metrics import STAGE_ERRORS, STAGE_SECONDS, Histogram, MetricsRegistry, get_registry
+
+
+def test_counters_and_gauges_are_keyed_by_name_and_labels():
+    registry = MetricsRegistry()
+    registry.counter("files_total", stage="read").inc()
+    registry.counter("files_total", stage="read").inc(2)
+    registry.counter("files_total", stage="write").inc()
+    assert registry.counter("files_total", stage="read").value == 3
+    assert registry.counter("files_total", stage="write").value == 1
+    
+    gauge = registry.gauge("queue_depth")
+    gauge.set(5)
+    gauge.dec(2)
+    assert gauge.value == 3
+    gauge.set_function(lambda: 42)
+    assert gauge.value == 42
+    gauge.set_function(lambda: 1 / 0)
+    assert math.isnan(gauge.value)
+    
+    with pytest.raises(ValueError):
+        registry.gauge("files_total")
+
+
+def test_histogram_quantiles_stay_within_the_bucket_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-5, 1.5) for _ in range(20000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.observe(value)
+    
+    exact = sorted(values)
+    for q, estimate in histogram.quantiles().items():
+        truth = exact[max(1, int(q * len(exact) + 0.5)) - 1]
+        # Log-linear buckets bound the relative error, plus 1us of rounding
+        assert abs(estimate - truth) <= truth * 0.07 + 1e-6
+    
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == len(values)
+    assert snapshot["min"] == min(values) and snapshot["max"] == max(values)
+    assert snapshot["sum"] == pytest.approx(sum(values))
+
+
+def test_empty_histogram_reports_nan():
+    snapshot = Histogram().snapshot()
+    assert snapshot["count"] == 0
+    assert all(math.isnan(snapshot[key]) for key in ("mean", "min", "max", "p50", "p99"))
+
+
+def test_stage_timer_records_durations_and_errors():
+    registry = MetricsRegistry()
+    timer = registry.stage("extract")
+    with timer:
+        pass
+    assert timer.elapsed is not None and timer.elapsed >= 0
+    
+    @registry.stage("analyze")
+    def analyze():
+        raise RuntimeError("model unavailable")
+    
+    with pytest.raises(RuntimeError):
+        analyze()
+    
+    snapshots = registry.histogram_snapshots()
+    assert snapshots["extract"]["count"] == 1
+    assert snapshots["analyze"]["count"] == 1
+    assert registry.counter(STAGE_ERRORS, stage="analyze").value == 1
+    assert registry.counter(STAGE_ERRORS, stage="extract").value == 0
+
+
+def test_render_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("fileflow_files_total", "Files processed", status="ok").inc(3)
+    registry.gauge("fileflow_label_test", path='a"b\\c').set(1)
+    registry.histogram(STAGE_SECONDS, stage="read").observe(0.25)
+    
+    text = registry.render_prometheus()
+    assert "# HELP fileflow_files_total Files processed\n" in text
+    assert "# TYPE fileflow_files_total counter\n" in text
+    assert 'fileflow_files_total{status="ok"} 3\n' in text
+    assert 'fileflow_label_test{path="a\\"b\\\\c"} 1\n' in text
+    assert f"# TYPE {STAGE_SECONDS} summary\n" in text
+    assert f'{STAGE_SECONDS}{{stage="read",quantile="0.5"}} 0.25' in text
+    assert f'{STAGE_SECONDS}_count{{stage="read"}} 1\n' in text
+
+
+def test_write_and_serve_prometheus(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("served_total").inc()
+    
+    path = tmp_path / "textfile" / "fileflow.prom"
+    registry.write_prometheus(str(path))
+    assert path.read_text() == registry.render_prometheus()
+    
+    server = registry.serve_prometheus(0)
+    try:
+        port = server.server_address[1]
+        assert registry.serve_prometheus(port) is server
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert "served_total 1" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_write_buffer_gauge_follows_pending_rows(db_path):
+    from a_core.a_fileflow.aa05_database import DatabaseManager
+    
+    manager = DatabaseManager(db_path, batch_size=1000, flush_interval_ms=60000)
+    try:
+        gauge = get_registry().gauge("db_write_buffer_rows")
+        manager.queue_file_fingerprint("/tmp/a.txt", 1, 1, 1, "hash")
+        manager.queue_file_fingerprint("/tmp/b.txt", 1, 1, 2, "hash")
+        assert gauge.value == 2
+        manager.flush()
+        assert gauge.value == 0
+    finally:
+        manager.close()
+        manager.logger.flush(timeout=5)
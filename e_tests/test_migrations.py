@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from a_core.e_utils.ae04_db_pool import ConnectionPool
+from a_core.f_data.af02_migrations import (Migration, MigrationRunner, SECOND_BRAIN_MIGRATIONS,
+                                           VECTOR_DB_MIGRATIONS, FAISS_METADATA_MIGRATIONS,
+                                           run_migrations)
+
+
+def tables(pool):
+    with pool.read() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_second_brain_migrates_to_the_latest_version_once(db_path):
+    latest = SECOND_BRAIN_MIGRATIONS[-1].version
+    assert run_migrations(db_path) == latest
+    assert run_migrations(db_path) == latest
+    
+    pool = ConnectionPool(db_path)
+    assert {"file_analysis", "file_entities", "file_fingerprints", "content_blobs",
+            "table_row_counts", "activity_hourly_counts"} <= tables(pool)
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM schema_backfill_progress").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("migrations", [VECTOR_DB_MIGRATIONS, FAISS_METADATA_MIGRATIONS])
+def test_vector_migrations_apply_cleanly(tmp_path, migrations):
+    pool = ConnectionPool(str(tmp_path / "vectors.db"))
+    assert MigrationRunner(pool, migrations).run() == migrations[-1].version
+    assert {"vector_attributes", "vector_tombstones"} <= tables(pool)
+
+
+def test_migrations_stop_at_the_target_version(db_path):
+    assert run_migrations(db_path, target_version=3) == 3
+    pool = ConnectionPool(db_path)
+    assert "file_fingerprints" not in tables(pool)
+    assert run_migrations(db_path) == SECOND_BRAIN_MIGRATIONS[-1].version
+    assert "file_fingerprints" in tables(pool)
+
+
+def test_a_failing_migration_rolls_back_and_keeps_the_version(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "fail.db"))
+    runner = MigrationRunner(pool, [
+        Migration(1, "first", ["CREATE TABLE a (id INTEGER PRIMARY KEY)"]),
+        Migration(2, "broken", ["CREATE TABLE b (id INTEGER PRIMARY KEY)", "NOT SQL"]),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        runner.run()
+    assert runner.current_version() == 1
+    assert "b" not in tables(pool)
+
+
+def test_optional_migrations_are_skipped(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "optional.db"))
+    runner = MigrationRunner(pool, [
+        Migration(1, "unsupported", ["CREATE VIRTUAL TABLE x USING no_such_module()"], optional=True),
+        Migration(2, "next", ["CREATE TABLE c (id INTEGER PRIMARY KEY)"]),
+    ])
+    assert runner.run() == 2
+    assert "c" in tables(pool)
+
+
+def test_interrupted_backfill_resumes_from_its_checkpoint(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "backfill.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)")
+        conn.executemany("INSERT INTO items (id, value) VALUES (?, 0)", [(i,) for i in range(1, 26)])
+    
+    ranges = []
+    fail_at = {"start": 10}
+    
+    def backfill(cursor, start_id, end_id):
+        if start_id == fail_at["start"]:
+            raise RuntimeError("interrupted")
+        ranges.append((start_id, end_id))
+        cursor.execute("UPDATE items SET value = value + 1 WHERE id > ? AND id <= ?", (start_id, end_id))
+    
+    migration = Migration(1, "bump_values", [], backfill_table="items", backfill_function=backfill)
+    runner = MigrationRunner(pool, [migration], batch_size=5)
+    with pytest.raises(RuntimeError):
+        runner.run()
+    assert runner.current_version() == 0
+    
+    fail_at["start"] = None
+    assert runner.run() == 1
+    # Chunks committed before the failure are not run again
+    assert ranges == [(0, 5), (5, 10), (10, 15), (15, 20), (20, 25)]
+    with pool.read() as conn:
+        assert conn.execute("SELECT MIN(value), MAX(value) FROM items").fetchone() == (1, 1)
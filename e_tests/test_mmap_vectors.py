@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from a_core.a_fileflow.aa017_ann_index import normalize_rows
+from a_core.a_fileflow.aa018_mmap_vectors import GATHER_FRACTION, QUERY_BLOCK, MmapVectorMatrix
+
+DIM = 16
+
+
+def exact(vectors, ids, query, k):
+    scores = normalize_rows(vectors) @ normalize_rows(query.reshape(1, -1))[0]
+    order = np.argsort(-scores)[:k]
+    return ids[order], 1 - scores[order]
+
+
+@pytest.fixture
+def matrix(tmp_path, random_vectors):
+    vectors = random_vectors(1000)
+    ids = np.arange(1, 1001, dtype=np.int64) * 3
+    matrix = MmapVectorMatrix(str(tmp_path / "matrix"))
+    matrix.append(ids[:600], vectors[:600])
+    matrix.append(ids[600:], vectors[600:])
+    return matrix, ids, vectors
+
+
+def test_search_batch_matches_exact_search(matrix, random_vectors):
+    matrix, ids, vectors = matrix
+    assert (matrix.count, matrix.max_id, matrix.dim) == (1000, 3000, DIM)
+    
+    queries = random_vectors(QUERY_BLOCK + 5, seed=1)
+    for query, (found, distances) in zip(queries, matrix.search_batch(queries, 10)):
+        expected_ids, expected_distances = exact(vectors, ids, query, 10)
+        np.testing.assert_array_equal(found, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, atol=1e-5)
+
+
+@pytest.mark.parametrize("fraction", [GATHER_FRACTION / 5, 0.9])
+def test_allowed_ids_restrict_both_ways(matrix, fraction, random_vectors):
+    matrix, ids, vectors = matrix
+    rng = np.random.default_rng(2)
+    allowed = np.sort(rng.choice(ids, int(fraction * len(ids)), replace=False))
+    # Unknown ids in the mask are ignored
+    allowed = np.union1d(allowed, [1, 2])
+    keep = np.isin(ids, allowed)
+    
+    query = random_vectors(1, seed=3)[0]
+    found, _ = matrix.search(query, 10, allowed=allowed)
+    np.testing.assert_array_equal(found, exact(vectors[keep], ids[keep], query, 10)[0])
+    assert len(matrix.search(query, 10, allowed=np.array([1, 2], dtype=np.int64))[0]) == 0
+
+
+def test_k_larger_than_the_matrix(tmp_path, random_vectors):
+    matrix = MmapVectorMatrix(str(tmp_path / "matrix"))
+    assert len(matrix.search(random_vectors(1)[0], 5)[0]) == 0
+    matrix.append([1, 2], random_vectors(2))
+    assert sorted(matrix.search(random_vectors(1, seed=1)[0], 5)[0]) == [1, 2]
+
+
+def test_other_instances_see_appends_and_dimension_is_checked(matrix, tmp_path, random_vectors):
+    matrix, ids, vectors = matrix
+    reader = MmapVectorMatrix(str(tmp_path / "matrix"))
+    assert reader.count == 1000
+    extra = random_vectors(1, seed=9)
+    matrix.append([5000], extra)
+    assert reader.search(extra[0], 1)[0][0] == 5000
+    with pytest.raises(ValueError):
+        matrix.append([6000], np.ones((1, DIM + 1)))
+
+
+def test_torn_tail_is_truncated_on_open(matrix, tmp_path):
+    matrix, ids, vectors = matrix
+    # A crash after writing a row but before its id
+    with open(matrix.matrix_path, "ab") as f:
+        f.write(b"\0" * (4 * DIM + 7))
+    reopened = MmapVectorMatrix(str(tmp_path / "matrix"))
+    assert reopened.count == 1000
+    assert reopened.matrix_path.stat().st_size == 1000 * 4 * DIM
+
+
+def test_remove_rewrites_without_the_rows(matrix, tmp_path):
+    matrix, ids, vectors = matrix
+    assert matrix.remove([ids[0], ids[500], 1]) == 2
+    assert matrix.count == 998
+    found, _ = matrix.search(vectors[500], 1)
+    assert found[0] != ids[500]
+    assert not matrix.marker_path.exists()
+    
+    # A rewrite interrupted between its renames empties the matrix
+    matrix.marker_path.touch()
+    reopened = MmapVectorMatrix(str(tmp_path / "matrix"))
+    assert reopened.count == 0 and reopened.dim is None
+
+
+def test_storage_mmap_backend(make_vector_storage, random_vectors):
+    storage = make_vector_storage(VECTOR_BACKEND="mmap")
+    assert storage._backend_name() == "mmap"
+    vectors = random_vectors(50, seed=4)
+    vector_ids = storage.store_embeddings_batch(vectors, ["doc"] * 50,
+                                                [{"file_path": f"/f{i % 5}.txt"} for i in range(50)])
+    query = random_vectors(1, seed=5)[0]
+    expected, _ = exact(vectors, np.arange(50), query, 5)
+    assert [hit['id'] for hit in storage.search_similar(query, limit=5)] == [vector_ids[i] for i in expected]
+    
+    # Updates append the new version and tombstone the old row instead of rewriting the matrix
+    assert storage.update_embedding(vector_ids[0], list(query))
+    assert storage.search_similar(query, limit=1)[0]['id'] == vector_ids[0]
+    assert storage.vector_matrix.count == 51
+    storage.compact()
+    assert storage.vector_matrix.count == 50
+    
+    # Rows deleted behind the matrix are noticed on open
+    with storage.metadata_pool.transaction() as conn:
+        conn.execute("DELETE FROM vectors WHERE id = (SELECT MIN(id) FROM vectors)")
+    reopened = make_vector_storage()
+    assert reopened.vector_matrix.count == 49
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from a_core.a_fileflow.aa017_ann_index import IVFIndex, normalize_rows
+from a_core.a_fileflow.aa019_quantization import (PQ_MIN_TRAIN_VECTORS, PQ_SUBVECTOR_DIMS, ProductQuantizer,
+                                                  ScalarQuantizer, make_quantizer)
+
+DIM = 64
+# Probe every list, so recall only reflects the codes
+ALL_LISTS = 100000
+
+
+def embeddings(count, seed=0):
+    """Vectors near a low-dimensional subspace, like real text embeddings"""
+    projection = np.random.default_rng(98).normal(size=(8, DIM))
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(count, 8)) @ projection + 0.05 * rng.normal(size=(count, DIM))).astype(np.float32)
+
+
+def recall(found_lists, vectors, ids, queries, k=10):
+    """Fraction of the exact cosine top k found in each result list"""
+    unit = normalize_rows(vectors)
+    hits = 0
+    for query, found in zip(queries, found_lists):
+        exact = ids[np.argsort(-(unit @ normalize_rows(query.reshape(1, -1))[0]))[:k]]
+        hits += len(set(exact) & set(found))
+    return hits / (k * len(queries))
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = embeddings(PQ_MIN_TRAIN_VECTORS + 500)
+    return np.arange(1, len(vectors) + 1, dtype=np.int64), vectors
+
+
+@pytest.fixture(scope="module")
+def indexes(data):
+    ids, vectors = data
+    built = {}
+    for kind in ("none", "int8", "pq"):
+        index = IVFIndex(DIM, nprobe=ALL_LISTS, quantization=kind)
+        index.add(ids, vectors)
+        built[kind] = index
+    return built
+
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer(DIM), ProductQuantizer(DIM)])
+def test_scorer_matches_decoded_inner_products(quantizer):
+    vectors = normalize_rows(embeddings(2000, seed=1))
+    quantizer.train(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.uint8 and codes.shape == (2000, quantizer.code_size)
+    
+    query = normalize_rows(embeddings(1, seed=2))[0]
+    np.testing.assert_allclose(quantizer.scorer(query)(codes), quantizer.decode(codes) @ query, atol=1e-4)
+    # Reconstructions are close to the originals
+    error = np.linalg.norm(quantizer.decode(codes) - vectors, axis=1).mean()
+    assert error < 0.5
+
+
+def test_int8_error_is_bounded_by_the_step():
+    vectors = embeddings(500, seed=3)
+    quantizer = ScalarQuantizer(DIM)
+    quantizer.train(vectors)
+    assert np.all(np.abs(quantizer.decode(quantizer.encode(vectors)) - vectors) <= quantizer.scale / 2 + 1e-5)
+
+
+def test_make_quantizer():
+    assert make_quantizer("none", DIM) is None
+    assert make_quantizer("pq", DIM).code_size == DIM // PQ_SUBVECTOR_DIMS
+    with pytest.raises(ValueError):
+        make_quantizer("int4", DIM)
+
+
+def test_memory_drops_with_the_codes(indexes):
+    full = indexes["none"].nbytes
+    assert not indexes["none"].is_quantized
+    assert indexes["int8"].is_quantized and indexes["pq"].is_quantized
+    # Ids take 8 bytes per row in every mode
+    rows = indexes["none"].ntotal
+    assert (indexes["int8"].nbytes - 8 * rows) * 4 == full - 8 * rows
+    assert (indexes["pq"].nbytes - 8 * rows) * 32 == full - 8 * rows
+
+
+def test_recall_against_exact_search(data, indexes):
+    ids, vectors = data
+    queries = embeddings(40, seed=4)
+    assert recall([indexes["none"].search(q, 10)[0] for q in queries], vectors, ids, queries) == 1.0
+    assert recall([indexes["int8"].search(q, 10)[0] for q in queries], vectors, ids, queries) >= 0.95
+    # PQ codes need the re-ranking margin VectorStorage asks for
+    assert recall([indexes["pq"].search(q, 80)[0] for q in queries], vectors, ids, queries) >= 0.95
+
+
+def test_pq_keeps_float_vectors_until_enough_to_train():
+    index = IVFIndex(DIM, quantization="pq")
+    index.add(np.arange(1, 5001), embeddings(5000, seed=5))
+    assert index.is_trained and not index.is_quantized
+    assert index.quantization == "pq"
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_quantized_index_round_trips(tmp_path, indexes, kind):
+    path = tmp_path / "vectors_ivf.npz"
+    index = indexes[kind]
+    index.path = path
+    index.save()
+    index.path = None
+    
+    loaded = IVFIndex.load(str(path), nprobe=ALL_LISTS, quantization=kind)
+    assert loaded.is_quantized and loaded.nbytes == index.nbytes
+    for query in embeddings(5, seed=6):
+        np.testing.assert_array_equal(loaded.search(query, 10)[0], index.search(query, 10)[0])
+    assert IVFIndex.load(str(path), quantization="none") is None
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_storage_reranks_quantized_hits_exactly(make_vector_storage, data, kind):
+    ids, vectors = data
+    storage = make_vector_storage(VECTOR_QUANTIZATION=kind, VECTOR_ANN_NPROBE=ALL_LISTS)
+    vector_ids = np.array(storage.store_embeddings_batch(vectors, ["doc"] * len(vectors), [{}] * len(vectors)))
+    assert storage.ann_index.is_quantized
+    
+    queries = embeddings(20, seed=7)
+    results = storage.search_similar_batch(queries, limit=10)
+    found = [[int(np.flatnonzero(vector_ids == hit['id'])[0]) + 1 for hit in hits] for hits in results]
+    assert recall(found, vectors, ids, queries) >= 0.95
+    
+    # Re-ranked distances are the exact cosine distances
+    unit = normalize_rows(vectors)
+    for query, row_ids, hits in zip(queries, found, results):
+        exact = 1 - unit[np.array(row_ids) - 1] @ normalize_rows(query.reshape(1, -1))[0]
+        np.testing.assert_allclose([hit['distance'] for hit in hits], exact, atol=1e-5)
+
+
+def test_changing_the_mode_rebuilds_the_index(make_vector_storage):
+    vectors = embeddings(300, seed=8)
+    storage = make_vector_storage(VECTOR_QUANTIZATION="int8")
+    storage.store_embeddings_batch(vectors, ["doc"] * 300, [{}] * 300)
+    storage.checkpoint()
+    
+    reopened = make_vector_storage(VECTOR_QUANTIZATION="none")
+    assert reopened.ann_index.quantization == "none"
+    assert reopened.ann_index.ntotal == 300
+
+
+def test_chromadb_rejects_quantization_without_switching_backends(make_vector_storage, monkeypatch):
+    from a_core.a_fileflow import aa014_vector_storage
+    
+    opened = []
+    monkeypatch.setattr(aa014_vector_storage, "chromadb", object())
+    monkeypatch.setattr(aa014_vector_storage.VectorStorage, "_initialize_chromadb",
+                        lambda storage: opened.append(storage))
+    logged = []
+    monkeypatch.setattr(aa014_vector_storage.LoggingUtils, "log_activity",
+                        lambda self, activity_type, *args, **kwargs: logged.append(activity_type))
+    
+    storage = make_vector_storage(VECTOR_QUANTIZATION="int8")
+    assert opened == [storage]
+    assert storage.metadata_pool is None and storage.ann_index is None
+    assert "vector_storage_config_error" in logged
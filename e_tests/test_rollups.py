@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data import af03_rollups as rollups
+from a_core.f_data.af02_migrations import MigrationRunner, run_migrations
+
+
+def read(db_path, reader, *args):
+    with get_pool(db_path).read() as conn:
+        return reader(conn, *args)
+
+
+def test_file_and_status_counts_follow_writes(db_path):
+    run_migrations(db_path)
+    pool = get_pool(db_path)
+    with pool.transaction() as conn:
+        conn.executemany("INSERT INTO file_analysis (file_path, original_name, suggested_name) VALUES (?, ?, ?)",
+                         [(f"/docs/{i}", str(i), str(i)) for i in range(5)])
+        conn.execute("UPDATE file_analysis SET status = 'approved' WHERE file_path IN ('/docs/0', '/docs/1')")
+        conn.execute("DELETE FROM file_analysis WHERE file_path = '/docs/4'")
+        conn.execute("INSERT INTO entities (entity_name, variations) VALUES ('Acme', '[]')")
+    
+    assert read(db_path, rollups.read_row_counts)['file_analysis'] == 4
+    assert read(db_path, rollups.read_row_counts)['entities'] == 1
+    assert read(db_path, rollups.read_status_counts) == {'pending': 2, 'approved': 2}
+
+
+def test_activity_buckets_group_by_hour_and_day(db_path):
+    run_migrations(db_path)
+    with get_pool(db_path).transaction() as conn:
+        conn.executemany("INSERT INTO activity_log (activity_type, description, timestamp) VALUES (?, '', ?)", [
+            ("a", "2024-01-01T10:05:00"), ("a", "2024-01-01T10:55:00"),
+            ("a", "2024-01-01T11:00:00"), ("b", "2024-01-02T09:00:00"),
+        ])
+    
+    assert read(db_path, rollups.read_activity_breakdown, None) == {"a": 3, "b": 1}
+    assert read(db_path, rollups.read_activity_buckets, None, "hour") == [
+        ("2024-01-01T10:00:00", "a", 2), ("2024-01-01T11:00:00", "a", 1), ("2024-01-02T09:00:00", "b", 1)
+    ]
+    assert read(db_path, rollups.read_activity_buckets, None, "day") == [
+        ("2024-01-01", "a", 3), ("2024-01-02", "b", 1)
+    ]
+    # Outside a one-day window
+    assert read(db_path, rollups.read_activity_breakdown, 1) == {}
+
+
+def test_recent_activity_is_inside_the_window(db_path):
+    run_migrations(db_path)
+    with get_pool(db_path).transaction() as conn:
+        conn.execute("INSERT INTO activity_log (activity_type, description, timestamp) VALUES ('a', '', ?)",
+                     (datetime.now().isoformat(),))
+    assert read(db_path, rollups.read_activity_breakdown, 1) == {"a": 1}
+
+
+def test_migration_seeds_rollups_from_existing_rows(db_path):
+    run_migrations(db_path, target_version=5)
+    with get_pool(db_path).transaction() as conn:
+        conn.executemany("INSERT INTO file_analysis (file_path, original_name, suggested_name, status) "
+                         "VALUES (?, ?, ?, ?)", [("/a", "a", "a", "pending"), ("/b", "b", "b", "rejected")])
+        conn.execute("INSERT INTO activity_log (activity_type, description, timestamp) "
+                     "VALUES ('a', '', '2024-01-01T10:00:00')")
+    run_migrations(db_path)
+    
+    assert read(db_path, rollups.read_row_counts) == {"file_analysis": 2, "entities": 0, "activity_log": 1}
+    assert read(db_path, rollups.read_status_counts) == {"pending": 1, "rejected": 1}
+    assert read(db_path, rollups.read_activity_breakdown, None) == {"a": 1}
+
+
+def test_activity_rollups_are_backfilled_in_chunks(db_path):
+    run_migrations(db_path, target_version=5)
+    pool = get_pool(db_path)
+    with pool.transaction() as conn:
+        conn.executemany("INSERT INTO activity_log (activity_type, description, timestamp) VALUES (?, '', ?)",
+                         [("a" if i % 2 else "b", f"2024-01-01T{10 + i % 3}:00:00") for i in range(25)])
+    
+    chunks = []
+    
+    def write_between_chunks(migration, last_id, max_id):
+        chunks.append(last_id)
+        if len(chunks) == 1:
+            with pool.transaction() as conn:
+                # One row the backfill already counted, one it hasn't reached, and a new one
+                conn.execute("DELETE FROM activity_log WHERE id IN (2, 20)")
+                conn.execute("INSERT INTO activity_log (activity_type, description, timestamp) "
+                             "VALUES ('c', '', '2024-01-02T09:00:00')")
+    
+    MigrationRunner(pool, batch_size=10, progress_callback=write_between_chunks).run()
+    
+    assert chunks[:3] == [10, 20, 25]
+    assert read(db_path, rollups.read_row_counts)["activity_log"] == 24
+    with pool.read() as conn:
+        expected = dict(conn.execute("SELECT activity_type, COUNT(*) FROM activity_log GROUP BY activity_type"))
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'activity_rollup_seed'").fetchone() is None
+    assert read(db_path, rollups.read_activity_breakdown, None) == expected
+
+
+def test_database_stats_read_the_rollups(db_manager, store_analysis):
+    store_analysis("/docs/a.txt", entities=["Acme"])
+    store_analysis("/docs/b.txt")
+    stats = db_manager.get_database_stats()
+    assert stats['total_files'] == 2
+    assert stats['pending_reviews'] == 2
+    assert stats['total_entities'] == 1
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from a_core.e_utils.ae09_tracing import (NOOP_SPAN, JSONLSpanStore, SQLiteSpanStore, Tracer,
+                                        build_tracer_from_env)
+
+
+@pytest.fixture(params=["sqlite", "jsonl"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSpanStore(str(tmp_path / "traces.db"))
+    return JSONLSpanStore(str(tmp_path / "logs" / "traces.jsonl"))
+
+
+def test_nested_spans_form_one_trace(store):
+    tracer = Tracer(store)
+    with tracer.span("process_file", file="a.pdf") as root:
+        with tracer.span("extract_content") as extract:
+            tracer.annotate(pages=3)
+            with tracer.span("ocr"):
+                pass
+        with tracer.span("store_embedding"):
+            pass
+    assert tracer.flush(timeout=5)
+    
+    spans = {span['name']: span for span in store.get_trace(root.trace_id)}
+    assert set(spans) == {"process_file", "extract_content", "ocr", "store_embedding"}
+    assert spans["process_file"]["parent_id"] is None
+    assert spans["extract_content"]["parent_id"] == root.span_id
+    assert spans["ocr"]["parent_id"] == extract.span_id
+    assert spans["store_embedding"]["parent_id"] == root.span_id
+    assert spans["process_file"]["attributes"] == {"file": "a.pdf"}
+    assert spans["extract_content"]["attributes"] == {"pages": 3}
+    assert all(span["duration_ms"] >= 0 for span in spans.values())
+
+
+def test_errors_mark_the_span_and_propagate(store):
+    tracer = Tracer(store)
+    with pytest.raises(ValueError):
+        with tracer.span("process_file") as root:
+            with tracer.span("ai_analysis"):
+                raise ValueError("bad response")
+    tracer.flush(timeout=5)
+    
+    statuses = {span['name']: (span['status'], span['error']) for span in store.get_trace(root.trace_id)}
+    assert statuses["ai_analysis"] == ("error", "ValueError: bad response")
+    assert statuses["process_file"] == ("error", "ValueError: bad response")
+
+
+def test_recent_traces_lists_roots_newest_first(store):
+    tracer = Tracer(store)
+    for name in ("process_file", "search", "rename"):
+        with tracer.span(name):
+            with tracer.span("child"):
+                pass
+        time.sleep(0.01)
+    tracer.flush(timeout=5)
+    
+    assert [span['name'] for span in store.recent_traces()] == ["rename", "search", "process_file"]
+    assert len(store.recent_traces(limit=2)) == 2
+    assert [span['name'] for span in store.recent_traces(name="search")] == ["search"]
+
+
+def test_threads_get_separate_traces(tmp_path):
+    store = SQLiteSpanStore(str(tmp_path / "traces.db"))
+    tracer = Tracer(store)
+    roots = []
+    
+    def work():
+        with tracer.span("process_file") as root:
+            with tracer.span("extract_content"):
+                time.sleep(0.01)
+        roots.append(root)
+    
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracer.flush(timeout=5)
+    
+    assert len({root.trace_id for root in roots}) == 4
+    for root in roots:
+        assert [span['parent_id'] for span in store.get_trace(root.trace_id)] == [None, root.span_id]
+
+
+def test_prune_drops_whole_expired_traces(tmp_path):
+    store = SQLiteSpanStore(str(tmp_path / "traces.db"))
+    tracer = Tracer(store)
+    with tracer.span("old") as old:
+        with tracer.span("child"):
+            pass
+    tracer.flush(timeout=5)
+    with store.pool.transaction() as conn:
+        conn.execute("UPDATE trace_spans SET start_time = start_time - 30 * 86400")
+    with tracer.span("new") as new:
+        pass
+    tracer.flush(timeout=5)
+    
+    store.prune(days=7)
+    assert store.get_trace(old.trace_id) == []
+    assert len(store.get_trace(new.trace_id)) == 1
+
+
+def test_disabled_tracer_yields_noop_spans():
+    tracer = Tracer(None)
+    assert not tracer.enabled
+    with tracer.span("process_file") as span:
+        span.set_attribute("file", "a.pdf")
+        tracer.annotate(pages=1)
+    assert span is NOOP_SPAN
+    assert tracer.current_span() is NOOP_SPAN
+    assert tracer.flush(timeout=1)
+
+
+def test_build_tracer_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRACE_STORE", "off")
+    assert build_tracer_from_env().store is None
+    
+    monkeypatch.setenv("TRACE_STORE", "jsonl")
+    monkeypatch.setenv("TRACE_PATH", str(tmp_path / "spans.jsonl"))
+    tracer = build_tracer_from_env()
+    assert isinstance(tracer.store, JSONLSpanStore)
+    with tracer.span("process_file"):
+        pass
+    tracer.flush(timeout=5)
+    assert (tmp_path / "spans.jsonl").exists()
+    
+    monkeypatch.setenv("TRACE_STORE", "sqlite")
+    monkeypatch.setenv("TRACE_PATH", str(tmp_path / "spans.db"))
+    monkeypatch.setenv("TRACE_RETENTION_DAYS", "2")
+    tracer = build_tracer_from_env()
+    assert isinstance(tracer.store, SQLiteSpanStore) and tracer.retention_days == 2
+    
+    monkeypatch.setenv("TRACE_STORE", "zipkin")
+    with pytest.raises(ValueError):
+        build_tracer_from_env()
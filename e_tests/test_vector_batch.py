@@ -0,0 +1,67 @@
+import pytest
+
+from a_core.a_fileflow.aa017_ann_index import MIN_TRAIN_VECTORS, normalize_rows
+
+
+@pytest.fixture(params=["exact", "ivf", "mmap"])
+def storage(request, make_vector_storage):
+    env = {"exact": {"VECTOR_ANN": "off"}, "ivf": {}, "mmap": {"VECTOR_BACKEND": "mmap"}}[request.param]
+    return make_vector_storage(**env)
+
+
+def test_batch_store_accepts_a_matrix_and_keeps_order(storage, random_vectors):
+    vectors = random_vectors(30)
+    vector_ids = storage.store_embeddings_batch(vectors, [f"doc {i}" for i in range(30)],
+                                                [{"i": i} for i in range(30)])
+    assert len(set(vector_ids)) == 30
+    assert storage.get_total_embeddings() == 30
+    with storage.metadata_pool.read() as conn:
+        stored = conn.execute("SELECT vector_id, content FROM vectors ORDER BY id").fetchall()
+    assert stored == [(vector_id, f"doc {i}") for i, vector_id in enumerate(vector_ids)]
+
+
+def test_batch_search_matches_single_searches(storage, random_vectors):
+    vectors = random_vectors(200, seed=1)
+    storage.store_embeddings_batch(vectors, ["doc"] * 200, [{}] * 200)
+    queries = random_vectors(7, seed=2)
+    
+    batch = storage.search_similar_batch(queries, limit=5)
+    assert len(batch) == 7
+    for query, hits in zip(queries, batch):
+        single = storage.search_similar(query, limit=5)
+        assert [hit['id'] for hit in hits] == [hit['id'] for hit in single]
+        assert [hit['distance'] for hit in hits] == pytest.approx([hit['distance'] for hit in single], abs=1e-5)
+        # Nearest first, by cosine distance
+        scores = normalize_rows(vectors) @ normalize_rows(query.reshape(1, -1))[0]
+        assert hits[0]['distance'] == pytest.approx(1 - scores.max(), abs=1e-5)
+        assert [hit['distance'] for hit in hits] == sorted(hit['distance'] for hit in hits)
+
+
+def test_batch_edge_cases(make_vector_storage, random_vectors):
+    storage = make_vector_storage()
+    assert storage.store_embeddings_batch([], [], []) == []
+    assert storage.search_similar_batch([], limit=5) == []
+    with pytest.raises(ValueError):
+        storage.store_embeddings_batch(random_vectors(2), ["only one"], [{}, {}])
+    with pytest.raises(ValueError):
+        storage.search_similar_batch(random_vectors(1), limit=5, colour=["red"])
+    # Nothing stored yet: every query gets an empty list
+    assert storage.search_similar_batch(random_vectors(3), limit=5) == [[], [], []]
+
+
+def test_snippets_are_capped(make_vector_storage, random_vectors):
+    from a_core.a_fileflow.aa014_vector_storage import SNIPPET_LENGTH
+    
+    storage = make_vector_storage()
+    vector_id = storage.store_embedding(list(random_vectors(1)[0]), "x" * (SNIPPET_LENGTH * 3), {})
+    hit = storage.search_similar(random_vectors(1)[0], limit=1)[0]
+    assert hit['id'] == vector_id and len(hit['content']) == SNIPPET_LENGTH
+
+
+def test_large_batch_trains_the_index_once(make_vector_storage, random_vectors):
+    storage = make_vector_storage()
+    vectors = random_vectors(MIN_TRAIN_VECTORS + 10, seed=3)
+    storage.store_embeddings_batch(vectors, ["doc"] * len(vectors), [{}] * len(vectors))
+    assert storage.ann_index.is_trained
+    assert storage.ann_index.trained_size == len(vectors)
+    assert storage.ann_index.ntotal == len(vectors)
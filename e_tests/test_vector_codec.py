@@ -0,0 +1,72 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from a_core.f_data import af05_vector_codec
+from a_core.f_data.af05_vector_codec import decode_embedding, encode_embedding
+
+
+def test_float32_round_trip():
+    embedding = np.random.default_rng(0).normal(size=1536).astype(np.float32)
+    data = encode_embedding(embedding)
+    assert len(data) == 1536 * 4
+    decoded = decode_embedding(data)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, embedding)
+    # Decoding is a view over the bytes, not a copy
+    assert not decoded.flags.writeable
+
+
+def test_struct_fallback_matches_numpy(monkeypatch):
+    embedding = [0.5, -1.25, 3.0, 1e-8]
+    data = encode_embedding(embedding)
+    monkeypatch.setattr(af05_vector_codec, "NUMPY_AVAILABLE", False)
+    assert encode_embedding(embedding) == data
+    assert decode_embedding(data) == pytest.approx(embedding)
+
+
+def test_json_text_is_still_decoded():
+    decoded = decode_embedding(json.dumps([0.1, 0.2, 0.3]))
+    np.testing.assert_allclose(decoded, [0.1, 0.2, 0.3], rtol=1e-6)
+
+
+def test_json_embeddings_are_converted_on_open(tmp_path, make_vector_storage):
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(200, 384)).round(6)
+    
+    # vectors.db as written before migrations: a TEXT column of JSON arrays
+    db_path = tmp_path / "vector_db" / "vectors.db"
+    db_path.parent.mkdir()
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE vectors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vector_id TEXT UNIQUE,
+            embedding TEXT,
+            content TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.executemany("INSERT INTO vectors (vector_id, embedding, content, metadata) VALUES (?, ?, ?, ?)",
+                     [(f"vec_{i}", json.dumps(list(embedding)), f"doc {i}", json.dumps({"file_path": f"/f{i}.txt"}))
+                      for i, embedding in enumerate(embeddings)])
+    conn.commit()
+    size_before = db_path.stat().st_size
+    conn.close()
+    
+    storage = make_vector_storage(VECTOR_ANN="off")
+    with storage.metadata_pool.read() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] >= 2
+        assert {row[0] for row in conn.execute("SELECT typeof(embedding) FROM vectors")} == {"blob"}
+        stored = conn.execute("SELECT embedding FROM vectors WHERE vector_id = 'vec_3'").fetchone()[0]
+    np.testing.assert_allclose(decode_embedding(stored), embeddings[3], rtol=1e-6)
+    # The rewritten rows are smaller, and the freed pages were vacuumed away
+    assert db_path.stat().st_size < size_before
+    
+    hits = storage.search_similar(embeddings[3], limit=1)
+    assert hits[0]['id'] == "vec_3"
+    assert hits[0]['distance'] == pytest.approx(0, abs=1e-5)
+    assert storage.search_similar(embeddings[5], limit=1, file_paths=["/f5.txt"])[0]['id'] == "vec_5"
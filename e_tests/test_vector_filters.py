@@ -0,0 +1,129 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from a_core.a_fileflow import aa014_vector_storage
+from a_core.a_fileflow.aa014_vector_storage import FAISS_DIMENSIONS, _squared_l2
+from a_core.f_data.af06_vector_attributes import metadata_attributes
+
+
+def metadata(i):
+    """Metadata cycling through entities, extensions and event types"""
+    return {"file_path": f"/docs/{i}.{('pdf', 'txt', 'PDF')[i % 3]}",
+            "entities": [("Acme", "Globex")[i % 2]] + (["Initech"] if i % 5 == 0 else []),
+            "event_type": ("created", "modified")[i % 4 == 0]}
+
+
+def store(storage, vectors):
+    ids = storage.store_embeddings_batch(vectors, [f"doc {i}" for i in range(len(vectors))],
+                                         [metadata(i) for i in range(len(vectors))])
+    return vectors, ids
+
+
+def expected_ids(storage, vectors, ids, query, keep, limit):
+    """Ids of the limit nearest rows among keep, by the unfiltered search's own distances"""
+    everything = {hit['id']: hit['distance'] for hit in storage.search_similar(query, limit=len(ids))}
+    return sorted((vector_id for i, vector_id in enumerate(ids) if keep(i)), key=everything.get)[:limit]
+
+
+def test_squared_l2_matches_brute_force(random_vectors):
+    queries, matrix = random_vectors(5, seed=1), random_vectors(40, seed=2)
+    brute = np.array([[np.sum((q - row) ** 2) for row in matrix] for q in queries])
+    np.testing.assert_allclose(_squared_l2(queries, matrix), brute, rtol=1e-4, atol=1e-4)
+    # Identical rows give exactly zero, never a small negative
+    assert _squared_l2(matrix[:3], matrix[:3]).diagonal().min() == 0
+
+
+def test_metadata_attributes():
+    assert sorted(metadata_attributes({"file_path": "/a/B.Pdf", "entities": "Acme", "event_type": "created"})) == [
+        ("entity", "Acme"), ("event_type", "created"), ("extension", ".pdf"), ("file_path", "/a/B.Pdf")
+    ]
+    assert metadata_attributes({"entities": [None, ""], "file_path": "/a/README"}) == [("file_path", "/a/README")]
+
+
+@pytest.fixture(params=["filter_first", "search_first", "mmap"])
+def storage(request, make_vector_storage, monkeypatch):
+    if request.param == "mmap":
+        return make_vector_storage(VECTOR_BACKEND="mmap")
+    if request.param == "search_first":
+        # Every filter goes through the IVF index with the matching rows as a mask
+        monkeypatch.setattr(aa014_vector_storage, "FILTER_FIRST_MAX_ROWS", 0)
+    return make_vector_storage()
+
+
+@pytest.mark.parametrize("filters, keep", [
+    ({"entities": ["Acme"]}, lambda i: i % 2 == 0),
+    ({"entities": ["Acme", "Initech"]}, lambda i: i % 2 == 0 or i % 5 == 0),
+    ({"extensions": ["pdf"]}, lambda i: i % 3 != 1),
+    ({"extensions": [".TXT"], "entities": "Globex"}, lambda i: i % 3 == 1 and i % 2 == 1),
+    ({"event_types": ["modified"]}, lambda i: i % 4 == 0),
+    ({"file_paths": ["/docs/7.txt", "/docs/8.PDF", "/docs/missing"]}, lambda i: i in (7, 8)),
+])
+def test_filters_mask_before_scoring(storage, filters, keep, random_vectors):
+    vectors, ids = store(storage, random_vectors(60))
+    query = random_vectors(1, seed=3)[0]
+    hits = storage.search_similar(query, limit=5, **filters)
+    assert [hit['id'] for hit in hits] == expected_ids(storage, vectors, ids, query, keep, 5)
+    # Filtered hits report the same distance the unfiltered search gives them
+    everything = {hit['id']: hit['distance'] for hit in storage.search_similar(query, limit=len(ids))}
+    assert [hit['distance'] for hit in hits] == pytest.approx([everything[hit['id']] for hit in hits], abs=1e-5)
+
+
+def test_empty_filters_and_no_match(storage, random_vectors):
+    store(storage, random_vectors(60))
+    query = random_vectors(1, seed=4)[0]
+    assert len(storage.search_similar(query, limit=5, entities=[], extensions=None)) == 5
+    assert storage.search_similar(query, limit=5, entities=["Nobody"]) == []
+    assert storage.search_similar_batch(random_vectors(2, seed=5), limit=5, extensions=["docx"]) == [[], []]
+
+
+def test_created_date_filters(storage, random_vectors):
+    vectors, ids = store(storage, random_vectors(20))
+    with storage.metadata_pool.transaction() as conn:
+        conn.execute("UPDATE vectors SET created_at = '2023-06-01 12:00:00' WHERE id % 2 = 0")
+    with storage.metadata_pool.read() as conn:
+        old = {row[0] for row in conn.execute("SELECT vector_id FROM vectors WHERE id % 2 = 0")}
+    query = random_vectors(1, seed=6)[0]
+    
+    before = storage.search_similar(query, limit=20, created_before=date(2024, 1, 1))
+    assert {hit['id'] for hit in before} == old
+    after = storage.search_similar(query, limit=20, created_after="2024-01-01")
+    assert {hit['id'] for hit in after} == set(ids) - old
+    assert storage.search_similar(query, limit=20, created_after="2023-01-01", created_before="2023-02-01") == []
+
+
+def test_deleted_and_replaced_rows_stop_matching(storage, random_vectors):
+    vectors, ids = store(storage, random_vectors(10))
+    storage.delete_embedding(ids[0])
+    storage.upsert_document("/docs/2.PDF", [random_vectors(1, seed=7)[0]], ["new version"], {"entities": ["Acme"]})
+    query = random_vectors(1, seed=8)[0]
+    
+    found = {hit['id'] for hit in storage.search_similar(query, limit=20, entities=["Acme"])}
+    assert ids[0] not in found and ids[2] not in found
+    assert {hit['content'] for hit in storage.search_similar(query, limit=20, file_paths=["/docs/2.PDF"])} == {
+        "new version"
+    }
+    # Tombstoned rows keep their created_at, but not their place in date filters
+    assert ids[0] not in {hit['id'] for hit in storage.search_similar(query, limit=20, created_after="2000-01-01")}
+
+
+def test_unknown_filter_is_rejected(make_vector_storage, random_vectors):
+    with pytest.raises(ValueError):
+        make_vector_storage().search_similar(random_vectors(1)[0], limit=5, colour="red")
+
+
+def test_faiss_filtered_search_reports_squared_l2(make_vector_storage, monkeypatch, random_vectors):
+    storage = make_vector_storage(backend="faiss")
+    vectors, ids = store(storage, random_vectors(30, dim=FAISS_DIMENSIONS))
+    query = random_vectors(1, seed=9, dim=FAISS_DIMENSIONS)[0]
+    
+    everything = {hit['id']: hit['distance'] for hit in storage.search_similar(query, limit=30)}
+    for threshold in (len(ids), 0):
+        # Filter-first scores in Python; search-first masks the FAISS index
+        monkeypatch.setattr(aa014_vector_storage, "FILTER_FIRST_MAX_ROWS", threshold)
+        hits = storage.search_similar(query, limit=5, entities=["Acme"])
+        assert [hit['id'] for hit in hits] == expected_ids(storage, vectors, ids, query, lambda i: i % 2 == 0, 5)
+        assert [hit['distance'] for hit in hits] == pytest.approx([everything[hit['id']] for hit in hits], rel=1e-4)
+        assert hits[0]['distance'] == pytest.approx(
+            float(np.sum((query - vectors[ids.index(hits[0]['id'])]) ** 2)), rel=1e-4)
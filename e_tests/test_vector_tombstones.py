@@ -0,0 +1,198 @@
+import json
+
+import numpy as np
+import pytest
+
+from a_core.a_fileflow import aa014_vector_storage
+from a_core.e_utils.ae04_db_pool import get_pool
+from a_core.f_data.af02_migrations import VECTOR_DB_MIGRATIONS, MigrationRunner
+from a_core.f_data.af05_vector_codec import decode_embedding, encode_embedding
+from a_core.f_data.af06_vector_attributes import index_attributes
+
+
+@pytest.fixture(params=["exact", "ivf", "mmap"])
+def storage(request, make_vector_storage):
+    env = {"exact": {"VECTOR_ANN": "off"}, "ivf": {}, "mmap": {"VECTOR_BACKEND": "mmap"}}[request.param]
+    return make_vector_storage(**env)
+
+
+def found(storage, query, limit=50, **filters):
+    return [hit['id'] for hit in storage.search_similar(query, limit=limit, **filters)]
+
+
+def test_deleted_vectors_disappear_at_once(storage, random_vectors):
+    vectors = random_vectors(20)
+    ids = storage.store_embeddings_batch(vectors, ["doc"] * 20, [{"file_path": f"/f{i}"} for i in range(20)])
+    
+    assert storage.delete_embedding(ids[3])
+    assert not storage.delete_embedding(ids[3])
+    assert not storage.delete_embedding("vec_missing")
+    assert storage.get_total_embeddings() == 19
+    assert ids[3] not in found(storage, vectors[3])
+    # limit live hits come back whatever was tombstoned
+    assert len(found(storage, vectors[3], limit=19)) == 19
+
+
+@pytest.mark.parametrize("env, index, method", [({}, "ann_index", "search"),
+                                                ({"VECTOR_BACKEND": "mmap"}, "vector_matrix", "search_batch")])
+def test_index_searches_mask_tombstones_instead_of_over_fetching(make_vector_storage, monkeypatch,
+                                                                  env, index, method, random_vectors):
+    storage = make_vector_storage(**env)
+    vectors = random_vectors(20, seed=6)
+    ids = storage.store_embeddings_batch(vectors, ["doc"] * 20, [{}] * 20)
+    for vector_id in ids[:5]:
+        assert storage.delete_embedding(vector_id)
+    
+    ks = []
+    search = getattr(getattr(storage, index), method)
+    monkeypatch.setattr(getattr(storage, index), method,
+                        lambda queries, k, **kwargs: ks.append(k) or search(queries, k, **kwargs))
+    hits = found(storage, vectors[0], limit=15)
+    assert len(hits) == 15 and not set(hits) & set(ids[:5])
+    assert set(ks) == {15}
+
+
+def test_delete_document_retires_every_chunk(storage, random_vectors):
+    storage.upsert_document("/docs/long.pdf", random_vectors(3, seed=1), ["a", "b", "c"], {})
+    other = storage.upsert_document("/docs/other.pdf", random_vectors(1, seed=2), ["d"], {})
+    assert storage.delete_document("/docs/long.pdf") == 3
+    assert storage.delete_document("/docs/long.pdf") == 0
+    assert found(storage, random_vectors(1, seed=3)[0]) == [other]
+
+
+def test_update_replaces_vector_content_and_metadata(storage, random_vectors):
+    vectors = random_vectors(10, seed=4)
+    ids = storage.store_embeddings_batch(vectors, ["old"] * 10, [{"entities": ["Acme"]}] * 10)
+    target = random_vectors(1, seed=5)[0]
+    
+    assert storage.update_embedding(ids[2], list(target), content="new", metadata={"entities": ["Globex"]})
+    hit = storage.search_similar(target, limit=1)[0]
+    assert (hit['id'], hit['content'], hit['metadata']) == (ids[2], "new", {"entities": ["Globex"]})
+    assert hit['distance'] == pytest.approx(0, abs=1e-5)
+    assert found(storage, target, entities=["Globex"]) == [ids[2]]
+    assert ids[2] not in found(storage, target, entities=["Acme"])
+    assert storage.get_total_embeddings() == 10
+    
+    # The old version is a tombstone that compaction reclaims
+    assert len(storage._tombstones) == 1
+    assert storage.compact() == {"removed": 1, "vectors": 10}
+    assert storage.search_similar(target, limit=1)[0]['id'] == ids[2]
+    
+    assert not storage.update_embedding("vec_missing", list(target))
+    storage.delete_embedding(ids[3])
+    assert not storage.update_embedding(ids[3], list(target))
+
+
+def test_failed_index_update_keeps_the_old_vector(make_vector_storage, monkeypatch, random_vectors):
+    storage = make_vector_storage()
+    vectors = random_vectors(10, seed=6)
+    ids = storage.store_embeddings_batch(vectors, ["doc"] * 10, [{}] * 10)
+    
+    original = storage._add_to_index
+    calls = []
+    
+    def add_failing_once(row_id, embedding):
+        calls.append(row_id)
+        if len(calls) == 1:
+            raise RuntimeError("index full")
+        original(row_id, embedding)
+    monkeypatch.setattr(storage, "_add_to_index", add_failing_once)
+    
+    with pytest.raises(RuntimeError):
+        storage.update_embedding(ids[4], list(random_vectors(1, seed=7)[0]))
+    
+    # Neither the tombstone nor the new row was committed, and the index still holds only the old vector
+    with storage.metadata_pool.read() as conn:
+        stored = conn.execute("SELECT embedding FROM vectors WHERE vector_id = ?", (ids[4],)).fetchone()[0]
+    np.testing.assert_array_equal(decode_embedding(stored), vectors[4])
+    assert storage.ann_index.ntotal == 10
+    assert storage.search_similar(vectors[4], limit=1)[0]['id'] == ids[4]
+    assert len(storage._tombstones) == 0
+
+
+def test_compaction_drops_dead_rows_from_table_and_index(storage, random_vectors):
+    vectors = random_vectors(40, seed=8)
+    ids = storage.store_embeddings_batch(vectors, ["doc"] * 40, [{"file_path": f"/f{i}"} for i in range(40)])
+    for vector_id in ids[:10]:
+        storage.delete_embedding(vector_id)
+    
+    assert storage.maybe_compact() is None
+    assert storage.compact() == {"removed": 10, "vectors": 30}
+    assert len(storage._tombstones) == 0
+    with storage.metadata_pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0] == 30
+        assert conn.execute("SELECT COUNT(*) FROM vector_tombstones").fetchone()[0] == 0
+    if storage.ann_index is not None:
+        assert storage.ann_index.ntotal == 30
+    if storage.vector_matrix is not None:
+        assert storage.vector_matrix.count == 30
+    
+    assert storage.search_similar(vectors[20], limit=1)[0]['id'] == ids[20]
+    assert set(found(storage, vectors[0])) == set(ids[10:])
+    assert storage.compact()["removed"] == 0
+
+
+def test_maybe_compact_threshold(make_vector_storage, monkeypatch, random_vectors):
+    monkeypatch.setattr(aa014_vector_storage, "COMPACT_MIN_TOMBSTONES", 5)
+    storage = make_vector_storage()
+    ids = storage.store_embeddings_batch(random_vectors(20, seed=9), ["doc"] * 20, [{}] * 20)
+    for vector_id in ids[:4]:
+        storage.delete_embedding(vector_id)
+    assert storage.maybe_compact() is None
+    assert storage.maybe_compact(min_tombstones=1)["removed"] == 4
+    for vector_id in ids[4:9]:
+        storage.delete_embedding(vector_id)
+    assert storage.maybe_compact()["removed"] == 5
+
+
+def test_tombstones_survive_a_restart(make_vector_storage, random_vectors):
+    storage = make_vector_storage()
+    vectors = random_vectors(10, seed=10)
+    ids = storage.store_embeddings_batch(vectors, ["doc"] * 10, [{}] * 10)
+    storage.delete_embedding(ids[1])
+    storage.checkpoint()
+    
+    reopened = make_vector_storage()
+    assert ids[1] not in found(reopened, vectors[1])
+    assert reopened.compact()["removed"] == 1
+
+
+def test_scheduler_compacts_vectors_when_idle(db_manager, make_vector_storage, random_vectors):
+    from a_core.e_utils.ae05_maintenance import MaintenanceScheduler
+    
+    storage = make_vector_storage()
+    ids = storage.store_embeddings_batch(random_vectors(10, seed=11), ["doc"] * 10, [{}] * 10)
+    storage.delete_embedding(ids[0])
+    scheduler = MaintenanceScheduler(db_path=str(db_manager.db_path), idle_seconds=0, vector_storage=storage)
+    # The first pass only records the activity baseline; below the threshold nothing is compacted
+    assert scheduler.run_once()["vectors_removed"] == 0
+    result = scheduler.run_once()
+    assert result["compacted"] and result["vectors_removed"] == 1
+    assert len(storage._tombstones) == 0
+
+
+def test_migration_retires_superseded_documents(tmp_path, make_vector_storage, random_vectors):
+    # vectors.db from before upserts: every analysis of a file added a document
+    pool = get_pool(str(tmp_path / "vector_db" / "vectors.db"))
+    MigrationRunner(pool, VECTOR_DB_MIGRATIONS).run(target_version=3)
+    rows = [
+        ("vec_a1", {"file_path": "/a.txt"}),
+        ("vec_b1", {"file_path": "/b.txt"}),
+        ("vec_a2_0", {"file_path": "/a.txt", "parent_id": "vec_a2_0", "chunk_index": 0}),
+        ("vec_a2_1", {"file_path": "/a.txt", "parent_id": "vec_a2_0", "chunk_index": 1}),
+    ]
+    vectors = random_vectors(len(rows), seed=12)
+    with pool.transaction() as conn:
+        cursor = conn.cursor()
+        row_ids = []
+        for (vector_id, metadata), vector in zip(rows, vectors):
+            cursor.execute("INSERT INTO vectors (vector_id, embedding, content, metadata) VALUES (?, ?, ?, ?)",
+                           (vector_id, encode_embedding(vector), "doc", json.dumps(metadata)))
+            row_ids.append(cursor.lastrowid)
+        index_attributes(cursor, zip(row_ids, [metadata for _, metadata in rows]))
+    
+    storage = make_vector_storage()
+    # The newest document of /a.txt keeps both its chunks; the older one is retired
+    assert sorted(found(storage, vectors[0])) == ["vec_a2_0", "vec_a2_1", "vec_b1"]
+    assert "vec_a1" not in found(storage, vectors[0], file_paths=["/a.txt"])
+    assert storage.get_total_embeddings() == 3
@@ -0,0 +1,73 @@
+import time
+
+from a_core.a_fileflow.aa05_database import DatabaseManager
+
+
+def count(db_manager, table):
+    with db_manager.pool.read() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_queued_rows_reach_the_database_on_flush(db_path):
+    # A long interval keeps the background flusher out of the way
+    db_manager = DatabaseManager(db_path, batch_size=1000, flush_interval_ms=60000)
+    try:
+        for i in range(3):
+            db_manager.queue_file_analysis(
+                f"/docs/file{i}.txt", f"file{i}.txt", f"renamed{i}.txt", f"text {i}", {},
+                ["Acme"], 0.8, "test", "", "created"
+            )
+        db_manager.queue_document_context("/docs/file0.txt", ["Acme"], "summary", ["text"])
+        db_manager.queue_file_fingerprint("/docs/file0.txt", 10, 1, 2, "abc")
+        
+        assert db_manager._pending_count() == 6
+        assert count(db_manager, "file_analysis") == 0
+        
+        # 3 analyses, 1 entity usage increment, 1 context, 1 fingerprint
+        assert db_manager.flush() == 6
+        assert db_manager._pending_count() == 0
+        assert count(db_manager, "file_analysis") == 3
+        assert count(db_manager, "document_context") == 1
+        assert count(db_manager, "file_fingerprints") == 1
+        with db_manager.pool.read() as conn:
+            assert conn.execute(
+                "SELECT usage_count FROM entities WHERE entity_name = 'Acme'"
+            ).fetchone()[0] == 3
+    finally:
+        db_manager.close()
+
+
+def test_later_analysis_of_a_path_supersedes_the_buffered_one(db_path):
+    db_manager = DatabaseManager(db_path, batch_size=1000, flush_interval_ms=60000)
+    try:
+        for name in ("first.txt", "second.txt"):
+            db_manager.queue_file_analysis("/docs/a.txt", "a.txt", name, "text", {}, [], 0.8, "", "", "modified")
+        # Buffered content is readable before the flush
+        assert db_manager.get_file_content("/docs/a.txt") == "text"
+        db_manager.flush()
+        with db_manager.pool.read() as conn:
+            rows = conn.execute("SELECT suggested_name FROM file_analysis").fetchall()
+        assert rows == [("second.txt",)]
+    finally:
+        db_manager.close()
+
+
+def test_batch_size_triggers_a_background_flush(db_path):
+    db_manager = DatabaseManager(db_path, batch_size=2, flush_interval_ms=60000)
+    try:
+        for i in range(2):
+            db_manager.queue_file_fingerprint(f"/docs/{i}.txt", 1, 1, None, None)
+        
+        deadline = time.monotonic() + 5
+        while count(db_manager, "file_fingerprints") < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count(db_manager, "file_fingerprints") == 2
+    finally:
+        db_manager.close()
+
+
+def test_close_writes_out_buffered_rows(db_path):
+    db_manager = DatabaseManager(db_path, batch_size=1000, flush_interval_ms=60000)
+    db_manager.queue_file_fingerprint("/docs/a.txt", 1, 1, None, None)
+    db_manager.close()
+    assert count(db_manager, "file_fingerprints") == 1